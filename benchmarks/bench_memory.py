@@ -0,0 +1,132 @@
+# AI generated and maintained by claude-3.7-sonnet
+# Benchmark: per-transaction memory and peak RSS during import parsing and reporting
+# License: MIT
+#
+# Usage: python benchmarks/bench_memory.py [--rows 200000]
+#
+# Each phase runs in a fresh interpreter so its peak RSS is not polluted by the
+# previous phase. Run it on two commits to compare before/after numbers.
+
+import argparse
+import csv
+import io
+import os
+import random
+import subprocess
+import sys
+import tempfile
+from contextlib import redirect_stdout
+from datetime import date, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+MERCHANTS = [
+    ("LOBLAWS #{n} TORONTO ON", "Groceries", "Supermarket"),
+    ("TIM HORTONS #{n}", "Dining", "Coffee"),
+    ("AMZN MKTP CA*{n}", "Shopping", "Online"),
+    ("SHELL C{n}", "Transport", "Fuel"),
+    ("NETFLIX.COM {n}", "Entertainment", "Streaming"),
+    ("HYDRO ONE {n}", "Housing", "Utilities"),
+]
+TAGS = ["", "", "", "vacation", "reimbursable"]
+
+
+def write_stored_csv(path: str, rows: int):
+    """Write a synthetic transactions.csv in storage format."""
+    from cmdbudget.config import CSV_FIELDNAMES, STORAGE_DATE_FORMAT
+    rng = random.Random(42)
+    start = date(2015, 1, 1)
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(CSV_FIELDNAMES)
+        for i in range(rows):
+            pattern, category, subcategory = rng.choice(MERCHANTS)
+            day = start + timedelta(days=i * 3650 // rows)
+            writer.writerow([
+                day.strftime(STORAGE_DATE_FORMAT),
+                pattern.format(n=rng.randint(1, 9999)),
+                f"{rng.randint(100, 50000) / 100:.2f}",
+                "CAD" if rng.random() < 0.9 else "USD",
+                category,
+                subcategory,
+                rng.choice(TAGS),
+                "",
+            ])
+
+
+def peak_rss_kb() -> int:
+    import resource
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return usage // 1024 if sys.platform == "darwin" else usage
+
+
+def phase_import(path: str):
+    """Parse the stored file into Transaction objects (the import/dedupe load path)."""
+    import tracemalloc
+    from cmdbudget.transaction_operations import TransactionOperations
+    import logging
+    logging.disable(logging.CRITICAL)
+    tracemalloc.start()
+    transactions = TransactionOperations.read_transactions(path)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    existing = set(transactions)
+    print(f"import: rows={len(transactions)} bytes/transaction={current // max(1, len(transactions))} "
+          f"distinct={len(existing)} peak_rss_kb={peak_rss_kb()}")
+
+
+def phase_report(path: str):
+    """Load through TransactionsManager and render every report type."""
+    import logging
+    logging.disable(logging.CRITICAL)
+    from cmdbudget.transactions_manager import TransactionsManager
+    workdir = os.path.dirname(path)
+    manager = TransactionsManager(
+        path,
+        os.path.join(workdir, "new_transactions.csv"),
+        os.path.join(workdir, "config.yml"),
+        os.path.join(workdir, "categories.yml"),
+        os.path.join(workdir, "transaction_mappings.yml"),
+    )
+    with redirect_stdout(io.StringIO()):
+        manager.initialize_data()
+        reporter = manager.reporter
+        months = reporter.get_available_months()
+        year, month = months[-1]
+        reporter.display_month_data(month, year, manager.get_transactions_for_month((year, month)))
+        reporter.display_category_data(reporter.get_available_categories()[0])
+        reporter.display_tag_data("vacation")
+    print(f"report: rows={len(manager.transactions)} peak_rss_kb={peak_rss_kb()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--phase", choices=["import", "report"], help=argparse.SUPPRESS)
+    parser.add_argument("--file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.phase == "import":
+        phase_import(args.file)
+        return
+    if args.phase == "report":
+        phase_report(args.file)
+        return
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "transactions.csv")
+        write_stored_csv(path, args.rows)
+        with open(os.path.join(workdir, "config.yml"), "w") as file:
+            file.write("import_csv_structure: {}\n")
+        with open(os.path.join(workdir, "categories.yml"), "w") as file:
+            file.write("categories: {IGNORED: [], SPLIT: []}\n")
+        with open(os.path.join(workdir, "transaction_mappings.yml"), "w") as file:
+            file.write("mappings: {}\n")
+        for phase in ("import", "report"):
+            subprocess.run([sys.executable, __file__, "--phase", phase, "--file", path], check=True, cwd=workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,469 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file serves reports and transactions as JSON over a local HTTP API
+# License: MIT
+
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from .currency_utils import from_minor_units
+from .display import Display
+from .search_query import QueryError, QueryPlan
+from .transaction_reporter import TransactionCategoryGrouper
+from .transaction_columns import RESERVED_CATEGORIES
+
+logger = logging.getLogger(__name__)
+
+# Page size of /api/transactions and /api/search when no limit is given, and the largest allowed
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 10000
+# Transactions per chunk of a streamed response
+STREAM_CHUNK_ROWS = 500
+# Largest request head (request line plus headers) accepted
+MAX_REQUEST_HEAD = 16 * 1024
+# Idle keep-alive connections are closed after this many seconds
+KEEP_ALIVE_TIMEOUT = 30
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+
+
+class ApiError(Exception):
+    """A request that cannot be answered, with the HTTP status to reply with."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def storage_signature(store) -> Tuple:
+    """The store's data generation: it changes whenever the stored history changes."""
+    return store.generation()
+
+
+def amounts_json(minor_by_currency: Dict[str, int]) -> Dict[str, float]:
+    """{currency: major-unit amount} for a {currency: minor units} mapping, omitting zeros."""
+    return {
+        currency: from_minor_units(total, currency)
+        for currency, total in sorted(minor_by_currency.items()) if total
+    }
+
+
+def transaction_json(row: int, transaction) -> Dict[str, Any]:
+    return {
+        "id": row,
+        "date": transaction.date.strftime("%Y-%m-%d"),
+        "description": transaction.description,
+        "amount": from_minor_units(transaction.amount_minor, transaction.currency),
+        "currency": transaction.currency,
+        "category": transaction.category,
+        "subcategory": transaction.subcategory,
+        "tag": transaction.tag,
+        "tags": list(transaction.tags),
+        "merchant": transaction.merchant,
+    }
+
+
+class ReportApi:
+    """JSON views over one loaded `TransactionsManager`.
+
+    Each method answers one route from the warm columns and reporter, without
+    touching the transaction files. Row ids in the output are positions in the
+    loaded table and change when the server reloads after a write.
+    """
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.reporter = manager.reporter
+        self.columns = manager.reporter.columns
+
+    def months(self) -> Dict[str, Any]:
+        return {"months": [{"year": year, "month": month} for year, month in self.reporter.get_available_months()]}
+
+    def categories(self) -> Dict[str, Any]:
+        return {"categories": self.reporter.get_available_categories()}
+
+    def tags(self) -> Dict[str, Any]:
+        return {"tags": self.reporter.get_available_tags()}
+
+    def month_report(self, year: int, month: int) -> Dict[str, Any]:
+        """Category and subcategory totals for one month, like the CLI month report."""
+        rows = self.reporter.month_rows.get((year, month))
+        if rows is None:
+            raise ApiError(404, f"No transactions in {year}-{month:02d}")
+        grouped = TransactionCategoryGrouper(self.columns, rows, self.reporter.fx_rates).group()
+        show_base = self.reporter.fx_rates is not None
+        totals: Dict[str, int] = defaultdict(int)
+        categories = []
+        for category in sorted(grouped):
+            data = grouped[category]
+            for currency, total in data["spends"].items():
+                totals[currency] += total
+            subcategories = []
+            for subcategory, amounts in sorted(data["subcategories"].items()):
+                subcategory_entry = {"subcategory": subcategory, "amounts": amounts_json(amounts)}
+                if show_base:
+                    subcategory_entry["base"] = data["subcategory_base"].get(subcategory, 0.0)
+                subcategories.append(subcategory_entry)
+            entry = {"category": category, "amounts": amounts_json(data["spends"]), "subcategories": subcategories}
+            if show_base:
+                entry["base"] = data["base"]
+            categories.append(entry)
+        report = {"year": year, "month": month, "categories": categories, "totals": amounts_json(totals)}
+        if show_base:
+            report["base_currency"] = self.reporter.fx_rates.base_currency
+            report["base_total"] = sum(data["base"] for data in grouped.values())
+        return report
+
+    def category_report(self, category: str) -> Dict[str, Any]:
+        """Monthly totals (with subcategories) and yearly totals for one category."""
+        if category not in self.reporter.get_available_categories():
+            raise ApiError(404, f"Unknown category: {category}")
+        columns = self.columns
+        months, yearly = [], defaultdict(lambda: defaultdict(int))
+        for (year, month) in self.reporter.get_available_months():
+            rows = columns.rows_with("category", category, self.reporter.month_rows[(year, month)])
+            if not rows:
+                continue
+            month_totals, subcategories = defaultdict(int), defaultdict(lambda: defaultdict(int))
+            for (subcategory_code, currency_code), total in columns.group_sum(("subcategory", "currency"), rows).items():
+                currency = columns.currency.decode(currency_code)
+                month_totals[currency] += total
+                yearly[year][currency] += total
+                subcategory = columns.subcategory.decode(subcategory_code)
+                if subcategory:
+                    subcategories[subcategory][currency] += total
+            months.append({
+                "year": year, "month": month, "amounts": amounts_json(month_totals),
+                "subcategories": {name: amounts_json(amounts) for name, amounts in sorted(subcategories.items())},
+            })
+        return {
+            "category": category,
+            "months": months,
+            "years": [{"year": year, "amounts": amounts_json(totals)} for year, totals in sorted(yearly.items())],
+        }
+
+    def tag_report(self, tag: str) -> Dict[str, Any]:
+        """Monthly totals (with categories) and yearly totals for one tag."""
+        if tag not in self.reporter.get_available_tags():
+            raise ApiError(404, f"Unknown tag: {tag}")
+        columns = self.columns
+        months, yearly = [], defaultdict(lambda: defaultdict(int))
+        month_rows = self.reporter.tag_month_rows(tag)
+        for (year, month) in sorted(month_rows):
+            rows = month_rows[(year, month)]
+            month_totals, categories = defaultdict(int), defaultdict(lambda: defaultdict(int))
+            for (category_code, currency_code), total in columns.group_sum(("category", "currency"), rows).items():
+                currency = columns.currency.decode(currency_code)
+                month_totals[currency] += total
+                yearly[year][currency] += total
+                categories[columns.category.decode(category_code)][currency] += total
+            months.append({
+                "year": year, "month": month, "amounts": amounts_json(month_totals),
+                "categories": {name: amounts_json(amounts) for name, amounts in sorted(categories.items())},
+            })
+        return {
+            "tag": tag,
+            "months": months,
+            "years": [{"year": year, "amounts": amounts_json(totals)} for year, totals in sorted(yearly.items())],
+        }
+
+    def filter_rows(self, params: Dict[str, str]) -> List[int]:
+        """Row ids matching the month/category/tag/q filters, oldest first.
+
+        IGNORED and SPLIT rows are left out unless `reserved=1` is given or the
+        category filter names one of them.
+        """
+        columns = self.columns
+        include_reserved = params.get("reserved") == "1" or params.get("category") in RESERVED_CATEGORIES
+        if "month" in params:
+            year, month = parse_month(params["month"])
+            if include_reserved:
+                first_day = datetime(year, month, 1).toordinal()
+                next_month = datetime(year + month // 12, month % 12 + 1, 1).toordinal()
+                rows: Iterable[int] = [row for row, day in enumerate(columns.day) if first_day <= day < next_month]
+            else:
+                rows = self.reporter.month_rows.get((year, month), [])
+        else:
+            rows = range(len(columns)) if include_reserved else self.reporter.rows
+        for name in ("category", "subcategory", "merchant", "currency"):
+            if name in params:
+                value = params[name].upper() if name == "currency" else params[name]
+                rows = columns.rows_with(name, value, rows)
+        if "tag" in params:
+            rows = columns.rows_with_tag(params["tag"], rows)
+        if params.get("q"):
+            needle = params["q"].upper()
+            transactions = columns.transactions
+            rows = [row for row in rows if needle in transactions[row].description.upper()]
+        rows = list(rows)
+        rows.sort(key=columns.day.__getitem__)
+        return rows
+
+    def page(self, params: Dict[str, str]) -> Tuple[Dict[str, Any], List[int]]:
+        """Envelope fields and the row ids of one page of filtered transactions."""
+        rows = self.filter_rows(params)
+        offset = parse_int(params, "offset", 0, 0, None)
+        limit = parse_int(params, "limit", DEFAULT_PAGE_SIZE, 1, MAX_PAGE_SIZE)
+        return {"total": len(rows), "offset": offset, "limit": limit}, rows[offset:offset + limit]
+
+    def query_page(self, params: Dict[str, str]) -> Tuple[Dict[str, Any], List[int]]:
+        """Envelope fields and row ids of one page of a search expression's matches.
+
+        Sorted by `sort` (date, amount or description) in `order` (desc by default);
+        only the first offset + limit matches are ordered.
+        """
+        offset = parse_int(params, "offset", 0, 0, None)
+        limit = parse_int(params, "limit", DEFAULT_PAGE_SIZE, 1, MAX_PAGE_SIZE)
+        order = params.get("order", "desc")
+        if order not in ("asc", "desc"):
+            raise ApiError(400, "'order' must be asc or desc")
+        try:
+            plan = QueryPlan(params["query"], self.manager.get_search_index())
+            result = plan.execute(params.get("sort", "date"), order == "desc", limit, offset)
+        except QueryError as e:
+            raise ApiError(400, str(e))
+        return {"total": result.total, "offset": offset, "limit": limit}, result.rows
+
+    def transaction_chunks(self, rows: List[int]) -> Iterator[List[Dict[str, Any]]]:
+        transactions = self.columns.transactions
+        for start in range(0, len(rows), STREAM_CHUNK_ROWS):
+            yield [transaction_json(row, transactions[row]) for row in rows[start:start + STREAM_CHUNK_ROWS]]
+
+
+def parse_month(value: str) -> Tuple[int, int]:
+    try:
+        parsed = datetime.strptime(value, "%Y-%m")
+    except ValueError:
+        raise ApiError(400, f"Invalid month '{value}', expected YYYY-MM")
+    return parsed.year, parsed.month
+
+
+def parse_int(params: Dict[str, str], name: str, default: int, minimum: int, maximum: Optional[int]) -> int:
+    if name not in params:
+        return default
+    try:
+        value = int(params[name])
+    except ValueError:
+        raise ApiError(400, f"'{name}' must be a whole number")
+    if value < minimum or (maximum is not None and value > maximum):
+        raise ApiError(400, f"'{name}' must be between {minimum} and {maximum if maximum is not None else 'any'}")
+    return value
+
+
+class ApiServer:
+    """Asyncio HTTP/1.1 server answering GET requests from an in-memory model.
+
+    The history is loaded once, in a worker thread. Each request first compares
+    the storage files' mtime and size with those of the loaded model; only when
+    another session has written does it load a fresh model, again in a thread,
+    and swap it in. Requests in flight keep the model they started with, so a
+    reload never changes data under a streaming response.
+    """
+
+    def __init__(self, manager_factory: Callable[[], Any], host: str, port: int):
+        self.manager_factory = manager_factory
+        self.host = host
+        self.port = port
+        self.api: Optional[ReportApi] = None
+        self.signature: Optional[Tuple] = None
+        self._reload_lock = asyncio.Lock()
+        self.routes = [
+            (("api", "months"), self._months),
+            (("api", "months", None, None), self._month_report),
+            (("api", "categories"), self._categories),
+            (("api", "categories", None), self._category_report),
+            (("api", "tags"), self._tags),
+            (("api", "tags", None), self._tag_report),
+            (("api", "transactions"), self._transactions),
+            (("api", "search"), self._search),
+        ]
+
+    def _load(self) -> Tuple[ReportApi, Tuple]:
+        manager = self.manager_factory()
+        # Taken before reading, so a write during the load is picked up by the next request
+        signature = storage_signature(manager.store)
+        manager.initialize_data()
+        # Built here, off the event loop, rather than by the first search request
+        manager.get_search_index()
+        return ReportApi(manager), signature
+
+    async def current_api(self) -> ReportApi:
+        """The loaded model, reloaded first if the stored history changed since it was loaded."""
+        if self.api is not None and storage_signature(self.api.manager.store) == self.signature:
+            return self.api
+        async with self._reload_lock:
+            # Another request may have reloaded while this one waited
+            if self.api is None or storage_signature(self.api.manager.store) != self.signature:
+                logger.info("Loading transaction history for the API")
+                self.api, self.signature = await asyncio.to_thread(self._load)
+                logger.info(f"API model loaded: {len(self.api.columns)} transactions")
+        return self.api
+
+    async def serve(self):
+        await self.current_api()
+        server = await asyncio.start_server(self._handle_connection, self.host, self.port, limit=MAX_REQUEST_HEAD)
+        Display.message(f"Serving the cmdbudget API on http://{self.host}:{self.port}/api/ (Ctrl+C to stop)")
+        async with server:
+            await server.serve_forever()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEP_ALIVE_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    break
+                except asyncio.LimitOverrunError:
+                    await self._send_json(writer, 400, {"error": "Request head too large"}, keep_alive=False)
+                    break
+                if not await self._handle_request(head, writer):
+                    break
+        except ConnectionError as e:
+            logger.debug(f"API client disconnected: {e}")
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _handle_request(self, head: bytes, writer: asyncio.StreamWriter) -> bool:
+        """Answer one request. Returns False when the connection should be closed."""
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, version = lines[0].split(" ")
+        except ValueError:
+            await self._send_json(writer, 400, {"error": "Malformed request line"}, keep_alive=False)
+            return False
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            if name:
+                headers[name.strip().lower()] = value.strip()
+        connection = headers.get("connection", "").lower()
+        keep_alive = connection == "keep-alive" if version == "HTTP/1.0" else connection != "close"
+        if headers.get("content-length", "0") != "0" or "transfer-encoding" in headers:
+            # Only GET is served, so a request body is never expected; closing avoids reading it
+            keep_alive = False
+
+        if method != "GET":
+            await self._send_json(writer, 405, {"error": f"Method {method} not allowed"}, keep_alive, {"Allow": "GET"})
+            return keep_alive
+
+        url = urlsplit(target)
+        parts = tuple(unquote(part) for part in url.path.strip("/").split("/"))
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        try:
+            handler, arguments = self._route(parts)
+            api = await self.current_api()
+            await handler(writer, api, params, keep_alive, *arguments)
+        except ApiError as e:
+            await self._send_json(writer, e.status, {"error": str(e)}, keep_alive)
+        except ConnectionError:
+            raise
+        except Exception as e:
+            logger.error(f"Error answering {method} {target}: {e}", exc_info=True)
+            await self._send_json(writer, 500, {"error": "Internal server error"}, keep_alive=False)
+            return False
+        logger.debug(f"{method} {target}")
+        return keep_alive
+
+    def _route(self, parts: Tuple[str, ...]):
+        """Handler and path arguments for a path; None in a route pattern matches any segment."""
+        for pattern, handler in self.routes:
+            if len(pattern) == len(parts) and all(expected in (None, part) for expected, part in zip(pattern, parts)):
+                return handler, [part for expected, part in zip(pattern, parts) if expected is None]
+        raise ApiError(404, "Not found")
+
+    # --- Routes ---
+
+    async def _months(self, writer, api: ReportApi, params, keep_alive):
+        await self._send_json(writer, 200, api.months(), keep_alive)
+
+    async def _month_report(self, writer, api: ReportApi, params, keep_alive, year: str, month: str):
+        if not (year.isdigit() and month.isdigit() and 1 <= int(month) <= 12):
+            raise ApiError(400, "Expected /api/months/<year>/<month>")
+        await self._send_json(writer, 200, api.month_report(int(year), int(month)), keep_alive)
+
+    async def _categories(self, writer, api: ReportApi, params, keep_alive):
+        await self._send_json(writer, 200, api.categories(), keep_alive)
+
+    async def _category_report(self, writer, api: ReportApi, params, keep_alive, category: str):
+        await self._send_json(writer, 200, api.category_report(category), keep_alive)
+
+    async def _tags(self, writer, api: ReportApi, params, keep_alive):
+        await self._send_json(writer, 200, api.tags(), keep_alive)
+
+    async def _tag_report(self, writer, api: ReportApi, params, keep_alive, tag: str):
+        await self._send_json(writer, 200, api.tag_report(tag), keep_alive)
+
+    async def _transactions(self, writer, api: ReportApi, params, keep_alive):
+        envelope, rows = api.page(params)
+        await self._stream_transactions(writer, api, envelope, rows, keep_alive)
+
+    async def _search(self, writer, api: ReportApi, params, keep_alive):
+        if params.get("query"):
+            envelope, rows = api.query_page(params)
+            await self._stream_transactions(writer, api, dict(envelope, query=params["query"]), rows, keep_alive)
+            return
+        if not params.get("q"):
+            raise ApiError(400, "Missing search text 'q' or search expression 'query'")
+        envelope, rows = api.page(params)
+        await self._stream_transactions(writer, api, dict(envelope, q=params["q"]), rows, keep_alive)
+
+    # --- Responses ---
+
+    async def _send_json(self, writer: asyncio.StreamWriter, status: int, payload: Dict[str, Any],
+                         keep_alive: bool = True, extra_headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        headers = {"Content-Length": str(len(body))}
+        headers.update(extra_headers or {})
+        writer.write(self._head(status, headers, keep_alive) + body)
+        await writer.drain()
+
+    async def _stream_transactions(self, writer: asyncio.StreamWriter, api: ReportApi, envelope: Dict[str, Any],
+                                   rows: List[int], keep_alive: bool):
+        """Send a page of transactions with chunked encoding, a few hundred rows per chunk.
+
+        Rows are encoded chunk by chunk between drains, so a large page neither sits in
+        memory as one body nor holds up other clients for its whole length.
+        """
+        writer.write(self._head(200, {"Transfer-Encoding": "chunked"}, keep_alive))
+        opening = json.dumps(envelope, ensure_ascii=False)[:-1] + ', "transactions": ['
+        self._write_chunk(writer, opening)
+        first = True
+        for chunk in api.transaction_chunks(rows):
+            text = ", ".join(json.dumps(item, ensure_ascii=False) for item in chunk)
+            self._write_chunk(writer, text if first else ", " + text)
+            first = False
+            await writer.drain()
+        self._write_chunk(writer, "]}")
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    @staticmethod
+    def _write_chunk(writer: asyncio.StreamWriter, text: str):
+        data = text.encode("utf-8")
+        writer.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+
+    @staticmethod
+    def _head(status: int, headers: Dict[str, str], keep_alive: bool) -> bytes:
+        lines = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}", "Content-Type: application/json; charset=utf-8"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        lines.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+def serve(manager_factory: Callable[[], Any], host: str, port: int):
+    """Run the API server until interrupted."""
+    try:
+        asyncio.run(ApiServer(manager_factory, host, port).serve())
+    except KeyboardInterrupt:
+        Display.message("\nAPI server stopped.")
+    except OSError as e:
+        logger.error(f"Could not start the API server on {host}:{port}: {e}", exc_info=True)
+        Display.error(f"Could not start the API server on {host}:{port}: {e}")
@@ -0,0 +1,164 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file selects stored transactions with a filter and edits them all in one pass
+# License: MIT
+
+import logging
+from dataclasses import dataclass, field, replace
+from datetime import date
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+from .currency_utils import to_minor_units
+from .transaction import Transaction, join_tags, parse_tags, split_tags
+from .transaction_columns import RESERVED_CATEGORIES
+
+logger = logging.getLogger(__name__)
+
+# Fields a batch edit can set
+BATCH_FIELDS = ("category", "subcategory", "tag", "merchant")
+# Changes that add tags to, or remove tags from, each transaction's own tags
+TAG_CHANGES = ("add_tags", "remove_tags")
+
+
+@dataclass
+class TransactionFilter:
+    """Which stored transactions a batch edit applies to. Unset criteria match everything.
+
+    `description` matches case-insensitively anywhere in the description; `tag`
+    matches transactions having that tag among their tags; the amount bounds are inclusive, in major units of each transaction's currency.
+    IGNORED and SPLIT rows only match when `category` names them.
+    """
+    start: Optional[date] = None
+    end: Optional[date] = None
+    description: str = ""
+    category: Optional[str] = None
+    subcategory: Optional[str] = None
+    tag: Optional[str] = None
+    min_amount: Optional[Decimal] = None
+    max_amount: Optional[Decimal] = None
+    _bounds: Dict[str, Tuple[Optional[int], Optional[int]]] = field(default_factory=dict, init=False, repr=False)
+
+    def matches(self, transaction: Transaction) -> bool:
+        if transaction.category in RESERVED_CATEGORIES and transaction.category != self.category:
+            return False
+        day = transaction.date.date()
+        if (self.start and day < self.start) or (self.end and day > self.end):
+            return False
+        if self.category is not None and transaction.category != self.category:
+            return False
+        if self.subcategory is not None and transaction.subcategory != self.subcategory:
+            return False
+        if self.tag is not None and self.tag not in transaction.tags:
+            return False
+        if self.description and self.description.upper() not in transaction.description.upper():
+            return False
+        if self.min_amount is not None or self.max_amount is not None:
+            low, high = self._minor_bounds(transaction.currency)
+            if (low is not None and transaction.amount_minor < low) or (high is not None and transaction.amount_minor > high):
+                return False
+        return True
+
+    def _minor_bounds(self, currency: str) -> Tuple[Optional[int], Optional[int]]:
+        """Amount bounds in the currency's minor units, converted once per currency."""
+        bounds = self._bounds.get(currency)
+        if bounds is None:
+            bounds = tuple(None if amount is None else to_minor_units(amount, currency)
+                           for amount in (self.min_amount, self.max_amount))
+            self._bounds[currency] = bounds
+        return bounds
+
+
+class BatchEditor:
+    """Applies one set of field changes to every stored transaction a filter selects.
+
+    `preview` reads only the partitions the filter's date range overlaps. `apply`
+    streams each partition holding a match through the filter once, rewriting the
+    matching rows, and the store commits every rewritten file together, so
+    re-tagging a few hundred transactions is one pass and one write. Sealed
+    partitions are left out, as they are for single edits.
+    """
+
+    def __init__(self, store, classifier=None, undo_log=None):
+        self.store = store
+        self.classifier = classifier
+        self.undo_log = undo_log
+
+    def preview(self, selection: TransactionFilter) -> List[Transaction]:
+        """Stored transactions the filter selects, oldest first."""
+        matches = [t for t in self.store.read_range(selection.start, selection.end) if selection.matches(t)]
+        matches.sort(key=lambda t: t.date)
+        return matches
+
+    def sealed_matches(self, matches: List[Transaction]) -> int:
+        """How many of the previewed transactions are in sealed partitions (and will not be edited)."""
+        return sum(1 for t in matches if self.store.is_sealed(self.store.partition_key(t.date)))
+
+    @staticmethod
+    def prepare(changes: Dict[str, str]) -> Dict[str, str]:
+        """Validate and normalize a batch edit's changes.
+
+        Changing the category without giving a subcategory clears the subcategory;
+        tag values may list several tags separated by commas or semicolons.
+        Raises ValueError for a field that cannot be batch edited or a SPLIT category.
+        """
+        unknown = set(changes) - set(BATCH_FIELDS) - set(TAG_CHANGES)
+        if unknown:
+            raise ValueError(f"Cannot batch edit {sorted(unknown)}. Use any of {BATCH_FIELDS + TAG_CHANGES}")
+        if changes.get("category") == "SPLIT":
+            raise ValueError("Transactions can only be split one at a time")
+        changes = dict(changes)
+        if "category" in changes:
+            changes.setdefault("subcategory", "")
+        for name in ("tag",) + TAG_CHANGES:
+            if name in changes:
+                changes[name] = parse_tags(changes[name])
+        return changes
+
+    @staticmethod
+    def edited(transaction: Transaction, changes: Dict[str, str]) -> Optional[Transaction]:
+        """The transaction with prepared changes applied, or None if they change nothing."""
+        fields = {name: value for name, value in changes.items() if name in BATCH_FIELDS}
+        if "add_tags" in changes or "remove_tags" in changes:
+            removed = set(split_tags(changes.get("remove_tags", "")))
+            kept = [tag for tag in split_tags(fields.get("tag", transaction.tag)) if tag not in removed]
+            fields["tag"] = join_tags(kept + list(split_tags(changes.get("add_tags", ""))))
+        if all(getattr(transaction, name) == value for name, value in fields.items()):
+            return None
+        return replace(transaction, **fields)
+
+    def apply(self, selection: TransactionFilter, changes: Dict[str, str],
+              matches: Optional[List[Transaction]] = None) -> Optional[int]:
+        """Set `changes` (see `prepare`) on every selected transaction. Returns the number changed, None on failure.
+
+        Raises ValueError for changes `prepare` rejects.
+        """
+        changes = self.prepare(changes)
+
+        if matches is None:
+            matches = self.preview(selection)
+        keys = sorted({self.store.partition_key(t.date) for t in matches})
+        keys = [key for key in keys if not self.store.is_sealed(key)]
+        if not keys:
+            return 0
+
+        edited_pairs: List[Tuple[Transaction, Transaction]] = []
+
+        def edit(transaction: Transaction) -> Optional[Transaction]:
+            if not selection.matches(transaction):
+                return None
+            edited = self.edited(transaction, changes)
+            if edited is not None:
+                edited_pairs.append((transaction, edited))
+            return edited
+
+        changed = self.store.rewrite_partitions(keys, edit)
+        if changed is None:
+            return None
+        logger.info(f"Batch edit set {changes} on {changed} transactions in partitions {keys}")
+        if self.undo_log is not None:
+            self.undo_log.record(f"Batch edit of {changed} transactions", transactions=[([o], [e]) for o, e in edited_pairs])
+        if self.classifier is not None and ("category" in changes or "subcategory" in changes):
+            # Keep the suggestion index in line with the new categorization
+            for original, edited in edited_pairs:
+                self.classifier.relearn(original, edited)
+        return changed
@@ -0,0 +1,181 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file implements block-compressed archives of stored transaction CSV files
+# License: MIT
+
+import csv
+import gzip
+import io
+import json
+import logging
+import lzma
+import os
+from datetime import date
+from typing import Dict, List, Optional
+
+from .csv_month_index import iter_record_spans
+from .file_lock import open_snapshot
+from .utils import parse_date_multi_format, memoize_date_parser
+
+logger = logging.getLogger(__name__)
+
+# compression name -> (file extension, compress, decompress, open whole stream)
+ARCHIVE_CODECS = {
+    "gzip": (".gz", lambda data: gzip.compress(data, mtime=0), gzip.decompress, gzip.open),
+    "lzma": (".xz", lzma.compress, lzma.decompress, lzma.open),
+}
+ARCHIVE_INDEX_VERSION = 1
+# Suffix of the JSON block index written next to each archive
+ARCHIVE_INDEX_SUFFIX = ".blocks.json"
+DEFAULT_BLOCK_ROWS = 2000
+
+
+def is_block_archive(path: str) -> bool:
+    """True if the path names a compressed archive rather than a plain CSV."""
+    return any(path.endswith(codec[0]) for codec in ARCHIVE_CODECS.values())
+
+
+def archive_path_for(csv_path: str, compression: str) -> str:
+    return csv_path + ARCHIVE_CODECS[compression][0]
+
+
+def _compression_of(path: str) -> str:
+    for name, codec in ARCHIVE_CODECS.items():
+        if path.endswith(codec[0]):
+            return name
+    raise ValueError(f"Not a block archive: {path}")
+
+
+def write_block_archive(csv_path: str, archive_path: str, compression: str = "gzip",
+                        block_rows: int = DEFAULT_BLOCK_ROWS) -> Dict:
+    """Compress a stored CSV into independently compressed blocks and write its block index.
+
+    The header row is block 0 and every later block holds up to `block_rows` records.
+    Each block is a complete gzip member (or xz stream), so the archive also decompresses
+    as a whole with `gzip -dc`/`xz -dc`. The index records each block's byte offset,
+    length, row count and date range so readers can decompress only what they need.
+    """
+    compress = ARCHIVE_CODECS[compression][1]
+    date_parser = memoize_date_parser(parse_date_multi_format)
+    with open(csv_path, "rb") as file:
+        data = file.read()
+
+    spans = iter_record_spans(data, 0, len(data))
+    header_span = next(spans, None)
+    header = data[header_span[0]:header_span[1]] if header_span else b""
+
+    blocks: List[Dict] = []
+    temp_path = f"{archive_path}.tmp"
+    with open(temp_path, "wb") as out:
+        def write_block(payload: bytes, rows: int, min_date: Optional[str], max_date: Optional[str]):
+            compressed = compress(payload)
+            blocks.append({
+                "offset": out.tell(), "length": len(compressed), "rows": rows,
+                "min_date": min_date, "max_date": max_date,
+            })
+            out.write(compressed)
+
+        write_block(header, 0, None, None)
+        chunk: List[bytes] = []
+        dates: List[str] = []
+        undated = False
+        for start, end in spans:
+            record = data[start:end]
+            chunk.append(record)
+            try:
+                date_field = next(csv.reader([record.decode("utf-8")]))[0]
+                dates.append(date_parser(date_field.strip()).date().isoformat())
+            except (ValueError, StopIteration, IndexError):
+                # A block with an unreadable date is never pruned
+                undated = True
+            if len(chunk) >= block_rows:
+                write_block(b"".join(chunk), len(chunk), None if undated else min(dates, default=None),
+                            None if undated else max(dates, default=None))
+                chunk, dates, undated = [], [], False
+        if chunk:
+            write_block(b"".join(chunk), len(chunk), None if undated else min(dates, default=None),
+                        None if undated else max(dates, default=None))
+    os.replace(temp_path, archive_path)
+
+    index = {
+        "version": ARCHIVE_INDEX_VERSION,
+        "compression": compression,
+        "header": header.decode("utf-8"),
+        "blocks": blocks,
+    }
+    with open(archive_path + ARCHIVE_INDEX_SUFFIX, "w", encoding="utf-8") as file:
+        json.dump(index, file)
+    logger.info(f"Archived {csv_path} into {len(blocks) - 1} {compression} blocks at {archive_path}")
+    return index
+
+
+def load_block_index(archive_path: str) -> Optional[Dict]:
+    """Return the block index of an archive, or None if it is missing or unreadable."""
+    index_path = archive_path + ARCHIVE_INDEX_SUFFIX
+    try:
+        with open(index_path, "r", encoding="utf-8") as file:
+            index = json.load(file)
+    except (IOError, ValueError) as e:
+        logger.warning(f"Block index {index_path} unavailable ({e}); reading {archive_path} as one stream")
+        return None
+    if index.get("version") != ARCHIVE_INDEX_VERSION:
+        return None
+    return index
+
+
+def read_block_archive_text(archive_path: str, start: Optional[date] = None, end: Optional[date] = None) -> str:
+    """CSV text (header included) of the blocks whose date range overlaps [start, end].
+
+    Only the overlapping blocks are read and decompressed. Without an index the
+    whole archive is decompressed as one stream.
+    """
+    index = load_block_index(archive_path)
+    if index is None:
+        with ARCHIVE_CODECS[_compression_of(archive_path)][3](archive_path, "rt", encoding="utf-8", newline="") as file:
+            return file.read()
+
+    decompress = ARCHIVE_CODECS[index["compression"]][2]
+    start_key = start.isoformat() if start else None
+    end_key = end.isoformat() if end else None
+    parts = [index["header"]]
+    with open(archive_path, "rb") as file:
+        for block in index["blocks"]:
+            if block["rows"] == 0:
+                continue
+            dated = block["min_date"] is not None
+            if dated and ((start_key and block["max_date"] < start_key) or (end_key and block["min_date"] > end_key)):
+                continue
+            file.seek(block["offset"])
+            parts.append(decompress(file.read(block["length"])).decode("utf-8"))
+    return "".join(parts)
+
+
+def extract_block_archive(archive_path: str, csv_path: str):
+    """Decompress a whole archive back into a plain CSV file."""
+    open_stream = ARCHIVE_CODECS[_compression_of(archive_path)][3]
+    temp_path = f"{csv_path}.tmp"
+    with open_stream(archive_path, "rb") as source, open(temp_path, "wb") as out:
+        while True:
+            chunk = source.read(1 << 20)
+            if not chunk:
+                break
+            out.write(chunk)
+    os.replace(temp_path, csv_path)
+
+
+def remove_block_archive(archive_path: str):
+    """Delete an archive and its block index."""
+    for path in (archive_path, archive_path + ARCHIVE_INDEX_SUFFIX):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def open_transaction_text(file_path: str, start: Optional[date] = None, end: Optional[date] = None):
+    """Open a stored transaction file for csv reading, whether plain CSV or block archive.
+
+    For archives only the blocks overlapping [start, end] are decompressed; plain
+    files are opened as a snapshot, so rows appended while reading are not seen
+    (callers still filter rows by date).
+    """
+    if is_block_archive(file_path):
+        return io.StringIO(read_block_archive_text(file_path, start, end), newline="")
+    return open_snapshot(file_path, encoding="utf-8")
@@ -0,0 +1,152 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file suggests categories for new descriptions based on categorized history
+# License: MIT
+
+import math
+import re
+import logging
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Categories that are never offered as suggestions
+RESERVED_CATEGORIES = ("IGNORED", "SPLIT")
+
+# Features present in more than this share of descriptions carry almost no signal;
+# their postings are not scanned at query time (they still count towards the norm).
+MAX_FEATURE_SHARE = 0.2
+# Below this many descriptions every feature is scanned: in a small history a shared
+# word may be the only link between a new description and its category
+MIN_CAPPED_DESCRIPTIONS = 50
+
+_NON_ALPHA = re.compile(r"[^A-Z ]+")
+_SPACES = re.compile(r" +")
+
+
+def normalize_description(description: str) -> str:
+    """Normalize a description for matching: uppercase, no digits or punctuation."""
+    text = _NON_ALPHA.sub(" ", description.upper())
+    return _SPACES.sub(" ", text).strip()
+
+
+def description_features(normalized: str, ngram_size: int = 3) -> Set[str]:
+    """Return the token and character n-gram features of a normalized description."""
+    features = set()
+    for token in normalized.split(" "):
+        if len(token) < 2:
+            continue
+        features.add(f"w:{token}")
+        padded = f" {token} "
+        for i in range(len(padded) - ngram_size + 1):
+            features.add(padded[i:i + ngram_size])
+    return features
+
+
+class CategorySuggester:
+    """Nearest-neighbour category suggestions over an inverted index of past descriptions.
+
+    Each distinct normalized description is indexed once as a set of token and
+    character n-gram features, together with how often it was filed under each
+    (category, subcategory) pair. Queries only touch the postings of features they
+    share with the new description, so lookups stay fast on large histories.
+    """
+
+    def __init__(self, ngram_size: int = 3):
+        self.ngram_size = ngram_size
+        self.indexed = False
+        self._doc_ids: Dict[str, int] = {}
+        self._doc_labels: List[Dict[Tuple[str, str], int]] = []
+        self._postings: Dict[str, Set[int]] = defaultdict(set)
+
+    def __len__(self) -> int:
+        return len(self._doc_labels)
+
+    def add(self, description: str, category: str, subcategory: str = ""):
+        """Record one categorized description."""
+        if not category or category in RESERVED_CATEGORIES:
+            return
+        normalized = normalize_description(description)
+        if not normalized:
+            return
+
+        doc_id = self._doc_ids.get(normalized)
+        if doc_id is None:
+            doc_id = len(self._doc_labels)
+            self._doc_ids[normalized] = doc_id
+            self._doc_labels.append(defaultdict(int))
+            for feature in description_features(normalized, self.ngram_size):
+                self._postings[feature].add(doc_id)
+
+        self._doc_labels[doc_id][(category, subcategory or "")] += 1
+
+    def remove(self, description: str, category: str, subcategory: str = ""):
+        """Forget one categorized description, e.g. when a transaction is re-categorized."""
+        doc_id = self._doc_ids.get(normalize_description(description))
+        if doc_id is None:
+            return
+        labels = self._doc_labels[doc_id]
+        label = (category, subcategory or "")
+        if label in labels:
+            labels[label] -= 1
+            if labels[label] <= 0:
+                del labels[label]
+
+    def index_transactions(self, transactions: Iterable):
+        """Index the description and category of every transaction in an iterable."""
+        count = 0
+        for transaction in transactions:
+            self.add(transaction.description, transaction.category, transaction.subcategory)
+            count += 1
+        self.indexed = True
+        logger.info(f"Indexed {count} transactions into {len(self)} distinct descriptions for category suggestions")
+
+    def suggest(self, description: str, top_k: int = 3,
+                allowed: Optional[Callable[[str, str], bool]] = None) -> List[Tuple[str, str]]:
+        """Return up to top_k likely (category, subcategory) pairs for a description.
+
+        When `allowed` is given, only pairs it accepts are ranked (e.g. those still configured).
+        """
+        normalized = normalize_description(description)
+        doc_count = len(self._doc_labels)
+        if not normalized or not doc_count:
+            return []
+
+        query = description_features(normalized, self.ngram_size)
+        if doc_count < MIN_CAPPED_DESCRIPTIONS:
+            max_postings = doc_count
+        else:
+            max_postings = max(1, int(doc_count * MAX_FEATURE_SHARE))
+
+        # Accumulate the idf weight of shared features for every candidate description
+        query_weight = 0.0
+        shared_weight: Dict[int, float] = defaultdict(float)
+        for feature in query:
+            postings = self._postings.get(feature)
+            if not postings:
+                continue
+            idf = math.log(1 + doc_count / len(postings))
+            query_weight += idf
+            if len(postings) > max_postings:
+                continue
+            for doc_id in postings:
+                shared_weight[doc_id] += idf
+
+        if not shared_weight:
+            return []
+
+        # Score each label by its best matching description, then by how often it was used
+        label_scores: Dict[Tuple[str, str], Tuple[float, int]] = {}
+        for doc_id, weight in shared_weight.items():
+            labels = self._doc_labels[doc_id]
+            if not labels:
+                continue
+            similarity = weight / query_weight
+            for label, uses in labels.items():
+                if allowed is not None and not allowed(*label):
+                    continue
+                best, total = label_scores.get(label, (0.0, 0))
+                label_scores[label] = (max(best, similarity), total + uses)
+
+        ranked = sorted(label_scores.items(), key=lambda item: (-item[1][0], -item[1][1], item[0]))
+        return [label for label, _ in ranked[:top_k]]
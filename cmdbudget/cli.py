@@ -2,25 +2,40 @@
 # This file implements the command-line interface
 # License: MIT
 
-from datetime import datetime
+from datetime import datetime, date
+from decimal import Decimal, InvalidOperation
+from .batch_editor import TransactionFilter
+from .search_query import QueryError
+from .transaction import parse_tags
 from .transaction_processor import NewTransactionProcessor
 from .transaction_reporter import TransactionReporter
 from .transactions_manager import TransactionsManager
 from .display import Display
+from .period_index import quarter_to_date, fiscal_year_to_date, fiscal_year_range, trailing_days, TRAILING_DAYS
+
+# Matching transactions listed before a batch edit is confirmed
+BATCH_PREVIEW_ROWS = 10
+# Recent changes listed in the undo menu
+UNDO_MENU_ROWS = 10
+# Search results listed per query, newest first
+SEARCH_RESULT_ROWS = 20
 
 class BudgetCLI:
     def __init__(self, transactions_manager: TransactionsManager):
         self.transactions_manager = transactions_manager
-        self.reporter = None
+
+    @property
+    def reporter(self) -> TransactionReporter:
+        """Full-history reporter; the history is parsed the first time a view needs it."""
+        return self.transactions_manager.get_reporter()
 
     def initialize(self):
-        """Initialize the CLI with required data."""
-        self.transactions_manager.initialize_data()
-        self.reporter = self.transactions_manager.reporter
+        """Initialize the CLI with required data (only the month index; history loads lazily)."""
+        self.transactions_manager.initialize_index()
 
     def display_month_menu(self):
         """Display available months and let user select one."""
-        months = self.reporter.get_available_months()
+        months = self.transactions_manager.get_available_months()
         Display.message("\nAvailable months:")
         for i, (year, month) in enumerate(months, 1):
             Display.menu_item(i, datetime(year, month, 1).strftime('%B %Y'))
@@ -80,14 +95,19 @@ class BudgetCLI:
             Display.menu_item(1, "Display by month")
             Display.menu_item(2, "Display by category")
             Display.menu_item(3, "Display by tag")
-            Display.menu_item(4, "Back to main menu")
+            Display.menu_item(4, "Display by period (quarter, fiscal year, custom range)")
+            Display.menu_item(5, "Display trends")
+            Display.menu_item(6, "Display recurring transactions")
+            Display.menu_item(7, "Search transactions")
+            Display.menu_item(8, "Back to main menu")
             
             choice = Display.prompt("\nSelect an option: ")
             
             if choice == "1":
                 selected_month = self.display_month_menu()
-                transactions = self.transactions_manager.get_transactions_for_month(selected_month)
-                self.reporter.display_month_data(selected_month[1], selected_month[0], transactions)
+                # Only the selected and previous month are parsed unless the history is already loaded
+                month_reporter = self.transactions_manager.get_month_reporter(selected_month)
+                month_reporter.display_month_data(selected_month[1], selected_month[0])
             
             elif choice == "2":
                 selected_category = self.display_category_menu()
@@ -99,18 +119,153 @@ class BudgetCLI:
                     self.reporter.display_tag_data(selected_tag)
             
             elif choice == "4":
+                self.period_menu()
+            
+            elif choice == "5":
+                selected_month = self.display_month_menu()
+                self.reporter.display_trend_data(selected_month[1], selected_month[0])
+            
+            elif choice == "6":
+                self.recurring_menu()
+            
+            elif choice == "7":
+                self.search_menu()
+            
+            elif choice == "8":
                 break
             
             else:
                 Display.warning("Invalid choice. Please try again.")
 
+    def period_menu(self):
+        """Pick a reporting period and show category totals for it."""
+        today = date.today()
+        start_month = self.transactions_manager.fiscal_year_start_month
+        Display.message("\nReporting Periods:")
+        Display.menu_item(1, "Quarter to date")
+        Display.menu_item(2, "Fiscal year to date")
+        Display.menu_item(3, f"Trailing {TRAILING_DAYS} days")
+        Display.menu_item(4, "Annual summary (fiscal year)")
+        Display.menu_item(5, "Custom date range")
+
+        choice = Display.prompt("\nSelect a period (or press Enter to go back): ").strip()
+        if choice == "1":
+            start, end = quarter_to_date(today)
+            title = "Quarter to Date"
+        elif choice == "2":
+            start, end = fiscal_year_to_date(today, start_month)
+            title = "Fiscal Year to Date"
+        elif choice == "3":
+            start, end = trailing_days(today)
+            title = f"Trailing {TRAILING_DAYS} Days"
+        elif choice == "4":
+            fiscal_year = self.display_fiscal_year_menu()
+            if fiscal_year is None:
+                return
+            start, end = fiscal_year_range(fiscal_year, start_month)
+            title = f"Annual Summary for {self._fiscal_year_label(fiscal_year, start_month)}"
+        elif choice == "5":
+            dates = self.prompt_for_date_range()
+            if dates is None:
+                return
+            start, end = dates
+            title = "Custom Period"
+        elif not choice:
+            return
+        else:
+            Display.warning("Invalid choice.")
+            return
+
+        self.reporter.display_period_data(start, end, title)
+
+    def display_fiscal_year_menu(self):
+        """Display fiscal years with transactions and let user select one."""
+        years = self.transactions_manager.get_fiscal_years()
+        if not years:
+            Display.message("\nNo transactions found.")
+            return None
+        start_month = self.transactions_manager.fiscal_year_start_month
+        Display.message("\nAvailable years:")
+        for i, year in enumerate(years, 1):
+            Display.menu_item(i, self._fiscal_year_label(year, start_month))
+
+        while True:
+            try:
+                choice = int(Display.prompt("\nSelect a year (number): "))
+                if 1 <= choice <= len(years):
+                    return years[choice - 1]
+                Display.warning("Invalid choice. Please try again.")
+            except ValueError:
+                Display.warning("Please enter a valid number.")
+
+    @staticmethod
+    def _fiscal_year_label(year: int, start_month: int) -> str:
+        return str(year) if start_month == 1 else f"FY {year}/{(year + 1) % 100:02d}"
+
+    def prompt_for_date_range(self):
+        """Ask for an inclusive dd/mm/yyyy date range. Returns (start, end) or None if cancelled."""
+        dates = []
+        for label in ("Start", "End"):
+            while True:
+                value = Display.prompt(f"{label} date (dd/mm/yyyy, Enter to cancel): ").strip()
+                if not value:
+                    return None
+                try:
+                    dates.append(datetime.strptime(value, "%d/%m/%Y").date())
+                    break
+                except ValueError:
+                    Display.warning("Invalid date format. Please use dd/mm/yyyy format.")
+        start, end = dates
+        if end < start:
+            Display.warning("End date is before start date; swapping them.")
+            start, end = end, start
+        return start, end
+
+    def recurring_menu(self):
+        """Show recurring charges that are still active, or every series ever detected."""
+        show_all = Display.prompt("\nInclude series that have stopped? (y/n) [n]: ").lower().strip() == 'y'
+        series_list = self.transactions_manager.get_recurring_series(active_only=not show_all)
+        title = "All Recurring Transactions" if show_all else "Active Recurring Transactions"
+        self.reporter.display_recurring_data(series_list, title)
+
+    def search_menu(self):
+        """Run search expressions until the user enters a blank line."""
+        Display.message("\nSearch with conditions like: category:Dining amount>50 date>=2024-01 "
+                        "(tag:trip OR \"hotel\") NOT merchant:Airbnb")
+        while True:
+            query = Display.prompt("\nSearch (Enter = back): ").strip()
+            if not query:
+                return
+            try:
+                transactions, total = self.transactions_manager.search(query, limit=SEARCH_RESULT_ROWS)
+            except QueryError as e:
+                Display.warning(str(e))
+                continue
+            if not total:
+                Display.message("No transactions match.")
+                continue
+            Display.table(
+                [[t.date.strftime('%Y-%m-%d'), t.description, f"{t.amount:.2f} {t.currency}",
+                  t.category, t.subcategory, ", ".join(t.tags)]
+                 for t in transactions],
+                headers=["Date", "Description", "Amount", "Category", "Subcategory", "Tag"]
+            )
+            if total > len(transactions):
+                Display.message(f"Showing the newest {len(transactions)} of {total} matching transactions.")
+            else:
+                Display.message(f"{total} matching transactions.")
+
     def transaction_management_menu(self):
         """Handle transaction management options."""
         while True:
             Display.message("\nTransaction Management Menu:")
             Display.menu_item(1, "Add a new transaction")
             Display.menu_item(2, "Process new transactions from new_transactions.csv")
-            Display.menu_item(3, "Back to main menu")
+            Display.menu_item(3, "Batch edit transactions")
+            Display.menu_item(4, "Archive (seal) or unseal stored years")
+            Display.menu_item(5, "Undo or redo recent changes")
+            Display.menu_item(6, "Find and merge duplicate transactions")
+            Display.menu_item(7, "Back to main menu")
             
             choice = Display.prompt("\nSelect an option: ")
             
@@ -121,11 +276,159 @@ class BudgetCLI:
                 self.transactions_manager.process_new_transactions()
             
             elif choice == "3":
+                self.batch_edit_menu()
+            
+            elif choice == "4":
+                self.partition_menu()
+            
+            elif choice == "5":
+                self.undo_menu()
+            
+            elif choice == "6":
+                groups = self.transactions_manager.find_duplicates()
+                if groups:
+                    self.transactions_manager.review_duplicates(groups)
+                else:
+                    Display.message("No duplicate transactions found.")
+            
+            elif choice == "7":
                 break
             
             else:
                 Display.warning("Invalid choice. Please try again.")
 
+    def prompt_for_filter(self):
+        """Ask for the criteria selecting transactions. Returns a TransactionFilter or None if cancelled."""
+        Display.message("\nSelect transactions (press Enter to skip a criterion):")
+        selection = TransactionFilter()
+        if Display.prompt("Limit to a date range? (y/n) [n]: ").lower().strip() == 'y':
+            dates = self.prompt_for_date_range()
+            if dates is None:
+                return None
+            selection.start, selection.end = dates
+        selection.description = Display.prompt("Description contains: ").strip()
+        selection.category = Display.prompt("Category: ").strip() or None
+        if selection.category:
+            selection.subcategory = Display.prompt("Subcategory: ").strip() or None
+        selection.tag = Display.prompt("Has tag: ").strip() or None
+        for attribute, label in (("min_amount", "Minimum amount"), ("max_amount", "Maximum amount")):
+            while True:
+                value = Display.prompt(f"{label}: $").strip()
+                if not value:
+                    break
+                try:
+                    setattr(selection, attribute, Decimal(value))
+                    break
+                except InvalidOperation:
+                    Display.warning("Please enter a valid number.")
+        return selection
+
+    def batch_edit_menu(self):
+        """Select transactions with a filter, preview them and change a field on all of them at once."""
+        selection = self.prompt_for_filter()
+        if selection is None:
+            return
+        matches = self.transactions_manager.preview_batch_edit(selection)
+        if not matches:
+            Display.message("\nNo transactions match.")
+            return
+
+        Display.message(f"\n{len(matches)} transactions match:")
+        Display.table(
+            [[t.date.strftime('%Y-%m-%d'), t.description, f"{t.amount:.2f} {t.currency}", t.category, t.subcategory, ", ".join(t.tags), t.merchant]
+             for t in matches[:BATCH_PREVIEW_ROWS]],
+            headers=["Date", "Description", "Amount", "Category", "Subcategory", "Tag", "Merchant"]
+        )
+        if len(matches) > BATCH_PREVIEW_ROWS:
+            Display.message(f"... and {len(matches) - BATCH_PREVIEW_ROWS} more")
+        sealed = self.transactions_manager.batch_editor.sealed_matches(matches)
+        if sealed:
+            Display.warning(f"{sealed} of them are in sealed (archived) partitions and will not be changed.")
+
+        Display.message("\nChange:")
+        Display.menu_item(1, "Category/subcategory")
+        Display.menu_item(2, "Tag")
+        Display.menu_item(3, "Merchant")
+        choice = Display.prompt("\nSelect an option (or press Enter to cancel): ").strip()
+        if choice == "1":
+            category, subcategory = self.transactions_manager.classifier.prompt_for_category(
+                selection.description or f"{len(matches)} selected transactions"
+            )
+            changes = {"category": category, "subcategory": subcategory}
+        elif choice == "2":
+            action = Display.prompt("a = add tags, r = remove tags, s = replace all tags: ").lower().strip()
+            names = {"a": "add_tags", "r": "remove_tags", "s": "tag"}
+            if action not in names:
+                return
+            tags = Display.prompt("Tags, separated by commas" + (" (Enter to clear): " if action == "s" else ": "))
+            changes = {names[action]: parse_tags(tags)}
+            if action != "s" and not changes[names[action]]:
+                return
+        elif choice == "3":
+            changes = {"merchant": Display.prompt("New merchant (Enter to clear): ").strip()}
+        else:
+            return
+
+        summary = ", ".join(f"{name} = '{value}'" for name, value in changes.items())
+        if Display.prompt(f"Set {summary} on {len(matches) - sealed} transactions? (y/n): ").lower().strip() != 'y':
+            return
+        changed = self.transactions_manager.batch_edit(selection, changes, matches)
+        if changed is not None:
+            Display.message(f"Updated {changed} transactions.")
+
+    def partition_menu(self):
+        """List storage partitions and toggle whether one is sealed (read-only archive)."""
+        partitions = self.transactions_manager.list_partitions()
+        if not partitions:
+            Display.message("Archiving needs partitioned storage. Set storage.layout to 'partitioned' in config.yml.")
+            return
+
+        Display.message("\nStorage Partitions:")
+        for i, (key, entry) in enumerate(partitions, 1):
+            status = "sealed" if entry.get("sealed") else "open"
+            Display.menu_item(i, f"{key}: {entry.get('rows', 0)} transactions ({status})")
+
+        choice = Display.prompt("\nSelect a partition to seal/unseal (or press Enter to go back): ").strip()
+        if not choice:
+            return
+        try:
+            key, entry = partitions[int(choice) - 1]
+        except (ValueError, IndexError):
+            Display.warning("Invalid choice.")
+            return
+
+        seal = not entry.get("sealed")
+        if self.transactions_manager.set_partition_sealed(key, seal):
+            Display.message(f"Partition {key} {'sealed' if seal else 'unsealed'}.")
+        else:
+            Display.error(f"Could not change partition {key}. Check logs for details.")
+
+    def undo_menu(self):
+        """Show the recent changes and undo or redo them, latest first."""
+        while True:
+            entries, position = self.transactions_manager.undo_log.entries()
+            if not entries:
+                Display.message("No changes to undo.")
+                return
+            Display.message("\nRecent changes (latest first):")
+            rows = [[entry["time"].replace("T", " "), entry["label"], "undone" if i >= position else ""]
+                    for i, entry in enumerate(entries)][-UNDO_MENU_ROWS:]
+            Display.table(list(reversed(rows)), headers=["When", "Change", ""])
+
+            choice = Display.prompt("\nu = undo latest, r = redo, Enter = back: ").lower().strip()
+            if not choice:
+                return
+            if choice == "u":
+                entry = self.transactions_manager.undo()
+                if entry is not None:
+                    Display.message(f"Undid: {entry['label']}")
+            elif choice == "r":
+                entry = self.transactions_manager.redo()
+                if entry is not None:
+                    Display.message(f"Redid: {entry['label']}")
+            else:
+                Display.warning("Invalid choice.")
+
     def category_management_menu(self):
         """Handle category management options."""
         while True:
@@ -133,7 +436,8 @@ class BudgetCLI:
             Display.menu_item(1, "List all categories")
             Display.menu_item(2, "Add new category")
             Display.menu_item(3, "Delete category")
-            Display.menu_item(4, "Back to main menu")
+            Display.menu_item(4, "Add or change a mapping rule")
+            Display.menu_item(5, "Back to main menu")
             
             choice = Display.prompt("\nSelect an option: ")
             
@@ -175,11 +479,26 @@ class BudgetCLI:
                     Display.warning("Please enter a valid number")
             
             elif choice == "4":
+                self.mapping_rule_menu()
+            
+            elif choice == "5":
                 break
             
             else:
                 Display.warning("Invalid choice. Please try again.")
 
+    def mapping_rule_menu(self):
+        """Save a mapping rule and offer to re-categorize the stored transactions it matches."""
+        rule = Display.prompt("\nDescription text the rule matches (case-insensitive): ").strip()
+        if not rule:
+            return
+        classifier = self.transactions_manager.classifier
+        category, subcategory = classifier.prompt_for_category(rule)
+        classifier.save_mapping(rule, category, subcategory)
+        Display.message(f"Saved mapping: '{rule}' -> {category}{' > ' + subcategory if subcategory else ''}")
+        for changed_rule in classifier.take_changed_rules():
+            self.transactions_manager.review_rule_change(changed_rule)
+
     def run(self):
         """Run the main CLI loop."""
         Display.message("Starting up...")
@@ -0,0 +1,158 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file exports stored transactions as memory-mappable binary columns for analytics tools
+# License: MIT
+
+import json
+import logging
+import os
+import struct
+import sys
+from array import array
+from contextlib import ExitStack
+from datetime import date, datetime
+from typing import BinaryIO, Dict, List, Optional
+
+from .config import TAG_DELIMITER
+from .currency_utils import get_decimal_places
+from .file_lock import atomic_write
+from .transaction_columns import CategoricalColumn, RESERVED_CATEGORIES
+from .transaction_operations import TransactionOperations
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_FILE = "schema.json"
+SCHEMA_VERSION = 1
+# Rows buffered per column before they are written out
+EXPORT_CHUNK_ROWS = 65536
+# NumPy .npy format 1.0: magic and version, then a little-endian header length
+NPY_MAGIC = b"\x93NUMPY\x01\x00"
+# Header bytes reserved up front (a multiple of 64, so the data is aligned) and filled in once the row count is known
+NPY_HEADER_SIZE = 128
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+# Bytes per value of the `array` typecodes used (int64 and int32)
+ITEM_SIZES = {"q": 8, "i": 4}
+# Dictionary-encoded string fields, exported as int32 codes
+CODED_FIELDS = ("description", "currency", "category", "subcategory", "tag", "merchant")
+
+
+def npy_header(descr: str, rows: int) -> bytes:
+    """A .npy 1.0 header for a one-dimensional array, padded to NPY_HEADER_SIZE bytes."""
+    text = f"{{'descr': '{descr}', 'fortran_order': False, 'shape': ({rows},), }}"
+    text = text.ljust(NPY_HEADER_SIZE - len(NPY_MAGIC) - 2 - 1) + "\n"
+    return NPY_MAGIC + struct.pack("<H", len(text)) + text.encode("latin1")
+
+
+class NpyColumnWriter:
+    """Streams values into a .npy file in chunks, writing the header last.
+
+    The header space is reserved first, chunks are appended as raw little-endian
+    values from an `array`, and `finish` seeks back to fill in the final shape,
+    so the column never has to be held in memory and NumPy is not needed to
+    write it. `numpy.load(path, mmap_mode='r')` maps the result without parsing.
+    """
+
+    def __init__(self, file: BinaryIO, typecode: str, descr: str):
+        self.file = file
+        self.typecode = typecode
+        self.descr = descr
+        self.rows = 0
+        if array(typecode).itemsize != ITEM_SIZES[typecode]:
+            raise ValueError(f"array typecode '{typecode}' is not {ITEM_SIZES[typecode]} bytes on this platform")
+        file.write(b" " * NPY_HEADER_SIZE)
+
+    def write(self, values: array):
+        if sys.byteorder == "big":
+            values = array(self.typecode, values)
+            values.byteswap()
+        values.tofile(self.file)
+        self.rows += len(values)
+
+    def finish(self):
+        self.file.seek(0)
+        self.file.write(npy_header(self.descr, self.rows))
+
+
+class ColumnarExporter:
+    """Writes the stored transactions (or a date range of them) as one .npy file per column.
+
+    Dates are exported as `datetime64[D]`, amounts as int64 minor units, and the
+    string fields as int32 codes into dictionaries listed in `schema.json`,
+    alongside each currency's decimal places. Rows stream from the store one
+    partition at a time (only those overlapping the range) through chunk-sized
+    buffers, so memory stays bounded by the chunk and the dictionaries. Every
+    file is written to a temporary name and renamed into place together at the
+    end, with the schema last.
+    """
+
+    def __init__(self, store, chunk_rows: int = EXPORT_CHUNK_ROWS):
+        self.store = store
+        self.chunk_rows = chunk_rows
+
+    def export(self, out_dir: str, start: Optional[date] = None, end: Optional[date] = None) -> int:
+        """Export to `out_dir`. Returns the number of transactions written; raises IOError/OSError."""
+        os.makedirs(out_dir, exist_ok=True)
+        dictionaries: Dict[str, CategoricalColumn] = {name: CategoricalColumn() for name in CODED_FIELDS}
+        with ExitStack() as stack:
+            def open_column(name: str, typecode: str, descr: str) -> NpyColumnWriter:
+                file = stack.enter_context(atomic_write(os.path.join(out_dir, f"{name}.npy"), "wb", encoding=None, newline=None))
+                return NpyColumnWriter(file, typecode, descr)
+
+            dates = open_column("date", "q", "<M8[D]")
+            amounts = open_column("amount_minor", "q", "<i8")
+            coded = {name: open_column(name, "i", "<i4") for name in CODED_FIELDS}
+            chunk = self._empty_chunk()
+
+            def flush():
+                dates.write(chunk["date"])
+                amounts.write(chunk["amount_minor"])
+                for name in CODED_FIELDS:
+                    coded[name].write(chunk[name])
+                chunk.update(self._empty_chunk())
+
+            for path in self.store.partition_files(start, end):
+                for transaction in TransactionOperations.iter_transactions(path, start, end):
+                    chunk["date"].append(transaction.date.toordinal() - EPOCH_ORDINAL)
+                    chunk["amount_minor"].append(transaction.amount_minor)
+                    chunk["description"].append(dictionaries["description"].encode(transaction.description))
+                    chunk["currency"].append(dictionaries["currency"].encode(transaction.currency.upper()))
+                    for name in ("category", "subcategory", "tag", "merchant"):
+                        chunk[name].append(dictionaries[name].encode(getattr(transaction, name)))
+                    if len(chunk["date"]) >= self.chunk_rows:
+                        flush()
+            flush()
+            for writer in (dates, amounts, *coded.values()):
+                writer.finish()
+        # Written after the columns are in place, so a schema always describes complete files
+        with atomic_write(os.path.join(out_dir, SCHEMA_FILE)) as file:
+            json.dump(self._schema(dates.rows, start, end, dictionaries), file, indent=2)
+        logger.info(f"Exported {dates.rows} transactions to {out_dir}")
+        return dates.rows
+
+    @staticmethod
+    def _empty_chunk() -> Dict[str, array]:
+        chunk = {"date": array("q"), "amount_minor": array("q")}
+        chunk.update((name, array("i")) for name in CODED_FIELDS)
+        return chunk
+
+    @staticmethod
+    def _schema(rows: int, start: Optional[date], end: Optional[date],
+                dictionaries: Dict[str, CategoricalColumn]) -> dict:
+        columns: List[dict] = [
+            {"name": "date", "file": "date.npy", "dtype": "datetime64[D]"},
+            {"name": "amount_minor", "file": "amount_minor.npy", "dtype": "int64",
+             "note": "amount in minor units of the row's currency; positive = expense"},
+        ]
+        columns.extend({"name": name, "file": f"{name}.npy", "dtype": "int32",
+                        "dictionary": dictionaries[name].values} for name in CODED_FIELDS)
+        return {
+            "version": SCHEMA_VERSION,
+            "rows": rows,
+            "start": start.isoformat() if start else None,
+            "end": end.isoformat() if end else None,
+            "exported": datetime.now().isoformat(timespec="seconds"),
+            "columns": columns,
+            "decimal_places": {currency: get_decimal_places(currency) for currency in dictionaries["currency"].values},
+            "reserved_categories": list(RESERVED_CATEGORIES),
+            # A tag value holding several tags joins them with this
+            "tag_delimiter": TAG_DELIMITER,
+        }
@@ -18,4 +18,39 @@ INPUT_DATE_FORMATS = [
 CSV_FIELDNAMES = [
     "Transaction Date", "Description", "Amount", "Currency",
     "Category", "Subcategory", "Tag", "Merchant"
-] 
\ No newline at end of file
+]
+
+# Separates the tags of a transaction in the Tag column; a single tag is stored as before
+TAG_DELIMITER = ";"
+
+# Directory (relative to the project root unless absolute) for indexes and other
+# derived state that can always be rebuilt from the transaction files
+DEFAULT_STATE_DIR = ".cmdbudget"
+
+# Transaction storage layout: "single" keeps one transactions.csv, "partitioned"
+# stores one file per year (or month) under DEFAULT_PARTITION_DIR with a manifest
+DEFAULT_STORAGE_LAYOUT = "single"
+DEFAULT_PARTITION_DIR = "transactions"
+DEFAULT_PARTITION_GRANULARITY = "year"
+# Compression of sealed partitions: "gzip", "lzma" or "none"
+DEFAULT_ARCHIVE_COMPRESSION = "gzip"
+
+# Month (1-12) in which the fiscal year starts, used by period reports
+DEFAULT_FISCAL_YEAR_START_MONTH = 1
+
+# Address of the local JSON API started by `cmdbudget serve`
+DEFAULT_API_HOST = "127.0.0.1"
+DEFAULT_API_PORT = 8750
+
+# Watch mode (`cmdbudget watch`): directory polled for bank export files, and seconds between polls
+DEFAULT_DROP_DIR = "drop"
+DEFAULT_POLL_INTERVAL = 60
+
+# Undo history: how many changes are kept, and for how many days
+DEFAULT_UNDO_MAX_ENTRIES = 100
+DEFAULT_UNDO_RETENTION_DAYS = 30
+
+# Near-duplicate detection: most days apart two copies of a transaction may be posted,
+# and how alike (0-1) their descriptions must be
+DEFAULT_DUPLICATE_DAY_WINDOW = 3
+DEFAULT_DUPLICATE_SIMILARITY = 0.5
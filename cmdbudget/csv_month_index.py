@@ -0,0 +1,217 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file provides memory-mapped, month-indexed lazy access to transactions.csv
+# License: MIT
+
+import csv
+import hashlib
+import io
+import json
+import logging
+import mmap
+import os
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .file_lock import FileLock, atomic_write
+from .transaction import Transaction
+from .utils import parse_date_multi_format, memoize_date_parser
+
+logger = logging.getLogger(__name__)
+
+MonthKey = Tuple[int, int]
+
+INDEX_VERSION = 1
+# Bytes before the previously indexed end that must be unchanged for an incremental refresh
+TAIL_CHECK_BYTES = 4096
+# Position of the Category column in storage rows (see config.CSV_FIELDNAMES)
+CATEGORY_FIELD = 4
+
+
+def iter_record_spans(buffer, start: int, end: int) -> Iterator[Tuple[int, int]]:
+    """Yield (start, end) byte spans of the CSV records in buffer[start:end].
+
+    A record normally ends at a newline; a newline inside a quoted field (odd
+    number of quote characters so far) continues the record. A trailing record
+    without a newline is yielded up to `end`.
+    """
+    pos = start
+    while pos < end:
+        record_end = buffer.find(b'\n', pos, end)
+        if record_end == -1:
+            yield pos, end
+            return
+        while buffer[pos:record_end].count(b'"') % 2:
+            next_newline = buffer.find(b'\n', record_end + 1, end)
+            if next_newline == -1:
+                record_end = end - 1
+                break
+            record_end = next_newline
+        yield pos, record_end + 1
+        pos = record_end + 1
+
+
+class MonthOffsetIndex:
+    """Byte-offset index of each month's rows in a stored transactions CSV.
+
+    The file is memory-mapped and scanned record by record, parsing only the
+    leading date field. Each month maps to a list of (start, end) byte spans, so
+    a month can be parsed without touching the rest of the history. The index
+    is persisted next to the application state and refreshed incrementally when
+    rows have only been appended since it was built.
+    """
+
+    def __init__(self, file_path: str, index_path: Optional[str] = None):
+        self.file_path = file_path
+        self.index_path = index_path
+        self.header: List[str] = []
+        self.spans: Dict[MonthKey, List[Tuple[int, int]]] = {}
+        self.reportable_counts: Dict[MonthKey, int] = {}
+        self.indexed_size = 0
+        self.indexed_mtime_ns = 0
+        self.tail_digest = ""
+        self._date_parser = memoize_date_parser(parse_date_multi_format)
+        self._load()
+
+    def months(self) -> List[MonthKey]:
+        """Sorted (year, month) keys that have at least one reportable (not IGNORED/SPLIT) row."""
+        return sorted(key for key, count in self.reportable_counts.items() if count > 0)
+
+    def refresh(self) -> bool:
+        """Bring the index up to date with the file. Returns True if anything changed."""
+        try:
+            # Open and measure under the shared lock so the snapshot ends on a whole row;
+            # the scan itself runs unlocked on that file handle
+            with FileLock(self.file_path, exclusive=False):
+                file = open(self.file_path, 'rb')
+                stat = os.fstat(file.fileno())
+        except FileNotFoundError:
+            self._reset()
+            return True
+
+        with file:
+            if stat.st_size == self.indexed_size and stat.st_mtime_ns == self.indexed_mtime_ns:
+                return False
+            if stat.st_size == 0:
+                self._reset()
+                return True
+            with mmap.mmap(file.fileno(), stat.st_size, access=mmap.ACCESS_READ) as buffer:
+                if self.indexed_size and stat.st_size > self.indexed_size and self._tail_unchanged(buffer):
+                    logger.info(f"Appending {stat.st_size - self.indexed_size} new bytes to month index of {self.file_path}")
+                    self._scan(buffer, self.indexed_size, stat.st_size)
+                else:
+                    logger.info(f"Rebuilding month index of {self.file_path}")
+                    self._reset()
+                    self._scan(buffer, 0, stat.st_size)
+                self.indexed_size = stat.st_size
+                self.indexed_mtime_ns = stat.st_mtime_ns
+                self.tail_digest = self._digest_tail(buffer, self.indexed_size)
+        self._save()
+        return True
+
+    def read_months(self, keys: List[MonthKey]) -> List[Transaction]:
+        """Parse only the rows of the given months into Transaction objects."""
+        spans = sorted(span for key in keys for span in self.spans.get(key, []))
+        if not spans:
+            return []
+        transactions = []
+        with FileLock(self.file_path, exclusive=False):
+            file = open(self.file_path, 'rb')
+        with file:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                for start, end in spans:
+                    text = buffer[start:end].decode('utf-8')
+                    for row in csv.DictReader(io.StringIO(text, newline=''), fieldnames=self.header):
+                        transactions.append(Transaction.from_row(row, self._date_parser))
+        return transactions
+
+    def _reset(self):
+        self.header = []
+        self.spans = {}
+        self.reportable_counts = {}
+        self.indexed_size = 0
+        self.indexed_mtime_ns = 0
+        self.tail_digest = ""
+
+    def _scan(self, buffer, start: int, end: int):
+        """Index every record in buffer[start:end], coalescing adjacent rows of the same month."""
+        for record_start, record_end in iter_record_spans(buffer, start, end):
+            record = buffer[record_start:record_end]
+            if not record.strip():
+                continue
+            if not self.header:
+                self.header = next(csv.reader([record.decode('utf-8')]))
+                continue
+
+            date_field = record[:record.find(b',')] if not record.startswith(b'"') else None
+            try:
+                if date_field is None:
+                    date_field = next(csv.reader([record.decode('utf-8')]))[0].encode('utf-8')
+                row_date = self._date_parser(date_field.decode('utf-8').strip())
+            except (ValueError, StopIteration, IndexError):
+                logger.warning(f"Skipping unparseable row at byte {record_start} of {self.file_path}")
+                continue
+
+            key = (row_date.year, row_date.month)
+            month_spans = self.spans.setdefault(key, [])
+            if month_spans and month_spans[-1][1] == record_start:
+                month_spans[-1] = (month_spans[-1][0], record_end)
+            else:
+                month_spans.append((record_start, record_end))
+            self.reportable_counts[key] = self.reportable_counts.get(key, 0) + self._is_reportable(record)
+
+    @staticmethod
+    def _is_reportable(record: bytes) -> int:
+        """1 unless the row's category is IGNORED or SPLIT (full parse only when the word appears)."""
+        if b'IGNORED' not in record and b'SPLIT' not in record:
+            return 1
+        fields = next(csv.reader([record.decode('utf-8')]))
+        return 0 if len(fields) > CATEGORY_FIELD and fields[CATEGORY_FIELD] in ("IGNORED", "SPLIT") else 1
+
+    @staticmethod
+    def _digest_tail(buffer, size: int) -> str:
+        return hashlib.sha1(buffer[max(0, size - TAIL_CHECK_BYTES):size]).hexdigest()
+
+    def _tail_unchanged(self, buffer) -> bool:
+        """True if the bytes just before the previously indexed end are the same as when indexed."""
+        return self._digest_tail(buffer, self.indexed_size) == self.tail_digest
+
+    def _load(self):
+        """Load a persisted index if one exists and matches this file."""
+        if not self.index_path or not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+            if data.get('version') != INDEX_VERSION or data.get('file') != os.path.abspath(self.file_path):
+                return
+            self.header = data['header']
+            self.indexed_size = data['size']
+            self.indexed_mtime_ns = data['mtime_ns']
+            self.tail_digest = data['tail_digest']
+            for key, entry in data['months'].items():
+                year, month = map(int, key.split('-'))
+                self.spans[(year, month)] = [tuple(span) for span in entry['spans']]
+                self.reportable_counts[(year, month)] = entry['reportable']
+        except (IOError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable month index {self.index_path}: {e}")
+            self._reset()
+
+    def _save(self):
+        if not self.index_path:
+            return
+        data = {
+            'version': INDEX_VERSION,
+            'file': os.path.abspath(self.file_path),
+            'header': self.header,
+            'size': self.indexed_size,
+            'mtime_ns': self.indexed_mtime_ns,
+            'tail_digest': self.tail_digest,
+            'months': {
+                f"{year}-{month:02d}": {'spans': spans, 'reportable': self.reportable_counts.get((year, month), 0)}
+                for (year, month), spans in self.spans.items()
+            },
+        }
+        try:
+            with atomic_write(self.index_path) as file:
+                json.dump(data, file)
+        except IOError as e:
+            logger.warning(f"Could not save month index {self.index_path}: {e}")
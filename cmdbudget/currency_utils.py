@@ -3,17 +3,69 @@
 # License: MIT
 
 import logging
-from typing import Dict, Any, List
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import Dict, Any, List, Union
 
 logger = logging.getLogger(__name__)
 
-def format_currency(amount: float, currency: str, config: Dict[str, Any]) -> str:
+DEFAULT_DECIMAL_PLACES = 2
+
+# Decimal places per currency code, populated from config.yml's currency_formatting
+_decimal_places: Dict[str, int] = {}
+
+def configure_decimal_places(config: Dict[str, Any]):
+    """Load the decimal places of each currency from the configuration.
+
+    Args:
+        config: The import_csv_structure configuration from config.yml
+    """
+    _decimal_places.clear()
+    for currency, formatting in config.get('currency_formatting', {}).items():
+        _decimal_places[currency.upper()] = int(formatting.get('decimal_places', DEFAULT_DECIMAL_PLACES))
+
+def get_decimal_places(currency: str) -> int:
+    """Get the number of decimal places (minor unit exponent) for a currency."""
+    return _decimal_places.get(currency.upper(), DEFAULT_DECIMAL_PLACES) if currency else DEFAULT_DECIMAL_PLACES
+
+def to_minor_units(amount: Union[str, int, float, Decimal], currency: str) -> int:
+    """Convert an amount in major units (e.g. dollars) to integer minor units (e.g. cents).
+
+    Strings are parsed exactly; floats are converted through their shortest repr so
+    user input like 12.3 becomes exactly 1230. Rounds half away from zero, logging a
+    warning when the amount has more decimal places than the currency.
+    Raises ValueError if the amount cannot be parsed, is not finite (NaN, Infinity)
+    or is a string in exponent notation such as '1e3'.
+    """
+    places = get_decimal_places(currency)
+    try:
+        if isinstance(amount, str) and ("e" in amount or "E" in amount):
+            raise ValueError("exponent notation is not an amount")
+        value = amount if isinstance(amount, Decimal) else Decimal(str(amount).strip())
+        if not value.is_finite():
+            raise ValueError("not a finite number")
+        minor = value.scaleb(places).quantize(Decimal(1), rounding=ROUND_HALF_UP)
+    except (InvalidOperation, ValueError) as e:
+        raise ValueError(f"Invalid amount '{amount}' for currency '{currency}'") from e
+    if value.as_tuple().exponent < -places:
+        logger.warning(f"Amount '{amount}' has more than {places} decimal places for {currency}; rounded to {int(minor)} minor units")
+    return int(minor)
+
+def from_minor_units(minor: int, currency: str) -> float:
+    """Convert integer minor units back to a float amount in major units, for display."""
+    return minor / (10 ** get_decimal_places(currency))
+
+def format_minor_units(minor: int, currency: str) -> str:
+    """Format integer minor units as a plain decimal string for storage (e.g. 1230 -> '12.30')."""
+    return str(Decimal(minor).scaleb(-get_decimal_places(currency)))
+
+def format_currency(amount: float, currency: str, config: Dict[str, Any], grouping: bool = False) -> str:
     """Format a currency amount according to the configuration.
     
     Args:
         amount: The amount to format
         currency: The currency code (e.g., 'CAD', 'USD')
         config: The currency formatting configuration from config.yml
+        grouping: Whether to add thousands separators (e.g. 1,234.50)
         
     Returns:
         Formatted currency string
@@ -26,7 +78,7 @@ def format_currency(amount: float, currency: str, config: Dict[str, Any]) -> str
         decimal_places = formatting.get('decimal_places', 2)
         
         # Format the number
-        formatted_amount = f"{abs(amount):.{decimal_places}f}"
+        formatted_amount = f"{abs(amount):,.{decimal_places}f}" if grouping else f"{abs(amount):.{decimal_places}f}"
         
         # Add the symbol
         if position == 'before':
@@ -0,0 +1,58 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file indexes the loaded history by description for substring lookups
+# License: MIT
+
+from collections import defaultdict
+from typing import Dict, Iterable, List, Set
+
+
+def trigrams(text: str) -> Set[str]:
+    """Every run of three characters in the text."""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class DescriptionIndex:
+    """Row ids of the loaded history by description, with a trigram index over distinct descriptions.
+
+    Histories repeat a few hundred descriptions across many thousands of rows, so a
+    substring lookup (the way mapping rules match) intersects the posting sets of
+    the text's trigrams, checks only the distinct descriptions that survive, and
+    returns their rows. Descriptions are compared upper-cased, like `find_category`.
+    """
+
+    def __init__(self, transactions: Iterable = ()):
+        self.rows_by_description: Dict[str, List[int]] = {}
+        self.descriptions_by_trigram: Dict[str, Set[str]] = defaultdict(set)
+        for row, transaction in enumerate(transactions):
+            self.add(row, transaction.description)
+
+    def __len__(self) -> int:
+        return len(self.rows_by_description)
+
+    def add(self, row: int, description: str):
+        key = description.upper()
+        rows = self.rows_by_description.get(key)
+        if rows is None:
+            rows = self.rows_by_description[key] = []
+            for gram in trigrams(key):
+                self.descriptions_by_trigram[gram].add(key)
+        rows.append(row)
+
+    def descriptions_containing(self, text: str) -> List[str]:
+        """Distinct (upper-cased) descriptions that contain the text, case-insensitively."""
+        needle = text.upper()
+        grams = trigrams(needle)
+        if not grams:
+            candidates: Iterable[str] = self.rows_by_description
+        else:
+            postings = sorted((self.descriptions_by_trigram.get(gram, set()) for gram in grams), key=len)
+            candidates = set(postings[0])
+            for posting in postings[1:]:
+                if not candidates:
+                    break
+                candidates &= posting
+        return sorted(description for description in candidates if needle in description)
+
+    def rows_containing(self, text: str) -> List[int]:
+        """Row ids whose description contains the text, in row order."""
+        return sorted(row for description in self.descriptions_containing(text) for row in self.rows_by_description[description])
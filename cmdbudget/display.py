@@ -2,10 +2,69 @@
 # This file centralizes display logic for user output.
 # License: MIT
 
+import re
+import shutil
+import sys
+from itertools import chain, islice
 from tabulate import tabulate
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Sequence, Tuple
 from .currency_utils import format_currency
 
+# Matches ANSI styling sequences, which take no space on screen
+ANSI_PATTERN = re.compile(r'\x1b\[[0-9;]*m')
+# Rows inspected to size columns when no widths are given
+WIDTH_SAMPLE_ROWS = 200
+
+def visible_width(value: Any) -> int:
+    """Width of a cell on screen, ignoring ANSI styling."""
+    return len(ANSI_PATTERN.sub('', str(value)))
+
+
+class StreamingTable:
+    """Formats table rows one at a time with column widths fixed up front.
+
+    Mirrors tabulate's "pretty" layout, but never needs the whole table: widths come
+    from the caller (e.g. from precomputed aggregates) or from a bounded sample.
+    Left-aligned cells longer than their column are shortened with an ellipsis;
+    other cells are never cut.
+    """
+
+    def __init__(self, headers: Sequence[str], widths: Sequence[int], colalign: Optional[Sequence[str]] = None):
+        self.headers = list(headers)
+        self.widths = [max(width, visible_width(header)) for width, header in zip(widths, headers)]
+        self.colalign = list(colalign) if colalign else ["left"] * len(self.headers)
+
+    @staticmethod
+    def sample_widths(headers: Sequence[str], rows: Iterable[Sequence[Any]]) -> List[int]:
+        """Column widths that fit the headers and the given (sample of) rows."""
+        widths = [visible_width(header) for header in headers]
+        for row in rows:
+            for i, value in enumerate(row):
+                widths[i] = max(widths[i], visible_width(value))
+        return widths
+
+    def border(self) -> str:
+        return "+" + "+".join("-" * (width + 2) for width in self.widths) + "+"
+
+    def format_row(self, row: Sequence[Any]) -> str:
+        cells = []
+        for value, width, align in zip(row, self.widths, self.colalign):
+            text = str(value)
+            padding = width - visible_width(text)
+            if padding < 0 and align == "left" and not ANSI_PATTERN.search(text):
+                text, padding = text[:width - 1] + "…", 0
+            padding = max(padding, 0)
+            if align == "right":
+                cells.append(" " * padding + text)
+            elif align == "center":
+                cells.append(" " * (padding // 2) + text + " " * (padding - padding // 2))
+            else:
+                cells.append(text + " " * padding)
+        return "| " + " | ".join(cells) + " |"
+
+    def header_lines(self) -> List[str]:
+        return [self.border(), self.format_row(self.headers), self.border()]
+
 class Display:
     """Handles formatting and printing output to the console for the user."""
 
@@ -89,6 +148,108 @@ class Display:
         ))
         print("\n") # Add a newline after the table
 
+    @staticmethod
+    def stream_table(rows: Iterable[Tuple[Optional[int], List[Any]]], headers: List[str],
+                     colalign: Optional[tuple] = None, widths: Optional[List[int]] = None,
+                     page_size: Optional[int] = None):
+        """Print a long table while its rows are still being produced, with paging.
+
+        Args:
+            rows: Iterable of (year, cells) pairs; the year (or None) is used for "jump to year"
+            headers: List of column headers
+            colalign: Optional tuple of column alignments
+            widths: Optional column widths; when omitted they are taken from the first
+                WIDTH_SAMPLE_ROWS rows
+            page_size: Rows per page (defaults to the terminal height)
+
+        In an interactive terminal the table is shown a page at a time with
+        next/previous/jump-to-year navigation. Otherwise every row is streamed straight out.
+        """
+        iterator: Iterator[Tuple[Optional[int], List[Any]]] = iter(rows)
+        if widths is None:
+            sample = list(islice(iterator, WIDTH_SAMPLE_ROWS))
+            widths = StreamingTable.sample_widths(headers, (cells for _, cells in sample))
+            iterator = chain(sample, iterator)
+        # Bold headers, as in Display.table
+        table = StreamingTable([f"\033[1m{h}\033[0m" for h in headers], widths, colalign)
+        lines = ((year, table.format_row(cells)) for year, cells in iterator)
+
+        if not (sys.stdin.isatty() and sys.stdout.isatty()):
+            for line in table.header_lines():
+                print(line)
+            for _, line in lines:
+                print(line)
+            print(table.border())
+            print("\n")
+            return
+
+        page_size = page_size or max(10, shutil.get_terminal_size().lines - 8)
+        Display._page_lines(table, lines, page_size)
+
+    @staticmethod
+    def _page_lines(table: StreamingTable, lines: Iterator[Tuple[Optional[int], str]], page_size: int):
+        """Interactive pager over formatted lines. Lines are pulled only as far as the user reads."""
+        produced: List[Tuple[Optional[int], str]] = []
+        exhausted = False
+        page_start = 0
+
+        def pull() -> bool:
+            nonlocal exhausted
+            if exhausted:
+                return False
+            line = next(lines, None)
+            if line is None:
+                exhausted = True
+                return False
+            produced.append(line)
+            return True
+
+        while True:
+            for line in table.header_lines():
+                print(line)
+            index = page_start
+            # Print each row as soon as it is produced
+            while index < page_start + page_size and (index < len(produced) or pull()):
+                print(produced[index][1])
+                index += 1
+            print(table.border())
+
+            has_next = index < len(produced) or pull()
+            if page_start == 0 and not has_next:
+                print("\n")
+                return
+
+            page_number = page_start // page_size + 1
+            choice = Display.prompt(
+                f"Page {page_number} - [n]ext, [p]revious, [y]ear jump, [q]uit: "
+            ).strip().lower()
+            if choice in ("", "n"):
+                if has_next:
+                    page_start += page_size
+                else:
+                    Display.message("(End of table)")
+            elif choice == "p":
+                page_start = max(0, page_start - page_size)
+            elif choice == "y":
+                year_input = Display.prompt("Jump to year: ").strip()
+                if not year_input.isdigit():
+                    Display.warning("Please enter a year, e.g. 2023.")
+                    continue
+                year = int(year_input)
+                position = next((i for i, (row_year, _) in enumerate(produced) if row_year == year), None)
+                while position is None and pull():
+                    if produced[-1][0] == year:
+                        position = len(produced) - 1
+                if position is None:
+                    Display.warning(f"No rows for {year}.")
+                else:
+                    page_start = position
+            elif choice == "q":
+                print("\n")
+                return
+            else:
+                Display.warning("Invalid choice.")
+
     @staticmethod
     def prompt(text: str) -> str:
         """Displays a prompt and gets user input."""
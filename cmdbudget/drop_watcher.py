@@ -0,0 +1,239 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file watches a drop directory and imports new rows of export files as they arrive
+# License: MIT
+
+import csv
+import io
+import json
+import logging
+import os
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+from .display import Display
+from .file_lock import FileLock, atomic_write
+from .import_profiles import header_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# File in storage.state_dir holding how far each drop file has been read
+WATCH_STATE_FILE = "watch_offsets.json"
+STATE_VERSION = 1
+# A last line without a newline is taken as complete once the file has not changed for this long
+SETTLE_SECONDS = 5.0
+# File name suffixes picked up from the drop directory
+DROP_SUFFIXES = (".csv",)
+
+
+def complete_records_end(data: bytes) -> int:
+    """Length of the leading part of `data` made of whole CSV records.
+
+    A record ends at a newline outside quotes. Doubled quotes inside a quoted value
+    come in pairs, so a newline is outside quotes exactly when the number of quote
+    characters before it is even.
+    """
+    end = position = quotes = 0
+    lines = data.split(b"\n")
+    # The last piece has no newline after it, so it never ends a record
+    for line in lines[:-1]:
+        quotes += line.count(b'"')
+        position += len(line) + 1
+        if quotes % 2 == 0:
+            end = position
+    return end
+
+
+class DropWatcher:
+    """Imports the rows appended to export files in a drop directory, resuming where it left off.
+
+    For each file the state records its device and inode, the CSV header, the byte
+    offset just past the last imported row and the number of rows imported. A poll
+    stats each file and reads only from that offset, and only complete records, so a
+    file still being written is picked up row by row and nothing is read twice. A
+    file that shrinks or is replaced by a new one (new inode) is read from the top.
+
+    Rows go through the import pipeline without prompts; rows with no mapping are
+    appended to a review file (by default the new transactions file, so the next
+    interactive import asks about them).
+    """
+
+    def __init__(self, manager, drop_dir: str, review_file: str, state_path: Optional[str] = None):
+        self.manager = manager
+        self.drop_dir = drop_dir
+        self.review_file = review_file
+        self.state_path = state_path
+        self.files: Dict[str, dict] = {}
+        self.load()
+
+    # --- State ---
+
+    def load(self):
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+            if data.get("version") == STATE_VERSION:
+                self.files = data["files"]
+        except (IOError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable watch state {self.state_path}, drop files will be read from the top: {e}")
+            self.files = {}
+
+    def save(self):
+        if not self.state_path:
+            return
+        try:
+            with atomic_write(self.state_path) as file:
+                json.dump({"version": STATE_VERSION, "files": self.files}, file)
+        except IOError as e:
+            logger.warning(f"Could not save watch state {self.state_path}: {e}")
+
+    # --- Polling ---
+
+    def drop_files(self) -> List[str]:
+        """Paths of the export files currently in the drop directory, oldest first."""
+        try:
+            names = os.listdir(self.drop_dir)
+        except FileNotFoundError:
+            return []
+        review_stem = re.escape(os.path.splitext(os.path.abspath(self.review_file))[0])
+        # Neither the review file nor its per-header siblings
+        review_files = re.compile(rf"{review_stem}(-[0-9a-f]{{8}})?")
+        paths = [
+            os.path.join(self.drop_dir, name) for name in names
+            if name.lower().endswith(DROP_SUFFIXES) and not name.startswith(".")
+            and not review_files.fullmatch(os.path.splitext(os.path.abspath(os.path.join(self.drop_dir, name)))[0])
+        ]
+        return sorted(paths, key=lambda path: (os.path.getmtime(path), path))
+
+    def poll(self) -> int:
+        """Import whatever is new in every drop file. Returns the number of rows read."""
+        total = 0
+        paths = self.drop_files()
+        # Forget files that were removed, so a new file under the same name starts from the top
+        present = {os.path.basename(path) for path in paths}
+        if any(name not in present for name in self.files):
+            self.files = {name: entry for name, entry in self.files.items() if name in present}
+            self.save()
+        for path in paths:
+            try:
+                total += self._poll_file(path)
+            except (IOError, ValueError, csv.Error) as e:
+                logger.error(f"Could not import from {path}: {e}", exc_info=True)
+                Display.error(f"Could not import from {os.path.basename(path)}: {e}")
+        return total
+
+    def run(self, interval: float):
+        """Poll every `interval` seconds until interrupted."""
+        Display.message(f"Watching {self.drop_dir} every {interval:g}s (Ctrl+C to stop)")
+        try:
+            while True:
+                self.poll()
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            Display.message("\nStopped watching.")
+
+    def _poll_file(self, path: str) -> int:
+        stat = os.stat(path)
+        name = os.path.basename(path)
+        entry = self.files.get(name)
+        if entry is not None and (entry["device"], entry["inode"]) != (stat.st_dev, stat.st_ino):
+            logger.info(f"{name} was replaced; reading it from the top")
+            entry = None
+        elif entry is not None and stat.st_size < entry["offset"]:
+            logger.info(f"{name} shrank; reading it from the top")
+            entry = None
+        if entry is not None and stat.st_size == entry["offset"]:
+            return 0
+        if entry is None:
+            entry = {"device": stat.st_dev, "inode": stat.st_ino, "header": None, "offset": 0, "rows": 0}
+
+        settled = time.time() - stat.st_mtime >= SETTLE_SECONDS
+        with open(path, "rb") as file:
+            if entry["header"] is None:
+                header_line = file.readline()
+                if not header_line.endswith(b"\n") and not settled:
+                    return 0
+                entry["header"] = next(csv.reader([header_line.decode("utf-8-sig")]), [])
+                entry["offset"] = len(header_line)
+            file.seek(entry["offset"])
+            data = file.read(stat.st_size - entry["offset"])
+
+        # Only whole records: the rest may still be being written, even mid quoted value
+        end = complete_records_end(data)
+        if settled and end < len(data):
+            end = len(data)
+        if end == 0:
+            self.files[name] = entry
+            self.save()
+            return 0
+
+        rows = self._parse_rows(data[:end], entry["header"], entry["rows"])
+        if rows:
+            counts, unresolved = self.manager.import_rows(rows, entry["header"])
+            if unresolved:
+                self._set_aside(entry["header"], [raw_transaction for _, raw_transaction in unresolved])
+            Display.message(
+                f"{name}: {len(rows)} new rows - {counts['mapped']} added, {len(unresolved)} need a category, "
+                f"{counts['duplicates']} duplicates, {counts['errors']} errors"
+            )
+        entry["offset"] += end
+        entry["rows"] += len(rows)
+        # Stored only after the rows are committed; a crash in between re-reads rows that dedupe then skips
+        self.files[name] = entry
+        self.save()
+        return len(rows)
+
+    @staticmethod
+    def _parse_rows(data: bytes, header: List[str], rows_before: int) -> List[Tuple[int, Dict[str, str]]]:
+        """(line number, row) pairs for the CSV records in a chunk of whole records."""
+        reader = csv.DictReader(io.StringIO(data.decode("utf-8"), newline=""), fieldnames=header)
+        # Line numbers as in the file: the header is line 1
+        return list(enumerate(reader, start=rows_before + 2))
+
+    def review_path(self, header: List[str]) -> str:
+        """The review file for rows of an export with this header.
+
+        Normally the review file itself; when it already holds rows of an export with
+        other columns (another bank), a sibling named after the header's fingerprint,
+        so no row loses columns to another bank's layout.
+        """
+        if os.path.exists(self.review_file) and os.path.getsize(self.review_file) > 0:
+            with open(self.review_file, "r", encoding="utf-8-sig", newline="") as file:
+                review_header = next(csv.reader(file), [])
+            if not set(header) <= set(review_header):
+                stem, extension = os.path.splitext(self.review_file)
+                return f"{stem}-{header_fingerprint(header)[:8]}{extension or '.csv'}"
+        return self.review_file
+
+    def _set_aside(self, header: List[str], raw_transactions: List):
+        """Append rows that need a category to the review file for their header, in its own column order."""
+        fieldnames = header
+        review_file = self.review_path(header)
+        if review_file != self.review_file:
+            Display.warning(f"{self.review_file} holds rows with other columns, so these are set aside in {review_file}; "
+                            f"rename it to {os.path.basename(self.review_file)} to review them once that file is imported.")
+        with FileLock(review_file):
+            write_header, needs_newline = True, False
+            waiting = set()
+            if os.path.exists(review_file) and os.path.getsize(review_file) > 0:
+                with open(review_file, "r", encoding="utf-8-sig", newline="") as file:
+                    reader = csv.reader(file)
+                    fieldnames = next(reader, header)
+                    # Rows already waiting for review (e.g. from an overlapping export) are not added twice
+                    waiting = {tuple(row) for row in reader}
+                with open(review_file, "rb") as file:
+                    file.seek(-1, os.SEEK_END)
+                    needs_newline = file.read(1) not in (b"\n", b"\r")
+                write_header = False
+            with open(review_file, "a", encoding="utf-8", newline="") as file:
+                if needs_newline:
+                    file.write("\r\n")
+                writer = csv.DictWriter(file, fieldnames=fieldnames, restval="", extrasaction="ignore")
+                if write_header:
+                    writer.writeheader()
+                rows = [raw_transaction.raw_data for raw_transaction in raw_transactions]
+                rows = [row for row in rows if tuple(row.get(field, "") for field in fieldnames) not in waiting]
+                writer.writerows(rows)
+        logger.info(f"Set aside {len(rows)} rows without a mapping in {review_file}")
@@ -0,0 +1,132 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file finds transactions stored more than once with small differences, and merges them
+# License: MIT
+
+import logging
+from collections import defaultdict
+from dataclasses import dataclass, replace
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from .category_suggester import description_features, normalize_description
+from .config import DEFAULT_DUPLICATE_DAY_WINDOW, DEFAULT_DUPLICATE_SIMILARITY
+from .transaction import Transaction, join_tags
+from .transaction_columns import RESERVED_CATEGORIES
+
+logger = logging.getLogger(__name__)
+
+# (currency, absolute minor amount, date bucket) that candidate duplicates share
+BlockKey = Tuple[str, int, int]
+
+
+@dataclass
+class DuplicateGroup:
+    """Stored transactions that look like copies of one transaction."""
+    # Row ids in the history the group was found in, oldest transaction first
+    rows: List[int]
+    transactions: List[Transaction]
+    # Lowest description similarity of the pairs that joined the group
+    similarity: float
+
+    def merged(self) -> Transaction:
+        """The transaction kept: the earliest copy, with every copy's tags and a merchant filled in from the others."""
+        kept = self.transactions[0]
+        tag = join_tags(tag for t in self.transactions for tag in t.tags)
+        merchant = kept.merchant or next((t.merchant for t in self.transactions if t.merchant), "")
+        return replace(kept, tag=tag, merchant=merchant)
+
+
+def description_similarity(a: Set[str], b: Set[str]) -> float:
+    """Jaccard similarity of two descriptions' feature sets."""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class DuplicateFinder:
+    """Finds near-duplicates by blocking, so the history is never compared pairwise.
+
+    Copies of one transaction from overlapping exports share the currency and the
+    absolute amount (accounts disagree on sign), and are posted at most a few
+    days apart. Rows are bucketed by that amount and by date in buckets one window
+    wide, so any two copies land in the same or neighbouring buckets; descriptions
+    are only scored against the few rows of those buckets. Descriptions are
+    normalized (case, digits, punctuation and spacing ignored) and compared with
+    the token and trigram features the category suggester uses. Building the
+    blocks and scanning them is linear in the history for realistic data.
+    """
+
+    def __init__(self, day_window: int = DEFAULT_DUPLICATE_DAY_WINDOW,
+                 min_similarity: float = DEFAULT_DUPLICATE_SIMILARITY):
+        self.day_window = day_window
+        self.min_similarity = min_similarity
+
+    def block_key(self, transaction: Transaction) -> BlockKey:
+        return (transaction.currency, abs(transaction.amount_minor),
+                transaction.date.toordinal() // (self.day_window + 1))
+
+    def find(self, transactions: Sequence[Transaction], focus: Optional[Iterable[int]] = None) -> List[DuplicateGroup]:
+        """Groups of near-duplicate rows, oldest group first.
+
+        With `focus` (row ids, e.g. the rows just imported) only groups containing
+        one of those rows are returned; the blocks still cover the whole history.
+        IGNORED and SPLIT rows are never matched.
+        """
+        blocks: Dict[BlockKey, List[int]] = defaultdict(list)
+        for row, transaction in enumerate(transactions):
+            if transaction.category not in RESERVED_CATEGORIES:
+                blocks[self.block_key(transaction)].append(row)
+
+        features: Dict[str, Set[str]] = {}
+
+        def features_of(description: str) -> Set[str]:
+            found = features.get(description)
+            if found is None:
+                found = features[description] = description_features(normalize_description(description))
+            return found
+
+        parent: Dict[int, int] = {}
+        weakest: Dict[int, float] = {}
+
+        def root(row: int) -> int:
+            while parent.get(row, row) != row:
+                parent[row] = parent.get(parent[row], parent[row])
+                row = parent[row]
+            return row
+
+        scan = range(len(transactions)) if focus is None else sorted(set(focus))
+        pairs = 0
+        for row in scan:
+            transaction = transactions[row]
+            if transaction.category in RESERVED_CATEGORIES:
+                continue
+            currency, amount, bucket = self.block_key(transaction)
+            for neighbour in (bucket - 1, bucket, bucket + 1):
+                for other in blocks.get((currency, amount, neighbour), ()):
+                    # A full scan sees each pair from both sides; score it once
+                    if other == row or (focus is None and other < row):
+                        continue
+                    candidate = transactions[other]
+                    if abs((candidate.date - transaction.date).days) > self.day_window:
+                        continue
+                    pairs += 1
+                    similarity = description_similarity(features_of(transaction.description),
+                                                        features_of(candidate.description))
+                    if similarity < self.min_similarity:
+                        continue
+                    a, b = root(row), root(other)
+                    link = min(similarity, weakest.get(a, 1.0), weakest.get(b, 1.0))
+                    parent[a] = parent.setdefault(b, b)
+                    weakest[b] = link
+
+        members: Dict[int, List[int]] = defaultdict(list)
+        for row in parent:
+            members[root(row)].append(row)
+        groups = []
+        for head, rows in members.items():
+            if len(rows) < 2:
+                continue
+            rows.sort(key=lambda r: (transactions[r].date, r))
+            groups.append(DuplicateGroup(rows, [transactions[r] for r in rows], weakest.get(head, 1.0)))
+        groups.sort(key=lambda group: (group.transactions[0].date, group.rows[0]))
+        logger.info(f"Scored {pairs} candidate pairs in {len(blocks)} blocks; found {len(groups)} near-duplicate groups")
+        return groups
@@ -0,0 +1,152 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file provides advisory file locks, atomic file replacement and snapshot reads
+# License: MIT
+
+import io
+import logging
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows: locking becomes a no-op there
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Locks live in a sidecar file so they survive the data file being replaced by rename
+LOCK_SUFFIX = ".lock"
+
+# Locks held by the current thread: lock path -> [fd, exclusive, depth]
+_held = threading.local()
+
+
+class FileLock:
+    """Advisory `fcntl.flock` lock on `<path>.lock`, shared for readers or exclusive for writers.
+
+    Re-entrant within a thread (an exclusive hold also satisfies nested shared
+    requests), while other threads and processes are excluded as usual. Writers
+    hold the lock only for the write itself, so readers never wait on a whole
+    import, just on the row or file being written at that moment.
+    """
+
+    def __init__(self, path: str, exclusive: bool = True):
+        self.lock_path = path + LOCK_SUFFIX
+        self.exclusive = exclusive
+
+    def __enter__(self) -> "FileLock":
+        locks: Dict[str, list] = _held.__dict__.setdefault("locks", {})
+        held = locks.get(self.lock_path)
+        if held is not None:
+            if self.exclusive and not held[1]:
+                raise RuntimeError(f"Cannot upgrade a shared lock on {self.lock_path} to exclusive")
+            held[2] += 1
+            return self
+        if fcntl is None:
+            locks[self.lock_path] = [None, self.exclusive, 1]
+            return self
+
+        try:
+            fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        except OSError as e:
+            # e.g. a read-only directory: nobody can write there, so reading unlocked is safe
+            if self.exclusive:
+                raise
+            logger.debug(f"Reading without lock, cannot open {self.lock_path}: {e}")
+            locks[self.lock_path] = [None, False, 1]
+            return self
+
+        operation = fcntl.LOCK_EX if self.exclusive else fcntl.LOCK_SH
+        try:
+            fcntl.flock(fd, operation | fcntl.LOCK_NB)
+        except BlockingIOError:
+            logger.info(f"Waiting for {'exclusive' if self.exclusive else 'shared'} lock on {self.lock_path}")
+            fcntl.flock(fd, operation)
+        locks[self.lock_path] = [fd, self.exclusive, 1]
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        locks = _held.__dict__.get("locks", {})
+        held = locks[self.lock_path]
+        held[2] -= 1
+        if held[2] == 0:
+            del locks[self.lock_path]
+            if held[0] is not None:
+                fcntl.flock(held[0], fcntl.LOCK_UN)
+                os.close(held[0])
+        return False
+
+
+@contextmanager
+def atomic_write(path: str, mode: str = "w", encoding: Optional[str] = "utf-8", newline: Optional[str] = ""):
+    """Write a file through a temporary file in the same directory, then rename it into place.
+
+    Readers see either the old or the new contents, never a partial file; on error
+    the original is left untouched. The existing file's permissions are kept.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    try:
+        if "b" in mode:
+            file = os.fdopen(fd, mode)
+        else:
+            file = os.fdopen(fd, mode, encoding=encoding, newline=newline)
+        with file:
+            yield file
+            file.flush()
+            os.fsync(file.fileno())
+        try:
+            os.chmod(temp_path, os.stat(path).st_mode & 0o7777)
+        except FileNotFoundError:
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(temp_path, 0o666 & ~umask)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class _SnapshotReader(io.RawIOBase):
+    """Raw reader over the first `size` bytes of an open file."""
+
+    def __init__(self, file, size: int):
+        self._file = file
+        self._remaining = size
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self._remaining <= 0:
+            return 0
+        data = self._file.read(min(len(buffer), self._remaining))
+        buffer[:len(data)] = data
+        self._remaining -= len(data)
+        return len(data)
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+def snapshot_size(path: str) -> int:
+    """Size of a file at a moment when no writer is mid-write (so it ends on a record boundary)."""
+    with FileLock(path, exclusive=False):
+        return os.path.getsize(path)
+
+
+def open_snapshot(path: str, encoding: str = "utf-8", newline: Optional[str] = None):
+    """Open a text file as of now: later appends are not seen and a rename-replace leaves it intact.
+
+    The shared lock is only held while the file is opened and its size taken, so the
+    caller can read for as long as it likes without holding up writers.
+    """
+    with FileLock(path, exclusive=False):
+        file = open(path, "rb")
+        size = os.fstat(file.fileno()).st_size
+    return io.TextIOWrapper(io.BufferedReader(_SnapshotReader(file, size)), encoding=encoding, newline=newline)
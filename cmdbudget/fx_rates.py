@@ -0,0 +1,114 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file loads an offline FX rate table for base-currency report totals
+# License: MIT
+
+import csv
+import logging
+import os
+from array import array
+from bisect import bisect_right
+from typing import Any, Dict, List, Optional, Sequence
+
+from .currency_utils import get_decimal_places
+from .utils import parse_date_multi_format, memoize_date_parser
+
+logger = logging.getLogger(__name__)
+
+
+class FxRateTable:
+    """Daily exchange rates into one base currency, indexed by date for binary search.
+
+    Each currency keeps a sorted array of day ordinals and a parallel list of rates
+    (base-currency units per one unit of the currency). The rate for a day is the most
+    recent one on or before it; days before the first rate use the earliest rate.
+    Lookups are memoized per (currency, day).
+    """
+
+    def __init__(self, base_currency: str):
+        self.base_currency = base_currency.upper()
+        self._days: Dict[str, array] = {}
+        self._rates: Dict[str, List[float]] = {}
+        self._cache: Dict[tuple, Optional[float]] = {}
+
+    @classmethod
+    def load(cls, file_path: str, base_currency: str) -> "FxRateTable":
+        """Read a CSV with `date,currency,rate` columns. Rows that cannot be parsed are skipped."""
+        table = cls(base_currency)
+        date_parser = memoize_date_parser(parse_date_multi_format)
+        entries: Dict[str, List[tuple]] = {}
+        with open(file_path, "r", encoding="utf-8-sig") as file:
+            for line_num, row in enumerate(csv.DictReader(file), start=2):
+                try:
+                    day = date_parser(row["date"].strip()).toordinal()
+                    currency = row["currency"].strip().upper()
+                    rate = float(row["rate"])
+                except (KeyError, ValueError, AttributeError) as e:
+                    logger.warning(f"Skipping FX rate row {line_num} in {file_path}: {e}")
+                    continue
+                entries.setdefault(currency, []).append((day, rate))
+        for currency, currency_entries in entries.items():
+            currency_entries.sort()
+            table._days[currency] = array("i", (day for day, _ in currency_entries))
+            table._rates[currency] = [rate for _, rate in currency_entries]
+        logger.info(f"Loaded FX rates for {sorted(entries)} into {table.base_currency} from {file_path}")
+        return table
+
+    def currencies(self) -> List[str]:
+        return sorted(self._days)
+
+    def can_convert(self, currency: str) -> bool:
+        currency = currency.upper()
+        return currency == self.base_currency or currency in self._days
+
+    def rate(self, currency: str, day: int) -> Optional[float]:
+        """Base-currency units per unit of currency on a day ordinal, or None if the currency has no rates."""
+        currency = currency.upper()
+        if currency == self.base_currency:
+            return 1.0
+        key = (currency, day)
+        if key not in self._cache:
+            days = self._days.get(currency)
+            if not days:
+                self._cache[key] = None
+            else:
+                position = bisect_right(days, day) - 1
+                self._cache[key] = self._rates[currency][max(position, 0)]
+        return self._cache[key]
+
+    def max_rate(self, currency: str) -> Optional[float]:
+        """Largest known rate of a currency (used to bound converted totals for column widths)."""
+        currency = currency.upper()
+        if currency == self.base_currency:
+            return 1.0
+        rates = self._rates.get(currency)
+        return max(rates) if rates else None
+
+    def rates(self, currency: str, days: Sequence[int]) -> List[Optional[float]]:
+        """Rates for many day ordinals of one currency."""
+        return [self.rate(currency, day) for day in days]
+
+    def convert_minor(self, amount_minor: int, currency: str, day: int) -> Optional[float]:
+        """Convert integer minor units of a currency on a day into base-currency major units."""
+        rate = self.rate(currency, day)
+        if rate is None:
+            return None
+        return amount_minor / (10 ** get_decimal_places(currency)) * rate
+
+
+def load_fx_rates(config: Dict[str, Any]) -> Optional[FxRateTable]:
+    """Load the FX table named by `fx_rates_file` in the import_csv_structure config, if any.
+
+    The base currency is `base_currency`, falling back to `default_currency`.
+    """
+    file_path = config.get("fx_rates_file")
+    if not file_path:
+        return None
+    base_currency = config.get("base_currency") or config.get("default_currency", "CAD")
+    if not os.path.exists(file_path):
+        logger.warning(f"FX rate file {file_path} not found; reports will not show {base_currency} totals")
+        return None
+    try:
+        return FxRateTable.load(file_path, base_currency)
+    except IOError as e:
+        logger.error(f"Could not read FX rate file {file_path}: {e}", exc_info=True)
+        return None
@@ -0,0 +1,176 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file records how far an import has got, so an interrupted import can resume
+# License: MIT
+
+import csv
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .file_lock import atomic_write
+
+logger = logging.getLogger(__name__)
+
+# File in storage.state_dir holding the checkpoint of the last import
+IMPORT_CHECKPOINT_FILE = "import_checkpoint.json"
+STATE_VERSION = 1
+# Bytes hashed at the start of the file and just before the checkpoint offset
+FINGERPRINT_BYTES = 64 * 1024
+
+
+def source_fingerprint(path: str, offset: int) -> str:
+    """Hash of the file's first bytes and the bytes just before `offset`.
+
+    Enough to tell that the part already imported is unchanged (appending to the
+    file keeps it valid) while costing two small reads however large the file is.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        digest.update(file.read(min(offset, FINGERPRINT_BYTES)))
+        tail_start = max(0, offset - FINGERPRINT_BYTES)
+        file.seek(tail_start)
+        digest.update(file.read(offset - tail_start))
+    return f"{offset}:{digest.hexdigest()}"
+
+
+def read_records(file, start: int) -> Iterator[Tuple[List[str], int, int]]:
+    """(values, start offset, end offset) for each CSV record of a binary file from `start`.
+
+    `csv.reader` pulls one line at a time and stops at the end of a record, so the
+    file position after the last line it pulled is where the record ends, even for
+    quoted values that span lines.
+    """
+    file.seek(start)
+    end = start
+
+    def lines():
+        nonlocal end
+        for line in iter(file.readline, b""):
+            end = file.tell()
+            yield line.decode("utf-8-sig" if end == len(line) else "utf-8")
+
+    record_start = start
+    for values in csv.reader(lines()):
+        yield values, record_start, end
+        record_start = end
+
+
+def csv_row(fieldnames: List[str], values: List[str]) -> Dict[Optional[str], object]:
+    """A record as `csv.DictReader` would return it: extra values under None, missing ones as None."""
+    row: Dict[Optional[str], object] = dict(zip(fieldnames, values))
+    if len(values) > len(fieldnames):
+        row[None] = values[len(fieldnames):]
+    elif len(values) < len(fieldnames):
+        for name in fieldnames[len(values):]:
+            row[name] = None
+    return row
+
+
+class ImportCheckpoint:
+    """Persistent progress of an import of one source file.
+
+    `offset` and `row` mark the end of the last record whose outcome is durable:
+    every row before it is stored, a duplicate, or listed in `pending` (rows
+    handed to the prompts but not answered yet, by row number with their start
+    offset). A row that could not be read or saved holds the checkpoint before
+    it, so it is tried again. `split` holds the progress of a split in the
+    middle of being entered. A resumed import re-reads the pending rows, then
+    carries on from `offset`, so a restart costs only the rows that are left.
+    An import that gets through the whole file with nothing pending clears it.
+    """
+
+    def __init__(self, state_path: Optional[str], source: str):
+        self.state_path = state_path
+        self.source = os.path.abspath(source)
+        self.offset = 0
+        self.row = 1
+        self.pending: Dict[int, int] = {}
+        self.split: Optional[dict] = None
+        self._lock = threading.Lock()
+
+    def load(self) -> bool:
+        """Load the checkpoint if it belongs to this source file and the file still matches it."""
+        if not self.state_path or not os.path.exists(self.state_path):
+            return False
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+            if data.get("version") != STATE_VERSION or data["source"] != self.source:
+                return False
+            if os.path.getsize(self.source) < data["offset"] or source_fingerprint(self.source, data["offset"]) != data["fingerprint"]:
+                logger.info(f"{self.source} changed since the last import; starting from the top")
+                return False
+            self.offset, self.row = data["offset"], data["row"]
+            self.pending = {int(row): start for row, start in data["pending"].items()}
+            self.split = data["split"]
+            return True
+        except (IOError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable import checkpoint {self.state_path}: {e}")
+            return False
+
+    def save(self):
+        if not self.state_path:
+            return
+        with self._lock:
+            data = {
+                "version": STATE_VERSION,
+                "source": self.source,
+                "offset": self.offset,
+                "row": self.row,
+                "fingerprint": source_fingerprint(self.source, self.offset),
+                "pending": self.pending,
+                "split": self.split,
+            }
+            try:
+                with atomic_write(self.state_path) as file:
+                    json.dump(data, file)
+            except IOError as e:
+                logger.warning(f"Could not save import checkpoint {self.state_path}: {e}")
+
+    def clear(self):
+        """Forget the checkpoint: the import is complete, so the next one starts from the top."""
+        with self._lock:
+            self.offset, self.row, self.pending, self.split = 0, 1, {}, None
+            if self.state_path and os.path.exists(self.state_path):
+                try:
+                    os.remove(self.state_path)
+                except OSError as e:
+                    logger.warning(f"Could not remove import checkpoint {self.state_path}: {e}")
+
+    def advance(self, row: int, offset: int):
+        """Every row up to `row` (ending at `offset`) now has a durable outcome."""
+        with self._lock:
+            if offset > self.offset:
+                self.offset, self.row = offset, row
+        self.save()
+
+    def add_pending(self, row: int, start: int):
+        with self._lock:
+            self.pending[row] = start
+
+    def resolve(self, row: int, save: bool = True):
+        """A pending row was answered (or will be handled again on this pass)."""
+        with self._lock:
+            self.pending.pop(row, None)
+            if self.split is not None and self.split["row"] == row:
+                self.split = None
+        if save:
+            self.save()
+
+    def pending_before_offset(self) -> List[Tuple[int, int]]:
+        """(row, start offset) of pending rows that resuming from `offset` would not reach."""
+        with self._lock:
+            return sorted((row, start) for row, start in self.pending.items() if row <= self.row)
+
+    def set_split(self, row: int, remaining_minor: int, parts: int):
+        """Record that the split of `row` has its marker and `parts` parts saved, with `remaining_minor` left."""
+        with self._lock:
+            self.split = {"row": row, "remaining_minor": remaining_minor, "parts": parts}
+        self.save()
+
+    def split_for(self, row: int) -> Optional[dict]:
+        with self._lock:
+            return dict(self.split) if self.split is not None and self.split["row"] == row else None
@@ -0,0 +1,295 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file holds named bank import profiles and picks one for an export by hashing its header row
+# License: MIT
+
+import hashlib
+import json
+import logging
+import os
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from .currency_utils import to_minor_units
+from .file_lock import FileLock, atomic_write
+from .transaction import RawTransaction
+from .utils import memoize_date_parser, parse_date_multi_format
+
+logger = logging.getLogger(__name__)
+
+# File in storage.state_dir mapping header fingerprints to profiles and their compiled decoders
+IMPORT_PROFILES_STATE_FILE = "import_profiles.json"
+STATE_VERSION = 1
+# Name of the profile given by the import_csv_structure section
+DEFAULT_PROFILE = "default"
+# Keys every profile needs once laid over import_csv_structure
+REQUIRED_PROFILE_KEYS = ("date_column", "description_column")
+
+
+def header_fingerprint(fieldnames: Sequence[str]) -> str:
+    """Hash of an export's column names, in order (a leading byte order mark is ignored)."""
+    names = list(fieldnames)
+    if names and names[0]:
+        names[0] = names[0].lstrip("\ufeff")
+    return hashlib.sha1("\x00".join(name or "" for name in names).encode("utf-8")).hexdigest()
+
+
+def profile_hash(profile: dict) -> str:
+    """Hash of a profile's settings, so a cached decoder is dropped when they change."""
+    return hashlib.sha1(json.dumps(profile, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _normalize(name: Optional[str]) -> str:
+    return (name or "").lstrip("\ufeff").strip().casefold()
+
+
+def _description_columns(profile: dict) -> List[str]:
+    columns = profile["description_column"]
+    return list(columns) if isinstance(columns, list) else [columns]
+
+
+def _amount_columns(profile: dict) -> List[Tuple[str, str]]:
+    """(currency, column) in currency_priority order."""
+    currency_columns = profile.get("currency_columns", {"CAD": "CAD$"})
+    return [(currency, currency_columns[currency]) for currency in profile.get("currency_priority", ["CAD"])
+            if currency in currency_columns]
+
+
+def _required_columns(profile: dict) -> Set[str]:
+    """The normalized names of the date, description and amount columns a profile reads."""
+    columns = {_normalize(profile["date_column"])}
+    columns.update(_normalize(column) for column in _description_columns(profile))
+    columns.update(_normalize(column) for _, column in _amount_columns(profile))
+    return columns
+
+
+def profiles_from_config(config: dict) -> Dict[str, dict]:
+    """The import profiles by name: import_csv_structure as 'default', then each entry of import_profiles laid over it.
+
+    A profile only lists what differs from import_csv_structure, so currency
+    formatting and other shared settings are given once.
+    """
+    base = config.get("import_csv_structure") or {}
+    profiles = {DEFAULT_PROFILE: base}
+    for name, profile in (config.get("import_profiles") or {}).items():
+        profiles[str(name)] = {**base, **(profile or {})}
+    return profiles
+
+
+def validate_profile(name: str, profile: dict) -> Optional[str]:
+    """A message describing what is wrong with a profile, or None if it is usable."""
+    for key in REQUIRED_PROFILE_KEYS:
+        if key not in profile:
+            return f"Import profile '{name}' has no '{key}'"
+    if not isinstance(profile["description_column"], (str, list)):
+        return f"'description_column' of import profile '{name}' must be a column name or a list of them"
+    if not isinstance(profile.get("currency_columns", {}), dict):
+        return f"'currency_columns' of import profile '{name}' must be a dictionary"
+    if not isinstance(profile.get("currency_priority", []), list):
+        return f"'currency_priority' of import profile '{name}' must be a list"
+    for currency in profile.get("currency_priority", []):
+        if currency not in profile.get("currency_columns", {}):
+            return f"Currency '{currency}' in currency_priority of import profile '{name}' is not in its currency_columns"
+    if not isinstance(profile.get("expenses_are_positive", True), bool):
+        return f"'expenses_are_positive' of import profile '{name}' must be true or false"
+    if "header" in profile and (not isinstance(profile["header"], list) or not profile["header"]):
+        return f"'header' of import profile '{name}' must be the list of the export's column names"
+    if "date_format" in profile and not isinstance(profile["date_format"], str):
+        return f"'date_format' of import profile '{name}' must be a date format such as '%Y-%m-%d'"
+    return None
+
+
+@dataclass
+class RowDecoder:
+    """A profile compiled against one header: turns that export's rows into raw transactions.
+
+    Column names are resolved to the header's own spelling (ignoring case and
+    surrounding spaces), the currency columns are put in priority order and the
+    date parser is chosen once, so decoding a row only looks up the columns it needs.
+    Holds only plain values, so it can be cached in the state file as is.
+    """
+    profile: str
+    date_column: str
+    description_columns: Tuple[str, ...]
+    amount_columns: Tuple[Tuple[str, str], ...]  # (currency, column) in priority order
+    default_currency: str
+    expenses_are_positive: bool
+    date_format: Optional[str] = None
+    _parse_date: Callable[[str], datetime] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.description_columns = tuple(self.description_columns)
+        self.amount_columns = tuple(tuple(pair) for pair in self.amount_columns)
+        if self.date_format:
+            date_format = self.date_format
+            self._parse_date = memoize_date_parser(lambda value: datetime.strptime(value, date_format))
+        else:
+            self._parse_date = memoize_date_parser(parse_date_multi_format)
+
+    @classmethod
+    def compile(cls, name: str, profile: dict, fieldnames: Sequence[str]) -> 'RowDecoder':
+        """Resolve a profile's columns against a header. Columns the header lacks keep their configured name."""
+        actual = {}
+        for fieldname in fieldnames:
+            actual.setdefault(_normalize(fieldname), fieldname)
+
+        def column(configured: str) -> str:
+            return actual.get(_normalize(configured), configured)
+
+        return cls(
+            profile=name,
+            date_column=column(profile["date_column"]),
+            description_columns=tuple(column(configured) for configured in _description_columns(profile)),
+            amount_columns=tuple((currency, column(configured)) for currency, configured in _amount_columns(profile)),
+            default_currency=profile.get("default_currency", "CAD"),
+            expenses_are_positive=profile.get("expenses_are_positive", True),
+            date_format=profile.get("date_format"),
+        )
+
+    def to_spec(self) -> dict:
+        spec = asdict(self)
+        spec.pop("_parse_date", None)
+        return spec
+
+    @classmethod
+    def from_spec(cls, spec: dict) -> 'RowDecoder':
+        return cls(**spec)
+
+    def decode(self, row: dict) -> RawTransaction:
+        """Decode a CSV row (as `csv.DictReader` returns it) into a raw transaction.
+
+        The first non-zero amount in currency priority order wins, otherwise the amount
+        is 0 in the default currency; the sign is flipped when expenses are negative.
+
+        Raises KeyError if the date column is missing and ValueError if the date cannot be parsed.
+        """
+        date_val = self._parse_date(row[self.date_column])
+        parts = ((row.get(column) or "").strip() for column in self.description_columns)
+        description = " ".join(part for part in parts if part)
+
+        currency, amount_minor = self.default_currency, 0
+        for candidate, column in self.amount_columns:
+            amount_str = str(row.get(column) or "0.0").replace("$", "").replace(",", "").strip()
+            if not amount_str or amount_str == "0.0":
+                continue
+            try:
+                value = to_minor_units(amount_str, candidate)
+            except ValueError:
+                logger.warning(f"Could not convert amount '{amount_str}' to minor units for currency '{candidate}'. Trying next currency.")
+                continue
+            if value != 0:
+                currency, amount_minor = candidate, value
+                break
+        else:
+            logger.info(f"No valid amount found in any currency column. Using default currency: {self.default_currency}")
+        if not self.expenses_are_positive:
+            amount_minor = -amount_minor
+        return RawTransaction.from_values(row, date_val, description, amount_minor, currency)
+
+
+class ProfileRegistry:
+    """Picks the import profile for an export from a hash of its header row.
+
+    The state file maps each header fingerprint seen so far to its profile and
+    compiled decoder, so a known export layout costs one hash and one dict lookup
+    and is never parsed against each profile. A profile may pin its layout with a
+    `header` list; any other header is matched once by which profile's columns it
+    has (the most specific wins, a tie is asked about or refused) and remembered.
+    An entry whose profile settings have changed since is matched again.
+    """
+
+    def __init__(self, profiles: Dict[str, dict], state_path: Optional[str] = None):
+        self.profiles = profiles
+        self.state_path = state_path
+        # Header fingerprint -> {"profile", "profile_hash", "header", "decoder", "learned"}
+        self.headers: Dict[str, dict] = {}
+        self.pinned = {header_fingerprint(profile["header"]): name
+                       for name, profile in profiles.items() if profile.get("header")}
+        self._decoders: Dict[str, RowDecoder] = {}
+        self.load()
+
+    def load(self):
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+            if data.get("version") == STATE_VERSION:
+                self.headers = data["headers"]
+        except (IOError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable import profile registry {self.state_path}, headers will be matched again: {e}")
+            self.headers = {}
+
+    def save(self, fingerprint: str, entry: dict):
+        """Add one entry to the state file, keeping entries another session added meanwhile."""
+        self.headers[fingerprint] = entry
+        if not self.state_path:
+            return
+        try:
+            with FileLock(self.state_path):
+                on_disk = ProfileRegistry({}, self.state_path).headers
+                on_disk[fingerprint] = entry
+                with atomic_write(self.state_path) as file:
+                    json.dump({"version": STATE_VERSION, "headers": on_disk}, file)
+        except IOError as e:
+            logger.warning(f"Could not save import profile registry {self.state_path}: {e}")
+
+    def decoder_for(self, fieldnames: Sequence[str],
+                    choose: Optional[Callable[[List[str]], Optional[str]]] = None) -> Optional[RowDecoder]:
+        """The decoder for an export with this header, or None if no profile fits it.
+
+        `choose` is called with the candidate profile names when several fit equally
+        well; without it (or if it returns None) an ambiguous header is refused.
+        """
+        fingerprint = header_fingerprint(fieldnames)
+        decoder = self._decoders.get(fingerprint)
+        if decoder is not None:
+            return decoder
+
+        pinned = self.pinned.get(fingerprint)
+        entry = self.headers.get(fingerprint)
+        if entry is not None and pinned in (None, entry["profile"]) and self._current(entry):
+            decoder = RowDecoder.from_spec(entry["decoder"])
+        else:
+            name = pinned or self._match(fieldnames, choose)
+            if name is None:
+                return None
+            decoder = RowDecoder.compile(name, self.profiles[name], fieldnames)
+            logger.info(f"Import profile '{name}' chosen for header {list(fieldnames)}")
+            self.save(fingerprint, {
+                "profile": name,
+                "profile_hash": profile_hash(self.profiles[name]),
+                "header": list(fieldnames),
+                "decoder": decoder.to_spec(),
+                "learned": datetime.now().isoformat(timespec="seconds"),
+            })
+        self._decoders[fingerprint] = decoder
+        return decoder
+
+    def candidates(self, fieldnames: Sequence[str]) -> List[str]:
+        """The profiles that fit the header best: all their date, description and amount columns are present.
+
+        When several fit, only those reading the most columns are kept. With a single
+        profile (only import_csv_structure) that profile always applies, as before
+        profiles existed.
+        """
+        if len(self.profiles) == 1:
+            return list(self.profiles)
+        present = {_normalize(name) for name in fieldnames}
+        fitting = {name: len(required) for name, required in
+                   ((name, _required_columns(profile)) for name, profile in self.profiles.items())
+                   if required <= present}
+        most = max(fitting.values(), default=0)
+        return [name for name, count in fitting.items() if count == most]
+
+    def _match(self, fieldnames: Sequence[str], choose) -> Optional[str]:
+        candidates = self.candidates(fieldnames)
+        if len(candidates) == 1:
+            return candidates[0]
+        if candidates and choose is not None:
+            return choose(candidates)
+        return None
+
+    def _current(self, entry: dict) -> bool:
+        profile = self.profiles.get(entry.get("profile"))
+        return profile is not None and entry.get("profile_hash") == profile_hash(profile)
@@ -4,12 +4,17 @@
 
 import sys
 import os
+import argparse
 import yaml
 import logging # Import logging
 import csv # Added for creating default transactions file
+from datetime import date
 from .cli import BudgetCLI
 from .transactions_manager import TransactionsManager
 from .display import Display # Import Display
+from .currency_utils import configure_decimal_places
+from .import_profiles import DEFAULT_PROFILE, profiles_from_config, validate_profile
+from .config import DEFAULT_STATE_DIR, DEFAULT_STORAGE_LAYOUT, DEFAULT_FISCAL_YEAR_START_MONTH, DEFAULT_API_HOST, DEFAULT_API_PORT, DEFAULT_DROP_DIR, DEFAULT_POLL_INTERVAL, DEFAULT_UNDO_MAX_ENTRIES, DEFAULT_UNDO_RETENTION_DAYS
 
 # --- Configuration Setup --- 
 CONFIG_FILE = 'config.yml'
@@ -133,6 +138,23 @@ def load_config():
                 Display.error(f"Default currency '{csv_config['default_currency']}' not found in currency_columns.")
                 sys.exit(f"Error: Invalid default currency. Exiting.")
 
+            # Amounts are held as integer minor units using each currency's decimal_places
+            configure_decimal_places(csv_config)
+
+            # Optional: 'import_profiles', other banks' export layouts, each laid over import_csv_structure
+            import_profiles = config.setdefault('import_profiles', {})
+            if not isinstance(import_profiles, dict) or not all(isinstance(profile, dict) for profile in import_profiles.values()):
+                Display.error(f"'import_profiles' section in {CONFIG_FILE} must map profile names to dictionaries.")
+                sys.exit(f"Error: Invalid 'import_profiles' section. Exiting.")
+            if DEFAULT_PROFILE in import_profiles:
+                Display.error(f"Import profile name '{DEFAULT_PROFILE}' is taken by import_csv_structure in {CONFIG_FILE}.")
+                sys.exit(f"Error: Invalid 'import_profiles' section. Exiting.")
+            for name, profile in profiles_from_config(config).items():
+                problem = validate_profile(name, profile)
+                if problem:
+                    Display.error(f"{problem} in {CONFIG_FILE}.")
+                    sys.exit(f"Error: Invalid import profile '{name}'. Exiting.")
+
             # 2. Handle optional 'storage' section
             if 'storage' not in config:
                 Display.warning(f"'storage' section not found in {CONFIG_FILE}. Using default file paths: {default_storage_config}")
@@ -149,6 +171,59 @@ def load_config():
                       Display.warning(f"'new_transaction_file_path' missing in {CONFIG_FILE}['storage']. Using default: {DEFAULT_NEW_TRANSACTIONS_FILE}")
                       config['storage']['new_transaction_file_path'] = DEFAULT_NEW_TRANSACTIONS_FILE
 
+            # Optional: directory for rebuildable state such as indexes (no warning when absent)
+            config['storage'].setdefault('state_dir', DEFAULT_STATE_DIR)
+            # Optional: 'single' transactions file or 'partitioned' per-year/month files
+            config['storage'].setdefault('layout', DEFAULT_STORAGE_LAYOUT)
+            if config['storage']['layout'] not in ('single', 'partitioned'):
+                Display.error(f"Invalid storage layout '{config['storage']['layout']}' in {CONFIG_FILE}. Use 'single' or 'partitioned'.")
+                sys.exit(f"Error: Invalid storage layout. Exiting.")
+
+            # Optional: 'reporting' section for period reports
+            reporting = config.setdefault('reporting', {})
+            if not isinstance(reporting, dict):
+                Display.error(f"'reporting' section in {CONFIG_FILE} must be a dictionary.")
+                sys.exit(f"Error: Invalid 'reporting' section. Exiting.")
+            reporting.setdefault('fiscal_year_start_month', DEFAULT_FISCAL_YEAR_START_MONTH)
+            if reporting['fiscal_year_start_month'] not in range(1, 13):
+                Display.error(f"Invalid fiscal_year_start_month '{reporting['fiscal_year_start_month']}' in {CONFIG_FILE}. Use a month number from 1 to 12.")
+                sys.exit(f"Error: Invalid fiscal_year_start_month. Exiting.")
+
+            # Optional: 'api' section for `cmdbudget serve`
+            api = config.setdefault('api', {})
+            if not isinstance(api, dict):
+                Display.error(f"'api' section in {CONFIG_FILE} must be a dictionary.")
+                sys.exit(f"Error: Invalid 'api' section. Exiting.")
+            api.setdefault('host', DEFAULT_API_HOST)
+            api.setdefault('port', DEFAULT_API_PORT)
+            if not isinstance(api['port'], int) or not 0 < api['port'] < 65536:
+                Display.error(f"Invalid api port '{api['port']}' in {CONFIG_FILE}. Use a number from 1 to 65535.")
+                sys.exit(f"Error: Invalid api port. Exiting.")
+
+            # Optional: 'watch' section for `cmdbudget watch`
+            watch = config.setdefault('watch', {})
+            if not isinstance(watch, dict):
+                Display.error(f"'watch' section in {CONFIG_FILE} must be a dictionary.")
+                sys.exit(f"Error: Invalid 'watch' section. Exiting.")
+            watch.setdefault('drop_dir', DEFAULT_DROP_DIR)
+            watch.setdefault('poll_interval', DEFAULT_POLL_INTERVAL)
+            watch.setdefault('review_file', config['storage']['new_transaction_file_path'])
+            if not isinstance(watch['poll_interval'], (int, float)) or watch['poll_interval'] <= 0:
+                Display.error(f"Invalid watch poll_interval '{watch['poll_interval']}' in {CONFIG_FILE}. Use a number of seconds above 0.")
+                sys.exit(f"Error: Invalid watch poll_interval. Exiting.")
+
+            # Optional: 'undo' section, how much change history is kept
+            undo = config.setdefault('undo', {})
+            if not isinstance(undo, dict):
+                Display.error(f"'undo' section in {CONFIG_FILE} must be a dictionary.")
+                sys.exit(f"Error: Invalid 'undo' section. Exiting.")
+            undo.setdefault('max_entries', DEFAULT_UNDO_MAX_ENTRIES)
+            undo.setdefault('retention_days', DEFAULT_UNDO_RETENTION_DAYS)
+            for key in ('max_entries', 'retention_days'):
+                if not isinstance(undo[key], int) or undo[key] < 1:
+                    Display.error(f"Invalid undo {key} '{undo[key]}' in {CONFIG_FILE}. Use a whole number of at least 1.")
+                    sys.exit(f"Error: Invalid undo {key}. Exiting.")
+
             logger.debug(f"Loaded configuration: {config}")
             return config
     except yaml.YAMLError as e:
@@ -178,8 +253,26 @@ def create_default_yaml(file_path, default_content):
              # Optionally exit if this file is critical
              # sys.exit(f"Error creating {file_path}. Exiting.")
 
+def parse_arguments(argv=None):
+    """Parse the command line: no command runs the interactive CLI, `serve` the JSON API, `watch` the drop-directory import and `export` the columnar export."""
+    parser = argparse.ArgumentParser(prog="cmdbudget", description="Command-line budgeting tool.")
+    commands = parser.add_subparsers(dest="command")
+    serve_parser = commands.add_parser("serve", help="Serve reports and transactions as JSON over local HTTP")
+    serve_parser.add_argument("--host", help=f"Address to listen on (default: api.host in {CONFIG_FILE}, or {DEFAULT_API_HOST})")
+    serve_parser.add_argument("--port", type=int, help=f"Port to listen on (default: api.port in {CONFIG_FILE}, or {DEFAULT_API_PORT})")
+    watch_parser = commands.add_parser("watch", help="Import new rows of export files dropped into a directory")
+    watch_parser.add_argument("--dir", help=f"Drop directory (default: watch.drop_dir in {CONFIG_FILE}, or {DEFAULT_DROP_DIR})")
+    watch_parser.add_argument("--interval", type=float, help=f"Seconds between polls (default: watch.poll_interval in {CONFIG_FILE}, or {DEFAULT_POLL_INTERVAL})")
+    watch_parser.add_argument("--once", action="store_true", help="Poll once and exit, e.g. from cron")
+    export_parser = commands.add_parser("export", help="Export transactions as NumPy .npy columns with a JSON schema")
+    export_parser.add_argument("out_dir", help="Directory to write the column files and schema.json to")
+    export_parser.add_argument("--start", type=date.fromisoformat, help="First date to export (YYYY-MM-DD)")
+    export_parser.add_argument("--end", type=date.fromisoformat, help="Last date to export (YYYY-MM-DD)")
+    return parser.parse_args(argv)
+
 def main():
     """Main application entry point."""
+    args = parse_arguments()
     # Use Display.message instead of logger.info for startup message
     # (Commented out for now, perhaps not needed for user)
     
@@ -199,8 +292,8 @@ def main():
          logger.critical(f"Critical error retrieving guaranteed storage path '{e}'. This indicates a bug in load_config.")
          sys.exit("Internal configuration error. Exiting.")
     
-    # Check if the main transactions file exists, create if not
-    if not os.path.exists(transactions_file):
+    # Check if the main transactions file exists, create if not (partitions are created on first save)
+    if config['storage']['layout'] == 'single' and not os.path.exists(transactions_file):
          # Use Display.warning instead of logger.warning
          Display.warning(f"Main transaction file '{transactions_file}' not found. Creating empty file with headers.")
          try:
@@ -226,15 +319,45 @@ def main():
              Display.error(f"Unexpected error creating transaction file '{transactions_file}'. Check logs.")
              sys.exit(f"Error creating {transactions_file}. Exiting.")
 
-    # Initialize manager and CLI
-    try:
-        manager = TransactionsManager(
+    def create_manager():
+        return TransactionsManager(
             transactions_file=transactions_file,
             new_transactions_file=new_transactions_file,
             config_file=CONFIG_FILE,
             categories_file=CATEGORIES_FILE,
             mappings_file=MAPPINGS_FILE
         )
+
+    if args.command == "serve":
+        from .api_server import serve
+        serve(create_manager, args.host or config['api']['host'], args.port or config['api']['port'])
+        return
+    if args.command == "watch":
+        from .drop_watcher import DropWatcher, WATCH_STATE_FILE
+        from .utils import get_state_path
+        watcher = DropWatcher(create_manager(), args.dir or config['watch']['drop_dir'], config['watch']['review_file'],
+                              get_state_path(config, WATCH_STATE_FILE))
+        if args.once:
+            watcher.poll()
+        else:
+            watcher.run(args.interval or config['watch']['poll_interval'])
+        return
+
+    if args.command == "export":
+        from .columnar_export import ColumnarExporter
+        from .transaction_store import open_transaction_store
+        try:
+            count = ColumnarExporter(open_transaction_store(config, transactions_file)).export(args.out_dir, args.start, args.end)
+        except (IOError, OSError) as e:
+            logger.error(f"Export to {args.out_dir} failed: {e}", exc_info=True)
+            Display.error(f"Could not export to {args.out_dir}: {e}")
+            sys.exit(1)
+        Display.message(f"Exported {count} transactions to {args.out_dir}")
+        return
+
+    # Initialize manager and CLI
+    try:
+        manager = create_manager()
         cli = BudgetCLI(manager)
         cli.run()
     except Exception as e:
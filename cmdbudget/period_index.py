@@ -0,0 +1,203 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file provides prefix-sum totals for arbitrary reporting periods
+# License: MIT
+
+import logging
+from array import array
+from calendar import monthrange
+from collections import defaultdict
+from datetime import date, timedelta
+from itertools import accumulate
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .transaction_columns import TransactionColumns
+
+logger = logging.getLogger(__name__)
+
+# Reporting periods offered by the period report menu
+TRAILING_DAYS = 90
+
+
+class PeriodSumIndex:
+    """Cumulative spend per (category, currency) indexed by day ordinal.
+
+    For each (category code, currency code) pair `prefix[i]` is the sum of
+    amount_minor over rows dated before `origin + i`, so the total for any
+    inclusive day range is two array reads. When an FX table is given, a
+    parallel float prefix per category holds base-currency totals.
+    """
+
+    def __init__(self, columns: TransactionColumns, rows: Iterable[int], fx_rates=None):
+        self.columns = columns
+        self.fx_rates = fx_rates
+        rows = list(rows)
+        days = columns.day
+        self.origin = min((days[row] for row in rows), default=date.today().toordinal())
+        self.span = max((days[row] for row in rows), default=self.origin) - self.origin + 1
+        self.prefix: Dict[Tuple[int, int], array] = {}
+        self.base_prefix: Dict[int, array] = {}
+        self.unconverted = 0
+        self._build(rows)
+
+    def _build(self, rows: List[int]):
+        """Bucket amounts into per-day arrays, then turn each into a running sum."""
+        columns = self.columns
+        category_codes = columns.category.codes
+        currency_codes = columns.currency.codes
+        days = columns.day
+        amounts = columns.amount_minor
+
+        daily: Dict[Tuple[int, int], array] = {}
+        for row in rows:
+            key = (category_codes[row], currency_codes[row])
+            buckets = daily.get(key)
+            if buckets is None:
+                buckets = daily[key] = array('q', bytes(8 * self.span))
+            buckets[days[row] - self.origin] += amounts[row]
+        self.prefix = {key: array('q', accumulate(buckets, initial=0)) for key, buckets in daily.items()}
+
+        if self.fx_rates is not None:
+            base_daily: Dict[int, array] = {}
+            for row in rows:
+                converted = self._convert(row)
+                if converted is None:
+                    continue
+                buckets = base_daily.get(category_codes[row])
+                if buckets is None:
+                    buckets = base_daily[category_codes[row]] = array('d', bytes(8 * self.span))
+                buckets[days[row] - self.origin] += converted
+            self.base_prefix = {key: array('d', accumulate(buckets, initial=0.0)) for key, buckets in base_daily.items()}
+            if self.unconverted:
+                logger.warning(f"{self.unconverted} transactions have no FX rate into {self.fx_rates.base_currency} and are left out of period base totals")
+
+    def _convert(self, row: int) -> Optional[float]:
+        columns = self.columns
+        converted = self.fx_rates.convert_minor(columns.amount_minor[row], columns.currency.decode(columns.currency.codes[row]), columns.day[row])
+        if converted is None:
+            self.unconverted += 1
+        return converted
+
+    def add(self, row: int):
+        """Account for a row appended to the columns table after the index was built."""
+        self.adjust([row])
+
+    def adjust(self, rows: Iterable[int], sign: int = 1):
+        """Add (sign 1) or take out (sign -1) rows as they currently stand in the columns table.
+
+        Amounts are first bucketed by key and day, so each prefix array the rows
+        touch is walked once however many rows change.
+        """
+        columns = self.columns
+        deltas: Dict[Tuple[int, int], Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        base_deltas: Dict[int, Dict[int, float]] = defaultdict(lambda: defaultdict(float))
+        for row in rows:
+            day = columns.day[row]
+            self._cover(day)
+            key = (columns.category.codes[row], columns.currency.codes[row])
+            deltas[key][day] += sign * columns.amount_minor[row]
+            if self.fx_rates is not None:
+                currency = columns.currency.decode(key[1])
+                converted = self.fx_rates.convert_minor(columns.amount_minor[row], currency, day)
+                if converted is None:
+                    self.unconverted += sign
+                else:
+                    base_deltas[key[0]][day] += sign * converted
+
+        for key, by_day in deltas.items():
+            prefix = self.prefix.get(key)
+            if prefix is None:
+                prefix = self.prefix[key] = array('q', bytes(8 * (self.span + 1)))
+            _add_running(prefix, by_day, self.origin)
+        for category_code, by_day in base_deltas.items():
+            base = self.base_prefix.get(category_code)
+            if base is None:
+                base = self.base_prefix[category_code] = array('d', bytes(8 * (self.span + 1)))
+            _add_running(base, by_day, self.origin)
+
+    def _cover(self, day: int):
+        """Widen every prefix array so that `day` falls inside the indexed span."""
+        if day < self.origin:
+            padding = self.origin - day
+            for arrays in (self.prefix, self.base_prefix):
+                for key, prefix in arrays.items():
+                    arrays[key] = array(prefix.typecode, bytes(8 * padding)) + prefix
+            self.origin = day
+            self.span += padding
+        elif day >= self.origin + self.span:
+            padding = day - (self.origin + self.span) + 1
+            for arrays in (self.prefix, self.base_prefix):
+                for prefix in arrays.values():
+                    prefix.extend([prefix[-1]] * padding)
+            self.span += padding
+
+    def _bounds(self, start: date, end: date) -> Tuple[int, int]:
+        """Prefix positions (lo, hi) for an inclusive date range, clamped to the indexed span."""
+        lo = min(max(start.toordinal() - self.origin, 0), self.span)
+        hi = min(max(end.toordinal() - self.origin + 1, 0), self.span)
+        return lo, max(lo, hi)
+
+    def total(self, category: str, currency: str, start: date, end: date) -> int:
+        """Minor-unit total of one category in one currency between start and end (inclusive)."""
+        key = (self.columns.category.code_of(category), self.columns.currency.code_of(currency.upper()))
+        prefix = self.prefix.get(key)
+        if prefix is None:
+            return 0
+        lo, hi = self._bounds(start, end)
+        return prefix[hi] - prefix[lo]
+
+    def category_totals(self, start: date, end: date) -> Dict[str, Dict[str, int]]:
+        """{category: {currency: minor units}} for the inclusive date range, omitting zero totals."""
+        lo, hi = self._bounds(start, end)
+        totals: Dict[str, Dict[str, int]] = defaultdict(dict)
+        for (category_code, currency_code), prefix in self.prefix.items():
+            amount = prefix[hi] - prefix[lo]
+            if amount:
+                totals[self.columns.category.decode(category_code)][self.columns.currency.decode(currency_code)] = amount
+        return totals
+
+    def category_base_totals(self, start: date, end: date) -> Dict[str, float]:
+        """{category: base-currency total} for the inclusive date range (empty without FX rates)."""
+        lo, hi = self._bounds(start, end)
+        return {
+            self.columns.category.decode(category_code): prefix[hi] - prefix[lo]
+            for category_code, prefix in self.base_prefix.items()
+            if prefix[hi] != prefix[lo]
+        }
+
+
+def _add_running(prefix: array, deltas: Dict[int, float], origin: int):
+    """Add per-day deltas to a prefix-sum array: entry i gains the deltas of days before origin + i."""
+    days = sorted(deltas)
+    running, position = 0, 0
+    for i in range(days[0] - origin + 1, len(prefix)):
+        while position < len(days) and days[position] - origin < i:
+            running += deltas[days[position]]
+            position += 1
+        prefix[i] += running
+
+
+def quarter_to_date(today: date) -> Tuple[date, date]:
+    """From the first day of today's calendar quarter to today."""
+    return date(today.year, 3 * ((today.month - 1) // 3) + 1, 1), today
+
+
+def fiscal_year_range(fiscal_year: int, start_month: int = 1) -> Tuple[date, date]:
+    """Whole fiscal year, named by the calendar year it starts in."""
+    start = date(fiscal_year, start_month, 1)
+    end_year, end_month = (fiscal_year, 12) if start_month == 1 else (fiscal_year + 1, start_month - 1)
+    return start, date(end_year, end_month, monthrange(end_year, end_month)[1])
+
+
+def fiscal_year_of(day: date, start_month: int = 1) -> int:
+    """Fiscal year (by starting calendar year) that a date falls in."""
+    return day.year if day.month >= start_month else day.year - 1
+
+
+def fiscal_year_to_date(today: date, start_month: int = 1) -> Tuple[date, date]:
+    """From the start of the current fiscal year to today."""
+    return fiscal_year_range(fiscal_year_of(today, start_month), start_month)[0], today
+
+
+def trailing_days(today: date, days: int = TRAILING_DAYS) -> Tuple[date, date]:
+    """The `days` days ending today (inclusive)."""
+    return today - timedelta(days=days - 1), today
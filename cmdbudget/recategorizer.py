@@ -0,0 +1,108 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file carries mapping rule changes back to transactions already stored
+# License: MIT
+
+import logging
+from collections import Counter
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .description_index import DescriptionIndex
+from .transaction import Transaction
+
+logger = logging.getLogger(__name__)
+
+# (row id in the loaded history, stored transaction, re-categorized transaction)
+Change = Tuple[int, Transaction, Transaction]
+
+
+@dataclass
+class RecategorizationPlan:
+    """Stored transactions a mapping rule would now categorize differently."""
+    rule: str
+    changes: List[Change] = field(default_factory=list)
+    # Matching transactions in sealed partitions, which are left as they are
+    sealed: int = 0
+
+    def summary(self) -> List[Tuple[str, str, int]]:
+        """(from, to, count) for each distinct change of category > subcategory, most common first."""
+        counts = Counter((category_label(old), category_label(new)) for _, old, new in self.changes)
+        return [(old, new, count) for (old, new), count in counts.most_common()]
+
+
+def category_label(transaction: Transaction) -> str:
+    """'Category > Subcategory', or just the category when there is no subcategory."""
+    return f"{transaction.category} > {transaction.subcategory}" if transaction.subcategory else transaction.category
+
+
+class Recategorizer:
+    """Re-applies the mapping rules to the stored rows a changed rule can match.
+
+    Candidate rows come from a `DescriptionIndex` (rows whose description contains
+    the rule text), not a scan of the history. Each candidate is re-classified with
+    `find_category`, so rules earlier in the mappings still take precedence, and
+    SPLIT markers are never touched. `apply` rewrites only the partitions holding
+    changes, in one commit through the store's `rewrite_partitions`.
+    """
+
+    def __init__(self, classifier, store, undo_log=None):
+        self.classifier = classifier
+        self.store = store
+        self.undo_log = undo_log
+
+    def plan(self, rule: str, transactions: Sequence[Transaction], index: DescriptionIndex) -> RecategorizationPlan:
+        plan = RecategorizationPlan(rule)
+        targets: Dict[str, Tuple[Optional[str], str]] = {}
+        for row in index.rows_containing(rule):
+            transaction = transactions[row]
+            recategorized = self.recategorized(transaction, targets)
+            if recategorized is None:
+                continue
+            if self.store.is_sealed(self.store.partition_key(transaction.date)):
+                plan.sealed += 1
+            else:
+                plan.changes.append((row, transaction, recategorized))
+        logger.info(f"Rule '{rule}' would re-categorize {len(plan.changes)} stored transactions ({plan.sealed} sealed)")
+        return plan
+
+    def recategorized(self, transaction: Transaction, targets: Dict[str, Tuple[Optional[str], str]]) -> Optional[Transaction]:
+        """The transaction as the mappings now categorize it, or None if that changes nothing."""
+        if transaction.category == "SPLIT":
+            return None
+        target = targets.get(transaction.description)
+        if target is None:
+            category, subcategory = self.classifier.find_category(transaction.description)
+            target = targets[transaction.description] = (category, subcategory or "")
+        category, subcategory = target
+        if category is None or (transaction.category, transaction.subcategory) == target:
+            return None
+        return replace(transaction, category=category, subcategory=subcategory)
+
+    def apply(self, plan: RecategorizationPlan) -> Optional[int]:
+        """Write the plan's changes. Returns the number of rows changed, None on failure."""
+        if not plan.changes:
+            return 0
+        keys = sorted({self.store.partition_key(old.date) for _, old, _ in plan.changes})
+        descriptions = {old.description for _, old, _ in plan.changes}
+        targets: Dict[str, Tuple[Optional[str], str]] = {}
+        edited_pairs: List[Tuple[Transaction, Transaction]] = []
+
+        def edit(transaction: Transaction) -> Optional[Transaction]:
+            if transaction.description not in descriptions:
+                return None
+            recategorized = self.recategorized(transaction, targets)
+            if recategorized is not None:
+                edited_pairs.append((transaction, recategorized))
+            return recategorized
+
+        changed = self.store.rewrite_partitions(keys, edit)
+        if changed is None:
+            return None
+        if self.undo_log is not None:
+            self.undo_log.record(f"Re-categorize {changed} transactions for '{plan.rule}'",
+                                 transactions=[([old], [new]) for old, new in edited_pairs])
+        # Keep the suggestion index in line with what was actually rewritten
+        for old, new in edited_pairs:
+            self.classifier.relearn(old, new)
+        logger.info(f"Re-categorized {changed} stored transactions for rule '{plan.rule}'")
+        return changed
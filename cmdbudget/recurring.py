@@ -0,0 +1,231 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file detects recurring (weekly, monthly, annual) transactions
+# License: MIT
+
+import json
+import logging
+import os
+from bisect import insort
+from dataclasses import dataclass, asdict
+from datetime import date, timedelta
+from statistics import median
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .category_suggester import normalize_description
+from .file_lock import atomic_write
+from .transaction_columns import RESERVED_CATEGORIES
+
+logger = logging.getLogger(__name__)
+
+# File in storage.state_dir holding the detector's buckets and series
+RECURRING_STATE_FILE = "recurring.json"
+STATE_VERSION = 1
+# Amounts within this fraction of a cluster's smallest amount count as "the same" charge
+AMOUNT_TOLERANCE = 0.15
+# Share of gaps between consecutive charges that must match the period
+MIN_MATCHING_SHARE = 0.75
+# name -> (expected gap in days, allowed deviation in days, minimum occurrences)
+PERIODS = {
+    "weekly": (7, 1, 4),
+    "monthly": (30, 3, 3),
+    "annual": (365, 7, 3),
+}
+
+# (day ordinal, absolute amount in minor units, category, description)
+Occurrence = Tuple[int, int, str, str]
+
+
+@dataclass
+class RecurringSeries:
+    """One detected recurring charge."""
+    description: str
+    currency: str
+    category: str
+    period: str
+    amount_minor: int
+    occurrences: int
+    first_day: int
+    last_day: int
+
+    @property
+    def next_date(self) -> date:
+        return date.fromordinal(self.last_day + PERIODS[self.period][0])
+
+    @property
+    def last_date(self) -> date:
+        return date.fromordinal(self.last_day)
+
+
+def bucket_key(description: str, currency: str) -> str:
+    """Bucket of a transaction: normalized description (no digits or punctuation) and currency."""
+    return f"{normalize_description(description)}|{currency.upper()}"
+
+
+def plain_generation(generation: Optional[Tuple]) -> Optional[list]:
+    """A store generation (tuples of per-file values) as the lists it reads back as from JSON."""
+    if generation is None:
+        return None
+    return [list(item) if isinstance(item, tuple) else item for item in generation]
+
+
+def split_by_amount(occurrences: List[Occurrence]) -> List[List[Occurrence]]:
+    """Cluster a bucket's occurrences into runs of similar amounts, each sorted by date."""
+    clusters: List[List[Occurrence]] = []
+    anchor = None
+    for occurrence in sorted(occurrences, key=lambda item: item[1]):
+        if anchor is None or occurrence[1] > anchor * (1 + AMOUNT_TOLERANCE):
+            clusters.append([])
+            anchor = occurrence[1]
+        clusters[-1].append(occurrence)
+    for cluster in clusters:
+        cluster.sort()
+    return clusters
+
+
+def detect_period(days: List[int]) -> Optional[str]:
+    """Name of the period most gaps between sorted charge days match, if enough do."""
+    gaps = [later - earlier for earlier, later in zip(days, days[1:]) if later != earlier]
+    best, best_matches = None, 0
+    for name, (expected, deviation, minimum) in PERIODS.items():
+        if len(gaps) + 1 < minimum:
+            continue
+        matches = sum(1 for gap in gaps if abs(gap - expected) <= deviation)
+        if matches >= MIN_MATCHING_SHARE * len(gaps) and matches > best_matches:
+            best, best_matches = name, matches
+    return best
+
+
+class RecurringDetector:
+    """Finds periodic charges by bucketing, not by comparing transactions pairwise.
+
+    Transactions are bucketed by normalized description and currency; each bucket
+    keeps its occurrences sorted by date. Detection splits a bucket into clusters
+    of similar amounts and checks the gaps between consecutive dates against the
+    weekly/monthly/annual periods, so a full run is O(n log n). The buckets and
+    detected series are persisted, and `add()` re-examines only the buckets that
+    new transactions fall into. The state records the store generation it was
+    built at (see `generation()` on the stores), so any other write makes it stale.
+    """
+
+    def __init__(self, state_path: Optional[str] = None):
+        self.state_path = state_path
+        self.buckets: Dict[str, List[Occurrence]] = {}
+        self.series: Dict[str, List[RecurringSeries]] = {}
+        self.transaction_count = 0
+        # Store generation the buckets reflect, as JSON-friendly lists
+        self.generation: Optional[list] = None
+
+    def covers(self, generation: Tuple) -> bool:
+        """Whether the buckets (in memory, else persisted) reflect the store at this generation."""
+        generation = plain_generation(generation)
+        return self.generation == generation or (self.load() and self.generation == generation)
+
+    def build(self, transactions: Iterable, generation: Optional[Tuple] = None):
+        """Index a full history, read at store `generation`, and detect every series."""
+        self.buckets = {}
+        self.transaction_count = 0
+        self.generation = plain_generation(generation)
+        for transaction in transactions:
+            self._index(transaction)
+        for occurrences in self.buckets.values():
+            occurrences.sort()
+        self.series = {key: self._detect(key) for key in self.buckets}
+        self.series = {key: found for key, found in self.series.items() if found}
+        logger.info(f"Found {len(self.all_series())} recurring series in {self.transaction_count} transactions")
+
+    def add(self, transactions: Iterable, generation: Optional[Tuple] = None):
+        """Index newly imported transactions (the store is now at `generation`) and re-detect only their buckets."""
+        self.generation = plain_generation(generation)
+        touched = set()
+        for transaction in transactions:
+            key = self._index(transaction, keep_sorted=True)
+            if key:
+                touched.add(key)
+        for key in touched:
+            found = self._detect(key)
+            if found:
+                self.series[key] = found
+            else:
+                self.series.pop(key, None)
+        logger.info(f"Re-examined {len(touched)} description buckets for recurring charges")
+
+    def _index(self, transaction, keep_sorted: bool = False) -> Optional[str]:
+        if transaction.category in RESERVED_CATEGORIES:
+            return None
+        self.transaction_count += 1
+        key = bucket_key(transaction.description, transaction.currency)
+        occurrence = (transaction.date.toordinal(), abs(transaction.amount_minor), transaction.category, transaction.description)
+        occurrences = self.buckets.setdefault(key, [])
+        if keep_sorted:
+            insort(occurrences, occurrence)
+        else:
+            occurrences.append(occurrence)
+        return key
+
+    def _detect(self, key: str) -> List[RecurringSeries]:
+        currency = key.rsplit("|", 1)[1]
+        found = []
+        for cluster in split_by_amount(self.buckets[key]):
+            days = [occurrence[0] for occurrence in cluster]
+            period = detect_period(days)
+            if period is None:
+                continue
+            latest = cluster[-1]
+            found.append(RecurringSeries(
+                description=latest[3], currency=currency, category=latest[2], period=period,
+                amount_minor=int(median(occurrence[1] for occurrence in cluster)),
+                occurrences=len(cluster), first_day=days[0], last_day=days[-1],
+            ))
+        return found
+
+    def all_series(self) -> List[RecurringSeries]:
+        """Detected series, soonest expected next charge first."""
+        return sorted(
+            (series for found in self.series.values() for series in found),
+            key=lambda series: (series.last_day + PERIODS[series.period][0], series.description)
+        )
+
+    def active_series(self, today: date) -> List[RecurringSeries]:
+        """Series whose next charge is not overdue by more than one period's allowed deviation."""
+        return [
+            series for series in self.all_series()
+            if series.next_date + timedelta(days=PERIODS[series.period][1]) >= today
+        ]
+
+    def load(self) -> bool:
+        """Load persisted buckets and series. Returns False if there is no usable state."""
+        if not self.state_path or not os.path.exists(self.state_path):
+            return False
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+            if data.get("version") != STATE_VERSION:
+                return False
+            self.transaction_count = data["transaction_count"]
+            self.generation = data["generation"]
+            self.buckets = {key: [tuple(item) for item in items] for key, items in data["buckets"].items()}
+            self.series = {
+                key: [RecurringSeries(**item) for item in items]
+                for key, items in data["series"].items()
+            }
+            return True
+        except (IOError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable recurring-charge state {self.state_path}: {e}")
+            self.buckets, self.series, self.transaction_count, self.generation = {}, {}, 0, None
+            return False
+
+    def save(self):
+        if not self.state_path:
+            return
+        data = {
+            "version": STATE_VERSION,
+            "transaction_count": self.transaction_count,
+            "generation": self.generation,
+            "buckets": self.buckets,
+            "series": {key: [asdict(series) for series in found] for key, found in self.series.items()},
+        }
+        try:
+            with atomic_write(self.state_path) as file:
+                json.dump(data, file)
+        except IOError as e:
+            logger.warning(f"Could not save recurring-charge state {self.state_path}: {e}")
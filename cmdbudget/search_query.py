@@ -0,0 +1,620 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file parses search expressions and plans them against the in-memory indexes
+# License: MIT
+
+import heapq
+import logging
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple, Union
+
+from .currency_utils import to_minor_units
+from .description_index import DescriptionIndex
+from .tag_bitmaps import RowBitmap
+from .transaction_columns import RESERVED_CATEGORIES, TransactionColumns
+
+logger = logging.getLogger(__name__)
+
+# Fields a query can name; bare words search the description
+QUERY_FIELDS = ("date", "amount", "category", "subcategory", "tag", "merchant", "currency", "description")
+CODED_FIELDS = ("category", "subcategory", "tag", "merchant", "currency")
+RANGE_FIELDS = ("date", "amount")
+SORT_KEYS = ("date", "amount", "description")
+# Another index is intersected with the driving one only if it is at most this many times larger;
+# otherwise its condition is checked on the driving rows
+INTERSECT_RATIO = 2
+
+_TOKEN = re.compile(r'''\s*(?:
+    (?P<paren>[()])
+  | (?P<field>[A-Za-z]+)(?P<op>>=|<=|:|>|<|=)(?P<value>"[^"]*"|[^\s()"]*)
+  | (?P<word>"[^"]*"|[^\s()"]+)
+)''', re.VERBOSE)
+
+
+class QueryError(ValueError):
+    """A search expression that cannot be parsed or compiled."""
+
+
+# --- Syntax tree ---
+
+@dataclass(frozen=True)
+class Term:
+    field: str
+    op: str
+    value: str
+
+
+@dataclass(frozen=True)
+class And:
+    children: Tuple
+
+
+@dataclass(frozen=True)
+class Or:
+    children: Tuple
+
+
+@dataclass(frozen=True)
+class Not:
+    child: object
+
+
+Node = Union[Term, And, Or, Not]
+
+
+def _unquote(text: str) -> str:
+    return text[1:-1] if len(text) >= 2 and text[0] == text[-1] == '"' else text
+
+
+def tokenize(text: str) -> Iterator[Tuple[str, object]]:
+    """(kind, value) tokens: '(' and ')', keywords AND/OR/NOT, and terms."""
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = _TOKEN.match(text, position)
+        if match is None or match.end() == position:
+            raise QueryError(f"Cannot read the query from: {text[position:].strip()}")
+        position = match.end()
+        if match.group("paren"):
+            yield match.group("paren"), None
+        elif match.group("field"):
+            field, op, value = match.group("field").lower(), match.group("op"), _unquote(match.group("value"))
+            if field not in QUERY_FIELDS:
+                raise QueryError(f"Unknown field '{field}'. Use one of: {', '.join(QUERY_FIELDS)}")
+            if op not in (":", "=") and field not in RANGE_FIELDS:
+                raise QueryError(f"'{field}' can only be matched with ':' (comparisons work on date and amount)")
+            if not value:
+                raise QueryError(f"Missing value after '{field}{op}'")
+            yield "term", Term(field, op, value)
+        else:
+            word = match.group("word")
+            if word.upper() in ("AND", "OR", "NOT"):
+                yield "keyword", word.upper()
+            else:
+                yield "term", Term("description", ":", _unquote(word))
+
+
+class _Parser:
+    """Recursive descent: OR binds loosest, then AND (also implied between terms), then NOT."""
+
+    def __init__(self, text: str):
+        self.tokens = list(tokenize(text))
+        self.position = 0
+
+    def parse(self) -> Node:
+        if not self.tokens:
+            raise QueryError("The query is empty")
+        node = self._or()
+        if self.position < len(self.tokens):
+            raise QueryError("Unmatched ')' in the query")
+        return node
+
+    def _peek(self) -> Optional[Tuple[str, object]]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def _take_keyword(self, keyword: str) -> bool:
+        if self._peek() == ("keyword", keyword):
+            self.position += 1
+            return True
+        return False
+
+    def _or(self) -> Node:
+        children = [self._and()]
+        while self._take_keyword("OR"):
+            children.append(self._and())
+        return children[0] if len(children) == 1 else Or(tuple(children))
+
+    def _and(self) -> Node:
+        children = [self._not()]
+        while self._peek() not in (None, (")", None), ("keyword", "OR")):
+            self._take_keyword("AND")
+            children.append(self._not())
+        return children[0] if len(children) == 1 else And(tuple(children))
+
+    def _not(self) -> Node:
+        if self._take_keyword("NOT"):
+            return Not(self._not())
+        return self._atom()
+
+    def _atom(self) -> Node:
+        token = self._peek()
+        if token is None:
+            raise QueryError("The query ends where a condition was expected")
+        self.position += 1
+        kind, value = token
+        if kind == "(":
+            node = self._or()
+            if self._peek() != (")", None):
+                raise QueryError("Missing ')' in the query")
+            self.position += 1
+            return node
+        if kind == "term":
+            return value
+        raise QueryError(f"Expected a condition, found '{value or kind}'")
+
+
+def parse_query(text: str) -> Node:
+    """Parse a search expression such as `category:dining amount>50 (tag:trip OR "airbnb")`."""
+    return _Parser(text).parse()
+
+
+# --- Indexes ---
+
+class SearchIndex:
+    """Row-id indexes over the loaded history that queries are planned against.
+
+    Rows sorted by day answer date ranges with two bisections, each categorical
+    code has a posting list (built the first time its field is searched),
+    description text goes through the trigram `DescriptionIndex`, and tags use
+    the per-tag bitmaps the columns keep. Category counts come straight from the
+    columns, so estimating a term's size is O(1) or O(log n).
+    """
+
+    def __init__(self, columns: TransactionColumns, description_index: DescriptionIndex, base_rows: Sequence[int]):
+        self.columns = columns
+        self.description_index = description_index
+        # Rows searched when IGNORED/SPLIT are not asked for
+        self.base_rows = base_rows
+        days = columns.day
+        self.rows_by_day = array('i', sorted(range(len(columns)), key=days.__getitem__))
+        self.sorted_days = array('i', (days[row] for row in self.rows_by_day))
+        self._postings: Dict[str, Dict[int, array]] = {}
+
+    def __len__(self) -> int:
+        return len(self.columns)
+
+    def day_span(self, first: int, last: int) -> Tuple[int, int]:
+        """Positions in `rows_by_day` of the rows dated between two day ordinals (inclusive)."""
+        start = bisect_left(self.sorted_days, first)
+        return start, max(start, bisect_right(self.sorted_days, last))
+
+    def postings(self, field: str, code: int) -> array:
+        by_code = self._postings.get(field)
+        if by_code is None:
+            by_code = {}
+            for row, row_code in enumerate(self.columns.column(field).codes):
+                rows = by_code.get(row_code)
+                if rows is None:
+                    rows = by_code[row_code] = array('i')
+                rows.append(row)
+            self._postings[field] = by_code
+        return by_code.get(code, array('i'))
+
+    def codes_matching(self, field: str, value: str) -> List[int]:
+        """Codes of the field's values equal to `value`, ignoring case."""
+        wanted = value.upper()
+        return [code for code, known in enumerate(self.columns.column(field).values) if known.upper() == wanted]
+
+
+# --- Plan ---
+
+class _PlanNode:
+    """A compiled condition: a per-row test and, if it has an index, its estimated row count and its rows."""
+    indexed = False
+
+    def estimate(self) -> int:
+        raise NotImplementedError
+
+    def rows(self) -> Set[int]:
+        raise NotImplementedError
+
+    def test(self) -> Callable[[int], bool]:
+        raise NotImplementedError
+
+    def describe(self) -> str:
+        raise NotImplementedError
+
+    def explain(self, depth: int = 0) -> List[str]:
+        return [f"{'  ' * depth}{self.describe()}"]
+
+
+class _DayRange(_PlanNode):
+    indexed = True
+
+    def __init__(self, index: SearchIndex, first: int, last: int):
+        self.index, self.first, self.last = index, first, last
+
+    def estimate(self) -> int:
+        start, stop = self.index.day_span(self.first, self.last)
+        return stop - start
+
+    def rows(self) -> Set[int]:
+        start, stop = self.index.day_span(self.first, self.last)
+        return set(self.index.rows_by_day[start:stop])
+
+    def test(self) -> Callable[[int], bool]:
+        days, first, last = self.index.columns.day, self.first, self.last
+        return lambda row: first <= days[row] <= last
+
+    def describe(self) -> str:
+        low = date.fromordinal(self.first).isoformat() if self.first > 1 else "..."
+        high = date.fromordinal(self.last).isoformat() if self.last < date.max.toordinal() else "..."
+        return f"date {low} to {high} (~{self.estimate()} rows, date index)"
+
+
+class _CodeIn(_PlanNode):
+    indexed = True
+
+    def __init__(self, index: SearchIndex, field: str, value: str):
+        self.index, self.field, self.value = index, field, value
+        self.codes = index.codes_matching(field, value)
+
+    def estimate(self) -> int:
+        counts = self.index.columns.column(self.field).counts
+        return sum(counts[code] for code in self.codes)
+
+    def rows(self) -> Set[int]:
+        rows: Set[int] = set()
+        for code in self.codes:
+            rows.update(self.index.postings(self.field, code))
+        return rows
+
+    def test(self) -> Callable[[int], bool]:
+        codes, wanted = self.index.columns.column(self.field).codes, set(self.codes)
+        return lambda row: codes[row] in wanted
+
+    def describe(self) -> str:
+        return f"{self.field} = {self.value!r} (~{self.estimate()} rows, {self.field} codes)"
+
+
+class _Tags(_PlanNode):
+    """Rows from the tag bitmaps; tag terms under one AND or OR are combined into one bitmap."""
+    indexed = True
+
+    def __init__(self, index: SearchIndex, bitmap: RowBitmap, label: str):
+        self.index, self.bitmap, self.label = index, bitmap, label
+
+    @classmethod
+    def for_tag(cls, index: SearchIndex, tag: str) -> '_Tags':
+        tags = index.columns.tags
+        return cls(index, tags.any_of(tags.matching(tag)), f"tag {tag!r}")
+
+    @classmethod
+    def combine(cls, nodes: List['_Tags'], both: bool) -> '_Tags':
+        bitmap = nodes[0].bitmap
+        for node in nodes[1:]:
+            bitmap = bitmap & node.bitmap if both else bitmap | node.bitmap
+        return cls(nodes[0].index, bitmap, (" and " if both else " or ").join(node.label for node in nodes))
+
+    def estimate(self) -> int:
+        return len(self.bitmap)
+
+    def rows(self) -> Set[int]:
+        return set(self.bitmap)
+
+    def test(self) -> Callable[[int], bool]:
+        return self.bitmap.__contains__
+
+    def describe(self) -> str:
+        return f"{self.label} (~{self.estimate()} rows, tag bitmaps)"
+
+
+class _DescriptionContains(_PlanNode):
+    indexed = True
+
+    def __init__(self, index: SearchIndex, text: str):
+        self.index, self.text = index, text
+        self._descriptions: Optional[List[str]] = None
+
+    def _matching(self) -> List[str]:
+        """Distinct descriptions containing the text; counting their rows needs no row-level work."""
+        if self._descriptions is None:
+            self._descriptions = self.index.description_index.descriptions_containing(self.text)
+        return self._descriptions
+
+    def estimate(self) -> int:
+        rows_by_description = self.index.description_index.rows_by_description
+        return sum(len(rows_by_description[description]) for description in self._matching())
+
+    def rows(self) -> Set[int]:
+        rows_by_description = self.index.description_index.rows_by_description
+        rows: Set[int] = set()
+        for description in self._matching():
+            rows.update(rows_by_description[description])
+        return rows
+
+    def test(self) -> Callable[[int], bool]:
+        transactions, matching = self.index.columns.transactions, set(self._matching())
+        return lambda row: transactions[row].description.upper() in matching
+
+    def describe(self) -> str:
+        return f"description contains {self.text!r} (~{self.estimate()} rows, text postings)"
+
+
+class _AmountRange(_PlanNode):
+    def __init__(self, index: SearchIndex, low: Optional[Decimal], high: Optional[Decimal], low_open: bool, high_open: bool):
+        self.index, self.low, self.high, self.low_open, self.high_open = index, low, high, low_open, high_open
+
+    def test(self) -> Callable[[int], bool]:
+        columns = self.index.columns
+        amounts, currency_codes = columns.amount_minor, columns.currency.codes
+        # Bounds in each currency's minor units, exclusive bounds made inclusive
+        bounds = {}
+        for code, currency in enumerate(columns.currency.values):
+            low = None if self.low is None else to_minor_units(self.low, currency) + (1 if self.low_open else 0)
+            high = None if self.high is None else to_minor_units(self.high, currency) - (1 if self.high_open else 0)
+            bounds[code] = (low, high)
+
+        def matches(row: int) -> bool:
+            low, high = bounds[currency_codes[row]]
+            amount = amounts[row]
+            return (low is None or amount >= low) and (high is None or amount <= high)
+        return matches
+
+    def describe(self) -> str:
+        low = "" if self.low is None else f"{'>' if self.low_open else '>='} {self.low}"
+        high = "" if self.high is None else f"{'<' if self.high_open else '<='} {self.high}"
+        return f"amount {' and '.join(part for part in (low, high) if part)} (checked per row)"
+
+
+class _And(_PlanNode):
+    def __init__(self, children: List[_PlanNode]):
+        # date>=X date<Y is one range, looked up with one pair of bisections
+        ranges = [child for child in children if isinstance(child, _DayRange)]
+        if len(ranges) > 1:
+            merged = _DayRange(ranges[0].index, max(r.first for r in ranges), min(r.last for r in ranges))
+            children = [merged] + [child for child in children if not isinstance(child, _DayRange)]
+        # tag:a tag:b is one bitmap AND
+        tags = [child for child in children if isinstance(child, _Tags)]
+        if len(tags) > 1:
+            children = [_Tags.combine(tags, both=True)] + [child for child in children if not isinstance(child, _Tags)]
+        self.children = children
+        self.indexed = any(child.indexed for child in children)
+
+    def _plan(self) -> Tuple[Optional[_PlanNode], List[_PlanNode], List[_PlanNode]]:
+        """(driving index, indexes to intersect, conditions to check per row), most selective first."""
+        indexed = sorted((child for child in self.children if child.indexed), key=lambda child: child.estimate())
+        if not indexed:
+            return None, [], self.children
+        driver = indexed[0]
+        limit = INTERSECT_RATIO * driver.estimate()
+        intersect = [child for child in indexed[1:] if child.estimate() <= limit]
+        residual = [child for child in indexed[1:] if child.estimate() > limit]
+        residual.extend(child for child in self.children if not child.indexed)
+        return driver, intersect, residual
+
+    def estimate(self) -> int:
+        return min((child.estimate() for child in self.children if child.indexed), default=0)
+
+    def rows(self) -> Set[int]:
+        driver, intersect, residual = self._plan()
+        rows = driver.rows()
+        for child in intersect:
+            if not rows:
+                break
+            rows &= child.rows()
+        tests = [child.test() for child in residual]
+        if tests:
+            rows = {row for row in rows if all(test(row) for test in tests)}
+        return rows
+
+    def test(self) -> Callable[[int], bool]:
+        tests = [child.test() for child in self.children]
+        return lambda row: all(test(row) for test in tests)
+
+    def describe(self) -> str:
+        return "all of"
+
+    def explain(self, depth: int = 0) -> List[str]:
+        driver, intersect, residual = self._plan()
+        lines = [f"{'  ' * depth}all of:"]
+        for role, children in (("use", [driver] if driver else []), ("intersect", intersect), ("filter", residual)):
+            for child in children:
+                child_lines = child.explain(depth + 1)
+                child_lines[0] = f"{'  ' * (depth + 1)}{role}: {child_lines[0].strip()}"
+                lines.extend(child_lines)
+        return lines
+
+
+class _Or(_PlanNode):
+    def __init__(self, children: List[_PlanNode]):
+        tags = [child for child in children if isinstance(child, _Tags)]
+        if len(tags) > 1:
+            children = [_Tags.combine(tags, both=False)] + [child for child in children if not isinstance(child, _Tags)]
+        self.children = children
+        self.indexed = all(child.indexed for child in children)
+
+    def estimate(self) -> int:
+        return sum(child.estimate() for child in self.children)
+
+    def rows(self) -> Set[int]:
+        rows: Set[int] = set()
+        for child in self.children:
+            rows |= child.rows()
+        return rows
+
+    def test(self) -> Callable[[int], bool]:
+        tests = [child.test() for child in self.children]
+        return lambda row: any(test(row) for test in tests)
+
+    def describe(self) -> str:
+        return "any of"
+
+    def explain(self, depth: int = 0) -> List[str]:
+        lines = [f"{'  ' * depth}{self.describe()}:"]
+        for child in self.children:
+            lines.extend(child.explain(depth + 1))
+        return lines
+
+
+class _Not(_PlanNode):
+    def __init__(self, child: _PlanNode):
+        self.child = child
+
+    def test(self) -> Callable[[int], bool]:
+        test = self.child.test()
+        return lambda row: not test(row)
+
+    def describe(self) -> str:
+        return "not (checked per row)"
+
+    def explain(self, depth: int = 0) -> List[str]:
+        return [f"{'  ' * depth}{self.describe()}:"] + self.child.explain(depth + 1)
+
+
+def _period(value: str) -> Tuple[int, int]:
+    """First and last day ordinal of YYYY, YYYY-MM or YYYY-MM-DD."""
+    try:
+        parts = [int(part) for part in value.split("-")]
+        if len(parts) == 1:
+            return date(parts[0], 1, 1).toordinal(), date(parts[0], 12, 31).toordinal()
+        if len(parts) == 2:
+            year, month = parts
+            return date(year, month, 1).toordinal(), date(year + month // 12, month % 12 + 1, 1).toordinal() - 1
+        if len(parts) == 3:
+            day = date(*parts).toordinal()
+            return day, day
+    except ValueError:
+        pass
+    raise QueryError(f"'{value}' is not a date. Use YYYY, YYYY-MM or YYYY-MM-DD")
+
+
+def _amount(value: str) -> Decimal:
+    try:
+        return Decimal(value.lstrip("$"))
+    except InvalidOperation:
+        raise QueryError(f"'{value}' is not an amount") from None
+
+
+def _compile_term(term: Term, index: SearchIndex) -> _PlanNode:
+    if term.field == "description":
+        return _DescriptionContains(index, term.value)
+    if term.field == "tag":
+        return _Tags.for_tag(index, term.value)
+    if term.field in CODED_FIELDS:
+        return _CodeIn(index, term.field, term.value)
+    low_text, separator, high_text = term.value.partition("..")
+    if term.field == "date":
+        earliest, latest = 1, date.max.toordinal()
+        if separator:
+            if term.op not in (":", "="):
+                raise QueryError("Use date:FROM..TO for a range")
+            return _DayRange(index, _period(low_text)[0] if low_text else earliest,
+                             _period(high_text)[1] if high_text else latest)
+        first, last = _period(term.value)
+        bounds = {":": (first, last), "=": (first, last), ">": (last + 1, latest), ">=": (first, latest),
+                  "<": (earliest, first - 1), "<=": (earliest, last)}
+        return _DayRange(index, *bounds[term.op])
+    if separator:
+        if term.op not in (":", "="):
+            raise QueryError("Use amount:FROM..TO for a range")
+        return _AmountRange(index, _amount(low_text) if low_text else None,
+                            _amount(high_text) if high_text else None, False, False)
+    amount = _amount(term.value)
+    return _AmountRange(index, amount if term.op in (":", "=", ">", ">=") else None,
+                        amount if term.op in (":", "=", "<", "<=") else None,
+                        term.op == ">", term.op == "<")
+
+
+def _compile(node: Node, index: SearchIndex) -> _PlanNode:
+    if isinstance(node, Term):
+        return _compile_term(node, index)
+    if isinstance(node, And):
+        return _And([_compile(child, index) for child in node.children])
+    if isinstance(node, Or):
+        return _Or([_compile(child, index) for child in node.children])
+    return _Not(_compile(node.child, index))
+
+
+def _names_reserved(node: Node) -> bool:
+    """Whether the query asks for IGNORED or SPLIT rows by category."""
+    if isinstance(node, Term):
+        return node.field == "category" and node.value.upper() in RESERVED_CATEGORIES
+    if isinstance(node, Not):
+        return _names_reserved(node.child)
+    return any(_names_reserved(child) for child in node.children)
+
+
+@dataclass
+class SearchResult:
+    # Row ids of the returned page, in the requested order
+    rows: List[int]
+    # Rows matching the query in total
+    total: int
+
+
+class QueryPlan:
+    """A query compiled against a `SearchIndex`.
+
+    AND picks its most selective indexed condition (by O(1)/O(log n) estimates)
+    to produce candidate rows, intersects other indexes that are of similar size,
+    and checks the rest against the candidates' columns; OR of indexed conditions
+    is a union of their rows. A query with no usable index scans the searchable
+    rows once. Results are ordered with a bounded heap when only the first N are
+    wanted, so a large match set is never fully sorted for one page.
+    """
+
+    def __init__(self, query: str, index: SearchIndex):
+        self.query = query
+        self.index = index
+        self.tree = parse_query(query)
+        self.root = _compile(self.tree, index)
+        self.include_reserved = _names_reserved(self.tree)
+
+    def explain(self) -> List[str]:
+        lines = self.root.explain()
+        if not self.root.indexed:
+            lines.insert(0, f"scan {len(self.index.base_rows)} rows:")
+        return lines
+
+    def matching_rows(self) -> Iterable[int]:
+        if self.root.indexed:
+            rows: Iterable[int] = self.root.rows()
+        else:
+            test = self.root.test()
+            universe = range(len(self.index)) if self.include_reserved else self.index.base_rows
+            return [row for row in universe if test(row)]
+        if not self.include_reserved:
+            category_codes = self.index.columns.category.codes
+            reserved = self.index.columns.reserved_category_codes()
+            rows = [row for row in rows if category_codes[row] not in reserved]
+        return rows
+
+    def execute(self, sort: str = "date", descending: bool = True,
+                limit: Optional[int] = None, offset: int = 0) -> SearchResult:
+        """The matching rows ordered by `sort` (ties by row id), optionally one page of them."""
+        if sort not in SORT_KEYS:
+            raise QueryError(f"Cannot sort by '{sort}'. Use one of: {', '.join(SORT_KEYS)}")
+        rows = list(self.matching_rows())
+        columns = self.index.columns
+        if sort == "date":
+            days = columns.day
+            key = lambda row: (days[row], row)
+        elif sort == "amount":
+            amounts = columns.amount_minor
+            key = lambda row: (amounts[row], row)
+        else:
+            transactions = columns.transactions
+            key = lambda row: (transactions[row].description.upper(), row)
+        wanted = None if limit is None else offset + limit
+        if wanted is not None and wanted < len(rows):
+            ordered = (heapq.nlargest if descending else heapq.nsmallest)(wanted, rows, key=key)
+        else:
+            ordered = sorted(rows, key=key, reverse=descending)
+        page = ordered[offset:] if limit is None else ordered[offset:offset + limit]
+        logger.info(f"Query {self.query!r} matched {len(rows)} rows")
+        return SearchResult(page, len(rows))
@@ -0,0 +1,168 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file keeps one compressed bitmap of row ids per tag for multi-tag lookups
+# License: MIT
+
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+from .transaction import split_tags
+
+# Row ids are split into chunks of 2**CHUNK_BITS rows; only chunks holding a row are stored
+CHUNK_BITS = 16
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+# Chunks with fewer set bits than this are walked bit by bit rather than through their bit string
+SPARSE_CHUNK_BITS = 512
+
+
+class RowBitmap:
+    """A set of row ids as chunked bitmaps.
+
+    Each 65536-row chunk that holds a row is one Python int used as a bit set, so
+    a tag on a few rows costs a few small ints, a tag on most rows costs one bit
+    per row, and AND/OR/difference run chunk by chunk in C (`&`, `|`, `& ~`)
+    instead of row by row. Empty chunks are never stored.
+    """
+
+    __slots__ = ("chunks",)
+
+    def __init__(self, chunks: Optional[Dict[int, int]] = None):
+        self.chunks: Dict[int, int] = chunks or {}
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[int]) -> 'RowBitmap':
+        """Build from row ids, setting bits in per-chunk byte buffers rather than growing ints."""
+        buffers: Dict[int, bytearray] = {}
+        for row in rows:
+            chunk = row >> CHUNK_BITS
+            buffer = buffers.get(chunk)
+            if buffer is None:
+                buffer = buffers[chunk] = bytearray(1 << (CHUNK_BITS - 3))
+            offset = row & CHUNK_MASK
+            buffer[offset >> 3] |= 1 << (offset & 7)
+        return cls({chunk: int.from_bytes(buffer, "little") for chunk, buffer in buffers.items()})
+
+    def add(self, row: int):
+        chunk = row >> CHUNK_BITS
+        self.chunks[chunk] = self.chunks.get(chunk, 0) | (1 << (row & CHUNK_MASK))
+
+    def discard(self, row: int):
+        chunk = row >> CHUNK_BITS
+        bits = self.chunks.get(chunk, 0) & ~(1 << (row & CHUNK_MASK))
+        if bits:
+            self.chunks[chunk] = bits
+        else:
+            self.chunks.pop(chunk, None)
+
+    def __contains__(self, row: int) -> bool:
+        return bool((self.chunks.get(row >> CHUNK_BITS, 0) >> (row & CHUNK_MASK)) & 1)
+
+    def __len__(self) -> int:
+        return sum(bits.bit_count() for bits in self.chunks.values())
+
+    def __bool__(self) -> bool:
+        return bool(self.chunks)
+
+    def __iter__(self) -> Iterator[int]:
+        """Row ids in ascending order."""
+        for chunk in sorted(self.chunks):
+            base, bits = chunk << CHUNK_BITS, self.chunks[chunk]
+            if bits.bit_count() < SPARSE_CHUNK_BITS:
+                while bits:
+                    low = bits & -bits
+                    yield base + low.bit_length() - 1
+                    bits ^= low
+            else:
+                # Least significant bit first
+                yield from (base + offset for offset, bit in enumerate(bin(bits)[:1:-1]) if bit == "1")
+
+    def __and__(self, other: 'RowBitmap') -> 'RowBitmap':
+        small, large = (self.chunks, other.chunks) if len(self.chunks) <= len(other.chunks) else (other.chunks, self.chunks)
+        result = {}
+        for chunk, bits in small.items():
+            both = bits & large.get(chunk, 0)
+            if both:
+                result[chunk] = both
+        return RowBitmap(result)
+
+    def __or__(self, other: 'RowBitmap') -> 'RowBitmap':
+        result = dict(self.chunks)
+        for chunk, bits in other.chunks.items():
+            result[chunk] = result.get(chunk, 0) | bits
+        return RowBitmap(result)
+
+    def __sub__(self, other: 'RowBitmap') -> 'RowBitmap':
+        result = {}
+        for chunk, bits in self.chunks.items():
+            left = bits & ~other.chunks.get(chunk, 0)
+            if left:
+                result[chunk] = left
+        return RowBitmap(result)
+
+    def copy(self) -> 'RowBitmap':
+        return RowBitmap(dict(self.chunks))
+
+
+class TagBitmaps:
+    """A `RowBitmap` per tag over the row ids of a transaction table.
+
+    Built in one pass from the Tag column's codes (each distinct stored value is
+    split into its tags once), then kept up to date row by row as transactions
+    are appended or edited, so tag reports and tag searches never rescan rows.
+    """
+
+    def __init__(self):
+        self.bitmaps: Dict[str, RowBitmap] = {}
+
+    @classmethod
+    def build(cls, values: Sequence[str], codes: Iterable[int]) -> 'TagBitmaps':
+        """Index a dictionary-encoded Tag column: `values` by code and each row's code."""
+        tags_by_code = [split_tags(value) for value in values]
+        rows_by_tag: Dict[str, List[int]] = defaultdict(list)
+        for row, code in enumerate(codes):
+            for tag in tags_by_code[code]:
+                rows_by_tag[tag].append(row)
+        index = cls()
+        index.bitmaps = {tag: RowBitmap.from_rows(rows) for tag, rows in rows_by_tag.items()}
+        return index
+
+    def add(self, row: int, value: str):
+        """Index a new row's stored Tag value."""
+        for tag in split_tags(value):
+            self.bitmaps.setdefault(tag, RowBitmap()).add(row)
+
+    def update(self, row: int, old_value: str, new_value: str):
+        """Move a row from the tags of its old Tag value to those of its new one."""
+        if old_value == new_value:
+            return
+        old_tags, new_tags = set(split_tags(old_value)), set(split_tags(new_value))
+        for tag in old_tags - new_tags:
+            bitmap = self.bitmaps[tag]
+            bitmap.discard(row)
+            if not bitmap:
+                del self.bitmaps[tag]
+        for tag in new_tags - old_tags:
+            self.bitmaps.setdefault(tag, RowBitmap()).add(row)
+
+    def tags(self) -> List[str]:
+        return sorted(self.bitmaps)
+
+    def rows_with(self, tag: str) -> RowBitmap:
+        """Rows carrying the tag exactly (an empty bitmap for an unknown tag)."""
+        return self.bitmaps.get(tag) or RowBitmap()
+
+    def matching(self, tag: str) -> List[str]:
+        """Tags equal to `tag` ignoring case."""
+        wanted = tag.upper()
+        return [known for known in self.bitmaps if known.upper() == wanted]
+
+    def any_of(self, tags: Iterable[str]) -> RowBitmap:
+        result = RowBitmap()
+        for tag in tags:
+            result = result | self.rows_with(tag)
+        return result
+
+    def all_of(self, tags: Iterable[str]) -> RowBitmap:
+        result = None
+        for tag in tags:
+            result = self.rows_with(tag) if result is None else result & self.rows_with(tag)
+        return result if result is not None else RowBitmap()
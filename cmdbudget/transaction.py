@@ -2,18 +2,52 @@
 # This file defines the transaction data models
 # License: MIT
 
-from dataclasses import dataclass
+import sys
+from dataclasses import dataclass, field
 from datetime import datetime
 from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Dict, Iterable, Tuple
 import logging
+import re
+from .currency_utils import to_minor_units, from_minor_units
+from .config import TAG_DELIMITER
 
 # Assuming utils might be needed later, keep commented or remove if not
 # from .utils import parse_date_multi_format
 
 logger = logging.getLogger(__name__)
 
+def intern_field(value: str) -> str:
+    """Intern a low-cardinality string field (category, currency, tag, ...) so rows share one copy."""
+    return sys.intern(value) if value else ""
+
+@lru_cache(maxsize=4096)
+def split_tags(value: str) -> Tuple[str, ...]:
+    """The tags in a stored Tag value (none for an empty value). Cached: histories reuse few values."""
+    return tuple(tag for tag in (part.strip() for part in value.split(TAG_DELIMITER)) if tag)
+
+def join_tags(tags: Iterable[str]) -> str:
+    """The stored Tag value for some tags, without blanks or repeats, in the order given."""
+    return TAG_DELIMITER.join(dict.fromkeys(tag.strip() for tag in tags if tag.strip()))
+
+def parse_tags(text: str) -> str:
+    """The stored Tag value for tags typed by the user, separated by commas or semicolons."""
+    return join_tags(re.split(r"[,;]", text))
+
+def dedupe_key(date: datetime, description: str, amount_minor: int) -> Tuple:
+    """Key used for duplicate detection: day, normalized description and absolute minor amount."""
+    # Use absolute amount to detect duplicates regardless of sign convention
+    return (date.date(), description.strip().lower(), abs(amount_minor))
+
 class BaseTransaction(ABC):
-    """Abstract base class for all transactions."""
+    """Abstract base class for all transactions.
+
+    Subclasses are slotted dataclasses that precompute `_fingerprint`, the hash
+    of `dedupe_key`, at construction. Hashing is then a slot read, and equality
+    only normalizes descriptions when the fingerprints already match.
+    """
+    __slots__ = ()
     
     @property
     @abstractmethod
@@ -27,44 +61,60 @@ class BaseTransaction(ABC):
 
     @property
     @abstractmethod
-    def amount(self) -> float:
+    def amount_minor(self) -> int:
+        """Amount in integer minor units of the currency (e.g. cents)."""
         pass
 
+    @property
+    def amount(self) -> float:
+        """Amount in major units, derived from amount_minor and the subclass's currency (for display)."""
+        return from_minor_units(self.amount_minor, self.currency)
+
+    @property
+    def fingerprint(self) -> int:
+        """Precomputed duplicate-detection fingerprint (hash of date, description, absolute amount)."""
+        return self._fingerprint
+
+    def dedupe_key(self) -> Tuple:
+        """The full duplicate-detection key this transaction's fingerprint was computed from."""
+        return dedupe_key(self.date, self.description, self.amount_minor)
+
     def __hash__(self):
         """Consistent hashing logic for all transaction types.
 
-        Hashing uses date, description (stripped), and the *absolute* amount rounded to 2 decimal places.
+        Hashing uses date, description (stripped), and the *absolute* amount in minor units.
         """
-        # Use absolute amount for hashing to detect duplicates regardless of sign convention
-        rounded_abs_amount = round(abs(self.amount), 2)
-        return hash((
-            self.date.date(),
-            self.description.strip().lower(),
-            rounded_abs_amount # Hash based on absolute value
-        ))
+        return self._fingerprint
 
     def __eq__(self, other):
         """Consistent equality checking for all transaction types.
 
-        Equality uses date, description (stripped), and the *absolute* amount rounded to 2 decimal places.
+        Equality uses date, description (stripped), and the *absolute* amount in minor units.
         """
         if not isinstance(other, BaseTransaction):
             return False
-        # Compare absolute rounded amounts for equality check
-        return (
-            self.date.date() == other.date.date() and
-            self.description.strip().lower() == other.description.strip().lower() and
-            round(abs(self.amount), 2) == round(abs(other.amount), 2) # Compare absolute values
-        )
+        if self._fingerprint != other._fingerprint:
+            return False
+        # Fingerprints match: confirm on the full key to rule out hash collisions
+        return self.dedupe_key() == other.dedupe_key()
+
+# Field names of import rows are shared between all RawTransactions from the same file
+_shared_field_names: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class RawTransaction(BaseTransaction):
     """Represents a transaction from an external source before categorization."""
     _date: datetime
     _description: str
-    _amount: float # Stores the amount with sign based on config (positive for expense)
+    _amount_minor: int # Integer minor units with sign based on config (positive for expense)
     _currency: str # Store the detected currency
-    _raw_data: dict # Optional: store original row data
+    _raw_fields: Tuple[str, ...] = () # Original row column names (shared across rows)
+    _raw_values: Tuple[str, ...] = () # Original row values
+    _fingerprint: int = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self._currency = intern_field(self._currency)
+        self._fingerprint = hash(dedupe_key(self._date, self._description, self._amount_minor))
 
     @property
     def date(self) -> datetime:
@@ -75,106 +125,58 @@ class RawTransaction(BaseTransaction):
         return self._description
 
     @property
-    def amount(self) -> float:
-        return self._amount
+    def amount_minor(self) -> int:
+        return self._amount_minor
 
     @property
     def currency(self) -> str:
         return self._currency
 
-    @classmethod
-    def from_row(cls, row: dict, config: dict, date_parser) -> 'RawTransaction':
-        """Create a RawTransaction from a CSV row using configuration.
-
-        Assumes 'config' is the dictionary from the 'import_csv_structure' section.
-        Parses amount based on config['expenses_are_positive'] flag.
-        Stores amount sign consistently (positive = expense).
-        Raises ValueError if date or amount parsing fails.
-        Raises KeyError if required columns are missing.
-        """
-        try:
-            # Extract config flags first for clarity
-            expenses_positive = config.get('expenses_are_positive', True) # Default true
-            date_col = config['date_column']
-            desc_col_key = 'description_column' # Key name
-            currency_columns = config.get('currency_columns', {'CAD': 'CAD$'})
-            currency_priority = config.get('currency_priority', ['CAD'])
-            default_currency = config.get('default_currency', 'CAD')
-
-            date_val = date_parser(row[date_col])
-            
-            # --- Handle Description Column(s) ---
-            desc_config = config[desc_col_key] # Get the config value (str or list)
-            if isinstance(desc_config, list):
-                desc_parts = [row.get(col_name, '').strip() for col_name in desc_config]
-                desc_val = ' '.join(part for part in desc_parts if part)
-            elif isinstance(desc_config, str):
-                desc_val = row.get(desc_config, '').strip()
-            else:
-                logger.error(f"Configuration error: '{desc_col_key}' must be a string or a list, got {type(desc_config)}")
-                raise TypeError(f"Configuration error: '{desc_col_key}' must be a string or a list, got {type(desc_config)}")
-
-            # --- Handle Currency and Amount ---
-            detected_currency = None
-            amount_val = 0.0
-
-            # Try each currency in priority order
-            for currency in currency_priority:
-                if currency not in currency_columns:
-                    logger.warning(f"Currency '{currency}' in priority list not found in currency_columns. Skipping.")
-                    continue
-
-                amount_col = currency_columns[currency]
-                amount_str = str(row.get(amount_col, '0.0')).replace('$', '').replace(',', '').strip()
-
-                if amount_str and amount_str != '0.0':
-                    try:
-                        raw_amount_val = float(amount_str)
-                        if raw_amount_val != 0.0:
-                            detected_currency = currency
-                            amount_val = raw_amount_val
-                            break
-                    except ValueError:
-                        logger.warning(f"Could not convert amount '{amount_str}' to float for currency '{currency}'. Trying next currency.")
-
-            # If no currency was detected, use default
-            if detected_currency is None:
-                detected_currency = default_currency
-                logger.info(f"No valid amount found in any currency column. Using default currency: {default_currency}")
-
-            # Adjust sign based on config
-            if not expenses_positive:
-                amount_val = -amount_val
+    @property
+    def raw_data(self) -> dict:
+        """The original import row as a dictionary."""
+        return dict(zip(self._raw_fields, self._raw_values))
 
-        except KeyError as e:
-            logger.error(f"Missing column '{e}' needed for RawTransaction creation in row: {row}")
-            raise
-        except ValueError as e:
-            logger.error(f"Value error parsing data for RawTransaction in row: {row} - {e}")
-            raise
-        except Exception as e:
-            logger.error(f"Unexpected error during RawTransaction.from_row: {e}", exc_info=True)
-            raise
+    @classmethod
+    def from_values(cls, row: dict, date_val: datetime, description: str, amount_minor: int, currency: str) -> 'RawTransaction':
+        """Create a RawTransaction from already decoded values, keeping `row` as its raw data.
 
+        Import rows are decoded by `import_profiles.RowDecoder`, which calls this.
+        """
+        field_names = tuple(row.keys())
         return cls(
             _date=date_val,
-            _description=desc_val,
-            _amount=amount_val,
-            _currency=detected_currency,
-            _raw_data=row
+            _description=description,
+            _amount_minor=amount_minor,
+            _currency=currency,
+            _raw_fields=_shared_field_names.setdefault(field_names, field_names),
+            _raw_values=tuple(row.values())
         )
 
-@dataclass(eq=False) # Use BaseTransaction __eq__ and __hash__
+@dataclass(eq=False, slots=True) # Use BaseTransaction __eq__ and __hash__
 class Transaction(BaseTransaction):
-    """Represents a fully processed transaction with category and other metadata."""
+    """Represents a fully processed transaction with category and other metadata.
+
+    Slotted (no per-instance __dict__); currency, category, subcategory, tag and
+    merchant are interned because they repeat across many rows.
+    """
     _date: datetime
     _description: str
-    _amount: float # Stores amount with sign (positive=expense)
+    _amount_minor: int # Integer minor units with sign (positive=expense)
     currency: str
     category: str
     subcategory: str
     tag: str
     merchant: str
+    _fingerprint: int = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.currency = intern_field(self.currency)
+        self.category = intern_field(self.category)
+        self.subcategory = intern_field(self.subcategory)
+        self.tag = intern_field(self.tag)
+        self.merchant = intern_field(self.merchant)
+        self._fingerprint = hash(dedupe_key(self._date, self._description, self._amount_minor))
 
     @property
     def date(self) -> datetime:
@@ -185,8 +187,13 @@ class Transaction(BaseTransaction):
         return self._description
 
     @property
-    def amount(self) -> float:
-        return self._amount
+    def amount_minor(self) -> int:
+        return self._amount_minor
+
+    @property
+    def tags(self) -> Tuple[str, ...]:
+        """The individual tags stored in `tag`."""
+        return split_tags(self.tag)
 
     @classmethod
     def from_raw(cls, raw: RawTransaction, category: str,
@@ -195,7 +202,7 @@ class Transaction(BaseTransaction):
         return cls(
             raw.date,
             raw.description,
-            raw.amount,
+            raw.amount_minor,
             raw.currency, # Use the detected currency from RawTransaction
             category,
             subcategory,
@@ -212,13 +219,14 @@ class Transaction(BaseTransaction):
         """
         try:
             date_val = date_parser(row["Transaction Date"])
-            amount_val = float(row["Amount"])
             currency_val = row.get("Currency", "CAD") # Default to CAD if not present
+            # Parse the stored decimal string exactly into minor units
+            amount_val = to_minor_units(row["Amount"], currency_val)
 
             return cls(
                 _date=date_val,
                 _description=row["Description"],
-                _amount=amount_val,
+                _amount_minor=amount_val,
                 currency=currency_val,
                 category=row["Category"],
                 subcategory=row["Subcategory"],
@@ -0,0 +1,220 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file provides a dictionary-encoded columnar view of transactions
+# License: MIT
+
+from array import array
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .currency_utils import get_decimal_places
+from .tag_bitmaps import TagBitmaps
+
+# Categories that are stored but excluded from reports
+RESERVED_CATEGORIES = ("IGNORED", "SPLIT")
+
+
+class CategoricalColumn:
+    """A string column stored as small integer codes.
+
+    Keeps the value -> code dictionary, the code -> value list and a row count per
+    code, so membership and "is this value used" questions are O(1) and grouping
+    can key on integers instead of strings.
+    """
+
+    def __init__(self):
+        self.values: List[str] = []
+        self.codes_by_value: Dict[str, int] = {}
+        self.counts: List[int] = []
+        self.codes = array('i')
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def encode(self, value: str) -> int:
+        """Return the code for a value, assigning a new one if it has not been seen."""
+        value = value or ""
+        code = self.codes_by_value.get(value)
+        if code is None:
+            code = len(self.values)
+            self.codes_by_value[value] = code
+            self.values.append(value)
+            self.counts.append(0)
+        return code
+
+    def code_of(self, value: str) -> Optional[int]:
+        """Return the code for a value, or None if no row has ever used it."""
+        return self.codes_by_value.get(value or "")
+
+    def decode(self, code: int) -> str:
+        return self.values[code]
+
+    def append(self, value: str) -> int:
+        """Append a row and return its code."""
+        code = self.encode(value)
+        self.codes.append(code)
+        self.counts[code] += 1
+        return code
+
+    def set(self, row: int, value: str):
+        """Change the value of an existing row, keeping counts in step."""
+        old_code = self.codes[row]
+        new_code = self.encode(value)
+        if old_code != new_code:
+            self.counts[old_code] -= 1
+            self.counts[new_code] += 1
+            self.codes[row] = new_code
+
+    def count(self, value: str) -> int:
+        """Number of rows holding a value (O(1))."""
+        code = self.code_of(value)
+        return self.counts[code] if code is not None else 0
+
+    def present_values(self) -> List[str]:
+        """Values used by at least one row."""
+        return [value for value, count in zip(self.values, self.counts) if count > 0]
+
+
+class TransactionColumns:
+    """Columnar view of a transaction list.
+
+    Row ids are positions in `transactions`. Amounts are kept as integer minor
+    units and dates as day ordinals in flat arrays; category, subcategory, tag,
+    currency and merchant are dictionary-encoded `CategoricalColumn`s. `tags`
+    holds a row bitmap per individual tag (a Tag value can hold several).
+    """
+
+    CATEGORICAL_FIELDS = ("category", "subcategory", "tag", "currency", "merchant")
+
+    def __init__(self, transactions: Iterable = ()):
+        self.transactions: List = []
+        self.amount_minor = array('q')
+        self.day = array('i')
+        self.category = CategoricalColumn()
+        self.subcategory = CategoricalColumn()
+        self.tag = CategoricalColumn()
+        self.currency = CategoricalColumn()
+        self.merchant = CategoricalColumn()
+        for transaction in transactions:
+            self._append_row(transaction)
+        # Built from the tag codes in one pass; append and update then keep it current
+        self.tags = TagBitmaps.build(self.tag.values, self.tag.codes)
+
+    def __len__(self) -> int:
+        return len(self.transactions)
+
+    def column(self, name: str) -> CategoricalColumn:
+        """Return a categorical column by field name."""
+        if name not in self.CATEGORICAL_FIELDS:
+            raise KeyError(f"Unknown categorical column: {name}")
+        return getattr(self, name)
+
+    def append(self, transaction) -> int:
+        """Add a transaction and return its row id."""
+        row = self._append_row(transaction)
+        self.tags.add(row, transaction.tag)
+        return row
+
+    def _append_row(self, transaction) -> int:
+        row = len(self.transactions)
+        self.transactions.append(transaction)
+        self.amount_minor.append(transaction.amount_minor)
+        self.day.append(transaction.date.toordinal())
+        self.category.append(transaction.category)
+        self.subcategory.append(transaction.subcategory)
+        self.tag.append(transaction.tag)
+        self.currency.append(transaction.currency.upper())
+        self.merchant.append(transaction.merchant)
+        return row
+
+    def update(self, row: int, transaction):
+        """Replace the transaction at a row id, re-encoding its columns."""
+        self.tags.update(row, self.transactions[row].tag, transaction.tag)
+        self.transactions[row] = transaction
+        self.amount_minor[row] = transaction.amount_minor
+        self.day[row] = transaction.date.toordinal()
+        self.category.set(row, transaction.category)
+        self.subcategory.set(row, transaction.subcategory)
+        self.tag.set(row, transaction.tag)
+        self.currency.set(row, transaction.currency.upper())
+        self.merchant.set(row, transaction.merchant)
+
+    def reserved_category_codes(self) -> set:
+        """Codes of the IGNORED/SPLIT categories that exist in this table."""
+        return {code for code in map(self.category.code_of, RESERVED_CATEGORIES) if code is not None}
+
+    def reportable_rows(self) -> List[int]:
+        """Row ids of transactions that count towards reports (not IGNORED or SPLIT)."""
+        excluded = self.reserved_category_codes()
+        if not excluded:
+            return list(range(len(self.transactions)))
+        return [row for row, code in enumerate(self.category.codes) if code not in excluded]
+
+    def rows_with(self, name: str, value: str, rows: Optional[Sequence[int]] = None) -> List[int]:
+        """Row ids (optionally within `rows`) whose categorical column equals value."""
+        column = self.column(name)
+        code = column.code_of(value)
+        if code is None:
+            return []
+        codes = column.codes
+        candidates = range(len(codes)) if rows is None else rows
+        return [row for row in candidates if codes[row] == code]
+
+    def rows_with_tag(self, tag: str, rows: Optional[Iterable[int]] = None) -> List[int]:
+        """Row ids (optionally within `rows`) carrying the tag among their tags, from its bitmap."""
+        bitmap = self.tags.rows_with(tag)
+        if rows is None:
+            return list(bitmap)
+        return [row for row in rows if row in bitmap]
+
+    def group_sum(self, key_names: Tuple[str, ...], rows: Iterable[int]) -> Dict[Tuple[int, ...], int]:
+        """Sum amount_minor over rows, grouped by the codes of the named columns."""
+        code_arrays = [self.column(name).codes for name in key_names]
+        amounts = self.amount_minor
+        totals: Dict[Tuple[int, ...], int] = defaultdict(int)
+        if len(code_arrays) == 1:
+            codes = code_arrays[0]
+            for row in rows:
+                totals[(codes[row],)] += amounts[row]
+        else:
+            for row in rows:
+                totals[tuple(codes[row] for codes in code_arrays)] += amounts[row]
+        return totals
+
+    def currency_amount_bounds(self, rows: Iterable[int]) -> Dict[str, int]:
+        """Sum of absolute amounts per currency over rows: no subset total can exceed it."""
+        currency_codes = self.currency.codes
+        amounts = self.amount_minor
+        bounds: Dict[int, int] = defaultdict(int)
+        for row in rows:
+            bounds[currency_codes[row]] += abs(amounts[row])
+        return {self.currency.decode(code): total for code, total in bounds.items()}
+
+    def group_sum_converted(self, key_names: Tuple[str, ...], rows: Iterable[int], fx_rates) -> Tuple[Dict[Tuple[int, ...], float], int]:
+        """Sum amounts converted into the FX table's base currency, grouped by the named columns' codes.
+
+        Rows are split by currency in one pass; each currency's distinct days are then
+        looked up once in the rate table. Returns (totals, number of rows that could not
+        be converted because their currency has no rates).
+        """
+        currency_codes = self.currency.codes
+        rows_by_currency: Dict[int, List[int]] = defaultdict(list)
+        for row in rows:
+            rows_by_currency[currency_codes[row]].append(row)
+
+        code_arrays = [self.column(name).codes for name in key_names]
+        amounts = self.amount_minor
+        days = self.day
+        totals: Dict[Tuple[int, ...], float] = defaultdict(float)
+        unconverted = 0
+        for currency_code, currency_rows in rows_by_currency.items():
+            currency = self.currency.decode(currency_code)
+            if not fx_rates.can_convert(currency):
+                unconverted += len(currency_rows)
+                continue
+            scale = 10 ** get_decimal_places(currency)
+            distinct_days = sorted({days[row] for row in currency_rows})
+            rate_by_day = dict(zip(distinct_days, fx_rates.rates(currency, distinct_days)))
+            for row in currency_rows:
+                key = tuple(codes[row] for codes in code_arrays)
+                totals[key] += amounts[row] * rate_by_day[days[row]] / scale
+        return totals, unconverted
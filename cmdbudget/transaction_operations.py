@@ -5,15 +5,24 @@
 import os
 import csv
 import logging # Import logging
-from datetime import datetime
-from typing import Dict, List, Optional
+from datetime import datetime, date, time
+from typing import Callable, Dict, Iterator, List, Optional, Union
+from decimal import Decimal
 from .transaction import Transaction, RawTransaction
-from .utils import parse_date_multi_format # Import from utils
+from .currency_utils import to_minor_units, format_minor_units
+from .utils import parse_date_multi_format, memoize_date_parser # Import from utils
 from .config import STORAGE_DATE_FORMAT, CSV_FIELDNAMES
+from .block_archive import open_transaction_text
+from .file_lock import FileLock, atomic_write
 
 # Get a logger for this module
 logger = logging.getLogger(__name__)
 
+@memoize_date_parser
+def _parse_stored_date(date_str: str) -> datetime:
+    return datetime.strptime(date_str, STORAGE_DATE_FORMAT)
+
+
 class TransactionOperations:
     """Provides a unified API for transaction CRUD operations against a CSV file."""
 
@@ -21,26 +30,30 @@ class TransactionOperations:
     def create_transaction(
         date: datetime,
         description: str,
-        amount: float,
+        amount: Union[float, str, Decimal, None],
         currency: str,
         category: str,
         subcategory: str = "",
         tag: str = "",
-        merchant: str = ""
+        merchant: str = "",
+        amount_minor: Optional[int] = None
     ) -> Transaction:
-        """Create a new Transaction object with the given attributes."""
+        """Create a new Transaction object with the given attributes.
+
+        The amount is given in major units (e.g. 12.30) and converted exactly to integer
+        minor units; pass amount_minor instead when the integer amount is already known.
+        A plain date is taken as midnight of that day.
+        """
         # Basic validation can be added here if desired
         if not isinstance(date, datetime):
-             # Handle cases where date might not be datetime object yet
-             # This shouldn't happen if called correctly, but defensive check
-             logger.warning(f"create_transaction received non-datetime object for date: {type(date)}")
-             # Attempt to parse if it looks like a string? Or raise error?
-             # For now, let it proceed, but Transaction init might fail
-             pass
+            # Manually entered transactions carry the plain date returned by prompt_for_date
+            date = datetime.combine(date, time())
+        if amount_minor is None:
+            amount_minor = to_minor_units(amount, currency)
         return Transaction(
             _date=date,
             _description=description,
-            _amount=float(amount), # Ensure amount is float
+            _amount_minor=int(amount_minor),
             currency=currency,
             category=category,
             subcategory=subcategory,
@@ -64,8 +77,8 @@ class TransactionOperations:
         return {
             "Transaction Date": transaction.date.strftime(STORAGE_DATE_FORMAT),
             "Description": transaction.description,
-            # Store amount with 2 decimal places consistently (positive=expense)
-            "Amount": f"{transaction.amount:.2f}",
+            # Store the exact minor-unit amount with the currency's decimal places (positive=expense)
+            "Amount": format_minor_units(transaction.amount_minor, transaction.currency),
             "Currency": transaction.currency,
             "Category": transaction.category,
             "Subcategory": transaction.subcategory,
@@ -73,21 +86,41 @@ class TransactionOperations:
             "Merchant": transaction.merchant
         }
 
+    @staticmethod
+    def save_transactions(transactions: List[Transaction], file_path: str) -> bool:
+        """Append several transactions to a file under one lock. Returns True on success."""
+        try:
+            rows = [TransactionOperations._transaction_to_row(transaction) for transaction in transactions]
+            return TransactionOperations._append_rows_to_file(rows, file_path)
+        except Exception as e:
+            logger.error(f"Error during save_transactions to '{file_path}': {e}", exc_info=True)
+            return False
+
     @staticmethod
     def _append_transaction_to_file(transaction_row: Dict[str, str], file_path: str) -> bool: # Make private
         """Append a transaction row to a CSV file."""
+        return TransactionOperations._append_rows_to_file([transaction_row], file_path)
+
+    @staticmethod
+    def _append_rows_to_file(transaction_rows: List[Dict[str, str]], file_path: str) -> bool:
+        """Append rows to a CSV file while holding its exclusive lock.
+
+        The rows are written in one call and flushed before the lock is released, so a
+        reader (which takes its snapshot size under the shared lock) only ever sees whole rows.
+        """
         try:
-            # Check if file exists and is empty to write header
-            file_exists = os.path.exists(file_path)
-            write_header = not file_exists or os.path.getsize(file_path) == 0
+            with FileLock(file_path):
+                # Check if file exists and is empty to write header
+                file_exists = os.path.exists(file_path)
+                write_header = not file_exists or os.path.getsize(file_path) == 0
 
-            with open(file_path, 'a', newline='', encoding='utf-8') as file: # Specify encoding
-                writer = csv.DictWriter(file, fieldnames=CSV_FIELDNAMES)
+                with open(file_path, 'a', newline='', encoding='utf-8') as file: # Specify encoding
+                    writer = csv.DictWriter(file, fieldnames=CSV_FIELDNAMES)
 
-                if write_header:
-                    writer.writeheader()
+                    if write_header:
+                        writer.writeheader()
 
-                writer.writerow(transaction_row)
+                    writer.writerows(transaction_rows)
             return True
         except IOError as e:
             logger.error(f"I/O Error appending transaction to {file_path}: {e}", exc_info=True)
@@ -97,15 +130,104 @@ class TransactionOperations:
             return False
 
     @staticmethod
-    def read_transactions(file_path: str) -> List[Transaction]:
-        """Read all transactions from a CSV file. Returns list of Transactions or empty list on error."""
+    def write_transactions(transactions: List[Transaction], file_path: str) -> bool:
+        """Rewrite a CSV file with the given transactions in storage format. Returns True on success.
+
+        The new contents go to a temporary file that replaces the original by rename,
+        so readers and a crash mid-write never leave a truncated file.
+        """
+        try:
+            with FileLock(file_path), atomic_write(file_path) as file:
+                writer = csv.DictWriter(file, fieldnames=CSV_FIELDNAMES)
+                writer.writeheader()
+                for transaction in transactions:
+                    writer.writerow(TransactionOperations._transaction_to_row(transaction))
+            return True
+        except IOError as e:
+            logger.error(f"I/O Error writing transactions to {file_path}: {e}", exc_info=True)
+            return False
+        except Exception as e:
+            logger.error(f"Unexpected error writing transactions to {file_path}: {e}", exc_info=True)
+            return False
+
+    @staticmethod
+    def transaction_to_record(transaction: Transaction) -> List[str]:
+        """The stored CSV values of a transaction, in CSV_FIELDNAMES order."""
+        row = TransactionOperations._transaction_to_row(transaction)
+        return [row[name] for name in CSV_FIELDNAMES]
+
+    @staticmethod
+    def transaction_from_record(values: List[str]) -> Transaction:
+        """Inverse of `transaction_to_record`."""
+        return Transaction.from_row(dict(zip(CSV_FIELDNAMES, values)), _parse_stored_date)
+
+    @staticmethod
+    def iter_transactions(file_path: str, start: Optional[date] = None, end: Optional[date] = None) -> Iterator[Transaction]:
+        """Yield the transactions of a stored CSV or block archive one at a time, optionally only those in [start, end].
+
+        Unlike `read_transactions` nothing is collected, so a file of any size is read
+        in constant memory. Rows that cannot be parsed are skipped with a warning.
+        """
+        if not os.path.exists(file_path):
+            return
+        with open_transaction_text(file_path, start, end) as file:
+            for line_num, row in enumerate(csv.DictReader(file), start=2):
+                try:
+                    transaction = Transaction.from_row(row, _parse_stored_date)
+                except (KeyError, ValueError) as e:
+                    logger.warning(f"Skipping unreadable row {line_num} of {file_path}: {e}")
+                    continue
+                if (start and transaction.date.date() < start) or (end and transaction.date.date() > end):
+                    continue
+                yield transaction
+
+    @staticmethod
+    def rewrite_transactions(file_path: str, out_file,
+                             edit: Callable[[Transaction], Union[None, Transaction, List[Transaction]]]) -> int:
+        """Stream a stored CSV into `out_file`, replacing the rows `edit` returns new transactions for.
+
+        Rows are read, passed to `edit` and written one at a time, so the file is never
+        held in memory. `edit` returns None to keep a row, a transaction to replace it,
+        or a list of transactions (empty to drop the row). Rows that cannot be parsed
+        are copied unchanged. Returns the number of rows replaced; raises IOError.
+        """
+        writer = csv.DictWriter(out_file, fieldnames=CSV_FIELDNAMES, restval="", extrasaction="ignore")
+        writer.writeheader()
+        if not os.path.exists(file_path):
+            return 0
+
+        changed = 0
+        with open_transaction_text(file_path) as file:
+            for line_num, row in enumerate(csv.DictReader(file), start=2):
+                try:
+                    transaction = Transaction.from_row(row, _parse_stored_date)
+                except (KeyError, ValueError) as e:
+                    logger.warning(f"Copying unreadable row {line_num} of {file_path} unchanged: {e}")
+                    writer.writerow(row)
+                    continue
+                edited = edit(transaction)
+                if edited is None:
+                    writer.writerow(row)
+                    continue
+                for replacement in ([edited] if isinstance(edited, Transaction) else edited):
+                    writer.writerow(TransactionOperations._transaction_to_row(replacement))
+                changed += 1
+        return changed
+
+    @staticmethod
+    def read_transactions(file_path: str, start: Optional[date] = None, end: Optional[date] = None) -> List[Transaction]:
+        """Read transactions from a CSV file or block archive. Returns list of Transactions or empty list on error.
+
+        With start/end only transactions dated in [start, end] are returned; for block
+        archives (.gz/.xz) only the blocks overlapping that range are decompressed.
+        """
         transactions = []
         try:
             if not os.path.exists(file_path):
                 logger.info(f"Transaction file {file_path} not found, returning empty list.")
                 return []
 
-            with open(file_path, 'r', encoding='utf-8') as file: # Specify encoding
+            with open_transaction_text(file_path, start, end) as file:
                 reader = csv.DictReader(file)
                 # Check header consistency
                 if set(reader.fieldnames) != set(CSV_FIELDNAMES):
@@ -113,6 +235,7 @@ class TransactionOperations:
                      # Attempt to proceed, but Transaction.from_row might fail if columns missing.
 
                 # Define a specific parser for the known stored date format
+                @memoize_date_parser
                 def parse_stored_date(date_str):
                     try:
                         return datetime.strptime(date_str, STORAGE_DATE_FORMAT)
@@ -130,6 +253,8 @@ class TransactionOperations:
                              continue
                         # Parse the transaction first, using the specific stored date parser
                         parsed_transaction = Transaction.from_row(row, parse_stored_date)
+                        if (start and parsed_transaction.date.date() < start) or (end and parsed_transaction.date.date() > end):
+                            continue
                         # Log details *before* appending
                         logger.info(f"LOADED TX (L{line_num}): Date={parsed_transaction.date.date()}, Desc='{parsed_transaction.description}', Amount={parsed_transaction.amount}, Category='{parsed_transaction.category}'")
                         transactions.append(parsed_transaction)
@@ -2,21 +2,35 @@
 # This file handles processing and categorizing new transactions
 # License: MIT
 
-import csv
+import copy
 import os
+import queue
+import threading
 import yaml
 import logging
-from typing import Set, List
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
 from datetime import datetime
 from .transaction import Transaction, RawTransaction
 from .transaction_operations import TransactionOperations
+from .transaction_store import CsvTransactionStore
 from pprint import pprint, pformat
-from .utils import parse_date_multi_format # Import from utils
+from .utils import get_state_path # Import from utils
 from .display import Display # Import Display
+from .category_suggester import CategorySuggester
+from .currency_utils import to_minor_units, from_minor_units
+from .import_checkpoint import ImportCheckpoint, IMPORT_CHECKPOINT_FILE, csv_row, read_records
+from .import_profiles import ProfileRegistry, RowDecoder, IMPORT_PROFILES_STATE_FILE, profiles_from_config
 
 logging.basicConfig(level=logging.INFO) # Basic config, might be moved to main
 logger = logging.getLogger(__name__)
 
+# Mapped rows are committed in batches of this many
+IMPORT_BATCH_SIZE = 200
+# Unmapped rows the import worker may classify ahead of the prompts
+PIPELINE_DEPTH = 64
+# Outcomes counted for the import summary
+IMPORT_COUNTS = ("mapped", "categorized", "split", "ignored", "duplicates", "errors")
+
 class TransactionClassifier:
     def __init__(self, config_file, categories_file, mappings_file):
         self.config_file = config_file
@@ -27,6 +41,13 @@ class TransactionClassifier:
         self.categories = list(categories_data.keys())
         self.subcategories = categories_data
         self.mappings = self.load_yaml(mappings_file).get('mappings', {})
+        self.suggester = CategorySuggester()
+        # The import worker classifies while the prompt loop may add mappings
+        self.lock = threading.RLock()
+        # Rules saved since they were last carried back to stored transactions
+        self.changed_rules: List[str] = []
+        # Undo log that mapping and category changes are recorded in, if any
+        self.undo_log = None
 
     @staticmethod
     def load_yaml(file_path):
@@ -75,35 +96,102 @@ class TransactionClassifier:
 
     def save_mapping(self, description: str, category: str, subcategory: str = None):
         """Save new mapping to the mappings file."""
-        self.mappings[description] = {
-            'category': category,
-            'subcategory': subcategory
-        }
+        with self.lock:
+            before = self.mappings.get(description)
+            self.mappings[description] = {
+                'category': category,
+                'subcategory': subcategory
+            }
+            mappings = dict(self.mappings)
+            if description not in self.changed_rules:
+                self.changed_rules.append(description)
+        if self._write_mappings(mappings):
+            logger.info(f"Saved new mapping for '{description[:30]}...'")
+            if self.undo_log is not None and before != mappings[description]:
+                self.undo_log.record(f"Mapping '{description}'", mappings=[(description, before, mappings[description])])
+
+    def restore_mapping(self, description: str, mapping: Optional[dict]) -> bool:
+        """Put a rule back as it was (None removes it), without recording it as a new change."""
+        with self.lock:
+            if mapping is None:
+                self.mappings.pop(description, None)
+            else:
+                self.mappings[description] = dict(mapping)
+            mappings = dict(self.mappings)
+        return self._write_mappings(mappings)
+
+    def _write_mappings(self, mappings: dict) -> bool:
         try:
             with open(self.mappings_file, 'w', encoding='utf-8') as file:
-                yaml.dump({'mappings': self.mappings}, file)
-            logger.info(f"Saved new mapping for '{description[:30]}...'")
+                yaml.dump({'mappings': mappings}, file)
+            return True
         except IOError as e:
              logger.error(f"Failed to save mappings file {self.mappings_file}: {e}", exc_info=True)
              Display.error(f"Failed to save mappings file: {self.mappings_file}")
         except Exception as e:
              logger.error(f"Unexpected error saving mappings file {self.mappings_file}: {e}", exc_info=True)
              Display.error(f"Unexpected error saving mappings: {self.mappings_file}")
+        return False
+
+    def take_changed_rules(self) -> List[str]:
+        """Rules saved since the last call, oldest first."""
+        with self.lock:
+            rules, self.changed_rules = self.changed_rules, []
+        return rules
 
     def find_category(self, description: str) -> tuple[str, str]:
         """Find category and subcategory for a description or return None, None."""
         # Consider making matching case-insensitive by default
         # Consider more robust matching (e.g., partial, regex)
-        for known_desc, mapping in self.mappings.items():
+        with self.lock:
+            mappings = list(self.mappings.items())
+        for known_desc, mapping in mappings:
             if known_desc.upper() in description.upper(): # Case-insensitive check
                 return mapping['category'], mapping.get('subcategory')
         return None, None
 
+    def learn_history(self, transactions):
+        """Index categorized history for suggestions (only once per classifier)."""
+        with self.lock:
+            if not self.suggester.indexed:
+                self.suggester.index_transactions(transactions)
+
+    def learn(self, transaction):
+        """Add a newly committed transaction to the suggestion index."""
+        with self.lock:
+            self.suggester.add(transaction.description, transaction.category, transaction.subcategory)
+
+    def relearn(self, old, new):
+        """Move an edited transaction's description from its old categorization to its new one."""
+        with self.lock:
+            self.suggester.remove(old.description, old.category, old.subcategory)
+            self.suggester.add(new.description, new.category, new.subcategory)
+
+    def forget(self, transaction):
+        """Drop a removed transaction from the suggestion index."""
+        with self.lock:
+            self.suggester.remove(transaction.description, transaction.category, transaction.subcategory)
+
+    def suggest_categories(self, description: str, top_k: int = 3) -> list[tuple[str, str]]:
+        """Return likely (category, subcategory) pairs whose category and subcategory still exist in categories.yml."""
+        with self.lock:
+            return self.suggester.suggest(description, top_k, allowed=self._is_configured)
+
+    def _is_configured(self, category: str, subcategory: str) -> bool:
+        return category in self.categories and (not subcategory or subcategory in (self.subcategories.get(category) or []))
+
     def prompt_for_category(self, description: str) -> tuple[str, str]:
         """Prompt user to select a category and subcategory."""
         Display.message(f"\nTransaction: {description}")
+        suggestions = self.suggest_categories(description)
 
         while True:
+            if suggestions:
+                Display.message("\nSuggested (from similar past transactions):")
+                for i, (category, subcategory) in enumerate(suggestions, 1):
+                    label = f"{category} > {subcategory}" if subcategory else category
+                    Display.message(f"s{i}. {label}")
+
             Display.message("\nSelect a category:")
             display_categories = [cat for cat in self.categories if cat not in ["IGNORED", "SPLIT"]]
             display_categories.sort() # Sort for consistency
@@ -113,8 +201,15 @@ class TransactionClassifier:
             Display.menu_item(len(display_categories) + 1, "Add new category")
 
             try:
-                choice_input = Display.prompt("\nEnter category number: ")
+                prompt_text = f"\nEnter category number (s1-s{len(suggestions)} for a suggestion): " if suggestions else "\nEnter category number: "
+                choice_input = Display.prompt(prompt_text).strip()
                 if not choice_input: continue # Handle empty input
+                if choice_input.lower().startswith('s') and suggestions:
+                    suggestion_index = int(choice_input[1:])
+                    if 1 <= suggestion_index <= len(suggestions):
+                        return suggestions[suggestion_index - 1]
+                    Display.warning("Invalid suggestion.")
+                    continue
                 choice = int(choice_input)
 
                 if 1 <= choice <= len(display_categories):
@@ -205,9 +300,12 @@ class TransactionClassifier:
     def _save_categories(self) -> bool:
          """Saves the current categories and subcategories to the YAML file."""
          try:
+             before = self.load_yaml(self.categories_file).get('categories') if self.undo_log is not None else None
              with open(self.categories_file, 'w', encoding='utf-8') as file:
                  yaml.dump({'categories': self.subcategories}, file)
              logger.info(f"Categories saved to {self.categories_file}")
+             if self.undo_log is not None:
+                 self.undo_log.record("Change categories", categories=(before, copy.deepcopy(self.subcategories)))
              return True
          except IOError as e:
              logger.error(f"Failed to save categories file {self.categories_file}: {e}", exc_info=True)
@@ -218,168 +316,128 @@ class TransactionClassifier:
              Display.error(f"Unexpected error saving categories: {self.categories_file}")
              return False
 
+    def restore_categories(self, categories) -> bool:
+        """Write the categories file back as it was, without recording it as a new change."""
+        subcategories = categories if isinstance(categories, dict) else {name: [] for name in categories or []}
+        with self.lock:
+            self.subcategories = subcategories
+            self.categories = list(subcategories.keys())
+        try:
+            with open(self.categories_file, 'w', encoding='utf-8') as file:
+                yaml.dump({'categories': categories}, file)
+            return True
+        except IOError as e:
+            logger.error(f"Failed to restore categories file {self.categories_file}: {e}", exc_info=True)
+            Display.error(f"Failed to save categories: {self.categories_file}")
+            return False
+
 
 class NewTransactionProcessor:
-    def __init__(self, new_transactions_file, transactions_file, config_file, categories_file, mappings_file):
+    def __init__(self, new_transactions_file, transactions_file, config_file, categories_file, mappings_file, classifier=None, store=None,
+                 profiles: Optional[ProfileRegistry] = None):
         self.new_transactions_file = new_transactions_file
         self.transactions_file = transactions_file
-        self.classifier = TransactionClassifier(config_file, categories_file, mappings_file)
+        # Reuse a warm classifier (and its suggestion index) when one is provided
+        self.classifier = classifier or TransactionClassifier(config_file, categories_file, mappings_file)
+        self.store = store or CsvTransactionStore(transactions_file)
+        # Import profiles, chosen per export by a hash of its header row
+        self.profiles = profiles or ProfileRegistry(
+            profiles_from_config(self.classifier.config),
+            get_state_path(self.classifier.config, IMPORT_PROFILES_STATE_FILE)
+        )
         self.existing_transactions: Set[Transaction] = set()
+        self.loaded_partitions: Set[str] = set()
+        # Store generation the duplicate set reflects; a run keeps the set while it is unchanged
+        self._dedupe_generation = None
+        # Rows of the current run claimed in the duplicate set before being stored
+        self._claimed: Set[RawTransaction] = set()
+        # Transactions stored by the last process() run, for incremental consumers
+        self.saved_transactions: List[Transaction] = []
+        # Outcome counts of the last process() run, by IMPORT_COUNTS key
+        self.counts: Dict[str, int] = dict.fromkeys(IMPORT_COUNTS, 0)
+        # Mapped transactions waiting to be committed as one batch
+        self._mapped_batch: List[Transaction] = []
+        # Progress of process() on new_transactions_file, for resuming after an interruption
+        self.checkpoint: Optional[ImportCheckpoint] = None
+        self._position: Optional[Tuple[int, int, int]] = None
+        self._handled: Optional[Tuple[int, int, int]] = None
+        self._checkpoint_blocked = False
+        # Guards the duplicate set, counts and store writes shared with the import worker
+        self.lock = threading.RLock()
         self.transaction_ops = TransactionOperations()
 
     def load_existing_transactions(self) -> Set[Transaction]:
-        """Load and hash all existing transactions from the main transaction file."""
+        """Load and hash all existing transactions from every stored file."""
         # Use the read_transactions method from TransactionOperations
-        transactions = self.transaction_ops.read_transactions(self.transactions_file)
+        transactions = [t for path in self.store.partition_files() for t in self.transaction_ops.read_transactions(path)]
         # Ensure they are hashable (depends on Transaction.__hash__ implementation)
         return set(transactions)
 
+    def _ensure_partition_loaded(self, day):
+        """Load the stored transactions of the partition holding `day` into the duplicate set.
+
+        Only partitions the import actually touches are read, so duplicate checking does not
+        grow with the number of archived years.
+        """
+        key = self.store.partition_key(day)
+        if key not in self.loaded_partitions:
+            self.loaded_partitions.add(key)
+            self.existing_transactions.update(self.store.read_partition(key))
+
     # Removed parse_date static method - use imported utility
 
     def process(self) -> bool:
-        """Process transactions from new_transactions.csv"""
+        """Process transactions from new_transactions.csv.
+
+        A worker thread decodes, dedupes and classifies rows ahead of the user and
+        commits mapped rows in batches; only rows without a mapping are queued for
+        the prompts below, so the user never waits on I/O between prompts.
+        """
         if not os.path.exists(self.new_transactions_file):
             Display.message("No new transactions file found.")
             return False
 
-        self.existing_transactions = self.load_existing_transactions()
-        processed_count = 0
-        skipped_duplicates = 0 # Track skipped duplicates
-        added_count = 0      # Track added transactions
-        transactions_to_save = [] # Collect transactions to save at the end
+        self._start_run()
+        self.checkpoint = ImportCheckpoint(get_state_path(self.classifier.config, IMPORT_CHECKPOINT_FILE), self.new_transactions_file)
+        if self.checkpoint.load():
+            Display.message(f"Continuing the import of {self.new_transactions_file} after row {self.checkpoint.row}; earlier rows were handled in a previous session.")
+            if self.checkpoint.pending:
+                Display.message(f"{len(self.checkpoint.pending)} rows from that session still need a category.")
+        if not self.classifier.suggester.indexed:
+            # A standalone processor has no warm suggestion index; build it from the full history
+            self.classifier.learn_history(self.load_existing_transactions())
 
         config = self.classifier.config.get('import_csv_structure', {})
         if not config:
             logger.error("Import CSV structure configuration not found in config.yml")
             Display.error("Import CSV structure configuration not found. Cannot process new transactions.")
             return False
-        default_currency = config.get('default_currency', 'CAD')
-
+        fieldnames = self._read_header()
+        decoder = self.profiles.decoder_for(fieldnames, choose=self._choose_profile) if fieldnames else None
+        if fieldnames and decoder is None:
+            Display.error(f"No import profile matches the columns of {self.new_transactions_file}: {', '.join(fieldnames)}")
+            Display.message("Add a profile for this export under 'import_profiles' in config.yml.")
+            return False
+        if decoder is not None:
+            if len(self.profiles.profiles) > 1:
+                Display.message(f"Importing with the '{decoder.profile}' profile.")
+            config = self.profiles.profiles[decoder.profile]
+
+        pending = queue.Queue(maxsize=PIPELINE_DEPTH)
+        stop = threading.Event()
+        # Reading stops as soon as the prompt loop ends, even mid-file
+        rows = self._read_rows(stop)
+        worker = threading.Thread(target=self._classify_ahead, args=(rows, decoder, pending, stop), name="import-classifier", daemon=True)
+        worker.start()
         try:
-            # Ensure consistent encoding
-            with open(self.new_transactions_file, 'r', encoding='utf-8-sig') as file: # Use utf-8-sig for potential BOM
-                reader = csv.DictReader(file)
-                line_num = 1 # For error reporting
-                for row in reader:
-                    line_num += 1
-                    logger.debug(f"Processing row {line_num}: {pformat(row)}")
-                    raw_transaction = None # Initialize
-
-                    try:
-                        # Use the RawTransaction.from_row factory method
-                        # It requires the row, config, and the date parser
-                        raw_transaction = RawTransaction.from_row(row, config, parse_date_multi_format)
-
-                    # Catch parsing/creation errors for this specific row
-                    except ValueError as e: # Catches date/amount parsing errors within from_row
-                        logger.error(f"Data parsing error in row {line_num}: {e}. Skipping row: {row}")
-                        continue
-                    except KeyError as e:
-                        logger.error(f"Missing expected column '{e}' in row {line_num} based on config. Skipping row: {row}")
-                        continue
-                    except Exception as e:
-                         logger.error(f"Unexpected error processing data in row {line_num}: {e}. Skipping row: {row}", exc_info=True)
-                         continue
-
-                    # --- Duplicate Check --- 
-                    if raw_transaction in self.existing_transactions:
-                        logger.info(f"Skipping duplicate transaction from row {line_num}: {raw_transaction.description}")
-                        skipped_duplicates += 1
-                        continue
-
-                    # --- Categorization --- 
-                    category, subcategory = self.classifier.find_category(raw_transaction.description)
-                    if category:
-                        # Mapping found - save automatically
-                        transaction = Transaction.from_raw(raw_transaction, default_currency, category, subcategory)
-                        if self.transaction_ops.save_transaction(transaction, self.transactions_file):
-                            processed_count += 1
-                            logger.info(f"Added transaction via mapping (Row {line_num}): {transaction.description}")
-                            self.existing_transactions.add(transaction)
-                        else:
-                             logger.error(f"Failed to save mapped transaction (Row {line_num}): {transaction.description}")
-                        continue # Move to the next row
-
-                    # --- User Interaction for Unmapped Transactions --- 
-                    choice = None
-                    # Get amount for display before loop (assuming from_row succeeded)
-                    exact_amount = raw_transaction.amount
-                    while choice is None:
-                         # Print statements for user interaction are kept here
-                         Display.message(f"\nNew Transaction (Row {line_num}): {raw_transaction.description}")
-                         Display.message(f"Amount: ${exact_amount:.2f} {default_currency}")
-
-                         Display.message("1. Show full details")
-                         Display.message("2. Categorize")
-                         Display.message("3. Split transaction")
-                         Display.message("4. Ignore")
-                         choice_input = Display.prompt("\nSelect an option (1-4): ").strip()
-                         # ... (rest of the user interaction loop remains largely the same, using print)
-                         if not choice_input: choice = None; continue
-                         try:
-                              choice = int(choice_input)
-                              if choice == 1:
-                                   # Pass the original row data stored by from_row if available,
-                                   # otherwise, just print the known details.
-                                   details_to_show = getattr(raw_transaction, '_raw_data', None) or \
-                                                     {'Date': raw_transaction.date, 'Description': raw_transaction.description, 'Amount': raw_transaction.amount}
-                                   self._display_transaction_details(details_to_show, config)
-                                   choice = None # Loop back
-                              elif choice == 2:
-                                   category, subcategory = self._process_categorization(raw_transaction)
-                                   break # Proceed to save
-                              elif choice == 3:
-                                   # Pass amount directly from raw_transaction
-                                   self._handle_split_transaction(raw_transaction, raw_transaction.amount, default_currency)
-                                   # Add split marker to prevent re-processing if import runs again on same file
-                                   split_marker = Transaction.from_raw(raw_transaction, default_currency, "SPLIT", None)
-                                   self.existing_transactions.add(split_marker)
-                                   processed_count += 1 # Count the original as processed via split
-                                   break # Break from inner loop, skip standard save
-                              elif choice == 4:
-                                   category, subcategory = "IGNORED", ""
-                                   break # Proceed to save as IGNORED
-                              else:
-                                   Display.warning("Invalid choice.")
-                                   choice = None # Loop back
-                         except ValueError:
-                              Display.warning("Please enter a valid number.")
-                              choice = None # Loop back
-                         except Exception as e:
-                              logger.error(f"Error processing user choice for row {line_num}: {e}", exc_info=True)
-                              Display.error("An error occurred during processing. Skipping this transaction.")
-                              # Decide: skip row (break) or try again (choice=None)? Let's skip.
-                              break # Break from inner loop, will skip saving
-
-                    # --- Save Transaction (if not split or error) --- 
-                    if choice in [2, 4]:
-                        transaction = Transaction.from_raw(raw_transaction, default_currency, category, subcategory)
-                        if self.transaction_ops.save_transaction(transaction, self.transactions_file):
-                            processed_count += 1
-                            log_action = "Ignored" if category == "IGNORED" else "Added"
-                            logger.info(f"{log_action} transaction (Row {line_num}): {transaction.description}")
-                            self.existing_transactions.add(transaction)
-                        else:
-                            logger.error(f"Failed to save transaction (Row {line_num}): {transaction.description}")
-
-                    # Reset choice for next iteration if needed, although break/continue handles flow
-                    choice = None 
-            
-            # Batch save transactions
-            if transactions_to_save:
-                if self.transaction_ops.save_multiple_transactions(transactions_to_save, self.transactions_file):
-                    Display.message(f"\nProcessing Complete:")
-                    Display.message(f"- Added: {added_count} new transactions.")
-                    Display.message(f"- Skipped (duplicates): {skipped_duplicates}")
-                    Display.message(f"- Total rows processed: {processed_count + skipped_duplicates}")
-                    return True
-                else:
-                    Display.error("Error saving processed transactions. Check logs.")
-                    return False
-            else:
-                 Display.message("\nProcessing Complete: No new, non-duplicate transactions found to add.")
-                 return True # Still considered success if no new ones found
-
+            while True:
+                item = pending.get()
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                line_num, raw_transaction = item
+                self._resolve_unmapped(line_num, raw_transaction, config)
         except FileNotFoundError:
              logger.error(f"File not found during processing: {self.new_transactions_file}")
              Display.error(f"New transactions file not found: {self.new_transactions_file}")
@@ -392,6 +450,321 @@ class NewTransactionProcessor:
             logger.error(f"An unexpected error occurred during CSV processing loop: {e}", exc_info=True)
             Display.error(f"An unexpected error occurred during processing. Check logs.")
             return False
+        finally:
+            # Unblocks a worker waiting on a full queue; it commits what it has already mapped
+            stop.set()
+            worker.join()
+        if not self.checkpoint.pending:
+            # The whole file was read and every row answered: a new import of it starts over
+            # (stored rows are then skipped as duplicates, unreadable ones tried again)
+            self.checkpoint.clear()
+
+        counts = self.counts
+        if not any(counts[key] for key in ("mapped", "categorized", "ignored", "split")):
+            Display.message("\nProcessing Complete: No new, non-duplicate transactions found to add.")
+        else:
+            Display.message(f"\nProcessing Complete:")
+            Display.message(f"- Added via mappings: {counts['mapped']}")
+            Display.message(f"- Categorized: {counts['categorized']}")
+            Display.message(f"- Split: {counts['split']}")
+            Display.message(f"- Ignored: {counts['ignored']}")
+        Display.message(f"- Skipped (duplicates): {counts['duplicates']}")
+        if counts['errors']:
+            Display.warning(f"- Rows not imported due to errors: {counts['errors']} (see log)")
+        Display.message(f"- Total rows processed: {sum(counts.values())}")
+        return True
+
+    def _read_header(self) -> Optional[List[str]]:
+        """The column names of the new transactions file, or None if it is empty."""
+        with open(self.new_transactions_file, 'rb') as file:
+            header = next(read_records(file, 0), None)
+        return header[0] if header is not None else None
+
+    def _choose_profile(self, candidates: List[str]) -> Optional[str]:
+        """Ask which of several equally fitting profiles an export is for; the answer is remembered."""
+        Display.message(f"\nThe columns of {self.new_transactions_file} fit more than one import profile:")
+        for i, name in enumerate(candidates, 1):
+            Display.menu_item(i, name)
+        choice = Display.prompt(f"Select the profile for this export (1-{len(candidates)}, Enter to cancel): ").strip()
+        if choice.isdigit() and 1 <= int(choice) <= len(candidates):
+            return candidates[int(choice) - 1]
+        return None
+
+    def _read_rows(self, stop: threading.Event) -> Iterator[Tuple[int, dict]]:
+        """(line number, row) for each row of the new transactions file, resuming from the checkpoint.
+
+        Rows the checkpoint lists as pending are read first, by offset; then reading
+        carries on after the checkpoint's last row. `_position` is the row number and
+        byte range of the row last read; `_handled` that of the row before it, which
+        the consumer is done with once it asks for the next one. Stops as soon as
+        `stop` is set.
+        """
+        checkpoint = self.checkpoint
+        with open(self.new_transactions_file, 'rb') as file:
+            header = next(read_records(file, 0), None)
+            if header is None:
+                return
+            fieldnames, _, header_end = header
+            for line_num, start in checkpoint.pending_before_offset():
+                values, start, end = next(read_records(file, start))
+                self._handled, self._position = self._position, (line_num, start, end)
+                yield line_num, csv_row(fieldnames, values)
+            line_num = checkpoint.row
+            for values, start, end in read_records(file, max(checkpoint.offset, header_end)):
+                if stop.is_set():
+                    break
+                if not values:
+                    continue # Blank line
+                line_num += 1
+                self._handled, self._position = self._position, (line_num, start, end)
+                yield line_num, csv_row(fieldnames, values)
+        self._handled = self._position
+
+    def _classify_rows(self, rows: Iterable[Tuple[int, dict]], decoder: RowDecoder) -> Iterator[Tuple[int, RawTransaction]]:
+        """Decode, dedupe and classify rows, yielding (line number, raw transaction) for those without a mapping.
+
+        Mapped rows are collected in `_mapped_batch` and committed every IMPORT_BATCH_SIZE
+        rows and at the end; a caller about to wait can commit early with `_flush_mapped()`.
+        """
+        checkpoint = self.checkpoint
+        rows_since_flush = 0
+        try:
+            for line_num, row in rows:
+                logger.debug(f"Processing row {line_num}: {pformat(row)}")
+                rows_since_flush += 1
+                if rows_since_flush >= IMPORT_BATCH_SIZE:
+                    self._flush_mapped()
+                    rows_since_flush = 0
+                # A split left half-entered in an earlier session goes straight back to the prompts
+                in_split = checkpoint is not None and checkpoint.split_for(line_num) is not None
+                if checkpoint is not None and not in_split:
+                    # Rows pending from an earlier session are decided afresh on this pass
+                    checkpoint.resolve(line_num, save=False)
+                try:
+                    raw_transaction = decoder.decode(row)
+                except ValueError as e: # Date parsing errors
+                    logger.error(f"Data parsing error in row {line_num}: {e}. Skipping row: {row}")
+                    self._unreadable_row()
+                    continue
+                except KeyError as e:
+                    logger.error(f"Missing expected column '{e}' in row {line_num} based on config. Skipping row: {row}")
+                    self._unreadable_row()
+                    continue
+                except Exception as e:
+                    logger.error(f"Unexpected error processing data in row {line_num}: {e}. Skipping row: {row}", exc_info=True)
+                    self._unreadable_row()
+                    continue
+
+                with self.lock:
+                    self._ensure_partition_loaded(raw_transaction.date)
+                    if raw_transaction in self.existing_transactions and not in_split:
+                        logger.info(f"Skipping duplicate transaction from row {line_num}: {raw_transaction.description}")
+                        self.counts["duplicates"] += 1
+                        continue
+                    # Claim it now, so a repeat later in the file is a duplicate even while this one awaits the user
+                    self.existing_transactions.add(raw_transaction)
+                    self._claimed.add(raw_transaction)
+
+                category, subcategory = self.classifier.find_category(raw_transaction.description)
+                if category and not in_split:
+                    self._mapped_batch.append(Transaction.from_raw(raw_transaction, category, subcategory or ""))
+                else:
+                    if checkpoint is not None:
+                        checkpoint.add_pending(line_num, self._position[1])
+                    yield line_num, raw_transaction
+        finally:
+            self._flush_mapped()
+
+    def _classify_ahead(self, rows: Iterable[Tuple[int, dict]], decoder: RowDecoder, pending: queue.Queue, stop: threading.Event):
+        """Worker: run `_classify_rows` and queue the unmapped rows for the prompt loop.
+
+        The queue ends with None, or with the exception that stopped the worker.
+        Never talks to the user; everything goes to the log.
+        """
+        try:
+            for item in self._classify_rows(rows, decoder):
+                if pending.full():
+                    # About to wait on the user: commit what is mapped so far first
+                    self._flush_mapped()
+                if not self._enqueue(pending, item, stop):
+                    return
+        except Exception as e:
+            self._enqueue(pending, e, stop)
+            return
+        self._enqueue(pending, None, stop)
+
+    def process_headless(self, rows: Iterable[Tuple[int, dict]], fieldnames: List[str]) -> List[Tuple[int, RawTransaction]]:
+        """Import (line number, row) pairs of an export with the given header without prompting.
+
+        Mapped rows are stored and duplicates skipped as in `process()`; the rows that
+        still need a category are returned as (line number, raw transaction) for the
+        caller to set aside. Outcomes are in `counts` and `saved_transactions`.
+        Raises ValueError if no import profile (or more than one) fits the header.
+        """
+        self._start_run()
+        self.checkpoint = None
+        if not self.classifier.config.get('import_csv_structure'):
+            raise ValueError("Import CSV structure configuration not found in config.yml")
+        decoder = self.profiles.decoder_for(fieldnames)
+        if decoder is None:
+            raise ValueError(f"no single import profile matches the columns {', '.join(fieldnames)}")
+        return list(self._classify_rows(rows, decoder))
+
+    @staticmethod
+    def _enqueue(pending: queue.Queue, item, stop: threading.Event) -> bool:
+        """Put an item on the bounded queue, giving up once the prompt loop has stopped."""
+        while not stop.is_set():
+            try:
+                pending.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _start_run(self):
+        """Forget the previous run's saved transactions and counts.
+
+        The duplicate set is kept when nothing but this processor wrote to the store
+        since it was loaded (as between watch polls); otherwise it is loaded again.
+        """
+        generation = self.store.generation()
+        if generation != self._dedupe_generation:
+            self.existing_transactions = set()
+            self.loaded_partitions = set()
+            self._dedupe_generation = generation
+        else:
+            # Rows claimed last run but never stored (set aside, unanswered) are not duplicates of anything
+            self.existing_transactions -= self._claimed - set(self.saved_transactions)
+        self._claimed = set()
+        self.saved_transactions = []
+        self._mapped_batch = []
+        self._position = None
+        self._handled = None
+        self._checkpoint_blocked = False
+        self.counts = dict.fromkeys(IMPORT_COUNTS, 0)
+
+    def _flush_mapped(self):
+        """Store the transactions categorized through mappings since the last flush, then advance the checkpoint."""
+        batch, self._mapped_batch = self._mapped_batch, []
+        if batch:
+            if self._store_transactions(batch):
+                logger.info(f"Added {len(batch)} transactions via mappings")
+                self._count("mapped", len(batch))
+            else:
+                logger.error(f"Failed to save {len(batch)} mapped transactions")
+                self._count("errors", len(batch))
+                # Keep the checkpoint before these rows, so the next run tries them again
+                self._checkpoint_blocked = True
+        # Only past rows already handled: the row just read may not be decided or stored yet
+        if self.checkpoint is not None and self._handled is not None and not self._checkpoint_blocked:
+            line_num, _, end = self._handled
+            self.checkpoint.advance(line_num, end)
+
+    def _store_transactions(self, transactions: List[Transaction]) -> bool:
+        """Save transactions and record them as imported (duplicates, suggestions, recurring)."""
+        with self.lock:
+            if not self.store.save_many(transactions):
+                return False
+            self.existing_transactions.update(transactions)
+            # Our own write: the duplicate set already holds it
+            self._dedupe_generation = self.store.generation()
+            self.saved_transactions.extend(transactions)
+        for transaction in transactions:
+            self.classifier.learn(transaction)
+        return True
+
+    def _unreadable_row(self):
+        """Count a row that could not be decoded and keep the checkpoint before it, so a later import retries it."""
+        with self.lock:
+            self.counts["errors"] += 1
+            self._checkpoint_blocked = True
+
+    def _count(self, key: str, amount: int = 1):
+        with self.lock:
+            self.counts[key] += amount
+
+    def _resolve_unmapped(self, line_num: int, raw_transaction: RawTransaction, config: dict):
+        """Ask the user what to do with a row that had no mapping when it was classified."""
+        resumed_split = self.checkpoint.split_for(line_num) if self.checkpoint is not None else None
+        if resumed_split is not None:
+            Display.message(f"\nContinuing the split of row {line_num}: {raw_transaction.description}")
+            self._handle_split_transaction(raw_transaction, line_num, resumed_split)
+            self._count("split")
+            self._resolved(line_num)
+            return
+
+        # A mapping saved at an earlier prompt may cover this row by now
+        category, subcategory = self.classifier.find_category(raw_transaction.description)
+        if category:
+            transaction = Transaction.from_raw(raw_transaction, category, subcategory or "")
+            if self._store_transactions([transaction]):
+                logger.info(f"Added transaction via mapping (Row {line_num}): {transaction.description}")
+                self._count("mapped")
+                self._resolved(line_num)
+            else:
+                logger.error(f"Failed to save mapped transaction (Row {line_num}): {transaction.description}")
+                self._count("errors")
+            return
+
+        choice = None
+        exact_amount = raw_transaction.amount
+        while choice is None:
+             # Print statements for user interaction are kept here
+             Display.message(f"\nNew Transaction (Row {line_num}): {raw_transaction.description}")
+             Display.message(f"Amount: ${exact_amount:.2f} {raw_transaction.currency}")
+
+             Display.message("1. Show full details")
+             Display.message("2. Categorize")
+             Display.message("3. Split transaction")
+             Display.message("4. Ignore")
+             choice_input = Display.prompt("\nSelect an option (1-4): ").strip()
+             if not choice_input: choice = None; continue
+             try:
+                  choice = int(choice_input)
+                  if choice == 1:
+                       # Pass the original row data kept by the decoder if available,
+                       # otherwise, just print the known details.
+                       details_to_show = raw_transaction.raw_data or \
+                                         {'Date': raw_transaction.date, 'Description': raw_transaction.description, 'Amount': raw_transaction.amount}
+                       self._display_transaction_details(details_to_show, config)
+                       choice = None # Loop back
+                  elif choice == 2:
+                       category, subcategory = self._process_categorization(raw_transaction)
+                       break # Proceed to save
+                  elif choice == 3:
+                       if self._handle_split_transaction(raw_transaction, line_num):
+                           self._count("split")
+                           self._resolved(line_num)
+                       return
+                  elif choice == 4:
+                       category, subcategory = "IGNORED", ""
+                       break # Proceed to save as IGNORED
+                  else:
+                       Display.warning("Invalid choice.")
+                       choice = None # Loop back
+             except ValueError:
+                  Display.warning("Please enter a valid number.")
+                  choice = None # Loop back
+             except Exception as e:
+                  logger.error(f"Error processing user choice for row {line_num}: {e}", exc_info=True)
+                  Display.error("An error occurred during processing. Skipping this transaction.")
+                  self._count("errors")
+                  return
+
+        transaction = Transaction.from_raw(raw_transaction, category, subcategory or "")
+        if self._store_transactions([transaction]):
+            ignored = category == "IGNORED"
+            logger.info(f"{'Ignored' if ignored else 'Added'} transaction (Row {line_num}): {transaction.description}")
+            self._count("ignored" if ignored else "categorized")
+            self._resolved(line_num)
+        else:
+            logger.error(f"Failed to save transaction (Row {line_num}): {transaction.description}")
+            self._count("errors")
+
+    def _resolved(self, line_num: int):
+        """Drop an answered row from the checkpoint's pending rows."""
+        if self.checkpoint is not None:
+            self.checkpoint.resolve(line_num)
 
     def _display_transaction_details(self, details: dict, config: dict):
         """Display transaction details. Keeps print for direct output."""
@@ -405,53 +778,72 @@ class NewTransactionProcessor:
         Display.message("========================\n")
 
 
-    def _handle_split_transaction(self, raw_transaction: RawTransaction, exact_amount: float, default_currency: str):
-        """Handle splitting a transaction. Uses print for user interaction."""
-        # ... (Create and save SPLIT marker transaction - already uses logging)
+    def _handle_split_transaction(self, raw_transaction: RawTransaction, line_num: Optional[int] = None,
+                                  resume: Optional[dict] = None) -> bool:
+        """Handle splitting a transaction. Uses print for user interaction.
+
+        All amounts are tracked in integer minor units of the transaction's currency,
+        so the remaining amount reaches exactly zero without float epsilons. Progress
+        is kept in the import checkpoint; `resume` continues a split from it without
+        saving the SPLIT marker or earlier parts again. Returns False if the split
+        could not be started.
+        """
+        currency = raw_transaction.currency
+        if resume is not None:
+            return self._enter_split_parts(raw_transaction, line_num, resume["remaining_minor"], resume["parts"])
         split_marker_transaction = self.transaction_ops.create_transaction(
             date=raw_transaction.date,
             description=raw_transaction.description,
-            amount=exact_amount,
-            currency=default_currency,
-            category="SPLIT", subcategory="", tag="", merchant=""
+            amount=None,
+            currency=currency,
+            category="SPLIT", subcategory="", tag="", merchant="",
+            amount_minor=raw_transaction.amount_minor
         )
-        if not self.transaction_ops.save_transaction(split_marker_transaction, self.transactions_file):
+        with self.lock:
+            saved_marker = self.store.save(split_marker_transaction)
+            if saved_marker:
+                self.existing_transactions.add(split_marker_transaction)
+                self.saved_transactions.append(split_marker_transaction)
+        if not saved_marker:
              logger.error(f"Failed to save SPLIT marker for: {raw_transaction.description}. Aborting split.")
              Display.error("Error saving initial split record. Cannot proceed with splitting.")
-             return # Abort splitting
+             return False # Abort splitting
         else:
              logger.info(f"Marked original transaction as SPLIT: {raw_transaction.description}")
-             self.existing_transactions.add(split_marker_transaction)
+        return self._enter_split_parts(raw_transaction, line_num, raw_transaction.amount_minor, 0)
 
-        remaining_amount = exact_amount
-        splits_added = 0
+    def _enter_split_parts(self, raw_transaction: RawTransaction, line_num: Optional[int],
+                           remaining_minor: int, splits_added: int) -> bool:
+        """Prompt for split parts until the amount is allocated or the user stops."""
+        currency = raw_transaction.currency
+        self._record_split(line_num, remaining_minor, splits_added)
 
-        while remaining_amount > 0.009:
+        while remaining_minor > 0:
+            remaining_amount = from_minor_units(remaining_minor, currency)
             # Print statements for user interaction are kept
-            Display.message(f"\nRemaining amount to split: ${remaining_amount:.2f} {default_currency}")
+            Display.message(f"\nRemaining amount to split: ${remaining_amount:.2f} {currency}")
             split_choice = Display.prompt("Add another split? (y/n): ").lower().strip()
             if split_choice != 'y':
-                if remaining_amount > 0.009:
-                    Display.warning(f"${remaining_amount:.2f} will remain categorized as SPLIT.")
+                Display.warning(f"${remaining_amount:.2f} will remain categorized as SPLIT.")
                 break
             
-            split_amount = None
-            while split_amount is None:
-                 # ... (Input logic for split_amount using print)
+            split_minor = None
+            while split_minor is None:
                  try:
                     split_amount_input = Display.prompt("Enter split amount: $").strip()
                     if not split_amount_input: continue
-                    split_amount_val = float(split_amount_input)
+                    split_minor_val = to_minor_units(split_amount_input, currency)
 
-                    if split_amount_val <= 0.009:
+                    if split_minor_val <= 0:
                         Display.warning("Amount must be positive.")
-                    elif split_amount_val > remaining_amount + 0.001:
+                    elif split_minor_val > remaining_minor:
                         Display.warning(f"Amount cannot exceed remaining amount (${remaining_amount:.2f})")
                     else:
-                         split_amount = split_amount_val # Assign valid amount
+                         split_minor = split_minor_val # Assign valid amount
                  except ValueError:
                     Display.warning("Please enter a valid number.")
 
+            split_amount = from_minor_units(split_minor, currency)
             split_description = Display.prompt(f"Enter description for this ${split_amount:.2f} split [Split: {raw_transaction.description[:30]}...]: ").strip()
             if not split_description:
                 split_description = f"Split: {raw_transaction.description}"
@@ -461,25 +853,31 @@ class NewTransactionProcessor:
             new_split_transaction = self.transaction_ops.create_transaction(
                 date=raw_transaction.date,
                 description=split_description,
-                amount=split_amount,
-                currency=default_currency,
-                category=category, subcategory=subcategory, tag="", merchant=""
+                amount=None,
+                currency=currency,
+                category=category, subcategory=subcategory, tag="", merchant="",
+                amount_minor=split_minor
             )
 
-            if self.transaction_ops.save_transaction(new_split_transaction, self.transactions_file):
+            if self._store_transactions([new_split_transaction]):
                 logger.info(f"Added split part: {split_description} ${split_amount:.2f}")
-                self.existing_transactions.add(new_split_transaction)
-                remaining_amount -= split_amount
+                remaining_minor -= split_minor
                 splits_added += 1
+                self._record_split(line_num, remaining_minor, splits_added)
             else:
                  logger.error(f"Failed to save split transaction part: {split_description}. Stopping split.")
                  Display.error("Error saving split part. Aborting further splits for this transaction.")
                  break
         
-        if splits_added > 0:
-             logger.info(f"Finished splitting transaction '{raw_transaction.description}' into {splits_added} parts.")
-        elif remaining_amount < 0.009: # Successfully allocated everything
+        if remaining_minor == 0: # Successfully allocated everything
              logger.info(f"Finished splitting transaction '{raw_transaction.description}'. Full amount allocated.")
+        elif splits_added > 0:
+             logger.info(f"Finished splitting transaction '{raw_transaction.description}' into {splits_added} parts.")
+        return True
+
+    def _record_split(self, line_num: Optional[int], remaining_minor: int, parts: int):
+        if self.checkpoint is not None and line_num is not None:
+            self.checkpoint.set_split(line_num, remaining_minor, parts)
 
 
     def _process_categorization(self, raw_transaction: RawTransaction) -> tuple[str, str]:
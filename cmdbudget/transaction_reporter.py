@@ -2,12 +2,19 @@
 # This file handles reporting and data visualization
 # License: MIT
 
+from bisect import bisect_left
 from datetime import datetime
 from collections import defaultdict
-from typing import Dict, List, Tuple
+from itertools import chain
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 from tabulate import tabulate
 import locale
-from .display import Display # Import Display
+import logging
+from .display import Display, visible_width # Import Display
+from .currency_utils import from_minor_units, format_currency
+from .transaction_columns import TransactionColumns, RESERVED_CATEGORIES
+from .period_index import PeriodSumIndex
+from .trend_analysis import TrendEngine, ROLLING_WINDOWS
 
 # Import Transaction if needed for type hints, assuming it's defined elsewhere
 # from .transaction import Transaction 
@@ -15,77 +22,230 @@ from .display import Display # Import Display
 # Set locale for proper currency formatting
 locale.setlocale(locale.LC_ALL, '')
 
+logger = logging.getLogger(__name__)
+
 def category_grouping_factory():
     return {
-        "spends": {
-            "CAD": 0,
-            "USD": 0
-        },
-        "subcategories": defaultdict(int)
+        # Integer minor units keyed by any currency code
+        "spends": defaultdict(int),
+        "subcategories": defaultdict(lambda: defaultdict(int)),
+        # Consolidated totals in the FX base currency (only when rates are loaded)
+        "base": 0.0,
+        "subcategory_base": defaultdict(float)
     }
 
 class TransactionCategoryGrouper:
-    def __init__(self, transactions):
-        # Filter out ignored and split transactions
-        self.transactions = [t for t in transactions if t.category not in ["IGNORED", "SPLIT"]]
+    """Groups rows of a TransactionColumns table by category, currency and subcategory codes."""
+
+    def __init__(self, columns: TransactionColumns, rows: Iterable[int], fx_rates=None):
+        self.columns = columns
+        self.fx_rates = fx_rates
+        # Filter out ignored and split transactions by category code
+        excluded = columns.reserved_category_codes()
+        self.rows = [row for row in rows if columns.category.codes[row] not in excluded]
 
     def group(self):
+        columns = self.columns
         category_mapping = defaultdict(category_grouping_factory)
-        for transaction in self.transactions:
-            # Skip if category is IGNORED or SPLIT
-            if transaction.category in ["IGNORED", "SPLIT"]:
-                continue
-                
-            category_mapping[transaction.category]["spends"][transaction.currency.upper()] += transaction.amount
 
-            if transaction.subcategory:
-                # Skip if subcategory is IGNORED or SPLIT
-                if transaction.subcategory in ["IGNORED", "SPLIT"]:
-                    continue
-                category_mapping[transaction.category]["subcategories"][transaction.subcategory] += transaction.amount
+        # Aggregate exact integer minor units on codes; decode names only for the grouped keys
+        for (category_code, currency_code), total in columns.group_sum(("category", "currency"), self.rows).items():
+            category = columns.category.decode(category_code)
+            category_mapping[category]["spends"][columns.currency.decode(currency_code)] += total
+
+        # Skip empty subcategories and the IGNORED/SPLIT markers
+        skipped_subcategories = {columns.subcategory.code_of(name) for name in ("",) + RESERVED_CATEGORIES}
+        for (category_code, subcategory_code, currency_code), total in columns.group_sum(("category", "subcategory", "currency"), self.rows).items():
+            if subcategory_code in skipped_subcategories:
+                continue
+            category = columns.category.decode(category_code)
+            subcategory = columns.subcategory.decode(subcategory_code)
+            category_mapping[category]["subcategories"][subcategory][columns.currency.decode(currency_code)] += total
+
+        if self.fx_rates is not None:
+            converted, _ = columns.group_sum_converted(("category", "subcategory"), self.rows, self.fx_rates)
+            for (category_code, subcategory_code), total in converted.items():
+                grouping = category_mapping[columns.category.decode(category_code)]
+                grouping["base"] += total
+                if subcategory_code not in skipped_subcategories:
+                    grouping["subcategory_base"][columns.subcategory.decode(subcategory_code)] += total
 
         return category_mapping
 
 class TransactionReporter:
-    def __init__(self, transactions, month_grouped_transactions):
-        # Filter out ignored and split transactions
-        self.transactions = [t for t in transactions if t.category not in ["IGNORED", "SPLIT"]]
-        # Filter month_grouped_transactions to remove ignored and split transactions
+    def __init__(self, transactions, month_grouped_transactions, columns: Optional[TransactionColumns] = None,
+                 currency_config: Optional[Dict[str, Any]] = None, fx_rates=None):
+        # Reports work on a dictionary-encoded view; reuse the manager's when provided
+        self.columns = columns if columns is not None else TransactionColumns(transactions)
+        # import_csv_structure settings (currency priority and formatting) and optional FX table
+        self.currency_config = currency_config or {}
+        self.fx_rates = fx_rates
+        # Row ids that are not IGNORED or SPLIT, grouped by (year, month)
+        self.rows = self.columns.reportable_rows()
+        self.month_rows: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        all_transactions = self.columns.transactions
+        for row in self.rows:
+            row_date = all_transactions[row].date
+            self.month_rows[(row_date.year, row_date.month)].append(row)
+        self.transactions = [all_transactions[row] for row in self.rows]
         self.month_grouped_transactions = {
-            k: [t for t in v if t.category not in ["IGNORED", "SPLIT"]]
-            for k, v in month_grouped_transactions.items()
+            key: [all_transactions[row] for row in rows]
+            for key, rows in self.month_rows.items()
         }
+        self._available_categories = None
+        self._available_tags = None
+        self._period_index: Optional[PeriodSumIndex] = None
+        self._trend_engine: Optional[TrendEngine] = None
+
+    def get_period_index(self) -> PeriodSumIndex:
+        """Prefix-sum index over the reportable rows (built on first use)."""
+        if self._period_index is None:
+            self._period_index = PeriodSumIndex(self.columns, self.rows, self.fx_rates)
+        return self._period_index
+
+    def get_trend_engine(self) -> TrendEngine:
+        """Month x category trend matrix over the reportable rows (built on first use)."""
+        if self._trend_engine is None:
+            self._trend_engine = TrendEngine(self.columns, self.rows)
+        return self._trend_engine
+
+    def add_transaction(self, transaction):
+        """Append a newly stored transaction, updating the month groups and period index in place."""
+        row = self.columns.append(transaction)
+        if transaction.category in RESERVED_CATEGORIES:
+            return
+        month_key = (transaction.date.year, transaction.date.month)
+        self.rows.append(row)
+        self.month_rows[month_key].append(row)
+        self.transactions.append(transaction)
+        self.month_grouped_transactions.setdefault(month_key, []).append(transaction)
+        self._available_categories = None
+        self._available_tags = None
+        if self._period_index is not None:
+            self._period_index.add(row)
+        if self._trend_engine is not None:
+            self._trend_engine.add(row)
+
+    def update_transactions(self, updates: List[Tuple[int, Any]]):
+        """Replace transactions at their row ids (same date and amount, e.g. re-categorized) in place.
+
+        The rows' old values are taken out of the period index and trend engine, the
+        columns are re-encoded and the new values added back, so no index is rebuilt.
+        Rows that become (or stop being) IGNORED/SPLIT join or leave the row lists.
+        """
+        columns = self.columns
+        old_rows = [row for row, _ in updates if columns.transactions[row].category not in RESERVED_CATEGORIES]
+        if self._period_index is not None:
+            self._period_index.adjust(old_rows, -1)
+        if self._trend_engine is not None:
+            for row in old_rows:
+                self._trend_engine.remove(row)
+
+        for row, transaction in updates:
+            was_reportable = columns.transactions[row].category not in RESERVED_CATEGORIES
+            reportable = transaction.category not in RESERVED_CATEGORIES
+            columns.update(row, transaction)
+            month_key = (transaction.date.year, transaction.date.month)
+            month_rows = self.month_rows[month_key]
+            month_transactions = self.month_grouped_transactions.setdefault(month_key, [])
+            position, month_position = bisect_left(self.rows, row), bisect_left(month_rows, row)
+            if was_reportable and reportable:
+                self.transactions[position] = transaction
+                month_transactions[month_position] = transaction
+            elif was_reportable:
+                del self.rows[position], self.transactions[position]
+                del month_rows[month_position], month_transactions[month_position]
+                if not month_rows:
+                    del self.month_rows[month_key], self.month_grouped_transactions[month_key]
+            elif reportable:
+                self.rows.insert(position, row)
+                self.transactions.insert(position, transaction)
+                month_rows.insert(month_position, row)
+                month_transactions.insert(month_position, transaction)
+            elif not month_rows:
+                del self.month_rows[month_key], self.month_grouped_transactions[month_key]
+
+        new_rows = [row for row, transaction in updates if transaction.category not in RESERVED_CATEGORIES]
+        if self._period_index is not None:
+            self._period_index.adjust(new_rows, 1)
+        if self._trend_engine is not None:
+            for row in new_rows:
+                self._trend_engine.add(row)
+        self._available_categories = None
+        self._available_tags = None
 
     def get_available_months(self) -> List[Tuple[int, int]]:
         """Returns a sorted list of (year, month) tuples that have transactions."""
-        # Only include months that have transactions
-        available_months = [
-            (year, month) 
-            for (year, month), transactions in self.month_grouped_transactions.items()
-            if transactions  # Only include months with transactions
-        ]
-        return sorted(available_months)
+        return sorted(self.month_rows.keys())
+
+    def get_report_currencies(self, rows: Optional[Iterable[int]] = None) -> List[str]:
+        """Currencies used by reportable rows (or the given rows), in currency_priority order then alphabetically."""
+        currency_codes = self.columns.currency.codes
+        used = {self.columns.currency.decode(code) for code in {currency_codes[row] for row in (self.rows if rows is None else rows)}}
+        return self._order_currencies(used)
+
+    def _order_currencies(self, used: set) -> List[str]:
+        priority = [currency.upper() for currency in self.currency_config.get('currency_priority', [])]
+        ordered = [currency for currency in priority if currency in used]
+        return ordered + sorted(used - set(ordered))
 
     def get_available_categories(self) -> List[str]:
-        """Returns a sorted list of unique categories, excluding IGNORED."""
-        categories = set(t.category for t in self.transactions)
-        return sorted(cat for cat in categories if cat != "IGNORED")
+        """Returns a sorted list of unique categories, excluding IGNORED and SPLIT (cached)."""
+        if self._available_categories is None:
+            self._available_categories = sorted(
+                category for category in self.columns.category.present_values()
+                if category not in RESERVED_CATEGORIES
+            )
+        return self._available_categories
 
     def get_available_tags(self) -> List[str]:
-        """Returns a sorted list of unique tags, excluding empty tags."""
-        tags = set(t.tag for t in self.transactions if t.tag)  # Only include non-empty tags
-        return sorted(tags)
-
-    def display_month_data(self, month: int, year: int, transactions: List):
-        """Display spending data for a specific month with percentage changes."""
+        """Returns a sorted list of the individual tags on reportable transactions (cached)."""
+        if self._available_tags is None:
+            category_codes = self.columns.category.codes
+            reserved = self.columns.reserved_category_codes()
+            self._available_tags = [
+                tag for tag in self.columns.tags.tags()
+                if any(category_codes[row] not in reserved for row in self.columns.tags.rows_with(tag))
+            ]
+        return self._available_tags
+
+    def tag_month_rows(self, tag: str) -> Dict[Tuple[int, int], List[int]]:
+        """Reportable rows carrying the tag, by (year, month), read from the tag's bitmap."""
+        columns = self.columns
+        category_codes = columns.category.codes
+        reserved = columns.reserved_category_codes()
+        month_rows: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        for row in columns.tags.rows_with(tag):
+            if category_codes[row] not in reserved:
+                row_date = columns.transactions[row].date
+                month_rows[(row_date.year, row_date.month)].append(row)
+        return month_rows
+
+    def display_month_data(self, month: int, year: int, transactions: Optional[List] = None):
+        """Display spending data for a specific month with percentage changes.
+
+        Uses the month's rows from the encoded table unless an explicit transaction list is given.
+        Shows one column per currency in use, plus a consolidated base-currency column when
+        an FX rate table is loaded.
+        """
         # Get previous month's data
         prev_month = month - 1 if month > 1 else 12
         prev_year = year if month > 1 else year - 1
-        prev_transactions = self.month_grouped_transactions.get((prev_year, prev_month), [])
+        prev_rows = self.month_rows.get((prev_year, prev_month), [])
         
         # Group current and previous month's transactions
-        current_grouped = TransactionCategoryGrouper(transactions).group()
-        prev_grouped = TransactionCategoryGrouper(prev_transactions).group()
+        if transactions is None:
+            current_rows = self.month_rows.get((year, month), [])
+            current_grouped = TransactionCategoryGrouper(self.columns, current_rows, self.fx_rates).group()
+            currencies = self.get_report_currencies(chain(current_rows, prev_rows))
+        else:
+            month_columns = TransactionColumns(transactions)
+            current_grouped = TransactionCategoryGrouper(month_columns, range(len(month_columns)), self.fx_rates).group()
+            currencies = self._order_currencies(set(self.get_report_currencies(prev_rows)) | set(month_columns.currency.present_values()))
+        prev_grouped = TransactionCategoryGrouper(self.columns, prev_rows, self.fx_rates).group()
+        if not currencies:
+            currencies = [self.currency_config.get('default_currency', 'CAD')]
+        show_base = self.fx_rates is not None
         
         month_name = datetime(year, month, 1).strftime('%B %Y')
         prev_month_name = datetime(prev_year, prev_month, 1).strftime('%B %Y')
@@ -96,15 +256,16 @@ class TransactionReporter:
 
         # Prepare data for tabulation
         table_data = []
-        totals = {"CAD": 0, "USD": 0}
-        prev_totals = {"CAD": 0, "USD": 0}
+        totals = defaultdict(int)
+        prev_totals = defaultdict(int)
+        base_total = 0.0
+        prev_base_total = 0.0
 
-        def format_amount_with_change(current: float, previous: float) -> str:
-            """Format amount with percentage change in smaller font."""
+        def format_with_change(current: float, previous: float, currency: str) -> str:
+            """Format a major-unit amount with percentage change in smaller font."""
             if current == 0:
                 return "-"
-            
-            amount_str = f"${current:,.2f}"
+            amount_str = self._format_money(current, currency)
             
             # Only calculate and display percentage change if previous > 0
             if previous > 0:
@@ -112,196 +273,382 @@ class TransactionReporter:
                 sign = "+" if pct_change >= 0 else "" # Show + for 0% change too
                 pct_str = f" (\033[2m{sign}{pct_change:.1f}%\033[0m)"
                 return amount_str + pct_str
-            # If previous is 0 and current is not 0, just show the amount
-            elif current != 0: 
-                 return amount_str
-            else: # Should not happen given the first check, but included for completeness
-                 return amount_str
+            return amount_str
+
+        def currency_cells(current_minor: Dict[str, int], previous_minor: Dict[str, int]) -> List[str]:
+            return [
+                format_with_change(
+                    from_minor_units(current_minor.get(currency, 0), currency),
+                    from_minor_units(previous_minor.get(currency, 0), currency),
+                    currency
+                )
+                for currency in currencies
+            ]
 
-        # Get all categories from both months, excluding SPLIT, IGNORED, and CAD
+        def base_cells(current: float, previous: float) -> List[str]:
+            return [format_with_change(current, previous, self.fx_rates.base_currency)] if show_base else []
+
+        separator_width = len(currencies) + (1 if show_base else 0)
+
+        # Get all categories from both months, excluding SPLIT and IGNORED
         all_categories = set(current_grouped.keys()) | set(prev_grouped.keys())
-        all_categories = {cat for cat in all_categories if cat not in ["SPLIT", "IGNORED", "CAD", "USD"]}
+        all_categories = {cat for cat in all_categories if cat not in RESERVED_CATEGORIES}
         
         first_category = True
         for category_name in sorted(all_categories):
             if not first_category:
                 # Add separator between categories
-                table_data.append(["-" * 20, "-" * 25, "-" * 25])
+                table_data.append(["-" * 20] + ["-" * 25] * separator_width)
             else:
                 first_category = False
 
-            current_data = current_grouped.get(category_name, {"spends": {"CAD": 0, "USD": 0}, "subcategories": {}})
-            prev_data = prev_grouped.get(category_name, {"spends": {"CAD": 0, "USD": 0}, "subcategories": {}})
-            
-            # Calculate category totals from subcategories
-            cad_amount = sum(amount for amount in current_data["subcategories"].values())
-            prev_cad = sum(amount for amount in prev_data["subcategories"].values())
-            usd_amount = 0  # Assuming USD is not used for subcategories
-            prev_usd = 0
+            current_data = current_grouped.get(category_name, category_grouping_factory())
+            prev_data = prev_grouped.get(category_name, category_grouping_factory())
             
-            totals["CAD"] += cad_amount
-            totals["USD"] += usd_amount
-            prev_totals["CAD"] += prev_cad
-            prev_totals["USD"] += prev_usd
+            for currency in currencies:
+                totals[currency] += current_data["spends"].get(currency, 0)
+                prev_totals[currency] += prev_data["spends"].get(currency, 0)
+            base_total += current_data["base"]
+            prev_base_total += prev_data["base"]
             
             # Add category with bold formatting
-            table_data.append([
-                f"\033[1m{category_name}\033[0m",
-                format_amount_with_change(cad_amount, prev_cad),
-                format_amount_with_change(usd_amount, prev_usd)
-            ])
+            table_data.append(
+                [f"\033[1m{category_name}\033[0m"]
+                + currency_cells(current_data["spends"], prev_data["spends"])
+                + base_cells(current_data["base"], prev_data["base"])
+            )
 
             # Add subcategories
             current_subcats = current_data["subcategories"]
             prev_subcats = prev_data["subcategories"]
             all_subcats = set(current_subcats.keys()) | set(prev_subcats.keys())
-            all_subcats = {subcat for subcat in all_subcats if subcat not in ["SPLIT", "IGNORED", "CAD", "USD"]}
+            all_subcats = {subcat for subcat in all_subcats if subcat not in RESERVED_CATEGORIES}
             
             for subcat in sorted(all_subcats):
-                current_sub_amount = current_subcats.get(subcat, 0)
-                prev_sub_amount = prev_subcats.get(subcat, 0)
-                
-                table_data.append([
-                    f"  └─ {subcat}",
-                    format_amount_with_change(current_sub_amount, prev_sub_amount),
-                    "-"  # Assuming subcategories are only in primary currency
-                ])
+                table_data.append(
+                    [f"  └─ {subcat}"]
+                    + currency_cells(current_subcats.get(subcat, {}), prev_subcats.get(subcat, {}))
+                    + base_cells(current_data["subcategory_base"].get(subcat, 0.0), prev_data["subcategory_base"].get(subcat, 0.0))
+                )
 
         # Add separator before total
-        table_data.append(["=" * 20, "=" * 25, "=" * 25])
+        table_data.append(["=" * 20] + ["=" * 25] * separator_width)
 
         # Add totals row with bold formatting
-        table_data.append([
-            "\033[1mTOTAL\033[0m",
-            format_amount_with_change(totals["CAD"], prev_totals["CAD"]),
-            format_amount_with_change(totals["USD"], prev_totals["USD"])
-        ])
+        table_data.append(
+            ["\033[1mTOTAL\033[0m"]
+            + currency_cells(totals, prev_totals)
+            + base_cells(base_total, prev_base_total)
+        )
 
         # Use Display.table instead of print(tabulate(...))
         Display.table(
             table_data,
-            headers=["\033[1mCategory\033[0m", "\033[1mCAD\033[0m", "\033[1mUSD\033[0m"],
+            headers=["\033[1mCategory\033[0m"] + [f"\033[1m{header}\033[0m" for header in self._amount_headers(currencies)],
             tablefmt="pretty",
-            colalign=("left", "right", "right")
+            colalign=("left",) + ("right",) * separator_width
         )
 
     def display_category_data(self, category: str):
-        """Display spending for a specific category across all months."""
+        """Display spending for a specific category across all months.
+
+        Rows are streamed and paged as they are computed; column widths come from the
+        category's name dictionaries and an upper bound on its amounts.
+        """
         # Use Display.header
         Display.header(f"📈 Spending History for {category}", level=2)
 
-        table_data = []
-        yearly_totals = defaultdict(lambda: defaultdict(float))
+        category_rows = self.columns.rows_with("category", category, self.rows)
+        currencies = self.get_report_currencies(category_rows)
+        name_width = max(
+            [20, self._month_name_width()]
+            + [visible_width(f"  └─ {name}") for name in self.columns.subcategory.present_values()]
+        )
+
+        Display.stream_table(
+            self._category_history_rows(category, currencies),
+            headers=["\033[1mMonth\033[0m"] + [f"\033[1m{header}\033[0m" for header in self._amount_headers(currencies)],
+            colalign=("left",) + ("right",) * len(self._amount_headers(currencies)),
+            widths=[name_width] + self._amount_widths(category_rows, currencies)
+        )
+
+    def _category_history_rows(self, category: str, currencies: List[str]) -> Iterator[Tuple[Optional[int], List[str]]]:
+        """Yield (year, row) for the category history table, one month at a time."""
+        # Totals are kept in integer minor units per currency: {year: {currency: minor}}
+        yearly_totals = defaultdict(lambda: defaultdict(int))
+        yearly_base = defaultdict(float)
 
+        columns = self.columns
         for (year, month) in self.get_available_months():
-            transactions = self.month_grouped_transactions[(year, month)]
-            category_transactions = [t for t in transactions if t.category == category]
+            category_rows = columns.rows_with("category", category, self.month_rows[(year, month)])
             
-            if category_transactions:
+            if category_rows:
                 month_name = datetime(year, month, 1).strftime('%B %Y')
-                total_amount = sum(t.amount for t in category_transactions)
-                yearly_totals[year]["total"] += total_amount
+                month_totals = defaultdict(int)
+                subcategory_totals = defaultdict(lambda: defaultdict(int))
+                for (currency_code,), total in columns.group_sum(("currency",), category_rows).items():
+                    currency = columns.currency.decode(currency_code)
+                    month_totals[currency] += total
+                    yearly_totals[year][currency] += total
+                for (subcategory_code, currency_code), total in columns.group_sum(("subcategory", "currency"), category_rows).items():
+                    subcategory = columns.subcategory.decode(subcategory_code)
+                    if subcategory:
+                        subcategory_totals[subcategory][columns.currency.decode(currency_code)] += total
+                subcategory_base = self._base_totals(("subcategory",), category_rows)
+                month_base = sum(subcategory_base.values())
+                yearly_base[year] += month_base
                 
                 # Add month data
-                table_data.append([
-                    month_name,
-                    f"${total_amount:,.2f}"
-                ])
+                yield year, [month_name] + self._amount_cells(month_totals, month_base, currencies)
 
                 # Add subcategories
-                subcategory_totals = defaultdict(float)
-                for t in category_transactions:
-                    if t.subcategory:
-                        subcategory_totals[t.subcategory] += t.amount
-                
-                for subcat, amount in sorted(subcategory_totals.items()):
-                    table_data.append([
-                        f"  └─ {subcat}",
-                        f"${amount:,.2f}"
-                    ])
+                for subcat, amounts in sorted(subcategory_totals.items()):
+                    yield year, [f"  └─ {subcat}"] + self._amount_cells(
+                        amounts, subcategory_base.get((columns.subcategory.code_of(subcat),), 0.0), currencies
+                    )
 
         # Add yearly totals
-        table_data.append(["=" * 20, "=" * 15])
+        yield None, ["=" * 20] + ["=" * 15] * len(self._amount_headers(currencies))
         for year in sorted(yearly_totals.keys()):
-            table_data.append([
-                f"\033[1m{year} Total\033[0m",
-                f"${yearly_totals[year]['total']:,.2f}"
-            ])
-
-        # Use Display.table
-        Display.table(
-            table_data,
-            headers=["\033[1mMonth\033[0m", "\033[1mAmount\033[0m"],
-            tablefmt="pretty",
-            colalign=("left", "right")
-        )
+            yield year, [f"\033[1m{year} Total\033[0m"] + self._amount_cells(yearly_totals[year], yearly_base[year], currencies)
 
     def display_tag_data(self, tag: str):
-        """Display spending for a specific tag across all months."""
+        """Display spending for a specific tag across all months.
+
+        Rows are streamed and paged as they are computed, like the category history.
+        """
         # Use Display.header
         Display.header(f"🏷️ Spending History for Tag: {tag}", level=2)
 
-        table_data = []
-        yearly_totals = defaultdict(lambda: defaultdict(float))
+        month_rows = self.tag_month_rows(tag)
+        tag_rows = [row for rows in month_rows.values() for row in rows]
+        currencies = self.get_report_currencies(tag_rows)
+        rows = self._tag_history_rows(month_rows, currencies)
+        first_row = next(rows, None)
+        if first_row is None:
+            Display.message("No transactions found with this tag.")
+            return
 
-        for (year, month) in self.get_available_months():
-            transactions = self.month_grouped_transactions[(year, month)]
-            tag_transactions = [t for t in transactions if t.tag == tag]
+        name_width = max(
+            [20, self._month_name_width()]
+            + [visible_width(f"  └─ {name}") for name in self.columns.category.present_values()]
+        )
+
+        Display.stream_table(
+            chain([first_row], rows),
+            headers=["Month/Category"] + self._amount_headers(currencies),
+            colalign=("left",) + ("right",) * len(self._amount_headers(currencies)),
+            widths=[name_width] + self._amount_widths(tag_rows, currencies)
+        )
+
+    def _tag_history_rows(self, month_rows: Dict[Tuple[int, int], List[int]],
+                          currencies: List[str]) -> Iterator[Tuple[Optional[int], List[str]]]:
+        """Yield (year, row) for the tag history table, one month at a time, from the tag's rows by month."""
+        # Totals are kept in integer minor units per currency
+        yearly_totals = defaultdict(lambda: defaultdict(int))
+        yearly_base = defaultdict(float)
+        blank_row = [""] * (1 + len(self._amount_headers(currencies)))
+
+        columns = self.columns
+        first_month = True
+        for (year, month) in sorted(month_rows):
+            tag_rows = month_rows[(year, month)]
             
-            if tag_transactions:
+            if tag_rows:
                 month_name = datetime(year, month, 1).strftime('%B %Y')
-                currency_totals = defaultdict(float)
-                category_totals = defaultdict(lambda: defaultdict(float))
+                currency_totals = defaultdict(int)
+                category_totals = defaultdict(lambda: defaultdict(int))
                 
-                for t in tag_transactions:
-                    currency_totals[t.currency] += t.amount
-                    yearly_totals[year][t.currency] += t.amount
-                    category_totals[t.category][t.currency] += t.amount
+                for (category_code, currency_code), total in columns.group_sum(("category", "currency"), tag_rows).items():
+                    currency = columns.currency.decode(currency_code)
+                    currency_totals[currency] += total
+                    yearly_totals[year][currency] += total
+                    category_totals[columns.category.decode(category_code)][currency] += total
+                category_base = self._base_totals(("category",), tag_rows)
+                month_base = sum(category_base.values())
+                yearly_base[year] += month_base
+
+                # Add spacing between months
+                if not first_month:
+                    yield None, blank_row
+                first_month = False
 
                 # Add month header
-                table_data.append([
-                    month_name,
-                    f"${currency_totals['CAD']:,.2f}" if currency_totals['CAD'] > 0 else "-",
-                    f"${currency_totals['USD']:,.2f}" if currency_totals['USD'] > 0 else "-"
-                ])
+                yield year, [month_name] + self._amount_cells(currency_totals, month_base, currencies)
 
                 # Add category breakdown
                 for category, amounts in category_totals.items():
-                    table_data.append([
-                        f"  └─ {category}",
-                        f"${amounts['CAD']:,.2f}" if amounts['CAD'] > 0 else "-",
-                        f"${amounts['USD']:,.2f}" if amounts['USD'] > 0 else "-"
-                    ])
-                
-                # Add spacing between months
-                table_data.append(["", "", ""])
-
-        # Remove last empty row
-        if table_data and not any(table_data[-1]):
-            table_data.pop()
+                    yield year, [f"  └─ {category}"] + self._amount_cells(
+                        amounts, category_base.get((columns.category.code_of(category),), 0.0), currencies
+                    )
 
         # Add yearly subtotals
         if yearly_totals:
-            table_data.append(["-" * 20, "-" * 15, "-" * 15])
+            yield None, ["-" * 20] + ["-" * 15] * len(self._amount_headers(currencies))
             for year in sorted(yearly_totals.keys()):
-                totals = yearly_totals[year]
-                row = [
-                    f"{year} Total",
-                    f"${totals['CAD']:,.2f}" if totals['CAD'] > 0 else "-",
-                    f"${totals['USD']:,.2f}" if totals['USD'] > 0 else "-"
-                ]
-                table_data.append(row)
-
-        # Use Display.table or Display.message if no data
-        if table_data:
-            Display.table(
-                table_data,
-                headers=["Month/Category", "CAD", "USD"],
-                tablefmt="pretty",
-                colalign=("left", "right", "right")
+                yield year, [f"{year} Total"] + self._amount_cells(yearly_totals[year], yearly_base[year], currencies)
+
+    def display_period_data(self, start, end, title: str):
+        """Display category totals between two dates (inclusive), answered from the prefix-sum index."""
+        Display.header(f"🗓️ {title}", level=2)
+        Display.message(f"{start.strftime('%d %b %Y')} – {end.strftime('%d %b %Y')}")
+
+        index = self.get_period_index()
+        category_totals = index.category_totals(start, end)
+        base_totals = index.category_base_totals(start, end)
+        categories = sorted(set(category_totals) | set(base_totals))
+        if not categories:
+            Display.message("No transactions in this period.")
+            return
+
+        currencies = self._order_currencies({currency for amounts in category_totals.values() for currency in amounts})
+        totals = defaultdict(int)
+        table_data = []
+        for category in categories:
+            amounts = category_totals.get(category, {})
+            for currency, amount in amounts.items():
+                totals[currency] += amount
+            table_data.append([category] + self._amount_cells(amounts, base_totals.get(category, 0.0), currencies))
+        table_data.append(["=" * 20] + ["=" * 15] * len(self._amount_headers(currencies)))
+        table_data.append(["\033[1mTOTAL\033[0m"] + self._amount_cells(totals, sum(base_totals.values()), currencies))
+
+        Display.table(
+            table_data,
+            headers=["Category"] + self._amount_headers(currencies),
+            tablefmt="pretty",
+            colalign=("left",) + ("right",) * len(self._amount_headers(currencies))
+        )
+
+    def display_trend_data(self, month: int, year: int):
+        """Display rolling means, year-over-year change and trend slope per category and subcategory."""
+        month_name = datetime(year, month, 1).strftime('%B %Y')
+        Display.header(f"📉 Spending Trends as of {month_name}", level=2)
+
+        engine = self.get_trend_engine()
+        columns = self.columns
+        series_by_category = defaultdict(list)
+        for key in engine.series_keys():
+            series_by_category[columns.category.decode(key[0])].append(key)
+
+        table_data = []
+        for category in sorted(series_by_category):
+            if category in RESERVED_CATEGORIES:
+                continue
+            # Whole-category series first, then subcategories by name, each in currency order
+            keys = sorted(
+                series_by_category[category],
+                key=lambda key: (key[1] != -1, columns.subcategory.decode(key[1]) if key[1] != -1 else "",
+                                 self._currency_rank(columns.currency.decode(key[2])))
             )
-        else:
-            Display.message("No transactions found with this tag.")
+            for key in keys:
+                stats = engine.stats(key, year, month)
+                if stats is None or not (stats.current or any(stats.rolling_means.values())):
+                    continue
+                currency = columns.currency.decode(key[2])
+                label = f"\033[1m{category}\033[0m" if key[1] == -1 else f"  └─ {columns.subcategory.decode(key[1])}"
+                table_data.append(
+                    [label, currency, self._format_minor(stats.current, currency)]
+                    + [self._format_minor(stats.rolling_means[window], currency) for window in ROLLING_WINDOWS]
+                    + [self._format_change(stats.yoy_delta, currency), self._format_change(stats.slope, currency)]
+                )
+
+        if not table_data:
+            Display.message("No spending in the twelve months up to this month.")
+            return
+        Display.table(
+            table_data,
+            headers=["Category", "Currency", "This Month"] + [f"{window}-mo Avg" for window in ROLLING_WINDOWS] + ["YoY Δ", "Trend/mo"],
+            tablefmt="pretty",
+            colalign=("left", "left") + ("right",) * (len(ROLLING_WINDOWS) + 3)
+        )
+
+    def display_recurring_data(self, series_list: List, title: str = "Recurring Transactions"):
+        """Display detected recurring charges with their typical amount and next expected date."""
+        Display.header(f"🔁 {title}", level=2)
+        if not series_list:
+            Display.message("No recurring transactions found.")
+            return
+        table_data = [
+            [
+                series.description, series.category, series.period.capitalize(),
+                self._format_minor(series.amount_minor, series.currency) + f" {series.currency}",
+                series.occurrences, series.last_date.strftime('%d %b %Y'), series.next_date.strftime('%d %b %Y'),
+            ]
+            for series in series_list
+        ]
+        Display.table(
+            table_data,
+            headers=["Description", "Category", "Every", "Amount", "Times", "Last", "Next Expected"],
+            tablefmt="pretty",
+            colalign=("left", "left", "left", "right", "right", "left", "left")
+        )
+
+    def _currency_rank(self, currency: str) -> Tuple[int, str]:
+        priority = [code.upper() for code in self.currency_config.get('currency_priority', [])]
+        return (priority.index(currency), "") if currency in priority else (len(priority), currency)
+
+    def _format_minor(self, amount_minor: float, currency: str) -> str:
+        """Format a (possibly fractional) minor-unit amount, "-" when zero."""
+        if not amount_minor:
+            return "-"
+        return self._format_money(from_minor_units(amount_minor, currency), currency)
+
+    def _format_change(self, amount_minor: Optional[float], currency: str) -> str:
+        """Signed minor-unit change, "n/a" when it cannot be computed."""
+        if amount_minor is None:
+            return "n/a"
+        formatted = self._format_minor(amount_minor, currency)
+        return formatted if amount_minor <= 0 else f"+{formatted}"
+
+    def _amount_headers(self, currencies: List[str]) -> List[str]:
+        """One amount column per currency, plus the consolidated base column when FX rates are loaded."""
+        if self.fx_rates is None:
+            return list(currencies)
+        return list(currencies) + [f"Total ({self.fx_rates.base_currency})"]
+
+    def _amount_cells(self, minor_by_currency: Dict[str, int], base_total: float, currencies: List[str]) -> List[str]:
+        """Formatted per-currency amounts ("-" when zero) and the base-currency total if shown."""
+        cells = [
+            self._format_money(from_minor_units(minor_by_currency[currency], currency), currency)
+            if minor_by_currency.get(currency) else "-"
+            for currency in currencies
+        ]
+        if self.fx_rates is not None:
+            cells.append(self._format_money(base_total, self.fx_rates.base_currency) if base_total else "-")
+        return cells
+
+    def _amount_widths(self, rows: List[int], currencies: List[str]) -> List[int]:
+        """Column widths for the amount columns, from an upper bound on any total over these rows."""
+        bounds = self.columns.currency_amount_bounds(rows)
+        widths = [
+            max(15, visible_width(self._format_money(-from_minor_units(bounds.get(currency, 0), currency), currency)))
+            for currency in currencies
+        ]
+        if self.fx_rates is not None:
+            base_bound = sum(
+                from_minor_units(bound, currency) * (self.fx_rates.max_rate(currency) or 0)
+                for currency, bound in bounds.items()
+            )
+            widths.append(max(15, visible_width(self._format_money(-base_bound, self.fx_rates.base_currency))))
+        return widths
+
+    def _base_totals(self, key_names: Tuple[str, ...], rows: List[int]) -> Dict[Tuple[int, ...], float]:
+        """Base-currency totals grouped by codes, or empty when no FX table is loaded."""
+        if self.fx_rates is None:
+            return {}
+        totals, unconverted = self.columns.group_sum_converted(key_names, rows, self.fx_rates)
+        if unconverted:
+            logger.warning(f"{unconverted} transactions have no FX rate into {self.fx_rates.base_currency} and are left out of base totals")
+        return totals
+
+    def _format_money(self, amount: float, currency: str) -> str:
+        """Format a major-unit amount with the currency's configured symbol and thousands separators."""
+        return format_currency(amount, currency, self.currency_config, grouping=True)
+
+    @staticmethod
+    def _month_name_width() -> int:
+        """Widest "<Month> <Year>" label."""
+        return max(visible_width(datetime(2000, month, 1).strftime('%B %Y')) for month in range(1, 13))
 
     @staticmethod
     def _format_currency(amount: float, currency: str) -> str:
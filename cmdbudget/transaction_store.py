@@ -0,0 +1,561 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file provides single-file and time-partitioned transaction storage
+# License: MIT
+
+import csv
+import json
+import logging
+import os
+import stat
+from collections import Counter, defaultdict, deque
+from contextlib import ExitStack, contextmanager
+from datetime import date, datetime
+from typing import Callable, Deque, Dict, List, Optional, Tuple, Union
+
+from .block_archive import (
+    ARCHIVE_CODECS, ARCHIVE_INDEX_SUFFIX, archive_path_for, extract_block_archive,
+    is_block_archive, remove_block_archive, write_block_archive
+)
+from .config import (
+    DEFAULT_STORAGE_LAYOUT, DEFAULT_PARTITION_DIR, DEFAULT_PARTITION_GRANULARITY,
+    DEFAULT_ARCHIVE_COMPRESSION, STORAGE_DATE_FORMAT
+)
+from .csv_month_index import MonthOffsetIndex
+from .display import Display
+from .file_lock import FileLock, atomic_write
+from .transaction import Transaction
+from .transaction_columns import RESERVED_CATEGORIES
+from .transaction_operations import TransactionOperations
+from .utils import get_state_path
+
+logger = logging.getLogger(__name__)
+
+MonthKey = Tuple[int, int]
+# Rewrite callback: None keeps the row, a transaction replaces it, a list (maybe empty) replaces it with those rows
+EditFunction = Callable[[Transaction], Union[None, Transaction, List[Transaction]]]
+
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 1
+PARTITION_GRANULARITIES = ("year", "month")
+
+
+class CsvTransactionStore:
+    """The original layout: the whole history in one CSV file, treated as a single partition.
+
+    Month views go through a `MonthOffsetIndex`, so they still avoid parsing the full file.
+    """
+
+    def __init__(self, file_path: str, index_path: Optional[str] = None):
+        self.file_path = file_path
+        self.month_index = MonthOffsetIndex(file_path, index_path)
+
+    def partition_key(self, day: datetime) -> str:
+        return ""
+
+    def partition_files(self, start: Optional[date] = None, end: Optional[date] = None) -> List[str]:
+        return [self.file_path]
+
+    def is_sealed(self, key: str) -> bool:
+        return False
+
+    def refresh(self):
+        self.month_index.refresh()
+
+    def generation(self) -> Tuple:
+        """Changes whenever the stored history does: the transactions file's stat."""
+        return file_signature([self.file_path])
+
+    def available_months(self) -> List[MonthKey]:
+        self.month_index.refresh()
+        return self.month_index.months()
+
+    def read_months(self, keys: List[MonthKey]) -> List[Transaction]:
+        # Refresh and read against the same file: a rewrite cannot slip in between
+        with FileLock(self.file_path, exclusive=False):
+            self.month_index.refresh()
+            return self.month_index.read_months(keys)
+
+    def read_partition(self, key: str, start: Optional[date] = None, end: Optional[date] = None) -> List[Transaction]:
+        if not os.path.exists(self.file_path):
+            return []
+        return TransactionOperations.read_transactions(self.file_path, start, end)
+
+    def read_range(self, start: Optional[date] = None, end: Optional[date] = None) -> List[Transaction]:
+        return self.read_partition("", start, end)
+
+    def write_partition(self, key: str, transactions: List[Transaction]) -> bool:
+        return TransactionOperations.write_transactions(transactions, self.file_path)
+
+    def save(self, transaction: Transaction) -> bool:
+        return TransactionOperations.save_transaction(transaction, self.file_path)
+
+    def save_many(self, transactions: List[Transaction]) -> bool:
+        return TransactionOperations.save_transactions(transactions, self.file_path)
+
+    def replace_transaction(self, key: str, original: Transaction, replacements: List[Transaction]) -> bool:
+        """Swap one stored transaction for its edited version(s), re-reading the file under its lock."""
+        with FileLock(self.file_path):
+            return _replace_in(self, key, original, replacements)
+
+    def rewrite_partitions(self, keys: List[str], edit: EditFunction,
+                           verify: Optional[Callable[[], bool]] = None) -> Optional[int]:
+        """Stream the file through `edit` in one atomic rewrite. Returns the rows changed, None on failure.
+
+        When `verify` is given it is called once the new file is written; if it returns
+        False the original is kept and None is returned.
+        """
+        return _rewrite_files([(self.file_path, edit)], verify)
+
+
+class PartitionedTransactionStore:
+    """Transactions split into one CSV per year (or month) under a directory, plus a manifest.
+
+    The manifest (`manifest.json`) records each partition's file, row count, date range,
+    reportable rows per month and whether it is sealed. Reads open only the partitions a
+    date range touches, appends and rewrites touch only the transaction's own partition,
+    and sealed partitions are made read-only on disk and refused for writes. Sealed
+    partitions are also block-compressed (see block_archive.py) unless compression is "none".
+    """
+
+    def __init__(self, directory: str, granularity: str = DEFAULT_PARTITION_GRANULARITY,
+                 archive_compression: str = DEFAULT_ARCHIVE_COMPRESSION):
+        if granularity not in PARTITION_GRANULARITIES:
+            raise ValueError(f"Unknown partition granularity '{granularity}'. Use one of {PARTITION_GRANULARITIES}")
+        if archive_compression != "none" and archive_compression not in ARCHIVE_CODECS:
+            raise ValueError(f"Unknown archive compression '{archive_compression}'. Use 'none' or one of {tuple(ARCHIVE_CODECS)}")
+        self.directory = directory
+        self.granularity = granularity
+        self.archive_compression = archive_compression
+        self.manifest_path = os.path.join(directory, MANIFEST_FILE)
+        self.partitions: Dict[str, dict] = {}
+        os.makedirs(directory, exist_ok=True)
+        self._load_manifest()
+
+    # --- Partition keys ---
+
+    def partition_key(self, day: datetime) -> str:
+        """Key of the partition holding a date: '2023' for yearly, '2023-01' for monthly."""
+        if self.granularity == "month":
+            return f"{day.year}-{day.month:02d}"
+        return f"{day.year}"
+
+    def partition_path(self, key: str) -> str:
+        """Current file of a partition: the plain CSV, or its archive once sealed and compressed."""
+        file_name = self.partitions.get(key, {}).get("file") or f"{key}.csv"
+        return os.path.join(self.directory, file_name)
+
+    def partition_keys(self, start: Optional[date] = None, end: Optional[date] = None) -> List[str]:
+        """Sorted keys of partitions whose period overlaps [start, end] (open-ended when None)."""
+        keys = []
+        for key in sorted(self.partitions):
+            first, last = self._key_bounds(key)
+            if (start is None or last >= start) and (end is None or first <= end):
+                keys.append(key)
+        return keys
+
+    def partition_files(self, start: Optional[date] = None, end: Optional[date] = None) -> List[str]:
+        return [self.partition_path(key) for key in self.partition_keys(start, end)]
+
+    def _key_bounds(self, key: str) -> Tuple[date, date]:
+        if self.granularity == "month":
+            year, month = map(int, key.split("-"))
+            last_day = date(year + month // 12, month % 12 + 1, 1).toordinal() - 1
+            return date(year, month, 1), date.fromordinal(last_day)
+        year = int(key)
+        return date(year, 1, 1), date(year, 12, 31)
+
+    # --- Reads ---
+
+    def refresh(self):
+        self._load_manifest()
+
+    def generation(self) -> Tuple:
+        """Changes whenever the stored history does: every write rewrites the manifest."""
+        return file_signature([self.manifest_path])
+
+    def available_months(self) -> List[MonthKey]:
+        """Months with reportable transactions, straight from the manifest (no file is opened)."""
+        months = set()
+        for entry in self.partitions.values():
+            for month, count in entry["months"].items():
+                if count > 0:
+                    year, month_number = map(int, month.split("-"))
+                    months.add((year, month_number))
+        return sorted(months)
+
+    def read_partition(self, key: str, start: Optional[date] = None, end: Optional[date] = None) -> List[Transaction]:
+        """Transactions of one partition, optionally limited to [start, end] (archives decompress only those blocks)."""
+        path = self.partition_path(key)
+        if key not in self.partitions or not os.path.exists(path):
+            return []
+        return TransactionOperations.read_transactions(path, start, end)
+
+    def read_range(self, start: Optional[date] = None, end: Optional[date] = None) -> List[Transaction]:
+        """Transactions dated within [start, end], reading only the overlapping partitions."""
+        return [
+            transaction
+            for key in self.partition_keys(start, end)
+            for transaction in self.read_partition(key, start, end)
+        ]
+
+    def read_months(self, keys: List[MonthKey]) -> List[Transaction]:
+        wanted = set(keys)
+        transactions = []
+        for year, month in sorted(wanted):
+            first = date(year, month, 1)
+            last = date.fromordinal(date(year + month // 12, month % 12 + 1, 1).toordinal() - 1)
+            transactions.extend(self.read_partition(self.partition_key(first), first, last))
+        return transactions
+
+    # --- Writes ---
+
+    def save(self, transaction: Transaction) -> bool:
+        """Append one transaction to its own partition."""
+        return self.save_many([transaction])
+
+    def save_many(self, transactions: List[Transaction]) -> bool:
+        """Append transactions, touching only the partitions they fall in."""
+        with self._write_lock():
+            return self._save_many(transactions)
+
+    def _save_many(self, transactions: List[Transaction]) -> bool:
+        by_partition: Dict[str, List[Transaction]] = {}
+        for transaction in transactions:
+            by_partition.setdefault(self.partition_key(transaction.date), []).append(transaction)
+        for key in by_partition:
+            if not self._check_writable(key):
+                return False
+
+        success = True
+        for key, partition_transactions in by_partition.items():
+            entry = self.partitions.setdefault(key, self._new_entry(key))
+            if not TransactionOperations.save_transactions(partition_transactions, self.partition_path(key)):
+                success = False
+                break
+            for transaction in partition_transactions:
+                self._add_to_stats(entry, transaction)
+        self._save_manifest()
+        return success
+
+    def write_partition(self, key: str, transactions: List[Transaction]) -> bool:
+        """Rewrite one partition with the given transactions (used by edits)."""
+        with self._write_lock():
+            return self._write_partition(key, transactions)
+
+    def replace_transaction(self, key: str, original: Transaction, replacements: List[Transaction]) -> bool:
+        """Swap one stored transaction for its edited version(s), re-reading its partition under the lock."""
+        with self._write_lock():
+            return _replace_in(self, key, original, replacements)
+
+    def rewrite_partitions(self, keys: List[str], edit: EditFunction,
+                           verify: Optional[Callable[[], bool]] = None) -> Optional[int]:
+        """Stream the given partitions through `edit` and commit them together.
+
+        Every rewritten partition is fully written before any replaces its original,
+        and the manifest is saved once afterwards with the partitions' new statistics.
+        If `verify` returns False once all are written, nothing is replaced.
+        Returns the number of rows changed, or None if nothing was written.
+        """
+        with self._write_lock():
+            keys = [key for key in keys if key in self.partitions]
+            for key in keys:
+                if not self._check_writable(key):
+                    return None
+            entries = {key: self._new_entry(key) for key in keys}
+
+            def edit_counted(entry: dict) -> EditFunction:
+                def edit_row(transaction: Transaction):
+                    edited = edit(transaction)
+                    kept = [transaction] if edited is None else [edited] if isinstance(edited, Transaction) else edited
+                    for row in kept:
+                        self._add_to_stats(entry, row)
+                    return edited
+                return edit_row
+
+            changed = _rewrite_files([(self.partition_path(key), edit_counted(entries[key])) for key in keys], verify)
+            if changed is None:
+                return None
+            self.partitions.update(entries)
+            self._save_manifest()
+            return changed
+
+    def _write_partition(self, key: str, transactions: List[Transaction]) -> bool:
+        if not self._check_writable(key):
+            return False
+        if not TransactionOperations.write_transactions(transactions, self.partition_path(key)):
+            return False
+        entry = self._new_entry(key)
+        entry["sealed"] = self.is_sealed(key)
+        for transaction in transactions:
+            self._add_to_stats(entry, transaction)
+        self.partitions[key] = entry
+        self._save_manifest()
+        return True
+
+    def import_file(self, file_path: str) -> int:
+        """Split an existing single-file history into partitions. Returns the number of rows moved."""
+        transactions = TransactionOperations.read_transactions(file_path)
+        by_partition: Dict[str, List[Transaction]] = {}
+        for transaction in transactions:
+            by_partition.setdefault(self.partition_key(transaction.date), []).append(transaction)
+        with self._write_lock():
+            for key, partition_transactions in sorted(by_partition.items()):
+                existing = self.read_partition(key)
+                if not self._write_partition(key, existing + partition_transactions):
+                    raise IOError(f"Could not write partition {key} while importing {file_path}")
+        return len(transactions)
+
+    # --- Sealing (archiving) ---
+
+    def is_sealed(self, key: str) -> bool:
+        return bool(self.partitions.get(key, {}).get("sealed"))
+
+    def seal(self, key: str) -> bool:
+        """Archive a partition: compress it into blocks (if enabled), drop its write bits and refuse writes."""
+        with self._write_lock():
+            return self._seal(key)
+
+    def _seal(self, key: str) -> bool:
+        if key not in self.partitions or self.is_sealed(key):
+            return False
+        path = self.partition_path(key)
+        try:
+            if self.archive_compression != "none":
+                archive_path = archive_path_for(path, self.archive_compression)
+                write_block_archive(path, archive_path, self.archive_compression)
+                os.remove(path)
+                self.partitions[key]["file"] = os.path.basename(archive_path)
+                path = archive_path
+                _make_read_only(archive_path + ARCHIVE_INDEX_SUFFIX)
+            _make_read_only(path)
+        except (IOError, OSError) as e:
+            logger.error(f"Could not seal partition {key}: {e}", exc_info=True)
+            return False
+        self.partitions[key]["sealed"] = True
+        self._save_manifest()
+        logger.info(f"Sealed partition {key} ({path})")
+        return True
+
+    def unseal(self, key: str) -> bool:
+        """Make a sealed partition writable again, decompressing it back to a plain CSV."""
+        with self._write_lock():
+            return self._unseal(key)
+
+    def _unseal(self, key: str) -> bool:
+        if key not in self.partitions:
+            return False
+        path = self.partition_path(key)
+        try:
+            if is_block_archive(path):
+                csv_path = os.path.join(self.directory, f"{key}.csv")
+                extract_block_archive(path, csv_path)
+                remove_block_archive(path)
+                self.partitions[key]["file"] = os.path.basename(csv_path)
+                path = csv_path
+            os.chmod(path, os.stat(path).st_mode | stat.S_IWUSR)
+        except (IOError, OSError) as e:
+            logger.error(f"Could not unseal partition {key}: {e}", exc_info=True)
+            return False
+        self.partitions[key]["sealed"] = False
+        self._save_manifest()
+        logger.info(f"Unsealed partition {key} ({path})")
+        return True
+
+    @contextmanager
+    def _write_lock(self):
+        """Exclusive store lock for a write, with the manifest re-read so other processes' changes are kept."""
+        with FileLock(self.manifest_path):
+            self._load_manifest()
+            yield
+
+    def _check_writable(self, key: str) -> bool:
+        if self.is_sealed(key):
+            logger.error(f"Refusing to write to sealed partition {key}")
+            Display.error(f"Partition {key} is sealed (archived). Unseal it before changing its transactions.")
+            return False
+        return True
+
+    # --- Manifest ---
+
+    def _new_entry(self, key: str) -> dict:
+        return {
+            "file": os.path.basename(self.partition_path(key)),
+            "rows": 0,
+            "min_date": None,
+            "max_date": None,
+            "months": {},
+            "sealed": False,
+        }
+
+    @staticmethod
+    def _add_to_stats(entry: dict, transaction: Transaction):
+        day = transaction.date.date().isoformat()
+        entry["rows"] += 1
+        entry["min_date"] = day if entry["min_date"] is None else min(entry["min_date"], day)
+        entry["max_date"] = day if entry["max_date"] is None else max(entry["max_date"], day)
+        month = day[:7]
+        reportable = 0 if transaction.category in RESERVED_CATEGORIES else 1
+        entry["months"][month] = entry["months"].get(month, 0) + reportable
+
+    def _load_manifest(self):
+        self.partitions = {}
+        if not os.path.exists(self.manifest_path):
+            return
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (IOError, ValueError) as e:
+            logger.error(f"Could not read partition manifest {self.manifest_path}: {e}", exc_info=True)
+            Display.error(f"Could not read partition manifest: {self.manifest_path}")
+            return
+        if data.get("version") != MANIFEST_VERSION:
+            logger.warning(f"Unsupported manifest version in {self.manifest_path}: {data.get('version')}")
+            return
+        if data.get("granularity") != self.granularity:
+            logger.warning(f"Manifest granularity '{data.get('granularity')}' overrides configured '{self.granularity}'")
+            self.granularity = data.get("granularity", self.granularity)
+        self.partitions = data.get("partitions", {})
+
+    def _save_manifest(self):
+        data = {
+            "version": MANIFEST_VERSION,
+            "granularity": self.granularity,
+            "partitions": {key: self.partitions[key] for key in sorted(self.partitions)},
+        }
+        try:
+            with atomic_write(self.manifest_path) as file:
+                json.dump(data, file, indent=2)
+        except IOError as e:
+            logger.error(f"Could not write partition manifest {self.manifest_path}: {e}", exc_info=True)
+            Display.error(f"Could not save partition manifest: {self.manifest_path}")
+
+
+def file_signature(paths: List[str]) -> Tuple:
+    """(path, inode, mtime, size) of each file, None for missing ones; any write changes it."""
+    signature = []
+    for path in paths:
+        try:
+            stat_result = os.stat(path)
+            signature.append((path, stat_result.st_ino, stat_result.st_mtime_ns, stat_result.st_size))
+        except FileNotFoundError:
+            signature.append((path, None, None, None))
+    return tuple(signature)
+
+
+def _replace_in(store, key: str, original: Transaction, replacements: List[Transaction]) -> bool:
+    """Re-read a partition, replace the first row matching `original` and write it back (caller holds the lock)."""
+    transactions = store.read_partition(key)
+    for index, stored in enumerate(transactions):
+        if (stored.date == original.date and stored.description == original.description
+                and stored.amount_minor == original.amount_minor and stored.category == original.category):
+            transactions[index:index + 1] = replacements
+            return store.write_partition(key, transactions)
+    logger.warning(f"Transaction '{original.description}' on {original.date} is no longer stored; edit not saved")
+    Display.warning("The transaction was changed or removed by another session. Reload and try again.")
+    return False
+
+
+def replace_records(store, groups: List[Tuple[List[List[str]], List[List[str]]]]) -> bool:
+    """Replace stored rows, matched by content, with new rows, all or nothing. Returns True on success.
+
+    Rows are given as `TransactionOperations.transaction_to_record` values. Each
+    group's new rows take the place of its first stored row and its other stored
+    rows are dropped; groups with no stored rows are appended. Only the partitions
+    holding the rows are streamed, and if any row is no longer stored exactly as
+    given, nothing is written.
+    """
+    wanted: Counter = Counter()
+    replacements: Dict[tuple, Deque[List[List[str]]]] = defaultdict(deque)
+    keys = set()
+    for stored, new in groups:
+        if not stored:
+            continue
+        wanted.update(tuple(record) for record in stored)
+        replacements[tuple(stored[0])].append(new)
+        keys.update(store.partition_key(datetime.strptime(record[0], STORAGE_DATE_FORMAT)) for record in stored)
+
+    if keys:
+        def edit(transaction: Transaction):
+            record = tuple(TransactionOperations.transaction_to_record(transaction))
+            if wanted[record] <= 0:
+                return None
+            wanted[record] -= 1
+            pending = replacements.get(record)
+            if pending:
+                return [TransactionOperations.transaction_from_record(values) for values in pending.popleft()]
+            return []
+
+        def verify() -> bool:
+            if +wanted:
+                Display.warning(f"{sum((+wanted).values())} of the transactions involved have been "
+                                f"edited or removed since.")
+                return False
+            return True
+
+        if store.rewrite_partitions(sorted(keys), edit, verify) is None:
+            return False
+
+    appended = [TransactionOperations.transaction_from_record(values)
+                for stored, new in groups if not stored for values in new]
+    if appended and not store.save_many(appended):
+        return False
+    store.refresh()
+    return True
+
+
+class _RewriteRejected(Exception):
+    """Raised inside a rewrite to discard the temporary files."""
+
+
+def _rewrite_files(jobs: List[Tuple[str, EditFunction]], verify: Optional[Callable[[], bool]] = None) -> Optional[int]:
+    """Rewrite each (file, edit) pair as one commit. Returns the rows changed, None on failure.
+
+    Every file is locked and streamed into its own temporary file; the temporary files
+    are renamed over the originals only once all of them have been written (and
+    `verify`, if given, accepts the result), so an error part-way leaves every file as it was.
+    """
+    changed = 0
+    try:
+        with ExitStack() as stack:
+            for path, edit in jobs:
+                stack.enter_context(FileLock(path))
+                out_file = stack.enter_context(atomic_write(path))
+                changed += TransactionOperations.rewrite_transactions(path, out_file, edit)
+            if verify is not None and not verify():
+                raise _RewriteRejected()
+    except _RewriteRejected:
+        logger.info(f"Rewrite of {[path for path, _ in jobs]} rejected by its check; nothing was changed")
+        return None
+    except (IOError, OSError, csv.Error) as e:
+        logger.error(f"Batch rewrite of {[path for path, _ in jobs]} failed, nothing was changed: {e}", exc_info=True)
+        Display.error("Could not save the batch edit. Check logs for details.")
+        return None
+    return changed
+
+
+def _make_read_only(path: str):
+    os.chmod(path, os.stat(path).st_mode & ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH))
+
+
+def open_transaction_store(config: dict, transactions_file: str):
+    """Return the store selected by `storage.layout` ('single' or 'partitioned').
+
+    Switching to the partitioned layout with an empty partition directory migrates the
+    rows of the existing single file into partitions (the file itself is left in place).
+    """
+    storage = config.get("storage", {}) if config else {}
+    layout = storage.get("layout", DEFAULT_STORAGE_LAYOUT)
+    if layout != "partitioned":
+        index_path = get_state_path(config or {}, f"{os.path.basename(transactions_file)}.months.json")
+        return CsvTransactionStore(transactions_file, index_path)
+
+    store = PartitionedTransactionStore(
+        storage.get("partition_dir", DEFAULT_PARTITION_DIR),
+        storage.get("partition_granularity", DEFAULT_PARTITION_GRANULARITY),
+        storage.get("archive_compression", DEFAULT_ARCHIVE_COMPRESSION),
+    )
+    if not store.partitions and os.path.exists(transactions_file) and os.path.getsize(transactions_file) > 0:
+        moved = store.import_file(transactions_file)
+        if moved:
+            Display.message(f"Migrated {moved} transactions from {transactions_file} into partitions under {store.directory}")
+    return store
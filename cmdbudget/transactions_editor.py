@@ -2,28 +2,36 @@
 # This file handles editing and updating existing transactions
 # License: MIT
 
-import csv
-from typing import Dict, List
+from dataclasses import replace
+from typing import List
 from datetime import datetime
-from .transaction import Transaction
+from .transaction import Transaction, parse_tags
 from .transaction_operations import TransactionOperations
+from .transaction_store import CsvTransactionStore
+from .currency_utils import to_minor_units, from_minor_units
 from .display import Display
 
 class TransactionEditor:
-    def __init__(self, transactions_file: str, classifier):
+    def __init__(self, transactions_file: str, classifier, store=None, undo_log=None):
         self.transactions_file = transactions_file
         self.classifier = classifier
+        self.store = store or CsvTransactionStore(transactions_file)
+        self.undo_log = undo_log
 
     def edit_transaction(self, transaction: Transaction) -> bool:
-        """Edit an existing transaction."""
-        # Load all transactions
-        transactions = self._load_transactions()
+        """Edit an existing transaction (only its own storage partition is loaded and rewritten)."""
+        partition = self.store.partition_key(transaction.date)
+        if self.store.is_sealed(partition):
+            Display.warning(f"Transactions in partition {partition} are archived (sealed) and cannot be edited.")
+            return False
+        transactions = self._load_transactions(partition)
+        original_count = len(transactions)
         
         # Find the transaction to edit
         for idx, t in enumerate(transactions):
             if (t.date == transaction.date and 
                 t.description == transaction.description and 
-                t.amount == transaction.amount):
+                t.amount_minor == transaction.amount_minor):
                 
                 # Show edit options using Display
                 Display.message("\nEdit Transaction:")
@@ -38,27 +46,28 @@ class TransactionEditor:
                     choice = int(choice_str)
                     if choice == 1:
                         category, subcategory = self.classifier.prompt_for_category(t.description)
-                        transactions[idx] = self._update_transaction(t, category=category, subcategory=subcategory)
+                        replacements = [self._update_transaction(t, category=category, subcategory=subcategory)]
+                        self.classifier.relearn(t, replacements[0])
                     elif choice == 2:
-                        tag = Display.prompt("Enter tag: ").strip()
-                        transactions[idx] = self._update_transaction(t, tag=tag)
+                        current = f" (current: {', '.join(t.tags)})" if t.tags else ""
+                        tag = parse_tags(Display.prompt(f"Enter tags, separated by commas{current}: "))
+                        replacements = [self._update_transaction(t, tag=tag)]
                     elif choice == 3:
                         merchant = Display.prompt("Enter merchant: ").strip()
-                        transactions[idx] = self._update_transaction(t, merchant=merchant)
+                        replacements = [self._update_transaction(t, merchant=merchant)]
                     elif choice == 4:
-                        # Handle splitting existing transaction
-                        if self._split_existing_transaction(t, transactions):
-                            # Remove the original transaction as it's been split
-                            transactions.pop(idx)
+                        # Handle splitting existing transaction: the SPLIT marker and parts replace the original
+                        if not self._split_existing_transaction(t, transactions):
+                            return False
+                        replacements = transactions[original_count:]
                     elif choice == 5:
                         return False
                     else:
                         Display.warning("Invalid choice")
                         return False
 
-                    # Save all transactions back to file
-                    self._save_transactions(transactions)
-                    return True
+                    # Save the change against the partition as it is stored now (another session may have written to it)
+                    return self._save_transactions(partition, t, replacements)
 
                 except ValueError:
                     Display.warning("Please enter a valid number")
@@ -68,24 +77,8 @@ class TransactionEditor:
         return False
 
     def _update_transaction(self, transaction: Transaction, **kwargs) -> Transaction:
-        """Create a new transaction with updated fields."""
-        # Create a dictionary of the transaction's current values
-        transaction_dict = {
-            "date": transaction.date,
-            "description": transaction.description,
-            "amount": transaction.amount,
-            "currency": transaction.currency,
-            "category": transaction.category,
-            "subcategory": transaction.subcategory,
-            "tag": transaction.tag,
-            "merchant": transaction.merchant
-        }
-        
-        # Update with any provided kwargs
-        transaction_dict.update(kwargs)
-        
-        # Create and return new transaction
-        return Transaction(**transaction_dict)
+        """Create a new transaction with updated fields (category, subcategory, tag, merchant)."""
+        return replace(transaction, **kwargs)
 
     def _split_existing_transaction(self, transaction: Transaction, all_transactions: List[Transaction]) -> bool:
         """Handle splitting an existing transaction."""
@@ -93,23 +86,26 @@ class TransactionEditor:
         split_transaction = self._update_transaction(transaction, category="SPLIT", subcategory="")
         all_transactions.append(split_transaction)
         
-        remaining_amount = transaction.amount
-        while remaining_amount > 0:
+        currency = transaction.currency
+        # Work in integer minor units so the remaining amount reaches exactly zero
+        remaining_minor = transaction.amount_minor
+        while remaining_minor > 0:
+            remaining_amount = from_minor_units(remaining_minor, currency)
             Display.message(f"\nRemaining amount to split: ${remaining_amount:.2f}")
             split_choice = Display.prompt("Would you like to add another split? (y/n): ").lower()
             
             if split_choice != 'y':
-                if remaining_amount > 0:
+                if remaining_minor > 0:
                     Display.warning(f"Warning: ${remaining_amount:.2f} of the transaction will be unaccounted for.")
                 break
             
             while True:
                 try:
                     split_amount_str = Display.prompt("Enter split amount: $")
-                    split_amount = float(split_amount_str)
-                    if split_amount <= 0:
+                    split_minor = to_minor_units(split_amount_str, currency)
+                    if split_minor <= 0:
                         Display.warning("Amount must be positive.")
-                    elif split_amount > remaining_amount:
+                    elif split_minor > remaining_minor:
                         Display.warning(f"Amount cannot exceed remaining amount (${remaining_amount:.2f})")
                     else:
                         break
@@ -120,56 +116,37 @@ class TransactionEditor:
             category, subcategory = self.classifier.prompt_for_category(split_description)
             
             # Create split transaction
-            split = Transaction(
+            split = TransactionOperations.create_transaction(
                 date=transaction.date,
                 description=split_description,
-                amount=split_amount,
-                currency=transaction.currency,
+                amount=None,
+                currency=currency,
                 category=category,
                 subcategory=subcategory,
                 tag="",
-                merchant=""
+                merchant="",
+                amount_minor=split_minor
             )
             all_transactions.append(split)
-            remaining_amount -= split_amount
+            self.classifier.learn(split)
+            remaining_minor -= split_minor
         
         return True
 
-    def _load_transactions(self) -> List[Transaction]:
-        """Load all transactions from file."""
-        transactions = []
-        try:
-            with open(self.transactions_file, 'r') as file:
-                reader = csv.DictReader(file)
-                for row in reader:
-                    transactions.append(Transaction.from_row(row, TransactionOperations.parse_date_multi_format))
-        except FileNotFoundError:
-            Display.warning(f"No transactions file found at {self.transactions_file}")
+    def _load_transactions(self, partition: str) -> List[Transaction]:
+        """Load the transactions of one storage partition (the whole file for the single-file layout)."""
+        transactions = self.store.read_partition(partition)
+        if not transactions:
+            Display.warning(f"No stored transactions found for partition '{partition or self.transactions_file}'")
+        # Read with the storage date format so dates round-trip unchanged
         return transactions
 
-    def _save_transactions(self, transactions: List[Transaction]):
-        """Save all transactions back to file."""
-        with open(self.transactions_file, 'w', newline='') as file:
-            if not transactions:
-                return
-            
-            # Get fieldnames from first transaction
-            fieldnames = [
-                "Transaction Date", "Description", "Amount", "Currency",
-                "Category", "Subcategory", "Tag", "Merchant"
-            ]
-            
-            writer = csv.DictWriter(file, fieldnames=fieldnames)
-            writer.writeheader()
-            
-            for transaction in transactions:
-                writer.writerow({
-                    "Transaction Date": transaction.date.strftime("%m/%d/%y"),
-                    "Description": transaction.description,
-                    "Amount": str(transaction.amount),
-                    "Currency": transaction.currency,
-                    "Category": transaction.category,
-                    "Subcategory": transaction.subcategory,
-                    "Tag": transaction.tag,
-                    "Merchant": transaction.merchant
-                }) 
\ No newline at end of file
+    def _save_transactions(self, partition: str, original: Transaction, replacements: List[Transaction]) -> bool:
+        """Replace the original transaction in its partition with the edited version(s)."""
+        if not self.store.replace_transaction(partition, original, replacements):
+            Display.error("Error saving transactions. Check logs for details.")
+            return False
+        if self.undo_log is not None:
+            action = "Split" if len(replacements) > 1 else "Edit"
+            self.undo_log.record(f"{action} '{original.description}'", transactions=[([original], replacements)])
+        return True
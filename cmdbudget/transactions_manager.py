@@ -6,15 +6,29 @@ import csv
 import os
 from datetime import datetime, date
 from collections import defaultdict
-from typing import List, Dict, Tuple
-from .transaction import Transaction
+from typing import Iterable, List, Dict, Tuple, Optional
+from .transaction import Transaction, RawTransaction
 from .transaction_processor import NewTransactionProcessor, TransactionClassifier
 from .transaction_reporter import TransactionReporter
+from .transaction_columns import TransactionColumns
+from .fx_rates import load_fx_rates
+from .period_index import fiscal_year_of
+from .recurring import RecurringDetector, RecurringSeries, RECURRING_STATE_FILE
+from .config import DEFAULT_FISCAL_YEAR_START_MONTH, DEFAULT_UNDO_MAX_ENTRIES, DEFAULT_UNDO_RETENTION_DAYS
+from .transaction_store import open_transaction_store, replace_records
+from .block_archive import open_transaction_text
 from .transaction_operations import TransactionOperations
 import yaml
 from .transactions_editor import TransactionEditor
+from .batch_editor import BatchEditor, TransactionFilter
+from .description_index import DescriptionIndex
+from .recategorizer import Recategorizer, RecategorizationPlan, category_label
+from .undo_log import UndoLog, UNDO_LOG_FILE
+from .duplicate_finder import DuplicateFinder, DuplicateGroup
+from .search_query import QueryPlan, SearchIndex
+from .import_profiles import ProfileRegistry, IMPORT_PROFILES_STATE_FILE, profiles_from_config
 from .user_input import prompt_for_date, prompt_for_description, prompt_for_amount, prompt_for_currency
-from .utils import parse_date_multi_format
+from .utils import parse_date_multi_format, memoize_date_parser, get_state_path
 from .display import Display
 import logging
 
@@ -30,13 +44,46 @@ class TransactionsManager:
         self.config_file = config_file
         self.categories_file = categories_file
         self.mappings_file = mappings_file
-        self.data = self.load_csv()
         self.transactions = None
+        self.columns = None
         self.month_grouped_transactions = None
         self.reporter = None
         self.classifier = TransactionClassifier(config_file, categories_file, mappings_file)
-        self.editor = TransactionEditor(transactions_file, self.classifier)
+        # Single file (with a month offset index) or per-year/month partitions, per storage.layout
+        self.store = open_transaction_store(self.classifier.config, transactions_file)
+        # Persistent undo/redo history of every change, kept per the optional 'undo' config section
+        undo_config = self.classifier.config.get('undo') or {}
+        self.undo_log = UndoLog(
+            get_state_path(self.classifier.config, UNDO_LOG_FILE), self.store, self.classifier,
+            max_entries=undo_config.get('max_entries', DEFAULT_UNDO_MAX_ENTRIES),
+            retention_days=undo_config.get('retention_days', DEFAULT_UNDO_RETENTION_DAYS)
+        )
+        self.classifier.undo_log = self.undo_log
+        self.editor = TransactionEditor(transactions_file, self.classifier, store=self.store, undo_log=self.undo_log)
+        self.batch_editor = BatchEditor(self.store, self.classifier, undo_log=self.undo_log)
+        self.recategorizer = Recategorizer(self.classifier, self.store, undo_log=self.undo_log)
+        self.duplicate_finder = DuplicateFinder()
+        # Loaded history by description, built the first time a rule change is carried back
+        self.description_index: Optional[DescriptionIndex] = None
+        # Date, code and text indexes for search queries, built on the first search after a load or change
+        self.search_index: Optional[SearchIndex] = None
+        # Bank import profiles and the header fingerprints they were matched to, shared by every import
+        self.import_profiles = ProfileRegistry(
+            profiles_from_config(self.classifier.config),
+            get_state_path(self.classifier.config, IMPORT_PROFILES_STATE_FILE)
+        )
+        # Processor reused by headless imports, so its duplicate set outlives one batch of rows
+        self.headless_processor: Optional[NewTransactionProcessor] = None
         self.transaction_ops = TransactionOperations()
+        # Currency settings for reports, and optional daily FX rates for base-currency totals
+        self.currency_config = self.classifier.config.get('import_csv_structure', {})
+        self.fx_rates = load_fx_rates(self.currency_config)
+        # Recurring-charge buckets and series, persisted in the state directory
+        self.recurring = RecurringDetector(get_state_path(self.classifier.config, RECURRING_STATE_FILE))
+        # Month (1-12) in which the fiscal year starts, for period reports
+        self.fiscal_year_start_month = (self.classifier.config.get('reporting') or {}).get(
+            'fiscal_year_start_month', DEFAULT_FISCAL_YEAR_START_MONTH
+        )
 
     def load_csv(self) -> List[Dict]:
         """Reads the CSV file and returns its contents as a list of dictionaries."""
@@ -55,22 +102,122 @@ class TransactionsManager:
 
     def initialize_data(self):
         """Load and organize all transaction data upfront."""
-        self.data = self.load_csv()
-        if self.data is None:
+        self.transactions = self.build_transactions()
+        if self.transactions is None:
             logger.error("Failed to load transaction data. Cannot initialize.")
             self.transactions = []
+            self.columns = TransactionColumns()
             self.month_grouped_transactions = {}
-            self.reporter = TransactionReporter([], {})
+            self.reporter = self._make_reporter([], {}, self.columns)
             return
 
-        self.transactions = self.build_transactions()
+        self.classifier.learn_history(self.transactions)
+        self.description_index = None
+        self.search_index = None
         # Include IGNORED transactions in storage but not in reporting
         self.month_grouped_transactions = self.group_by_month(self.transactions)
-        self.reporter = TransactionReporter(self.transactions, self.month_grouped_transactions)
+        # Dictionary-encode categorical fields once; reports and lookups then work on integer codes
+        self.columns = TransactionColumns(self.transactions)
+        self.reporter = self._make_reporter(self.transactions, self.month_grouped_transactions, self.columns)
+
+    def initialize_index(self):
+        """Prepare lazy access: refresh the month index/manifest without parsing the full history."""
+        self.store.refresh()
+
+    @property
+    def is_loaded(self) -> bool:
+        """True once the full history has been parsed by initialize_data."""
+        return self.transactions is not None
+
+    def ensure_loaded(self):
+        """Parse the full history if it has not been loaded yet."""
+        if not self.is_loaded:
+            self.initialize_data()
+
+    def get_reporter(self) -> TransactionReporter:
+        """Reporter over the full history (loads it on first use)."""
+        self.ensure_loaded()
+        return self.reporter
+
+    def reload(self):
+        """Pick up changes to the transaction file, staying lazy if the history was never loaded."""
+        if self.is_loaded:
+            self.initialize_data()
+        else:
+            self.store.refresh()
+
+    def get_available_months(self) -> List[Tuple[int, int]]:
+        """Months with reportable transactions, from the store's index unless the history is loaded."""
+        if self.is_loaded:
+            return self.reporter.get_available_months()
+        return self.store.available_months()
+
+    def get_month_reporter(self, month_key: Tuple[int, int]) -> TransactionReporter:
+        """Reporter able to display one month: parses only that month and the previous one."""
+        if self.is_loaded:
+            return self.reporter
+        year, month = month_key
+        prev_key = (year, month - 1) if month > 1 else (year - 1, 12)
+        transactions = self.store.read_months([month_key, prev_key])
+        return self._make_reporter(transactions, {})
+
+    def get_fiscal_years(self) -> List[int]:
+        """Fiscal years (by starting calendar year) that have reportable transactions."""
+        return sorted({
+            fiscal_year_of(date(year, month, 1), self.fiscal_year_start_month)
+            for year, month in self.get_available_months()
+        })
 
-    def build_transactions(self) -> List[Transaction]:
-        """Build Transaction objects from CSV data."""
-        return [Transaction.from_row(row, parse_date_multi_format) for row in self.data]
+    def get_recurring_series(self, active_only: bool = True) -> List[RecurringSeries]:
+        """Detected recurring charges, using persisted state when it covers the loaded history."""
+        self.ensure_loaded()
+        generation = self.store.generation()
+        if not self.recurring.covers(generation):
+            # Missing or stale state (e.g. after edits or custom transactions): rebuild from the full history
+            self.recurring.build(self.transactions, generation)
+            self.recurring.save()
+        if active_only:
+            return self.recurring.active_series(date.today())
+        return self.recurring.all_series()
+
+    def _add_loaded_transaction(self, transaction: Transaction):
+        """Fold a newly saved transaction into the loaded history without re-reading storage."""
+        self.transactions.append(transaction)
+        self.month_grouped_transactions.setdefault((transaction.date.year, transaction.date.month), []).append(transaction)
+        if self.description_index is not None:
+            self.description_index.add(len(self.transactions) - 1, transaction.description)
+        self.search_index = None
+        # Shares self.columns; also updates the month groups and prefix-sum index
+        self.reporter.add_transaction(transaction)
+        self.store.refresh()
+
+    def _make_reporter(self, transactions, month_grouped, columns=None) -> TransactionReporter:
+        return TransactionReporter(
+            transactions, month_grouped, columns,
+            currency_config=self.currency_config, fx_rates=self.fx_rates
+        )
+
+    def build_transactions(self) -> Optional[List[Transaction]]:
+        """Build Transaction objects while streaming the stored CSV file(s). Returns None if one cannot be read.
+
+        Rows are converted one at a time so the row dictionaries never all sit in memory.
+        With partitioned storage the partition files (plain or block-compressed) are read in date order.
+        """
+        date_parser = memoize_date_parser(parse_date_multi_format)
+        transactions: List[Transaction] = []
+        for file_path in self.store.partition_files():
+            try:
+                with open_transaction_text(file_path) as file:
+                    transactions.extend(Transaction.from_row(row, date_parser) for row in csv.DictReader(file))
+            except FileNotFoundError:
+                logger.error(f"The file '{file_path}' was not found.")
+                Display.error(f"Transaction file not found: {file_path}")
+                return None
+            except Exception as e:
+                logger.error(f"Error reading file '{file_path}': {e}", exc_info=True)
+                Display.error(f"Error reading transaction file: {e}")
+                return None
+        return transactions
 
     def group_by_month(self, transactions: List[Transaction]) -> Dict[Tuple[int, int], List[Transaction]]:
         """Group transactions by month."""
@@ -86,16 +233,57 @@ class TransactionsManager:
 
     def process_new_transactions(self):
         """Process transactions from new_transactions.csv"""
-        processor = NewTransactionProcessor(
+        processor = self._make_processor()
+        generation = self.store.generation()
+        if processor.process():
+            self._after_import(processor, generation)
+            # Mappings created while answering the prompts may also fit rows imported earlier
+            for rule in self.classifier.take_changed_rules():
+                self.review_rule_change(rule)
+            # Overlapping exports (card and bank feeds) bring copies the exact duplicate check misses
+            if processor.saved_transactions:
+                self.review_duplicates(self.find_duplicates(processor.saved_transactions))
+
+    def import_rows(self, rows: Iterable[Tuple[int, Dict]], fieldnames: List[str]) -> Tuple[Dict[str, int], List[Tuple[int, RawTransaction]]]:
+        """Import (line number, row) pairs of an export with the given header without prompting, as the watch mode does.
+
+        Returns the processor's outcome counts and the rows that have no mapping yet.
+        Raises ValueError if no import profile fits the header. The processor is kept
+        between calls: its duplicate set is reloaded only when the store was changed
+        by something else, so a small batch does not cost a read of the history.
+        """
+        if self.headless_processor is None:
+            self.headless_processor = self._make_processor()
+        processor = self.headless_processor
+        generation = self.store.generation()
+        unresolved = processor.process_headless(rows, fieldnames)
+        self._after_import(processor, generation)
+        return processor.counts, unresolved
+
+    def _make_processor(self) -> NewTransactionProcessor:
+        return NewTransactionProcessor(
             self.new_transactions_file,
             self.transactions_file,
             self.config_file,
             self.categories_file,
-            self.mappings_file
+            self.mappings_file,
+            classifier=self.classifier,
+            store=self.store,
+            profiles=self.import_profiles
         )
-        if processor.process():
-            # Reinitialize data to include new transactions
-            self.initialize_data() 
+
+    def _after_import(self, processor: NewTransactionProcessor, generation: Tuple):
+        """Record the import for undo and fold it into recurring state; `generation` is the store's before it."""
+        if processor.saved_transactions:
+            self.undo_log.record(f"Import of {len(processor.saved_transactions)} transactions",
+                                 transactions=[((), processor.saved_transactions)])
+        # Fold the imported rows into recurring-charge state that matched the store before the import
+        # (missing or stale state is rebuilt on the next report instead)
+        if processor.saved_transactions and self.recurring.covers(generation):
+            self.recurring.add(processor.saved_transactions, self.store.generation())
+            self.recurring.save()
+        # Reinitialize data to include new transactions
+        self.reload()
 
     def get_categories(self) -> set:
         """Get all available categories."""
@@ -114,10 +302,12 @@ class TransactionsManager:
             return False
         
         categories.add(category)
+        before = self._stored_categories()
         with open(self.categories_file, 'w') as file:
             # Make sure to preserve IGNORED in the file even if we don't show it
             all_categories = sorted(list(categories) + ["IGNORED"])
             yaml.dump({'categories': all_categories}, file)
+        self.undo_log.record(f"Add category {category}", categories=(before, all_categories))
         return True
 
     def delete_category(self, category: str) -> bool:
@@ -125,23 +315,212 @@ class TransactionsManager:
         categories = self.get_categories()
         if category in categories:
             categories.remove(category)
+            before = self._stored_categories()
             with open(self.categories_file, 'w') as file:
                 yaml.dump({'categories': sorted(list(categories))}, file)
+            self.undo_log.record(f"Delete category {category}", categories=(before, sorted(list(categories))))
             return True
         return False
 
+    def _stored_categories(self):
+        """The categories section as it is in the file now, to record for undo."""
+        with open(self.categories_file, 'r') as file:
+            return (yaml.safe_load(file) or {}).get('categories')
+
     def has_transactions_with_category(self, category: str) -> bool:
-        """Check if any transactions use this category."""
-        return any(t.category == category for t in self.transactions) 
+        """Check if any transactions use this category (O(1) via the encoded category counts)."""
+        self.ensure_loaded()
+        return self.columns.category.count(category) > 0
 
     def edit_transaction(self, transaction: Transaction) -> bool:
         """Edit an existing transaction."""
         result = self.editor.edit_transaction(transaction)
         if result:
             # Reinitialize data to include edited transactions
-            self.initialize_data()
+            self.reload()
         return result 
 
+    def preview_batch_edit(self, selection: TransactionFilter) -> List[Transaction]:
+        """Stored transactions a batch edit with this filter would change."""
+        return self.batch_editor.preview(selection)
+
+    def batch_edit(self, selection: TransactionFilter, changes: Dict[str, str],
+                   matches: Optional[List[Transaction]] = None) -> Optional[int]:
+        """Apply field changes to every transaction the filter selects, in one write."""
+        changed = self.batch_editor.apply(selection, changes, matches)
+        if not changed:
+            return changed
+        updates = self._loaded_batch_updates(selection, changes) if self.is_loaded else None
+        if updates is not None and len(updates) == changed:
+            # Same edit on the loaded rows: columns, tag bitmaps and indexes are patched in place
+            self._update_loaded(updates)
+        else:
+            # Not loaded, or another session stored matching rows meanwhile
+            self.reload()
+        return changed
+
+    def _loaded_batch_updates(self, selection: TransactionFilter,
+                              changes: Dict[str, str]) -> List[Tuple[int, Transaction, Transaction]]:
+        """(row, old, new) for the loaded rows a batch edit changes, skipping sealed partitions."""
+        changes = self.batch_editor.prepare(changes)
+        sealed: Dict[str, bool] = {}
+        updates = []
+        for row, transaction in enumerate(self.transactions):
+            if not selection.matches(transaction):
+                continue
+            key = self.store.partition_key(transaction.date)
+            if sealed.setdefault(key, self.store.is_sealed(key)):
+                continue
+            edited = self.batch_editor.edited(transaction, changes)
+            if edited is not None:
+                updates.append((row, transaction, edited))
+        return updates
+
+    def _update_loaded(self, updates: List[Tuple[int, Transaction, Transaction]]):
+        """Swap edited transactions (same date and amount) into the loaded history and reports."""
+        for row, old, new in updates:
+            self.transactions[row] = new
+            month = self.month_grouped_transactions[(old.date.year, old.date.month)]
+            month[next(i for i, t in enumerate(month) if t is old)] = new
+        self.reporter.update_transactions([(row, new) for row, _, new in updates])
+        self.search_index = None
+        self.store.refresh()
+
+    def plan_recategorization(self, rule: str) -> RecategorizationPlan:
+        """Stored transactions the mapping rule would now categorize differently."""
+        # Built first: it loads the history when that has not happened yet
+        description_index = self.get_description_index()
+        return self.recategorizer.plan(rule, self.transactions, description_index)
+
+    def get_description_index(self) -> DescriptionIndex:
+        """Trigram index of the loaded history's descriptions (loads and builds it on first use)."""
+        self.ensure_loaded()
+        if self.description_index is None:
+            self.description_index = DescriptionIndex(self.transactions)
+        return self.description_index
+
+    def get_search_index(self) -> SearchIndex:
+        """Indexes search queries are planned against (loads and builds them on first use)."""
+        if self.search_index is None:
+            description_index = self.get_description_index()
+            self.search_index = SearchIndex(self.columns, description_index, self.reporter.rows)
+        return self.search_index
+
+    def search(self, query: str, sort: str = "date", descending: bool = True,
+               limit: Optional[int] = None, offset: int = 0) -> Tuple[List[Transaction], int]:
+        """Transactions matching a search expression, ordered, and how many match in total. Raises QueryError."""
+        result = QueryPlan(query, self.get_search_index()).execute(sort, descending, limit, offset)
+        return [self.transactions[row] for row in result.rows], result.total
+
+    def apply_recategorization(self, plan: RecategorizationPlan) -> Optional[int]:
+        """Write a re-categorization plan and update the loaded history and reports in place."""
+        changed = self.recategorizer.apply(plan)
+        if not changed:
+            return changed
+        if changed != len(plan.changes):
+            # Another session stored matching rows since the plan was made: load everything again
+            self.reload()
+            return changed
+        self._update_loaded(plan.changes)
+        return changed
+
+    def review_rule_change(self, rule: str, sample_size: int = 10):
+        """Show which stored transactions a new or changed rule would re-categorize and apply it if confirmed."""
+        plan = self.plan_recategorization(rule)
+        if plan.sealed:
+            Display.warning(f"{plan.sealed} stored transactions matching '{rule}' are in sealed partitions and will not change.")
+        if not plan.changes:
+            return
+        Display.message(f"\nThe mapping '{rule}' also matches {len(plan.changes)} stored transactions categorized differently:")
+        Display.table([[old, new, count] for old, new, count in plan.summary()], headers=["From", "To", "Transactions"])
+        Display.table(
+            [[old.date.strftime('%Y-%m-%d'), old.description, f"{old.amount:.2f} {old.currency}",
+              category_label(old), category_label(new)]
+             for _, old, new in plan.changes[:sample_size]],
+            headers=["Date", "Description", "Amount", "From", "To"]
+        )
+        if len(plan.changes) > sample_size:
+            Display.message(f"... and {len(plan.changes) - sample_size} more")
+        if Display.prompt("Re-categorize these transactions too? (y/n): ").lower().strip() != 'y':
+            return
+        changed = self.apply_recategorization(plan)
+        if changed is not None:
+            Display.message(f"Re-categorized {changed} transactions.")
+
+    def find_duplicates(self, imported: Optional[List[Transaction]] = None) -> List[DuplicateGroup]:
+        """Near-duplicate groups in the history, or only those involving the given (just imported) transactions."""
+        self.ensure_loaded()
+        focus = None
+        if imported is not None:
+            imported_keys = set(imported)
+            focus = [row for row, transaction in enumerate(self.transactions) if transaction in imported_keys]
+        return self.duplicate_finder.find(self.transactions, focus)
+
+    def merge_duplicates(self, groups: List[DuplicateGroup]) -> Optional[int]:
+        """Replace each group with its merged transaction in one write. Returns the rows removed, None on failure."""
+        groups = [group for group in groups
+                  if not any(self.store.is_sealed(self.store.partition_key(t.date)) for t in group.transactions)]
+        if not groups:
+            return 0
+        deltas = [(group.transactions, [group.merged()]) for group in groups]
+        records = [([TransactionOperations.transaction_to_record(t) for t in before],
+                    [TransactionOperations.transaction_to_record(t) for t in after]) for before, after in deltas]
+        if not replace_records(self.store, records):
+            return None
+        removed = sum(len(group.transactions) - 1 for group in groups)
+        self.undo_log.record(f"Merge {len(groups)} near-duplicate groups ({removed} transactions removed)",
+                             transactions=deltas)
+        # Keep the suggestion index in line with the removed copies
+        for group in groups:
+            for transaction in group.transactions[1:]:
+                self.classifier.forget(transaction)
+        self.reload()
+        return removed
+
+    def review_duplicates(self, groups: List[DuplicateGroup]):
+        """List near-duplicate groups and merge the ones the user picks."""
+        if not groups:
+            return
+        sealed = [g for g in groups if any(self.store.is_sealed(self.store.partition_key(t.date)) for t in g.transactions)]
+        if sealed:
+            Display.warning(f"{len(sealed)} groups include transactions in sealed partitions and cannot be merged.")
+            groups = [g for g in groups if g not in sealed]
+            if not groups:
+                return
+        Display.message(f"\nFound {len(groups)} groups of transactions that look like duplicates:")
+        Display.table(
+            [[i if j == 0 else "", t.date.strftime('%Y-%m-%d'), t.description, f"{t.amount:.2f} {t.currency}",
+              category_label(t), "keep" if j == 0 else "remove", f"{group.similarity:.0%}" if j == 0 else ""]
+             for i, group in enumerate(groups, 1) for j, t in enumerate(group.transactions)],
+            headers=["Group", "Date", "Description", "Amount", "Category", "", "Similar"]
+        )
+        answer = Display.prompt("Groups to merge (e.g. 1,3-5), 'all', or Enter to skip: ").strip().lower()
+        if not answer:
+            return
+        chosen = self._parse_selection(answer, len(groups))
+        if chosen is None:
+            Display.warning("Invalid selection. Nothing was merged.")
+            return
+        removed = self.merge_duplicates([groups[i] for i in chosen])
+        if removed is not None:
+            Display.message(f"Merged {len(chosen)} groups, removing {removed} duplicate transactions.")
+
+    @staticmethod
+    def _parse_selection(answer: str, count: int) -> Optional[List[int]]:
+        """0-based indexes for an answer like '1,3-5' or 'all'; None if it is not valid."""
+        if answer == "all":
+            return list(range(count))
+        chosen = set()
+        try:
+            for part in answer.split(","):
+                first, _, last = part.strip().partition("-")
+                chosen.update(range(int(first), int(last or first) + 1))
+        except ValueError:
+            return None
+        if not chosen or min(chosen) < 1 or max(chosen) > count:
+            return None
+        return sorted(i - 1 for i in chosen)
+
     def add_custom_transaction(self):
         """Add a custom transaction manually entered by the user."""
         Display.header("Add Custom Transaction", level=2)
@@ -150,7 +529,7 @@ class TransactionsManager:
         transaction_date = prompt_for_date()
         description = prompt_for_description()
         amount = prompt_for_amount()
-        currency = prompt_for_currency()
+        currency = prompt_for_currency(self.currency_config.get('currency_priority'))
 
         # Check if there's an existing mapping for this description
         category, subcategory = self.classifier.find_category(description)
@@ -180,16 +559,46 @@ class TransactionsManager:
             merchant=""
         )
 
-        # Save the transaction to CSV
-        if self.transaction_ops.save_transaction(transaction, self.transactions_file):
+        # Save the transaction to its partition (or the single CSV)
+        if self.store.save(transaction):
              Display.message(f"\nTransaction added successfully: {description} (${amount:.2f} {currency})")
-             # Reinitialize data to include the new transaction
-             self.initialize_data()
+             self.undo_log.record(f"Add '{description}'", transactions=[((), [transaction])])
+             self.classifier.learn(transaction)
+             # Add the new transaction to the loaded history (or just refresh the index if not loaded)
+             if self.is_loaded:
+                 self._add_loaded_transaction(transaction)
+             else:
+                 self.reload()
              return True
         else:
             Display.error("Error adding transaction. Check logs for details.")
             return False
 
+    def undo(self) -> Optional[dict]:
+        """Reverse the latest change still applied. Returns its undo log entry, or None."""
+        return self._after_history_step(self.undo_log.undo())
+
+    def redo(self) -> Optional[dict]:
+        """Apply the change undone last again. Returns its undo log entry, or None."""
+        return self._after_history_step(self.undo_log.redo())
+
+    def _after_history_step(self, entry: Optional[dict]) -> Optional[dict]:
+        if entry is not None:
+            # The stored rows changed underneath the loaded history
+            self.reload()
+        return entry
+
+    def list_partitions(self) -> List[Tuple[str, dict]]:
+        """(key, manifest entry) for each storage partition; empty for the single-file layout."""
+        partitions = getattr(self.store, 'partitions', {})
+        return [(key, partitions[key]) for key in sorted(partitions)]
+
+    def set_partition_sealed(self, key: str, sealed: bool) -> bool:
+        """Seal (archive read-only) or unseal a storage partition."""
+        if sealed:
+            return self.store.seal(key)
+        return self.store.unseal(key)
+
     def _append_transaction_to_file(self, transaction):
         """DEPRECATED: Append a transaction to the transactions file."""
         logger.warning("_append_transaction_to_file is deprecated. Use transaction_ops.save_transaction.")
@@ -0,0 +1,182 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file computes spending trends over a month x category matrix
+# License: MIT
+
+from array import array
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .transaction_columns import TransactionColumns
+
+# Rolling-mean windows, in months
+ROLLING_WINDOWS = (3, 6, 12)
+
+# (category code, subcategory code or -1 for the whole category, currency code)
+SeriesKey = Tuple[int, int, int]
+
+
+def month_number(year: int, month: int) -> int:
+    """Months since year 0, so consecutive months differ by one."""
+    return year * 12 + month - 1
+
+
+@dataclass
+class TrendStats:
+    """Trend figures for one series as of one month, in minor units."""
+    current: int
+    rolling_means: Dict[int, float]
+    yoy_delta: Optional[int]
+    slope: Optional[float]
+
+
+class TrendEngine:
+    """Monthly totals per (category, subcategory, currency) with rolling means, YoY and slopes.
+
+    One pass over the rows fills a dense month x series matrix (one `array('q')`
+    per series). Each series also keeps running sums of y and t*y, so the
+    least-squares slope over all months is O(1). Stats are cached per
+    (series, month) and only the series touched by `add()` are invalidated;
+    a new month extends every series without rescanning rows.
+    """
+
+    def __init__(self, columns: TransactionColumns, rows: Iterable[int]):
+        self.columns = columns
+        self.first_month: Optional[int] = None
+        self.month_count = 0
+        self.values: Dict[SeriesKey, array] = {}
+        self.sum_y: Dict[SeriesKey, int] = {}
+        self.sum_ty: Dict[SeriesKey, int] = {}
+        self._cache: Dict[Tuple[SeriesKey, int], TrendStats] = {}
+        self._build(list(rows))
+
+    def _build(self, rows: List[int]):
+        if not rows:
+            return
+        columns = self.columns
+        day_months = self._row_months(rows)
+        self.first_month = min(day_months)
+        self.month_count = max(day_months) - self.first_month + 1
+        category_codes = columns.category.codes
+        subcategory_codes = columns.subcategory.codes
+        currency_codes = columns.currency.codes
+        amounts = columns.amount_minor
+        for row, month in zip(rows, day_months):
+            offset = month - self.first_month
+            category_code, currency_code = category_codes[row], currency_codes[row]
+            self._series((category_code, -1, currency_code))[offset] += amounts[row]
+            if columns.subcategory.decode(subcategory_codes[row]):
+                self._series((category_code, subcategory_codes[row], currency_code))[offset] += amounts[row]
+        for key, values in self.values.items():
+            self.sum_y[key] = sum(values)
+            self.sum_ty[key] = sum(t * value for t, value in enumerate(values) if value)
+
+    def _row_months(self, rows: List[int]) -> List[int]:
+        """Month number of each row, from a memo of day ordinal -> month."""
+        days = self.columns.day
+        by_day: Dict[int, int] = {}
+        months = []
+        for row in rows:
+            day = days[row]
+            month = by_day.get(day)
+            if month is None:
+                month_date = self.columns.transactions[row].date
+                month = by_day[day] = month_number(month_date.year, month_date.month)
+            months.append(month)
+        return months
+
+    def _series(self, key: SeriesKey) -> array:
+        values = self.values.get(key)
+        if values is None:
+            values = self.values[key] = array('q', bytes(8 * self.month_count))
+            self.sum_y[key] = 0
+            self.sum_ty[key] = 0
+        return values
+
+    def add(self, row: int):
+        """Account for a row appended to the columns table after the engine was built."""
+        self._accumulate(row, 1)
+
+    def remove(self, row: int):
+        """Take a row out as it currently stands in the columns table (before it is changed)."""
+        self._accumulate(row, -1)
+
+    def _accumulate(self, row: int, sign: int):
+        columns = self.columns
+        transaction_date = columns.transactions[row].date
+        month = month_number(transaction_date.year, transaction_date.month)
+        self._cover(month)
+        offset = month - self.first_month
+        amount = sign * columns.amount_minor[row]
+        category_code, currency_code = columns.category.codes[row], columns.currency.codes[row]
+        keys = [(category_code, -1, currency_code)]
+        if columns.subcategory.decode(columns.subcategory.codes[row]):
+            keys.append((category_code, columns.subcategory.codes[row], currency_code))
+        for key in keys:
+            self._series(key)[offset] += amount
+            self.sum_y[key] += amount
+            self.sum_ty[key] += offset * amount
+            self._cache = {cached: stats for cached, stats in self._cache.items() if cached[0] != key}
+
+    def _cover(self, month: int):
+        """Extend every series so that `month` is inside the matrix."""
+        if self.first_month is None:
+            self.first_month = month
+            self.month_count = 1
+            return
+        if month < self.first_month:
+            shift = self.first_month - month
+            for key, values in self.values.items():
+                self.values[key] = array('q', bytes(8 * shift)) + values
+                # Every existing value moves `shift` months later
+                self.sum_ty[key] += shift * self.sum_y[key]
+            self.first_month = month
+            self.month_count += shift
+            self._cache.clear()
+        elif month >= self.first_month + self.month_count:
+            extra = month - (self.first_month + self.month_count) + 1
+            for values in self.values.values():
+                values.extend([0] * extra)
+            self.month_count += extra
+            self._cache.clear()
+
+    def months(self) -> List[Tuple[int, int]]:
+        """(year, month) of every column of the matrix, oldest first."""
+        if self.first_month is None:
+            return []
+        return [
+            ((self.first_month + offset) // 12, (self.first_month + offset) % 12 + 1)
+            for offset in range(self.month_count)
+        ]
+
+    def series_keys(self) -> List[SeriesKey]:
+        return list(self.values)
+
+    def stats(self, key: SeriesKey, year: int, month: int) -> Optional[TrendStats]:
+        """Trend figures for a series as of a month (cached), or None outside the matrix."""
+        if self.first_month is None:
+            return None
+        offset = month_number(year, month) - self.first_month
+        if not 0 <= offset < self.month_count or key not in self.values:
+            return None
+        cached = self._cache.get((key, offset))
+        if cached is None:
+            cached = self._cache[(key, offset)] = self._compute(key, offset)
+        return cached
+
+    def _compute(self, key: SeriesKey, offset: int) -> TrendStats:
+        values = self.values[key]
+        rolling_means = {}
+        for window in ROLLING_WINDOWS:
+            start = max(0, offset - window + 1)
+            rolling_means[window] = sum(values[start:offset + 1]) / (offset + 1 - start)
+        yoy_delta = values[offset] - values[offset - 12] if offset >= 12 else None
+        return TrendStats(values[offset], rolling_means, yoy_delta, self._slope(key))
+
+    def _slope(self, key: SeriesKey) -> Optional[float]:
+        """Least-squares slope (minor units per month) across all months, from running sums."""
+        n = self.month_count
+        if n < 2:
+            return None
+        sum_t = n * (n - 1) / 2
+        sum_tt = (n - 1) * n * (2 * n - 1) / 6
+        return (n * self.sum_ty[key] - sum_t * self.sum_y[key]) / (n * sum_tt - sum_t * sum_t)
@@ -0,0 +1,169 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file keeps a persistent log of changes as row-level deltas so they can be undone and redone
+# License: MIT
+
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, List, Optional, Sequence, Tuple
+
+from .config import DEFAULT_UNDO_MAX_ENTRIES, DEFAULT_UNDO_RETENTION_DAYS
+from .display import Display
+from .file_lock import FileLock, atomic_write
+from .transaction import Transaction
+from .transaction_operations import TransactionOperations
+from .transaction_store import replace_records
+
+logger = logging.getLogger(__name__)
+
+# File in storage.state_dir holding the change log
+UNDO_LOG_FILE = "undo_log.jsonl"
+STATE_VERSION = 1
+
+# (rows before, rows after) of one change to stored transactions
+TransactionDelta = Tuple[Sequence[Transaction], Sequence[Transaction]]
+# (rule, mapping before, mapping after); None when the rule did not exist
+MappingDelta = Tuple[str, Optional[dict], Optional[dict]]
+
+
+class UndoLog:
+    """Undo/redo history of every change, stored as the deltas needed to reverse it.
+
+    Each entry holds only what changed: the stored rows before and after (in their
+    CSV form), mapping rules before and after, and the categories before and after.
+    The log is an append-only JSON lines file of `do`, `undo` and `redo` events,
+    so recording a change appends one line and undo/redo append a few bytes.
+    Replaying the file gives the entries and the undo position; entries older
+    than the retention window or beyond the entry limit are dropped when the file
+    is compacted. Undo and redo rewrite only the partitions the entry touches,
+    after checking that the rows it expects are still stored unchanged.
+    """
+
+    def __init__(self, path: str, store, classifier,
+                 max_entries: int = DEFAULT_UNDO_MAX_ENTRIES, retention_days: int = DEFAULT_UNDO_RETENTION_DAYS):
+        self.path = path
+        self.store = store
+        self.classifier = classifier
+        self.max_entries = max_entries
+        self.retention_days = retention_days
+
+    def record(self, label: str, transactions: Sequence[TransactionDelta] = (),
+               mappings: Sequence[MappingDelta] = (), categories: Optional[Tuple[Any, Any]] = None):
+        """Add a change to the history, discarding anything that could still be redone."""
+        groups = [[[TransactionOperations.transaction_to_record(t) for t in before],
+                   [TransactionOperations.transaction_to_record(t) for t in after]]
+                  for before, after in transactions if before or after]
+        if not groups and not mappings and categories is None:
+            return
+        try:
+            with FileLock(self.path):
+                entries, position, lines = self._load()
+                entry = {
+                    "id": max((e["id"] for e in entries), default=0) + 1,
+                    "time": datetime.now().isoformat(timespec="seconds"),
+                    "label": label,
+                    "transactions": groups,
+                    "mappings": [list(delta) for delta in mappings],
+                    "categories": list(categories) if categories is not None else None,
+                }
+                kept = self._retained(entries[:position]) + [entry]
+                if len(kept) != position + 1 or position < len(entries) or lines > 2 * self.max_entries:
+                    self._rewrite(kept)
+                else:
+                    self._append({"do": entry})
+            logger.info(f"Recorded undoable change {entry['id']}: {label}")
+        except (IOError, OSError) as e:
+            # The change itself has been made; only its undo is lost
+            logger.error(f"Failed to record '{label}' in {self.path}: {e}", exc_info=True)
+            Display.warning(f"This change could not be added to the undo history: {e}")
+
+    def entries(self) -> Tuple[List[dict], int]:
+        """The retained entries, oldest first, and how many of them are currently applied."""
+        with FileLock(self.path, exclusive=False):
+            entries, position, _ = self._load()
+        return entries, position
+
+    def undo(self) -> Optional[dict]:
+        """Reverse the latest applied change. Returns its entry, or None if nothing was undone."""
+        return self._step(undo=True)
+
+    def redo(self) -> Optional[dict]:
+        """Apply again the change undone last. Returns its entry, or None if nothing was redone."""
+        return self._step(undo=False)
+
+    def _step(self, undo: bool) -> Optional[dict]:
+        with FileLock(self.path):
+            entries, position, _ = self._load()
+            if (undo and position == 0) or (not undo and position == len(entries)):
+                Display.message("Nothing to undo." if undo else "Nothing to redo.")
+                return None
+            entry = entries[position - 1] if undo else entries[position]
+            if not self._apply(entry, reverse=undo):
+                return None
+            self._append({"undo" if undo else "redo": entry["id"]})
+        logger.info(f"{'Undid' if undo else 'Redid'} change {entry['id']}: {entry['label']}")
+        return entry
+
+    def _apply(self, entry: dict, reverse: bool) -> bool:
+        """Move the stored state from one side of the entry to the other."""
+        groups = [(after, before) if reverse else (before, after) for before, after in entry["transactions"]]
+        if groups and not replace_records(self.store, groups):
+            Display.error(f"Could not {'undo' if reverse else 'redo'} '{entry['label']}'. Nothing was changed.")
+            return False
+        for rule, before, after in entry["mappings"]:
+            self.classifier.restore_mapping(rule, before if reverse else after)
+        if entry["categories"] is not None:
+            before, after = entry["categories"]
+            self.classifier.restore_categories(before if reverse else after)
+        return True
+
+    def _load(self) -> Tuple[List[dict], int, int]:
+        """Replay the log: (entries, applied count, lines read)."""
+        entries: List[dict] = []
+        position = 0
+        lines = 0
+        if not os.path.exists(self.path):
+            return entries, position, lines
+        with open(self.path, "r", encoding="utf-8") as file:
+            for line in file:
+                lines += 1
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    # A write cut short by a crash; everything before it is intact
+                    logger.warning(f"Skipping unreadable line {lines} of {self.path}")
+                    continue
+                if "version" in event:
+                    if event["version"] != STATE_VERSION:
+                        logger.warning(f"Ignoring undo log {self.path} with version {event['version']}")
+                        return [], 0, lines
+                elif "do" in event:
+                    del entries[position:]
+                    entries.append(event["do"])
+                    position = len(entries)
+                elif "undo" in event and position and entries[position - 1]["id"] == event["undo"]:
+                    position -= 1
+                elif "redo" in event and position < len(entries) and entries[position]["id"] == event["redo"]:
+                    position += 1
+        return entries, position, lines
+
+    def _retained(self, entries: List[dict]) -> List[dict]:
+        """The newest entries within the entry limit and retention window (keeping room for one more)."""
+        cutoff = (datetime.now() - timedelta(days=self.retention_days)).isoformat(timespec="seconds")
+        entries = [entry for entry in entries if entry["time"] >= cutoff]
+        return entries[max(0, len(entries) - self.max_entries + 1):]
+
+    def _append(self, event: dict):
+        write_header = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        with open(self.path, "a", encoding="utf-8") as file:
+            if write_header:
+                file.write(json.dumps({"version": STATE_VERSION}) + "\n")
+            file.write(json.dumps(event) + "\n")
+
+    def _rewrite(self, entries: List[dict]):
+        """Compact the log to just the given (all applied) entries."""
+        with atomic_write(self.path, newline=None) as file:
+            file.write(json.dumps({"version": STATE_VERSION}) + "\n")
+            for entry in entries:
+                file.write(json.dumps({"do": entry}) + "\n")
@@ -3,6 +3,7 @@
 # License: MIT
 
 from datetime import datetime, date
+from typing import List, Optional
 
 def prompt_for_date() -> date:
     """Prompts the user for a transaction date, defaulting to today."""
@@ -37,19 +38,19 @@ def prompt_for_amount() -> float:
         except ValueError:
             print("Invalid amount. Please enter a valid number.")
 
-def prompt_for_currency() -> str:
-    """Prompts the user to select a currency (CAD or USD)."""
+def prompt_for_currency(currencies: Optional[List[str]] = None) -> str:
+    """Prompts the user to select a currency (the configured currencies, CAD or USD by default)."""
+    currencies = list(currencies) if currencies else ["CAD", "USD"]
     while True:
         print("\nSelect currency:")
-        print("1. CAD")
-        print("2. USD")
+        for i, currency in enumerate(currencies, 1):
+            print(f"{i}. {currency}")
         currency_choice = input("Select currency [1]: ").strip()
-        if not currency_choice or currency_choice == '1':
-            return "CAD" # Default to CAD
-        elif currency_choice == '2':
-            return "USD"
-        else:
-            print("Invalid choice. Please select 1 or 2.")
+        if not currency_choice:
+            return currencies[0] # Default to the first (highest priority) currency
+        if currency_choice.isdigit() and 1 <= int(currency_choice) <= len(currencies):
+            return currencies[int(currency_choice) - 1]
+        print(f"Invalid choice. Please select 1-{len(currencies)}.")
 
 # Potential future additions:
 # def prompt_for_tag(): ...
@@ -2,8 +2,11 @@
 # This file contains general utility functions.
 # License: MIT
 
+import os
 from datetime import datetime
-from .config import INPUT_DATE_FORMATS
+from functools import lru_cache
+from typing import Any, Callable, Dict
+from .config import INPUT_DATE_FORMATS, DEFAULT_STATE_DIR
 
 def parse_date_multi_format(date_str: str) -> datetime:
     """Parse date string in multiple formats."""
@@ -13,4 +16,19 @@ def parse_date_multi_format(date_str: str) -> datetime:
         except ValueError:
             continue
 
-    raise ValueError(f"Unable to parse date: {date_str} with known formats.") 
\ No newline at end of file
+    raise ValueError(f"Unable to parse date: {date_str} with known formats.") 
+
+def memoize_date_parser(parser: Callable[[str], datetime]) -> Callable[[str], datetime]:
+    """Wrap a date parser so each distinct date string is parsed once.
+
+    Rows on the same day then share one datetime object, which saves both the
+    strptime call and the memory of a per-row datetime.
+    """
+    return lru_cache(maxsize=65536)(parser)
+
+
+def get_state_path(config: Dict[str, Any], filename: str) -> str:
+    """Return the path of a state file inside storage.state_dir, creating the directory if needed."""
+    state_dir = (config or {}).get('storage', {}).get('state_dir', DEFAULT_STATE_DIR)
+    os.makedirs(state_dir, exist_ok=True)
+    return os.path.join(state_dir, filename)
@@ -0,0 +1,14 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file holds the shared pytest fixtures
+# License: MIT
+
+import pytest
+
+from helpers import Workspace
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    """A fresh workspace, also the working directory so relative paths stay inside it."""
+    monkeypatch.chdir(tmp_path)
+    return Workspace(str(tmp_path))
@@ -0,0 +1,116 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file builds throwaway cmdbudget workspaces and transactions for the tests
+# License: MIT
+
+import csv
+import os
+from datetime import datetime
+from typing import Iterable, List, Optional, Sequence
+
+import yaml
+
+from cmdbudget.config import CSV_FIELDNAMES
+from cmdbudget.currency_utils import configure_decimal_places
+from cmdbudget.transaction import Transaction
+from cmdbudget.transaction_operations import TransactionOperations
+
+IMPORT_CSV_STRUCTURE = {
+    "date_column": "Date",
+    "description_column": "Description",
+    "amount_column": "CAD$",
+    "expenses_are_positive": True,
+    "default_currency": "CAD",
+    "currency_columns": {"CAD": "CAD$", "USD": "USD$"},
+    "currency_priority": ["CAD", "USD"],
+    "currency_formatting": {
+        "CAD": {"symbol": "$", "position": "before", "decimal_places": 2},
+        "USD": {"symbol": "$", "position": "before", "decimal_places": 2},
+        "JPY": {"symbol": "¥", "position": "before", "decimal_places": 0},
+    },
+}
+CATEGORIES = {
+    "Groceries": ["Supermarket", "Market"],
+    "Dining": ["Coffee", "Restaurant"],
+    "Transport": [],
+    "IGNORED": [],
+    "SPLIT": [],
+}
+MAPPINGS = {
+    "LOBLAWS": {"category": "Groceries", "subcategory": "Supermarket"},
+    "TIM HORTONS": {"category": "Dining", "subcategory": "Coffee"},
+}
+NEW_TRANSACTIONS_HEADER = ["Date", "Description", "CAD$", "USD$"]
+
+
+def make_transaction(day: str, description: str, amount: str, category: str = "Groceries",
+                     subcategory: str = "", currency: str = "CAD", tag: str = "", merchant: str = "") -> Transaction:
+    """A transaction dated `day` (YYYY-MM-DD) with an amount in major units (positive = expense)."""
+    return TransactionOperations.create_transaction(
+        datetime.strptime(day, "%Y-%m-%d"), description, amount, currency, category, subcategory, tag, merchant
+    )
+
+
+class Workspace:
+    """A project directory with config.yml, categories, mappings and an empty transactions file.
+
+    State goes to `<root>/state`, so nothing is shared between tests.
+    """
+
+    def __init__(self, root: str, storage: Optional[dict] = None, **sections):
+        self.root = root
+        self.config_file = os.path.join(root, "config.yml")
+        self.categories_file = os.path.join(root, "categories.yml")
+        self.mappings_file = os.path.join(root, "transaction_mappings.yml")
+        self.transactions_file = os.path.join(root, "transactions.csv")
+        self.new_transactions_file = os.path.join(root, "new_transactions.csv")
+        self.state_dir = os.path.join(root, "state")
+        self.config = {
+            "import_csv_structure": dict(IMPORT_CSV_STRUCTURE),
+            "storage": {
+                "transaction_file_path": self.transactions_file,
+                "new_transaction_file_path": self.new_transactions_file,
+                "state_dir": self.state_dir,
+                **(storage or {}),
+            },
+            **sections,
+        }
+        self.write_yaml(self.config_file, self.config)
+        self.write_yaml(self.categories_file, {"categories": CATEGORIES})
+        self.write_yaml(self.mappings_file, {"mappings": MAPPINGS})
+        with open(self.transactions_file, "w", newline="", encoding="utf-8") as file:
+            csv.writer(file).writerow(CSV_FIELDNAMES)
+        configure_decimal_places(self.config["import_csv_structure"])
+
+    @staticmethod
+    def write_yaml(path: str, data: dict):
+        with open(path, "w", encoding="utf-8") as file:
+            yaml.safe_dump(data, file, allow_unicode=True)
+
+    def store(self, transactions: Iterable[Transaction]):
+        """Append transactions to the stored transactions file."""
+        assert TransactionOperations.save_transactions(list(transactions), self.transactions_file)
+
+    def write_new(self, rows: Sequence[Sequence[str]], header: Sequence[str] = NEW_TRANSACTIONS_HEADER,
+                  path: Optional[str] = None):
+        """Write an export to import, by default the new transactions file."""
+        with open(path or self.new_transactions_file, "w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(header)
+            writer.writerows(rows)
+
+    def manager(self):
+        from cmdbudget.transactions_manager import TransactionsManager
+        return TransactionsManager(self.transactions_file, self.new_transactions_file, self.config_file,
+                                   self.categories_file, self.mappings_file)
+
+    def stored_rows(self) -> List[dict]:
+        with open(self.transactions_file, newline="", encoding="utf-8") as file:
+            return list(csv.DictReader(file))
+
+
+def answers(monkeypatch, *replies: str):
+    """Feed the given replies to every Display.prompt, in order."""
+    from cmdbudget.display import Display
+    pending = list(replies)
+    monkeypatch.setattr(Display, "prompt", staticmethod(lambda text: pending.pop(0)))
+    return pending
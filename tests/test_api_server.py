@@ -0,0 +1,120 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file tests the asyncio JSON API over a real socket: routes, streamed pages, errors and reloads
+# License: MIT
+
+import asyncio
+import json
+
+import pytest
+
+from cmdbudget.api_server import ApiServer
+
+from helpers import make_transaction
+
+HISTORY = [
+    make_transaction("2024-01-05", "LOBLAWS #1", "40.00", "Groceries", "Supermarket", tag="family"),
+    make_transaction("2024-01-20", "TIM HORTONS", "3.50", "Dining", "Coffee"),
+    make_transaction("2024-02-02", "LOBLAWS #2", "60.25", "Groceries", "Supermarket"),
+    make_transaction("2024-02-10", "BLUE JAYS", "25.00", "IGNORED"),
+    make_transaction("2024-02-14", "AMAZON", "12.00", "Groceries", "Market", currency="USD"),
+]
+
+
+def dechunk(body: bytes) -> bytes:
+    data = b""
+    while True:
+        size_line, _, body = body.partition(b"\r\n")
+        size = int(size_line, 16)
+        if size == 0:
+            return data
+        data, body = data + body[:size], body[size + 2:]
+
+
+async def get(port: int, *targets: str, method: str = "GET"):
+    """Send the requests over one keep-alive connection; (status, JSON body) for each."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    responses = []
+    for number, target in enumerate(targets):
+        last = number == len(targets) - 1
+        writer.write(f"{method} {target} HTTP/1.1\r\nHost: test\r\nConnection: {'close' if last else 'keep-alive'}\r\n\r\n".encode())
+        await writer.drain()
+        head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+        headers = dict(line.split(": ", 1) for line in head[1:] if line)
+        if headers.get("Transfer-Encoding") == "chunked":
+            body = await reader.readuntil(b"\r\n0\r\n\r\n")
+            body = dechunk(body)
+        else:
+            body = await reader.readexactly(int(headers["Content-Length"]))
+        responses.append((int(head[0].split(" ")[1]), json.loads(body)))
+    writer.close()
+    return responses
+
+
+def run_against_server(workspace, scenario):
+    """Run `scenario(server, port)` against an API server on an ephemeral port."""
+    async def main():
+        api_server = ApiServer(workspace.manager, "127.0.0.1", 0)
+        await api_server.current_api()
+        server = await asyncio.start_server(api_server._handle_connection, "127.0.0.1", 0)
+        async with server:
+            return await scenario(api_server, server.sockets[0].getsockname()[1])
+    return asyncio.run(main())
+
+
+@pytest.fixture
+def history(workspace):
+    workspace.store(HISTORY)
+    return workspace
+
+
+def test_report_routes(history):
+    async def scenario(server, port):
+        return await get(port, "/api/months", "/api/categories", "/api/months/2024/02", "/api/categories/Groceries",
+                         "/api/tags/family")
+    (_, months), (_, categories), (_, february), (_, groceries), (_, family) = run_against_server(history, scenario)
+
+    assert months["months"] == [{"year": 2024, "month": 1}, {"year": 2024, "month": 2}]
+    assert "Groceries" in categories["categories"] and "IGNORED" not in categories["categories"]
+    assert february["totals"] == {"CAD": 60.25, "USD": 12.0}
+    assert [entry["category"] for entry in february["categories"]] == ["Groceries"]
+    assert [month["amounts"] for month in groceries["months"]] == [{"CAD": 40.0}, {"CAD": 60.25, "USD": 12.0}]
+    assert groceries["years"] == [{"year": 2024, "amounts": {"CAD": 100.25, "USD": 12.0}}]
+    assert [month["categories"] for month in family["months"]] == [{"Groceries": {"CAD": 40.0}}]
+
+
+def test_transaction_pages_are_streamed(history):
+    async def scenario(server, port):
+        return await get(port, "/api/transactions?limit=2&offset=1", "/api/transactions?reserved=1&month=2024-02",
+                         "/api/search?q=loblaws", "/api/search?query=amount%3E20&sort=amount&order=asc")
+    (status, page), (_, reserved), (_, text), (_, query) = run_against_server(history, scenario)
+
+    assert status == 200
+    assert (page["total"], page["offset"], page["limit"]) == (4, 1, 2)
+    assert [t["description"] for t in page["transactions"]] == ["TIM HORTONS", "LOBLAWS #2"]
+    assert [t["description"] for t in reserved["transactions"]] == ["LOBLAWS #2", "BLUE JAYS", "AMAZON"]
+    assert text["q"] == "loblaws" and text["total"] == 2
+    assert [t["amount"] for t in query["transactions"]] == [40.0, 60.25]
+
+
+def test_errors_keep_the_connection_usable(history):
+    async def scenario(server, port):
+        responses = await get(port, "/api/nowhere", "/api/months/2024/13", "/api/months/2023/01",
+                              "/api/transactions?limit=0", "/api/search?query=amount%3E", "/api/months")
+        return responses + await get(port, "/api/months", method="POST")
+    statuses = [status for status, _ in run_against_server(history, scenario)]
+    assert statuses == [404, 400, 404, 400, 400, 200, 405]
+
+
+def test_model_reloads_after_another_session_writes(history):
+    async def scenario(server, port):
+        before = server.api
+        (_, first), = await get(port, "/api/transactions")
+        history.store([make_transaction("2024-03-01", "LOBLAWS #3", "5.00", "Groceries", "Supermarket")])
+        (_, second), = await get(port, "/api/transactions")
+        reloaded = server.api is not before
+        (_, third), = await get(port, "/api/months")
+        return first["total"], second["total"], reloaded, third
+
+    first, second, reloaded, months = run_against_server(history, scenario)
+    assert (first, second, reloaded) == (4, 5, True)
+    assert months["months"][-1] == {"year": 2024, "month": 3}
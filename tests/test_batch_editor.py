@@ -0,0 +1,78 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file tests filter-selected batch edits over single-file and partitioned stores
+# License: MIT
+
+import os
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from cmdbudget.batch_editor import BatchEditor, TransactionFilter
+from cmdbudget.transaction_store import CsvTransactionStore, PartitionedTransactionStore
+
+from helpers import make_transaction
+
+HISTORY = [
+    make_transaction("2023-06-01", "LOBLAWS #1", "30.00", "Groceries", "Supermarket", tag="food"),
+    make_transaction("2024-02-01", "LOBLAWS #2", "80.00", "Groceries", "Supermarket", tag="food;bulk"),
+    make_transaction("2024-02-03", "TIM HORTONS", "3.00", "Dining", "Coffee"),
+    make_transaction("2024-02-04", "LOBLAWS #3", "50.00", "IGNORED"),
+]
+
+
+@pytest.fixture
+def partitioned(tmp_path):
+    store = PartitionedTransactionStore(str(tmp_path / "partitions"), "year", "none")
+    assert store.save_many(HISTORY)
+    return store
+
+
+def by_description(store):
+    return {t.description: t for t in store.read_range()}
+
+
+def test_filter_combines_criteria_and_skips_reserved_rows(partitioned):
+    editor = BatchEditor(partitioned)
+    assert [t.description for t in editor.preview(TransactionFilter(description="loblaws"))] == ["LOBLAWS #1", "LOBLAWS #2"]
+    assert [t.description for t in editor.preview(TransactionFilter(start=date(2024, 1, 1), tag="bulk"))] == ["LOBLAWS #2"]
+    assert [t.description for t in editor.preview(TransactionFilter(min_amount=Decimal("40")))] == ["LOBLAWS #2"]
+    assert [t.description for t in editor.preview(TransactionFilter(category="IGNORED"))] == ["LOBLAWS #3"]
+
+
+def test_apply_edits_tags_and_category_in_one_pass(partitioned):
+    editor = BatchEditor(partitioned)
+    changed = editor.apply(TransactionFilter(description="LOBLAWS"),
+                           {"category": "Dining", "add_tags": "review", "remove_tags": "bulk"})
+    assert changed == 2
+    stored = by_description(partitioned)
+    assert (stored["LOBLAWS #1"].category, stored["LOBLAWS #1"].subcategory, stored["LOBLAWS #1"].tag) == ("Dining", "", "food;review")
+    assert stored["LOBLAWS #2"].tags == ("food", "review")
+    assert stored["LOBLAWS #3"].category == "IGNORED"
+    # Nothing left to change the second time
+    assert editor.apply(TransactionFilter(description="LOBLAWS"), {"category": "Dining", "add_tags": "review"}) == 0
+
+
+def test_sealed_partitions_are_left_out(partitioned):
+    assert partitioned.seal("2023")
+    editor = BatchEditor(partitioned)
+    selection = TransactionFilter(description="LOBLAWS")
+    matches = editor.preview(selection)
+    assert editor.sealed_matches(matches) == 1
+    assert editor.apply(selection, {"merchant": "Loblaws"}, matches) == 1
+    stored = by_description(partitioned)
+    assert (stored["LOBLAWS #1"].merchant, stored["LOBLAWS #2"].merchant) == ("", "Loblaws")
+
+
+def test_single_file_store_is_rewritten_in_place(workspace):
+    workspace.store(HISTORY)
+    store = CsvTransactionStore(workspace.transactions_file)
+    assert BatchEditor(store).apply(TransactionFilter(category="Dining"), {"tag": "coffee, treat"}) == 1
+    assert [row["Tag"] for row in workspace.stored_rows()] == ["food", "food;bulk", "coffee;treat", ""]
+    assert not [name for name in os.listdir(workspace.root) if name.endswith(".tmp")]
+
+
+@pytest.mark.parametrize("changes", [{"amount": "1"}, {"category": "SPLIT"}])
+def test_prepare_rejects_fields_that_cannot_be_batch_edited(changes):
+    with pytest.raises(ValueError):
+        BatchEditor.prepare(changes)
@@ -0,0 +1,83 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file tests block-compressed archives: the on-disk layout, pruned reads and sealed partitions
+# License: MIT
+
+import gzip
+import json
+from datetime import date
+
+import pytest
+
+from cmdbudget import block_archive
+from cmdbudget.block_archive import (
+    ARCHIVE_INDEX_SUFFIX, ARCHIVE_INDEX_VERSION, extract_block_archive, read_block_archive_text, write_block_archive
+)
+from cmdbudget.transaction_operations import TransactionOperations
+from cmdbudget.transaction_store import PartitionedTransactionStore
+
+from helpers import make_transaction
+
+HISTORY = [make_transaction(f"2024-{month:02d}-10", f"SHOP {month}", f"{month}.00") for month in range(1, 13)]
+
+
+@pytest.fixture
+def stored_csv(tmp_path):
+    path = str(tmp_path / "2024.csv")
+    assert TransactionOperations.write_transactions(HISTORY, path)
+    return path
+
+
+@pytest.mark.parametrize("compression", ["gzip", "lzma"])
+def test_archive_round_trips_and_records_its_blocks(stored_csv, compression):
+    archive = block_archive.archive_path_for(stored_csv, compression)
+    index = write_block_archive(stored_csv, archive, compression, block_rows=5)
+    with open(archive + ARCHIVE_INDEX_SUFFIX, encoding="utf-8") as file:
+        assert json.load(file) == index
+    assert index["version"] == ARCHIVE_INDEX_VERSION
+    assert [block["rows"] for block in index["blocks"]] == [0, 5, 5, 2]
+    assert (index["blocks"][1]["min_date"], index["blocks"][1]["max_date"]) == ("2024-01-10", "2024-05-10")
+
+    with open(stored_csv, newline="", encoding="utf-8") as file:
+        original = file.read()
+    assert read_block_archive_text(archive) == original
+    extract_block_archive(archive, stored_csv + ".copy")
+    with open(stored_csv + ".copy", newline="", encoding="utf-8") as file:
+        assert file.read() == original
+
+
+def test_gzip_archive_is_one_valid_stream(stored_csv):
+    write_block_archive(stored_csv, stored_csv + ".gz", "gzip", block_rows=4)
+    with open(stored_csv, "rb") as file, gzip.open(stored_csv + ".gz", "rb") as archive:
+        assert archive.read() == file.read()
+
+
+def test_range_reads_decompress_only_overlapping_blocks(stored_csv, monkeypatch):
+    archive = stored_csv + ".gz"
+    write_block_archive(stored_csv, archive, "gzip", block_rows=3)
+    calls = []
+    extension, compress, decompress, open_stream = block_archive.ARCHIVE_CODECS["gzip"]
+    monkeypatch.setitem(block_archive.ARCHIVE_CODECS, "gzip",
+                        (extension, compress, lambda data: calls.append(1) or decompress(data), open_stream))
+
+    text = read_block_archive_text(archive, date(2024, 4, 1), date(2024, 5, 31))
+    assert len(calls) == 1
+    assert "SHOP 4" in text and "SHOP 5" in text and "SHOP 7" not in text
+
+
+def test_missing_index_falls_back_to_the_whole_stream(stored_csv, tmp_path):
+    archive = stored_csv + ".gz"
+    write_block_archive(stored_csv, archive, "gzip", block_rows=3)
+    (tmp_path / ("2024.csv.gz" + ARCHIVE_INDEX_SUFFIX)).unlink()
+    assert read_block_archive_text(archive, date(2024, 4, 1), date(2024, 4, 30)).count("SHOP") == 12
+
+
+def test_sealed_partition_is_read_through_its_archive(tmp_path):
+    store = PartitionedTransactionStore(str(tmp_path / "partitions"), "year", "gzip")
+    assert store.save_many(HISTORY + [make_transaction("2025-01-01", "NEW YEAR", "1.00")])
+    assert store.seal("2024")
+    assert store.partition_path("2024").endswith("2024.csv.gz")
+    assert [t.description for t in store.read_range(date(2024, 12, 1), date(2025, 1, 31))] == ["SHOP 12", "NEW YEAR"]
+
+    assert store.unseal("2024")
+    assert store.partition_path("2024").endswith("2024.csv")
+    assert len(store.read_partition("2024")) == 12
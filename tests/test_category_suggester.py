@@ -0,0 +1,54 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file tests category suggestions from categorized history
+# License: MIT
+
+from cmdbudget.category_suggester import CategorySuggester, MIN_CAPPED_DESCRIPTIONS, normalize_description
+from cmdbudget.transaction_processor import TransactionClassifier
+
+from helpers import make_transaction
+
+
+def test_normalize_description_drops_digits_and_punctuation():
+    assert normalize_description("Tim Hortons #1234, Toronto") == "TIM HORTONS TORONTO"
+
+
+def test_common_word_still_links_descriptions_in_a_small_history():
+    suggester = CategorySuggester()
+    suggester.add("STARBUCKS COFFEE", "Dining", "Coffee")
+    suggester.add("BLENZ COFFEE", "Dining", "Coffee")
+    suggester.add("COFFEE BEAN WHOLESALE", "Groceries", "Market")
+    # "COFFEE" is in every description, yet it is the only thing the query shares with them
+    assert suggester.suggest("JAVA COFFEE")[0] == ("Dining", "Coffee")
+
+
+def test_large_history_ranks_by_distinctive_features():
+    suggester = CategorySuggester()
+    for number in range(MIN_CAPPED_DESCRIPTIONS):
+        suggester.add(f"PAYMENT SHOP {chr(65 + number % 26)}{chr(65 + number // 26)}X", "Transport")
+    suggester.add("PAYMENT LOBLAWS", "Groceries", "Supermarket")
+    assert suggester.suggest("LOBLAWS PAYMENT", top_k=1) == [("Groceries", "Supermarket")]
+
+
+def test_removed_label_is_no_longer_suggested():
+    suggester = CategorySuggester()
+    suggester.add("NETFLIX", "Dining")
+    suggester.remove("NETFLIX", "Dining")
+    assert suggester.suggest("NETFLIX") == []
+
+
+def test_suggestions_skip_unconfigured_subcategories(workspace):
+    classifier = TransactionClassifier(workspace.config_file, workspace.categories_file, workspace.mappings_file)
+    classifier.suggester.add("FARM MARKET", "Groceries", "Farm Stand")
+    classifier.suggester.add("FARM MARKET", "Groceries", "Market")
+    classifier.suggester.add("FARM MARKET", "Gardening", "")
+    classifier.suggester.add("FARM MARKET", "Transport", "")
+
+    assert classifier.suggest_categories("FARM MARKET") == [("Groceries", "Market"), ("Transport", "")]
+
+
+def test_relearn_moves_an_edited_description(workspace):
+    classifier = TransactionClassifier(workspace.config_file, workspace.categories_file, workspace.mappings_file)
+    coffee = make_transaction("2024-01-05", "BLENZ", "4.00", "Dining", "Coffee")
+    classifier.learn(coffee)
+    classifier.relearn(coffee, make_transaction("2024-01-05", "BLENZ", "4.00", "Groceries", "Market"))
+    assert classifier.suggest_categories("BLENZ") == [("Groceries", "Market")]
@@ -0,0 +1,97 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file tests the columnar export: the .npy layout, the schema and streaming in chunks
+# License: MIT
+
+import ast
+import json
+import os
+import struct
+from array import array
+from datetime import date
+
+import pytest
+
+from cmdbudget.columnar_export import EPOCH_ORDINAL, NPY_HEADER_SIZE, NPY_MAGIC, SCHEMA_FILE, ColumnarExporter
+from cmdbudget.transaction_store import PartitionedTransactionStore
+
+from helpers import make_transaction
+
+
+def history():
+    """Built once the workspace has configured JPY as having no decimal places."""
+    return [
+        make_transaction("2023-12-30", "LOBLAWS", "40.00", "Groceries", "Supermarket"),
+        make_transaction("2024-01-02", "TIM HORTONS", "2.50", "Dining", "Coffee", tag="work"),
+        make_transaction("2024-01-03", "PAYROLL", "-1500.00", "Income", merchant="Employer"),
+        make_transaction("2024-02-14", "SUSHI", "1200", "Dining", "Restaurant", currency="JPY"),
+        make_transaction("2024-02-20", "LOBLAWS", "12.34", "Groceries", "Supermarket"),
+    ]
+
+
+def read_npy(path: str):
+    """(header dict, values) of a one-dimensional .npy file, parsed by hand."""
+    with open(path, "rb") as file:
+        assert file.read(len(NPY_MAGIC)) == NPY_MAGIC
+        length, = struct.unpack("<H", file.read(2))
+        header_text = file.read(length).decode("latin1")
+        header = ast.literal_eval(header_text)
+        data = file.read()
+    assert len(NPY_MAGIC) + 2 + length == NPY_HEADER_SIZE and header_text.endswith("\n")
+    values = array("q" if header["descr"] in ("<i8", "<M8[D]") else "i")
+    values.frombytes(data)
+    assert len(values) == header["shape"][0]
+    return header, list(values)
+
+
+@pytest.fixture
+def store(workspace, tmp_path):
+    store = PartitionedTransactionStore(str(tmp_path / "partitions"), "year")
+    assert store.save_many(history())
+    return store
+
+
+def decoded(out_dir: str):
+    with open(os.path.join(out_dir, SCHEMA_FILE), encoding="utf-8") as file:
+        schema = json.load(file)
+    columns = {}
+    for column in schema["columns"]:
+        header, values = read_npy(os.path.join(out_dir, column["file"]))
+        if "dictionary" in column:
+            assert header["descr"] == "<i4"
+            values = [column["dictionary"][code] for code in values]
+        columns[column["name"]] = values
+    return schema, columns
+
+
+def test_export_round_trips_through_the_files(store, tmp_path):
+    out_dir = str(tmp_path / "export")
+    assert ColumnarExporter(store, chunk_rows=2).export(out_dir) == len(history())
+    schema, columns = decoded(out_dir)
+
+    assert schema["rows"] == 5 and schema["decimal_places"] == {"CAD": 2, "JPY": 0}
+    assert [date.fromordinal(day + EPOCH_ORDINAL) for day in columns["date"]] == [t.date.date() for t in history()]
+    assert columns["amount_minor"] == [4000, 250, -150000, 1200, 1234]
+    assert columns["description"] == [t.description for t in history()]
+    assert columns["currency"] == ["CAD", "CAD", "CAD", "JPY", "CAD"]
+    assert columns["subcategory"] == [t.subcategory for t in history()]
+    assert columns["tag"] == ["", "work", "", "", ""]
+    assert columns["merchant"] == ["", "", "Employer", "", ""]
+    assert sorted(os.listdir(out_dir)) == sorted([SCHEMA_FILE] + [c["file"] for c in schema["columns"]])
+
+
+def test_range_export_reads_only_overlapping_rows(store, tmp_path):
+    out_dir = str(tmp_path / "export")
+    assert ColumnarExporter(store).export(out_dir, date(2024, 1, 1), date(2024, 1, 31)) == 2
+    schema, columns = decoded(out_dir)
+    assert (schema["start"], schema["end"]) == ("2024-01-01", "2024-01-31")
+    assert columns["description"] == ["TIM HORTONS", "PAYROLL"]
+
+
+def test_numpy_maps_the_columns(store, tmp_path):
+    numpy = pytest.importorskip("numpy")
+    out_dir = str(tmp_path / "export")
+    ColumnarExporter(store, chunk_rows=3).export(out_dir)
+    dates = numpy.load(os.path.join(out_dir, "date.npy"), mmap_mode="r")
+    amounts = numpy.load(os.path.join(out_dir, "amount_minor.npy"), mmap_mode="r")
+    assert dates.dtype == numpy.dtype("datetime64[D]") and str(dates[1]) == "2024-01-02"
+    assert amounts.dtype == numpy.dtype("int64") and int(amounts.sum()) == 4000 + 250 - 150000 + 1200 + 1234
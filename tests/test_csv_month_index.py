@@ -0,0 +1,72 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file tests the month offset index of the single-file store and its persisted form
+# License: MIT
+
+import json
+
+from cmdbudget.csv_month_index import INDEX_VERSION, MonthOffsetIndex, iter_record_spans
+from cmdbudget.transaction_operations import TransactionOperations
+
+from helpers import make_transaction
+
+HISTORY = [
+    make_transaction("2024-01-05", "LOBLAWS", "10.00"),
+    make_transaction("2024-01-20", "TWO\nLINES, \"QUOTED\"", "2.00", "Dining"),
+    make_transaction("2024-02-01", "PAYBACK", "5.00", "IGNORED"),
+    make_transaction("2024-03-03", "MARKET", "3.00"),
+]
+
+
+def descriptions(transactions):
+    return [t.description for t in transactions]
+
+
+def test_record_spans_keep_quoted_newlines_inside_a_record():
+    data = b'a,b\n"x\ny",z\nlast'
+    assert [data[start:end] for start, end in iter_record_spans(data, 0, len(data))] == [b"a,b\n", b'"x\ny",z\n', b"last"]
+
+
+def test_months_and_reads_match_the_full_file(workspace):
+    workspace.store(HISTORY)
+    index = MonthOffsetIndex(workspace.transactions_file, f"{workspace.state_dir}/months.json")
+    assert index.refresh()
+    # February only holds an IGNORED row
+    assert index.months() == [(2024, 1), (2024, 3)]
+    assert descriptions(index.read_months([(2024, 1)])) == ["LOBLAWS", "TWO\nLINES, \"QUOTED\""]
+    assert descriptions(index.read_months([(2024, 3), (2024, 2)])) == ["PAYBACK", "MARKET"]
+    assert not index.refresh()
+
+
+def test_appends_are_indexed_incrementally_and_rewrites_rebuild(workspace, monkeypatch):
+    workspace.store(HISTORY[:2])
+    index = MonthOffsetIndex(workspace.transactions_file)
+    index.refresh()
+
+    rebuilds = []
+    reset = index._reset
+    monkeypatch.setattr(index, "_reset", lambda: (rebuilds.append(1), reset()))
+    workspace.store(HISTORY[2:])
+    index.refresh()
+    assert rebuilds == []
+    assert index.months() == [(2024, 1), (2024, 3)]
+
+    TransactionOperations.write_transactions([HISTORY[3]], workspace.transactions_file)
+    index.refresh()
+    assert rebuilds == [1]
+    assert index.months() == [(2024, 3)]
+    assert descriptions(index.read_months([(2024, 1), (2024, 3)])) == ["MARKET"]
+
+
+def test_persisted_index_is_reused_only_for_its_own_file(workspace, tmp_path):
+    workspace.store(HISTORY)
+    index_path = str(tmp_path / "months.json")
+    MonthOffsetIndex(workspace.transactions_file, index_path).refresh()
+    with open(index_path, encoding="utf-8") as file:
+        data = json.load(file)
+    assert data["version"] == INDEX_VERSION
+    assert data["months"]["2024-02"]["reportable"] == 0
+
+    reloaded = MonthOffsetIndex(workspace.transactions_file, index_path)
+    assert reloaded.months() == [(2024, 1), (2024, 3)]
+    assert not reloaded.refresh()
+    assert MonthOffsetIndex(str(tmp_path / "other.csv"), index_path).months() == []
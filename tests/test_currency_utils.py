@@ -0,0 +1,49 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file tests the conversions between major-unit amounts and integer minor units
+# License: MIT
+
+import logging
+from decimal import Decimal
+
+import pytest
+
+from cmdbudget.currency_utils import (
+    configure_decimal_places, format_minor_units, from_minor_units, to_minor_units
+)
+
+from helpers import IMPORT_CSV_STRUCTURE
+
+
+@pytest.fixture(autouse=True)
+def decimal_places():
+    configure_decimal_places(IMPORT_CSV_STRUCTURE)
+
+
+def test_amounts_convert_exactly_by_currency():
+    assert to_minor_units("12.30", "CAD") == 1230
+    assert to_minor_units(12.3, "CAD") == 1230
+    assert to_minor_units(Decimal("-0.01"), "USD") == -1
+    assert to_minor_units(" 1500 ", "JPY") == 1500
+    assert format_minor_units(1230, "CAD") == "12.30"
+    assert from_minor_units(1500, "JPY") == 1500
+
+
+@pytest.mark.parametrize("amount", ["1e3", "2E-2", "NaN", "inf", "-Infinity", float("nan"), Decimal("Infinity"), "", "12,30"])
+def test_rejects_exponents_non_finite_and_garbage(amount):
+    with pytest.raises(ValueError):
+        to_minor_units(amount, "CAD")
+
+
+def test_excess_precision_is_rounded_with_a_warning(caplog):
+    with caplog.at_level(logging.WARNING, logger="cmdbudget.currency_utils"):
+        assert to_minor_units("12.345", "CAD") == 1235
+        assert to_minor_units("-12.345", "CAD") == -1235
+        assert to_minor_units("0.5", "JPY") == 1
+    assert len(caplog.records) == 3
+    assert "more than 0 decimal places for JPY" in caplog.records[-1].getMessage()
+
+    caplog.clear()
+    with caplog.at_level(logging.WARNING, logger="cmdbudget.currency_utils"):
+        to_minor_units("12.3", "CAD")
+        to_minor_units("12.30", "CAD")
+    assert not caplog.records
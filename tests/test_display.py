@@ -0,0 +1,56 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file tests streamed table output and the interactive pager
+# License: MIT
+
+from cmdbudget.display import Display, StreamingTable
+
+from helpers import answers
+
+
+def numbered_rows(count: int, pulled: list):
+    for number in range(count):
+        pulled.append(number)
+        yield 2020 + number // 10, [f"row {number}", str(number)]
+
+
+def formatted(table: StreamingTable, rows):
+    return ((year, table.format_row(cells)) for year, cells in rows)
+
+
+def test_rows_are_laid_out_like_tabulate_pretty():
+    table = StreamingTable(["Name", "Amount"], [6, 3], ("left", "right"))
+    assert table.header_lines() == ["+--------+--------+", "| Name   | Amount |", "+--------+--------+"]
+    assert table.format_row(["ab", "1.5"]) == "| ab     |    1.5 |"
+    # Long left-aligned text is cut, numbers are not
+    assert table.format_row(["a much longer name", "12345678"]) == "| a muc… | 12345678 |"
+    assert StreamingTable.sample_widths(["A", "B"], [["\033[1mbold\033[0m", "x"]]) == [4, 1]
+
+
+def test_piped_output_streams_every_row(capsys):
+    pulled = []
+    Display.stream_table(numbered_rows(25, pulled), ["Name", "N"], widths=[8, 2])
+    out = capsys.readouterr().out
+    assert len(pulled) == 25
+    assert "row 0 " in out and "row 24" in out
+
+
+def test_pager_pulls_rows_only_as_far_as_shown(monkeypatch, capsys):
+    pulled = []
+    table = StreamingTable(["Name", "N"], [8, 2])
+    answers(monkeypatch, "n", "q")
+    Display._page_lines(table, formatted(table, numbered_rows(100, pulled)), page_size=10)
+    out = capsys.readouterr().out
+    # Two pages shown, plus one row looked ahead to know there is a next page
+    assert len(pulled) == 21
+    assert "row 19" in out and "row 20" not in out
+
+
+def test_pager_jumps_to_a_year(monkeypatch, capsys):
+    pulled = []
+    table = StreamingTable(["Name", "N"], [8, 2])
+    answers(monkeypatch, "y", "2025", "p", "q")
+    Display._page_lines(table, formatted(table, numbered_rows(100, pulled)), page_size=10)
+    pages = capsys.readouterr().out.split("| Name ")[1:]
+    assert len(pages) == 3
+    assert "row 50 " in pages[1] and "row 59" in pages[1] and "row 60" not in pages[1]
+    assert "row 40 " in pages[2]
@@ -0,0 +1,105 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file tests the drop directory watcher: partial records, resuming and reuse of the duplicate set
+# License: MIT
+
+import csv
+import os
+
+from cmdbudget.drop_watcher import DropWatcher, WATCH_STATE_FILE, complete_records_end
+
+from helpers import NEW_TRANSACTIONS_HEADER, make_transaction
+
+HEADER = ",".join(NEW_TRANSACTIONS_HEADER) + "\r\n"
+
+
+def watcher(workspace, manager=None) -> DropWatcher:
+    drop_dir = os.path.join(workspace.root, "drop")
+    os.makedirs(drop_dir, exist_ok=True)
+    return DropWatcher(manager or workspace.manager(), drop_dir, os.path.join(workspace.root, "review.csv"),
+                       os.path.join(workspace.state_dir, WATCH_STATE_FILE))
+
+
+def append(watch: DropWatcher, name: str, text: str):
+    with open(os.path.join(watch.drop_dir, name), "a", encoding="utf-8", newline="") as file:
+        file.write(text)
+
+
+def count_partition_reads(monkeypatch, manager) -> list:
+    reads = []
+    read_partition = manager.store.read_partition
+
+    def counted(key, *args, **kwargs):
+        reads.append(key)
+        return read_partition(key, *args, **kwargs)
+    monkeypatch.setattr(manager.store, "read_partition", counted)
+    return reads
+
+
+def test_complete_records_end_stops_before_an_open_quote():
+    assert complete_records_end(b'a,b\r\nc,"d\r\ne"\r\n') == 15
+    assert complete_records_end(b'a,b\r\nc,"d\r\ne') == 5
+    assert complete_records_end(b'a,"say ""hi"""\nb,c') == 15
+    assert complete_records_end(b"a,b") == 0
+
+
+def test_record_with_a_newline_is_imported_once_complete(workspace):
+    watch = watcher(workspace)
+    append(watch, "bank.csv", HEADER + "2024-03-01,LOBLAWS #1,10.00,\r\n" + '2024-03-02,"LOBLAWS\nEXP')
+
+    assert watch.poll() == 1
+    assert [row["Description"] for row in workspace.stored_rows()] == ["LOBLAWS #1"]
+
+    append(watch, "bank.csv", 'RESS",4.00,\r\n')
+    assert watch.poll() == 1
+    assert [row["Description"] for row in workspace.stored_rows()] == ["LOBLAWS #1", "LOBLAWS\nEXPRESS"]
+    assert watch.poll() == 0
+
+
+def test_polls_reuse_the_duplicate_set_until_the_store_changes(workspace, monkeypatch):
+    workspace.store([make_transaction("2024-03-05", "LOBLAWS #5", "5.00", "Groceries", "Supermarket")])
+    manager = workspace.manager()
+    reads = count_partition_reads(monkeypatch, manager)
+    watch = watcher(workspace, manager)
+
+    append(watch, "bank.csv", HEADER + "2024-03-01,LOBLAWS #1,1.00,\r\n")
+    watch.poll()
+    append(watch, "bank.csv", "2024-03-02,LOBLAWS #2,2.00,\r\n2024-03-05,LOBLAWS #5,5.00,\r\n")
+    watch.poll()
+    # The second poll saw its own writes only, so the history was read once and the repeat still caught
+    assert len(reads) == 1
+    assert manager.headless_processor.counts["duplicates"] == 1
+
+    # Another program stores a row: the next poll reloads the history and skips that row
+    workspace.store([make_transaction("2024-03-06", "LOBLAWS #6", "6.00", "Groceries", "Supermarket")])
+    append(watch, "bank.csv", "2024-03-06,LOBLAWS #6,6.00,\r\n")
+    watch.poll()
+    assert len(reads) == 2
+    assert manager.headless_processor.counts["duplicates"] == 1
+    assert [row["Description"] for row in workspace.stored_rows()] == [
+        "LOBLAWS #5", "LOBLAWS #1", "LOBLAWS #2", "LOBLAWS #6"
+    ]
+
+
+def test_rows_set_aside_are_not_duplicates_in_later_polls(workspace):
+    watch = watcher(workspace)
+    append(watch, "first.csv", HEADER + "2024-03-01,NEW SHOP,3.00,\r\n")
+    watch.poll()
+    append(watch, "second.csv", HEADER + "2024-03-01,NEW SHOP,3.00,\r\n")
+    watch.poll()
+
+    assert watch.manager.headless_processor.counts["duplicates"] == 0
+    with open(watch.review_file, newline="", encoding="utf-8") as file:
+        assert [row["Description"] for row in csv.DictReader(file)] == ["NEW SHOP"]
+    assert workspace.stored_rows() == []
+
+
+def test_watch_resumes_from_the_saved_offset(workspace):
+    watch = watcher(workspace)
+    append(watch, "bank.csv", HEADER + "2024-03-01,LOBLAWS #1,1.00,\r\n")
+    watch.poll()
+
+    restarted = watcher(workspace)
+    append(restarted, "bank.csv", "2024-03-02,LOBLAWS #2,2.00,\r\n")
+    assert restarted.poll() == 1
+    assert restarted.manager.headless_processor.counts["duplicates"] == 0
+    assert len(workspace.stored_rows()) == 2
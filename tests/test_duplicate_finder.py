@@ -0,0 +1,89 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file tests blocked near-duplicate detection against a pairwise scan, and merging a group
+# License: MIT
+
+import random
+from datetime import date, timedelta
+
+from cmdbudget.category_suggester import description_features, normalize_description
+from cmdbudget.duplicate_finder import DuplicateFinder, description_similarity
+
+from helpers import make_transaction
+
+DESCRIPTIONS = ["AMAZON MKTP", "Amazon Mktp #2", "AMAZON.CA", "LOBLAWS", "Loblaws 1042", "TIM HORTONS #77", "SHELL"]
+
+
+def random_history(count: int, seed: int = 3):
+    generator = random.Random(seed)
+    first = date(2024, 1, 1)
+    return [
+        make_transaction((first + timedelta(days=generator.randrange(60))).isoformat(), generator.choice(DESCRIPTIONS),
+                         f"{generator.choice([1, -1]) * generator.choice([5, 12, 20])}.00",
+                         generator.choice(["Groceries", "Dining", "IGNORED"]), currency=generator.choice(["CAD", "USD"]))
+        for _ in range(count)
+    ]
+
+
+def pairwise_groups(transactions, finder: DuplicateFinder, focus=None):
+    """Every pair (with a focus row, if given) compared directly, joined into connected groups."""
+    parent = list(range(len(transactions)))
+
+    def root(row):
+        while parent[row] != row:
+            row = parent[row]
+        return row
+
+    features = [description_features(normalize_description(t.description)) for t in transactions]
+    for a, first in enumerate(transactions):
+        for b in range(a + 1, len(transactions)):
+            second = transactions[b]
+            if focus is not None and a not in focus and b not in focus:
+                continue
+            if "IGNORED" in (first.category, second.category) or first.currency != second.currency:
+                continue
+            if abs(first.amount_minor) != abs(second.amount_minor) or abs((first.date - second.date).days) > finder.day_window:
+                continue
+            if description_similarity(features[a], features[b]) >= finder.min_similarity:
+                parent[root(a)] = root(b)
+    groups = {}
+    for row in range(len(transactions)):
+        groups.setdefault(root(row), set()).add(row)
+    return {frozenset(rows) for rows in groups.values() if len(rows) > 1}
+
+
+def test_blocked_search_finds_the_same_groups_as_a_pairwise_scan():
+    history = random_history(400)
+    finder = DuplicateFinder(day_window=3, min_similarity=0.5)
+    groups = finder.find(history)
+    assert groups
+    assert {frozenset(group.rows) for group in groups} == pairwise_groups(history, finder)
+    for group in groups:
+        assert [t.date for t in group.transactions] == sorted(t.date for t in group.transactions)
+        assert finder.min_similarity <= group.similarity <= 1.0
+
+
+def test_focus_only_joins_pairs_with_those_rows():
+    history = random_history(400)
+    finder = DuplicateFinder(day_window=3, min_similarity=0.5)
+    focus = {10, 20, 30, 40}
+    focused = {frozenset(group.rows) for group in finder.find(history, focus)}
+    assert focused and all(rows & focus for rows in focused)
+    assert focused == pairwise_groups(history, finder, focus)
+
+
+def test_copies_across_accounts_and_window_edges():
+    history = [
+        make_transaction("2024-03-01", "AMAZON MKTP 123", "20.00", "Groceries"),
+        make_transaction("2024-03-03", "Amazon Mktp*456", "-20.00", "Groceries", tag="gift"),
+        make_transaction("2024-03-08", "AMAZON MKTP", "20.00", "Groceries", merchant="Amazon"),
+        make_transaction("2024-03-02", "AMAZON MKTP", "20.00", "IGNORED"),
+        make_transaction("2024-03-02", "AMAZON MKTP", "20.00", "Groceries", currency="USD"),
+    ]
+    finder = DuplicateFinder(day_window=3)
+    groups = finder.find(history)
+    assert [group.rows for group in groups] == [[0, 1]]
+
+    merged = groups[0].merged()
+    assert (merged.date, merged.amount_minor, merged.tags, merged.merchant) == (history[0].date, 2000, ("gift",), "")
+    assert [group.rows for group in DuplicateFinder(day_window=7).find(history)] == [[0, 1, 2]]
+    assert DuplicateFinder(day_window=7).find(history)[0].merged().merchant == "Amazon"
@@ -0,0 +1,99 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file tests advisory file locks, atomic replacement and snapshot reads
+# License: MIT
+
+import os
+import stat
+import threading
+import time
+
+import pytest
+
+from cmdbudget.file_lock import LOCK_SUFFIX, FileLock, atomic_write, open_snapshot, snapshot_size
+
+
+def test_exclusive_lock_keeps_other_threads_out(tmp_path):
+    path = str(tmp_path / "data.csv")
+    events = []
+
+    def writer():
+        with FileLock(path):
+            events.append("second")
+
+    with FileLock(path):
+        thread = threading.Thread(target=writer)
+        thread.start()
+        time.sleep(0.2)
+        events.append("first")
+    thread.join(timeout=5)
+    assert events == ["first", "second"]
+    assert os.path.exists(path + LOCK_SUFFIX)
+
+
+def test_lock_is_reentrant_but_not_upgradable(tmp_path):
+    path = str(tmp_path / "data.csv")
+    with FileLock(path):
+        with FileLock(path, exclusive=False):
+            with FileLock(path):
+                pass
+    with FileLock(path, exclusive=False):
+        with pytest.raises(RuntimeError):
+            with FileLock(path):
+                pass
+    # Everything was released: another thread can take it exclusively at once
+    acquired = []
+
+    def writer():
+        with FileLock(path):
+            acquired.append(True)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    thread.join(timeout=5)
+    assert acquired == [True]
+
+
+def test_atomic_write_replaces_whole_file_and_keeps_permissions(tmp_path):
+    path = tmp_path / "state.json"
+    path.write_text("old")
+    os.chmod(path, 0o600)
+    with atomic_write(str(path)) as file:
+        file.write("new contents")
+    assert path.read_text() == "new contents"
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    assert os.listdir(tmp_path) == ["state.json"]
+
+
+def test_atomic_write_leaves_original_on_error(tmp_path):
+    path = tmp_path / "state.json"
+    path.write_text("old")
+    with pytest.raises(ValueError):
+        with atomic_write(str(path)) as file:
+            file.write("half")
+            raise ValueError("boom")
+    assert path.read_text() == "old"
+    assert os.listdir(tmp_path) == ["state.json"]
+
+
+def test_atomic_write_binary(tmp_path):
+    path = tmp_path / "blob.bin"
+    with atomic_write(str(path), "wb") as file:
+        file.write(b"\x00\x01")
+    assert path.read_bytes() == b"\x00\x01"
+
+
+def test_snapshot_ignores_later_appends_and_replacement(tmp_path):
+    path = tmp_path / "data.csv"
+    path.write_text("a,1\nb,2\n")
+    snapshot = open_snapshot(str(path))
+    assert snapshot_size(str(path)) == 8
+    with open(path, "a") as file:
+        file.write("c,3\n")
+    with snapshot:
+        assert snapshot.read() == "a,1\nb,2\n"
+
+    snapshot = open_snapshot(str(path))
+    with atomic_write(str(path)) as file:
+        file.write("replaced\n")
+    with snapshot:
+        assert snapshot.readlines() == ["a,1\n", "b,2\n", "c,3\n"]
@@ -0,0 +1,58 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file tests the offline FX rate table and base-currency totals over the columnar view
+# License: MIT
+
+from datetime import date
+
+import pytest
+
+from cmdbudget.currency_utils import configure_decimal_places
+from cmdbudget.fx_rates import FxRateTable, load_fx_rates
+from cmdbudget.transaction_columns import TransactionColumns
+
+from helpers import IMPORT_CSV_STRUCTURE, make_transaction
+
+
+@pytest.fixture
+def rates(tmp_path) -> FxRateTable:
+    configure_decimal_places(IMPORT_CSV_STRUCTURE)
+    path = tmp_path / "rates.csv"
+    path.write_text("date,currency,rate\n2024-01-10,usd,1.30\n2024-01-01,USD,1.25\nbad,USD,1\n2024-01-01,JPY,0.009\n")
+    return FxRateTable.load(str(path), "cad")
+
+
+def day(text: str) -> int:
+    return date.fromisoformat(text).toordinal()
+
+
+def test_rate_is_the_latest_on_or_before_the_day(rates):
+    assert rates.currencies() == ["JPY", "USD"]
+    assert rates.rate("USD", day("2023-12-01")) == 1.25
+    assert rates.rate("usd", day("2024-01-09")) == 1.25
+    assert rates.rate("USD", day("2024-02-01")) == 1.30
+    assert rates.rate("CAD", day("2024-02-01")) == 1.0
+    assert rates.rate("EUR", day("2024-02-01")) is None
+    assert rates.convert_minor(1000, "JPY", day("2024-01-05")) == pytest.approx(9.0)
+    assert rates.max_rate("USD") == 1.30
+
+
+def test_grouped_totals_convert_each_row_at_its_own_rate(rates):
+    columns = TransactionColumns([
+        make_transaction("2024-01-05", "A", "10.00", "Dining", currency="USD"),
+        make_transaction("2024-01-15", "B", "10.00", "Dining", currency="USD"),
+        make_transaction("2024-01-15", "C", "1000", "Dining", currency="JPY"),
+        make_transaction("2024-01-15", "D", "5.00", "Groceries"),
+        make_transaction("2024-01-15", "E", "5.00", "Groceries", currency="EUR"),
+    ])
+    totals, unconverted = columns.group_sum_converted(("category",), range(len(columns)), rates)
+    named = {columns.category.decode(codes[0]): total for codes, total in totals.items()}
+    assert named["Dining"] == pytest.approx(12.5 + 13.0 + 9.0)
+    assert named["Groceries"] == pytest.approx(5.0)
+    assert unconverted == 1
+
+
+def test_load_fx_rates_uses_the_configured_file(tmp_path, rates):
+    assert load_fx_rates({}) is None
+    assert load_fx_rates({"fx_rates_file": str(tmp_path / "missing.csv")}) is None
+    table = load_fx_rates({"fx_rates_file": str(tmp_path / "rates.csv"), "default_currency": "USD", "base_currency": "CAD"})
+    assert table.base_currency == "CAD" and table.can_convert("JPY")
@@ -0,0 +1,153 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file tests resumable imports: the checkpoint file and how the processor advances and clears it
+# License: MIT
+
+import os
+
+import pytest
+
+from cmdbudget.display import Display
+from cmdbudget.import_checkpoint import IMPORT_CHECKPOINT_FILE, ImportCheckpoint, csv_row, read_records
+from cmdbudget import transaction_processor
+from cmdbudget.transaction_processor import NewTransactionProcessor
+
+from helpers import answers
+
+
+def processor(workspace) -> NewTransactionProcessor:
+    return NewTransactionProcessor(workspace.new_transactions_file, workspace.transactions_file, workspace.config_file,
+                                   workspace.categories_file, workspace.mappings_file)
+
+
+def checkpoint_path(workspace) -> str:
+    return os.path.join(workspace.state_dir, IMPORT_CHECKPOINT_FILE)
+
+
+def interrupt_at_prompt(monkeypatch):
+    def prompt(text):
+        raise KeyboardInterrupt
+    monkeypatch.setattr(Display, "prompt", staticmethod(prompt))
+
+
+def test_read_records_tracks_offsets_across_quoted_newlines(tmp_path):
+    path = tmp_path / "export.csv"
+    path.write_bytes(b'Date,Description\r\n2024-01-01,"two\nlines"\r\n2024-01-02,plain\r\n')
+    with open(path, "rb") as file:
+        records = list(read_records(file, 0))
+        assert [values for values, _, _ in records] == [["Date", "Description"], ["2024-01-01", "two\nlines"], ["2024-01-02", "plain"]]
+        _, start, end = records[1]
+        file.seek(start)
+        assert file.read(end - start) == b'2024-01-01,"two\nlines"\r\n'
+
+
+def test_csv_row_matches_dict_reader_for_short_and_long_records():
+    assert csv_row(["a", "b"], ["1"]) == {"a": "1", "b": None}
+    assert csv_row(["a"], ["1", "2", "3"]) == {"a": "1", None: ["2", "3"]}
+
+
+def test_checkpoint_round_trip_and_changed_source(tmp_path):
+    source = tmp_path / "new.csv"
+    source.write_text("Date,Description\n2024-01-01,A\n2024-01-02,B\n")
+    state = str(tmp_path / "checkpoint.json")
+    checkpoint = ImportCheckpoint(state, str(source))
+    checkpoint.add_pending(2, 17)
+    checkpoint.advance(3, source.stat().st_size)
+
+    loaded = ImportCheckpoint(state, str(source))
+    assert loaded.load()
+    assert (loaded.row, loaded.offset, loaded.pending) == (3, source.stat().st_size, {2: 17})
+
+    # Appending keeps the imported part, rewriting it does not
+    with open(source, "a") as file:
+        file.write("2024-01-03,C\n")
+    assert ImportCheckpoint(state, str(source)).load()
+    source.write_text("Date,Description\n2024-01-01,X\n2024-01-02,B\n2024-01-03,C\n")
+    assert not ImportCheckpoint(state, str(source)).load()
+
+
+def test_completed_import_clears_its_checkpoint(workspace, capsys):
+    workspace.write_new([["2024-03-01", "LOBLAWS #1", "10.00", ""], ["2024-03-02", "TIM HORTONS", "2.50", ""]])
+    first = processor(workspace)
+    assert first.process()
+    assert first.counts["mapped"] == 2
+    assert not os.path.exists(checkpoint_path(workspace))
+
+    capsys.readouterr()
+    again = processor(workspace)
+    assert again.process()
+    assert "Continuing the import" not in capsys.readouterr().out
+    assert again.counts["duplicates"] == 2
+
+
+def test_unreadable_rows_are_retried_after_an_interruption(workspace, monkeypatch, capsys):
+    monkeypatch.setattr(transaction_processor, "IMPORT_BATCH_SIZE", 1)
+    workspace.write_new([
+        ["2024-03-01", "LOBLAWS #1", "10.00", ""],
+        ["not a date", "LOBLAWS #2", "11.00", ""],
+        ["2024-03-03", "LOBLAWS #3", "12.00", ""],
+        ["2024-03-04", "NEW SHOP", "13.00", ""],
+    ])
+    interrupt_at_prompt(monkeypatch)
+    first = processor(workspace)
+    with pytest.raises(KeyboardInterrupt):
+        first.process()
+    assert first.counts["errors"] == 1
+    # The mapped rows are stored, but the checkpoint stays before the unreadable row
+    checkpoint = ImportCheckpoint(checkpoint_path(workspace), workspace.new_transactions_file)
+    assert checkpoint.load()
+    assert checkpoint.row == 2
+
+    answers(monkeypatch, "4")  # Ignore NEW SHOP
+    capsys.readouterr()
+    second = processor(workspace)
+    assert second.process()
+    assert "after row 2" in capsys.readouterr().out
+    assert second.counts["errors"] == 1  # Tried again rather than skipped
+    assert second.counts["duplicates"] == 1
+    assert second.counts["ignored"] == 1
+    assert not os.path.exists(checkpoint_path(workspace))
+
+
+def test_interrupted_import_resumes_with_pending_rows(workspace, monkeypatch):
+    workspace.write_new([
+        ["2024-03-01", "UNKNOWN A", "1.00", ""],
+        ["2024-03-02", "LOBLAWS", "2.00", ""],
+        ["2024-03-03", "UNKNOWN B", "3.00", ""],
+    ])
+    interrupt_at_prompt(monkeypatch)
+    with pytest.raises(KeyboardInterrupt):
+        processor(workspace).process()
+    checkpoint = ImportCheckpoint(checkpoint_path(workspace), workspace.new_transactions_file)
+    assert checkpoint.load()
+    assert 2 in checkpoint.pending
+
+    answers(monkeypatch, "4", "4")
+    resumed = processor(workspace)
+    assert resumed.process()
+    assert resumed.counts["ignored"] == 2
+    assert sorted(row["Description"] for row in workspace.stored_rows()) == ["LOBLAWS", "UNKNOWN A", "UNKNOWN B"]
+
+
+def test_checkpoint_never_passes_a_row_still_being_handled(workspace, monkeypatch):
+    monkeypatch.setattr(transaction_processor, "IMPORT_BATCH_SIZE", 1)
+    workspace.write_new([
+        ["2024-03-01", "LOBLAWS #1", "1.00", ""],
+        ["2024-03-02", "LOBLAWS #2", "2.00", ""],
+        ["2024-03-03", "BOOM", "3.00", ""],
+        ["2024-03-04", "LOBLAWS #4", "4.00", ""],
+    ])
+    run = processor(workspace)
+    find_category = run.classifier.find_category
+
+    def crash_on_boom(description):
+        if description == "BOOM":
+            raise RuntimeError("classifier failed")
+        return find_category(description)
+    monkeypatch.setattr(run.classifier, "find_category", crash_on_boom)
+
+    assert not run.process()
+    checkpoint = ImportCheckpoint(checkpoint_path(workspace), workspace.new_transactions_file)
+    assert checkpoint.load()
+    # Rows 2 and 3 are stored; BOOM (row 4) was not handled, so resuming must read it again
+    assert checkpoint.row == 3
+    assert [row["Description"] for row in workspace.stored_rows()] == ["LOBLAWS #1", "LOBLAWS #2"]
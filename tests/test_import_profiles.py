@@ -0,0 +1,86 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file tests import profiles: header fingerprints, compiled row decoders and the profile registry
+# License: MIT
+
+import json
+
+import pytest
+
+from cmdbudget.import_profiles import (
+    ProfileRegistry, RowDecoder, header_fingerprint, profiles_from_config, validate_profile
+)
+
+from helpers import IMPORT_CSV_STRUCTURE
+
+CARD = {
+    "date_column": "Posted",
+    "description_column": ["Merchant", "City"],
+    "currency_columns": {"USD": "Amount"},
+    "currency_priority": ["USD"],
+    "default_currency": "USD",
+    "expenses_are_positive": False,
+    "date_format": "%m/%d/%Y",
+}
+
+
+def registry(tmp_path, **profiles) -> ProfileRegistry:
+    config = {"import_csv_structure": IMPORT_CSV_STRUCTURE, "import_profiles": profiles}
+    return ProfileRegistry(profiles_from_config(config), str(tmp_path / "import_profiles.json"))
+
+
+def test_header_fingerprint_ignores_a_byte_order_mark_but_not_column_order():
+    assert header_fingerprint(["\ufeffDate", "Description"]) == header_fingerprint(["Date", "Description"])
+    assert header_fingerprint(["Description", "Date"]) != header_fingerprint(["Date", "Description"])
+
+
+def test_decoder_resolves_columns_and_picks_the_first_nonzero_currency():
+    decoder = RowDecoder.compile("default", IMPORT_CSV_STRUCTURE, [" date ", "DESCRIPTION", "CAD$", "USD$"])
+    assert decoder.date_column == " date "
+    raw = decoder.decode({" date ": "2024-03-01", "DESCRIPTION": " Shop ", "CAD$": "", "USD$": "$1,234.50"})
+    assert (raw.date.day, raw.description, raw.currency, raw.amount_minor) == (1, "Shop", "USD", 123450)
+    assert raw.raw_data["USD$"] == "$1,234.50"
+
+    empty = decoder.decode({" date ": "2024-03-01", "DESCRIPTION": "Nothing", "CAD$": "", "USD$": "0.00"})
+    assert (empty.currency, empty.amount_minor) == ("CAD", 0)
+
+
+def test_decoder_joins_description_columns_and_flips_negative_expenses():
+    decoder = RowDecoder.compile("card", {**IMPORT_CSV_STRUCTURE, **CARD}, ["Posted", "Merchant", "City", "Amount"])
+    raw = decoder.decode({"Posted": "03/04/2024", "Merchant": "CAFE", "City": "", "Amount": "-4.25"})
+    assert (raw.date.month, raw.date.day, raw.description, raw.amount_minor) == (3, 4, "CAFE", 425)
+    with pytest.raises(ValueError):
+        decoder.decode({"Posted": "2024-03-04", "Merchant": "CAFE", "Amount": "1"})
+    assert RowDecoder.from_spec(json.loads(json.dumps(decoder.to_spec()))) == decoder
+
+
+def test_registry_matches_by_columns_and_remembers_the_header(tmp_path):
+    profiles = registry(tmp_path, card=CARD)
+    header = ["Posted", "Merchant", "City", "Amount"]
+    assert profiles.decoder_for(header).profile == "card"
+    assert profiles.decoder_for(["Date", "Description", "CAD$", "USD$"]).profile == "default"
+    assert profiles.decoder_for(["When", "What"]) is None
+
+    reopened = registry(tmp_path, card=CARD)
+    assert reopened.headers[header_fingerprint(header)]["profile"] == "card"
+    # A changed profile is matched again rather than served from the stale cached decoder
+    changed = registry(tmp_path, card={**CARD, "date_format": "%d/%m/%Y"})
+    assert changed.decoder_for(header).date_format == "%d/%m/%Y"
+
+
+def test_registry_asks_or_refuses_when_profiles_tie(tmp_path):
+    profiles = registry(tmp_path, visa=CARD, mastercard=CARD)
+    header = ["Posted", "Merchant", "City", "Amount"]
+    assert profiles.decoder_for(header) is None
+    assert profiles.decoder_for(header, choose=lambda names: sorted(names)[0]).profile == "mastercard"
+
+
+def test_pinned_header_wins_over_column_matching(tmp_path):
+    header = ["Posted", "Merchant", "City", "Amount"]
+    profiles = registry(tmp_path, visa=CARD, mastercard={**CARD, "header": header})
+    assert profiles.decoder_for(header).profile == "mastercard"
+
+
+def test_validate_profile_reports_what_is_missing():
+    assert validate_profile("card", {**IMPORT_CSV_STRUCTURE, **CARD}) is None
+    assert "date_column" in validate_profile("bad", {"description_column": "D"})
+    assert "currency_priority" in validate_profile("bad", {**CARD, "currency_priority": ["EUR"]})
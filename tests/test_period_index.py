@@ -0,0 +1,77 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file tests prefix-sum period totals against plain sums, and the period helpers
+# License: MIT
+
+import random
+from collections import defaultdict
+from datetime import date, timedelta
+
+from cmdbudget.period_index import (
+    PeriodSumIndex, fiscal_year_of, fiscal_year_range, fiscal_year_to_date, quarter_to_date, trailing_days
+)
+from cmdbudget.transaction_columns import TransactionColumns
+
+from helpers import make_transaction
+
+CATEGORIES = ["Groceries", "Dining", "Transport"]
+
+
+def random_history(count: int, seed: int = 7):
+    generator = random.Random(seed)
+    first = date(2023, 1, 1)
+    return [
+        make_transaction((first + timedelta(days=generator.randrange(400))).isoformat(), f"ROW {number}",
+                         f"{generator.randrange(-5000, 20000) / 100:.2f}", generator.choice(CATEGORIES),
+                         currency=generator.choice(["CAD", "USD"]))
+        for number in range(count)
+    ]
+
+
+def plain_totals(transactions, start: date, end: date):
+    totals = defaultdict(lambda: defaultdict(int))
+    for transaction in transactions:
+        if start <= transaction.date.date() <= end:
+            totals[transaction.category][transaction.currency] += transaction.amount_minor
+    return {category: {currency: amount for currency, amount in by_currency.items() if amount}
+            for category, by_currency in totals.items() if any(by_currency.values())}
+
+
+def test_range_totals_match_plain_sums():
+    history = random_history(300)
+    index = PeriodSumIndex(TransactionColumns(history), range(len(history)))
+    generator = random.Random(1)
+    for _ in range(50):
+        start = date(2022, 12, 1) + timedelta(days=generator.randrange(450))
+        end = start + timedelta(days=generator.randrange(120))
+        assert dict(index.category_totals(start, end)) == plain_totals(history, start, end)
+    assert index.total("Dining", "usd", date(2000, 1, 1), date(2100, 1, 1)) == sum(
+        t.amount_minor for t in history if t.category == "Dining" and t.currency == "USD")
+
+
+def test_rows_added_outside_the_span_and_taken_out_again():
+    history = random_history(50)
+    columns = TransactionColumns(history)
+    index = PeriodSumIndex(columns, range(len(columns)))
+
+    for transaction in [make_transaction("2020-06-01", "EARLY", "7.00", "Dining"),
+                        make_transaction("2026-06-01", "LATE", "9.00", "Travel")]:
+        index.add(columns.append(transaction))
+    everything = (date(2000, 1, 1), date(2100, 1, 1))
+    assert dict(index.category_totals(*everything)) == plain_totals(columns.transactions, *everything)
+    assert index.total("Travel", "CAD", date(2026, 6, 1), date(2026, 6, 1)) == 900
+
+    # An edit is taken out as it stood, changed, then added back
+    index.adjust([0], sign=-1)
+    columns.update(0, make_transaction("2025-01-01", "MOVED", "1.00", "Transport"))
+    index.adjust([0])
+    assert dict(index.category_totals(*everything)) == plain_totals(columns.transactions, *everything)
+
+
+def test_period_helpers():
+    today = date(2024, 5, 20)
+    assert quarter_to_date(today) == (date(2024, 4, 1), today)
+    assert fiscal_year_range(2024, 4) == (date(2024, 4, 1), date(2025, 3, 31))
+    assert fiscal_year_range(2024) == (date(2024, 1, 1), date(2024, 12, 31))
+    assert fiscal_year_of(date(2024, 3, 31), 4) == 2023
+    assert fiscal_year_to_date(today, 7) == (date(2023, 7, 1), today)
+    assert trailing_days(today, 3) == (date(2024, 5, 18), today)
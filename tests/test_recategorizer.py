@@ -0,0 +1,73 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file tests carrying a changed mapping rule back to stored transactions
+# License: MIT
+
+import os
+
+import pytest
+
+from cmdbudget.description_index import DescriptionIndex
+from cmdbudget.recategorizer import Recategorizer
+from cmdbudget.transaction_processor import TransactionClassifier
+from cmdbudget.transaction_store import PartitionedTransactionStore
+from cmdbudget.undo_log import UndoLog
+
+from helpers import make_transaction
+
+HISTORY = [
+    make_transaction("2023-05-01", "COSTCO OLD", "9.00", "Dining"),
+    make_transaction("2024-01-05", "COSTCO WHOLESALE", "80.00", "Dining"),
+    make_transaction("2024-01-06", "Costco Wholesale", "20.00", "Dining", "Restaurant"),
+    make_transaction("2024-02-01", "LOBLAWS COSTCO", "10.00", "Groceries", "Supermarket"),
+    make_transaction("2024-02-02", "COSTCO GAS", "30.00", "Groceries", "Market"),
+    make_transaction("2024-03-01", "COSTCO RETURN", "50.00", "SPLIT"),
+    make_transaction("2025-01-01", "TIM HORTONS", "2.00", "Dining", "Coffee"),
+]
+
+
+@pytest.fixture
+def setup(workspace, tmp_path):
+    store = PartitionedTransactionStore(str(tmp_path / "partitions"), "year", "gzip")
+    assert store.save_many(HISTORY)
+    assert store.seal("2023")
+    classifier = TransactionClassifier(workspace.config_file, workspace.categories_file, workspace.mappings_file)
+    classifier.learn_history(HISTORY)
+    classifier.save_mapping("COSTCO", "Groceries", "Market")
+    undo_log = UndoLog(str(tmp_path / "undo.jsonl"), store, classifier)
+    return Recategorizer(classifier, store, undo_log), store, undo_log
+
+
+def test_plan_lists_only_rows_the_rules_now_categorize_differently(setup):
+    recategorizer, store, _ = setup
+    plan = recategorizer.plan("COSTCO", HISTORY, DescriptionIndex(HISTORY))
+
+    # LOBLAWS COSTCO keeps the earlier LOBLAWS rule, COSTCO GAS already matches, SPLIT rows are left alone
+    assert [row for row, _, _ in plan.changes] == [1, 2]
+    assert {(new.category, new.subcategory) for _, _, new in plan.changes} == {("Groceries", "Market")}
+    assert plan.sealed == 1
+    assert plan.summary() == [("Dining", "Groceries > Market", 1), ("Dining > Restaurant", "Groceries > Market", 1)]
+
+
+def test_apply_rewrites_only_affected_partitions_and_can_be_undone(setup):
+    recategorizer, store, undo_log = setup
+    plan = recategorizer.plan("COSTCO", HISTORY, DescriptionIndex(HISTORY))
+    untouched = os.stat(store.partition_path("2025")).st_mtime_ns
+
+    assert recategorizer.apply(plan) == 2
+    assert [(t.description, t.category) for t in store.read_partition("2024")] == [
+        ("COSTCO WHOLESALE", "Groceries"), ("Costco Wholesale", "Groceries"), ("LOBLAWS COSTCO", "Groceries"),
+        ("COSTCO GAS", "Groceries"), ("COSTCO RETURN", "SPLIT")]
+    assert os.stat(store.partition_path("2025")).st_mtime_ns == untouched
+    assert recategorizer.classifier.suggest_categories("COSTCO WHOLESALE")[0] == ("Groceries", "Market")
+
+    entries, position = undo_log.entries()
+    assert position == 1 and entries[0]["label"] == "Re-categorize 2 transactions for 'COSTCO'"
+    assert undo_log.undo() is not None
+    assert [t.category for t in store.read_partition("2024")[:2]] == ["Dining", "Dining"]
+
+
+def test_nothing_to_apply(setup):
+    recategorizer, _, undo_log = setup
+    plan = recategorizer.plan("TIM HORTONS", HISTORY, DescriptionIndex(HISTORY))
+    assert plan.changes == [] and recategorizer.apply(plan) == 0
+    assert undo_log.entries() == ([], 0)
@@ -0,0 +1,67 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file tests recurring-charge detection and when its persisted state is reused
+# License: MIT
+
+from datetime import date
+
+from cmdbudget.recurring import RecurringDetector
+
+from helpers import make_transaction
+
+MONTHS = ["2024-01-15", "2024-02-14", "2024-03-15", "2024-04-15", "2024-05-15"]
+
+
+def netflix(days, amount="15.99"):
+    return [make_transaction(day, "NETFLIX.COM", amount, "Entertainment") for day in days]
+
+
+def test_detects_monthly_series_and_ignores_irregular_charges():
+    detector = RecurringDetector()
+    detector.build(netflix(MONTHS) + [
+        make_transaction(day, "HARDWARE STORE", "40.00", "Home") for day in ["2024-01-03", "2024-01-20", "2024-04-02"]
+    ])
+    [series] = detector.all_series()
+    assert (series.description, series.period, series.occurrences, series.amount_minor) == ("NETFLIX.COM", "monthly", 5, 1599)
+    assert series.next_date > series.last_date
+    assert detector.active_series(date(2024, 6, 1)) == [series]
+    assert detector.active_series(date(2024, 9, 1)) == []
+
+
+def test_add_re_detects_the_touched_bucket():
+    detector = RecurringDetector()
+    detector.build(netflix(MONTHS[:2]))
+    assert detector.all_series() == []
+    detector.add(netflix(MONTHS[2:]))
+    assert [series.occurrences for series in detector.all_series()] == [5]
+
+
+def test_state_is_rebuilt_when_the_history_changes_but_not_its_size(workspace):
+    workspace.store(netflix(MONTHS))
+    assert [series.description for series in workspace.manager().get_recurring_series(active_only=False)] == ["NETFLIX.COM"]
+
+    # Rewrite the file in place, same rows and size, with dates that no longer recur
+    with open(workspace.transactions_file, "r+", newline="", encoding="utf-8") as file:
+        text = file.read()
+        for regular, irregular in zip(["14/02/24", "15/03/24", "15/04/24"], ["16/01/24", "02/03/24", "29/03/24"]):
+            text = text.replace(regular, irregular)
+        file.seek(0)
+        file.write(text)
+    assert workspace.manager().get_recurring_series(active_only=False) == []
+
+
+def test_import_folds_into_current_state_without_a_rebuild(workspace, monkeypatch):
+    workspace.store(netflix(MONTHS[:2]))
+    manager = workspace.manager()
+    assert manager.get_recurring_series(active_only=False) == []
+    manager.classifier.save_mapping("NETFLIX", "Dining")
+
+    counts, unresolved = manager.import_rows(
+        [(2, {"Date": day, "Description": "NETFLIX.COM", "CAD$": "15.99", "USD$": ""}) for day in MONTHS[2:]],
+        ["Date", "Description", "CAD$", "USD$"],
+    )
+    assert counts["mapped"] == 3 and not unresolved
+
+    def no_rebuild(self, transactions, generation=None):
+        raise AssertionError("recurring state was rebuilt")
+    monkeypatch.setattr(RecurringDetector, "build", no_rebuild)
+    assert [series.occurrences for series in workspace.manager().get_recurring_series(active_only=False)] == [5]
@@ -0,0 +1,115 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file tests search expressions: parsing, planned results against a brute-force filter, and explain output
+# License: MIT
+
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from cmdbudget.currency_utils import configure_decimal_places
+from cmdbudget.description_index import DescriptionIndex
+from cmdbudget.search_query import And, Not, Or, QueryError, QueryPlan, SearchIndex, Term, parse_query
+from cmdbudget.transaction_columns import TransactionColumns
+
+from helpers import IMPORT_CSV_STRUCTURE, make_transaction
+
+DESCRIPTIONS = ["LOBLAWS #12", "Tim Hortons", "AIRBNB PARIS", "Airbnb Lyon", "SHELL GAS", "UBER TRIP", "AMAZON.CA"]
+CATEGORIES = ["Groceries", "Dining", "Travel", "Transport", "IGNORED", "SPLIT"]
+TAGS = ["", "", "trip", "work", "trip;work", "Family"]
+
+
+def random_history(count: int, seed: int = 11):
+    configure_decimal_places(IMPORT_CSV_STRUCTURE)
+    generator = random.Random(seed)
+    first = date(2023, 11, 1)
+    history = []
+    for _ in range(count):
+        currency = generator.choice(["CAD", "CAD", "USD", "JPY"])
+        amount = f"{generator.randrange(100, 30000)}" if currency == "JPY" else f"{generator.randrange(-2000, 20000) / 100:.2f}"
+        history.append(make_transaction(
+            (first + timedelta(days=generator.randrange(200))).isoformat(), generator.choice(DESCRIPTIONS), amount,
+            generator.choice(CATEGORIES), currency=currency, tag=generator.choice(TAGS),
+            merchant=generator.choice(["", "Amazon", "Uber"])))
+    return history
+
+
+@pytest.fixture(scope="module")
+def history():
+    return random_history(600)
+
+
+@pytest.fixture(scope="module")
+def index(history):
+    columns = TransactionColumns(history)
+    return SearchIndex(columns, DescriptionIndex(history), columns.reportable_rows())
+
+
+def day(text: str) -> date:
+    return date.fromisoformat(text)
+
+
+# Each query with the same condition written as a plain per-transaction check
+QUERIES = [
+    ("airbnb", lambda t: "AIRBNB" in t.description.upper()),
+    ("category:dining", lambda t: t.category == "Dining"),
+    ("category:dining amount>50", lambda t: t.category == "Dining" and t.amount > 50),
+    ("date:2024-02 tag:trip", lambda t: (t.date.year, t.date.month) == (2024, 2) and "trip" in t.tags),
+    ("tag:trip tag:work", lambda t: {"trip", "work"} <= set(t.tags)),
+    ("tag:family OR tag:work", lambda t: "Family" in t.tags or "work" in t.tags),
+    ("date>=2024-03-01 date<2024-04 currency:usd", lambda t: day("2024-03-01") <= t.date.date() < day("2024-04-01")
+     and t.currency == "USD"),
+    ("date:2023-12..2024-01 (merchant:uber OR \"shell gas\")", lambda t: day("2023-12-01") <= t.date.date() <= day("2024-01-31")
+     and (t.merchant == "Uber" or "SHELL GAS" in t.description.upper())),
+    ("amount:10..20", lambda t: 10 <= t.amount <= 20),
+    ("amount<0 NOT category:travel", lambda t: t.amount < 0 and t.category != "Travel"),
+    ("NOT (tag:trip OR category:groceries)", lambda t: "trip" not in t.tags and t.category != "Groceries"),
+    ("category:ignored", lambda t: t.category == "IGNORED"),
+    ("category:split OR airbnb", lambda t: t.category == "SPLIT" or "AIRBNB" in t.description.upper()),
+]
+
+
+@pytest.mark.parametrize("query, predicate", QUERIES, ids=[query for query, _ in QUERIES])
+def test_planned_results_match_a_brute_force_filter(history, index, query, predicate):
+    plan = QueryPlan(query, index)
+    names_reserved = "ignored" in query or "split" in query
+    expected = {row for row, t in enumerate(history)
+                if predicate(t) and (names_reserved or t.category not in ("IGNORED", "SPLIT"))}
+    assert set(plan.matching_rows()) == expected
+    assert plan.execute().total == len(expected)
+
+
+def test_pages_follow_the_full_ordering(index):
+    plan = QueryPlan("category:dining OR category:travel", index)
+    everything = plan.execute("amount", descending=False).rows
+    amounts = [index.columns.amount_minor[row] for row in everything]
+    assert amounts == sorted(amounts)
+    assert plan.execute("amount", descending=False, limit=10, offset=5).rows == everything[5:15]
+    newest = plan.execute("date", limit=3).rows
+    assert newest == sorted(everything, key=lambda row: (index.columns.day[row], row), reverse=True)[:3]
+
+
+def test_parser_precedence():
+    assert parse_query('a OR b c') == Or((Term("description", ":", "a"),
+                                          And((Term("description", ":", "b"), Term("description", ":", "c")))))
+    assert parse_query('NOT tag:x amount>=5') == And((Not(Term("tag", ":", "x")), Term("amount", ">=", "5")))
+    assert parse_query('"two words"') == Term("description", ":", "two words")
+
+
+@pytest.mark.parametrize("query", ["", "(airbnb", "airbnb)", "colour:red", "tag>x", "date:2024-13", "amount>abc",
+                                   "category:", "OR"])
+def test_bad_queries_are_query_errors(index, query):
+    with pytest.raises(QueryError):
+        QueryPlan(query, index)
+
+
+def test_explain_drives_from_the_most_selective_index(index):
+    lines = QueryPlan("category:groceries date:2024-02-10 amount>5", index).explain()
+    assert lines[0] == "all of:"
+    assert lines[1].startswith("  use: date 2024-02-10 to 2024-02-10")
+    assert any(line.startswith("  filter: amount > 5 (checked per row)") for line in lines)
+    assert any("category = 'groceries'" in line for line in lines[2:])
+
+    scan = QueryPlan("NOT category:groceries", index).explain()
+    assert scan[0] == f"scan {len(index.base_rows)} rows:"
+    assert scan[1] == "not (checked per row):"
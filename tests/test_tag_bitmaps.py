@@ -0,0 +1,79 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file tests chunked row bitmaps against plain sets, and the per-tag index kept over a table
+# License: MIT
+
+import random
+
+import pytest
+
+from cmdbudget.tag_bitmaps import CHUNK_BITS, SPARSE_CHUNK_BITS, RowBitmap, TagBitmaps
+from cmdbudget.transaction import join_tags, parse_tags
+from cmdbudget.transaction_columns import TransactionColumns
+
+from helpers import make_transaction
+
+
+def random_rows(generator: random.Random, count: int, span: int):
+    return {generator.randrange(span) for _ in range(count)}
+
+
+@pytest.mark.parametrize("count", [10, 5000, 150000])
+def test_bitmap_set_operations_match_python_sets(count):
+    generator = random.Random(count)
+    span = 4 << CHUNK_BITS
+    a, b = random_rows(generator, count, span), random_rows(generator, count, span)
+    left, right = RowBitmap.from_rows(a), RowBitmap.from_rows(b)
+
+    assert list(left) == sorted(a) and len(left) == len(a)
+    assert list(left & right) == sorted(a & b)
+    assert list(left | right) == sorted(a | b)
+    assert list(left - right) == sorted(a - b)
+    assert all(row in left for row in list(a)[:100])
+    assert not any(row in left for row in list(b - a)[:100])
+
+
+def test_dense_and_sparse_chunks_iterate_alike():
+    dense = set(range(2 * SPARSE_CHUNK_BITS)) | {(1 << CHUNK_BITS) + 5}
+    assert list(RowBitmap.from_rows(dense)) == sorted(dense)
+
+
+def test_add_and_discard_drop_empty_chunks():
+    bitmap = RowBitmap()
+    bitmap.add(3)
+    bitmap.add((2 << CHUNK_BITS) + 1)
+    copy = bitmap.copy()
+    bitmap.discard((2 << CHUNK_BITS) + 1)
+    bitmap.discard(99)
+    assert list(bitmap) == [3] and list(bitmap.chunks) == [0]
+    bitmap.discard(3)
+    assert not bitmap and bitmap.chunks == {}
+    assert list(copy) == [3, (2 << CHUNK_BITS) + 1]
+
+
+def test_tag_index_follows_appends_and_edits():
+    columns = TransactionColumns([
+        make_transaction("2024-01-01", "A", "1.00", tag="trip;work"),
+        make_transaction("2024-01-02", "B", "2.00", tag="work"),
+        make_transaction("2024-01-03", "C", "3.00"),
+    ])
+    tags = columns.tags
+    assert tags.tags() == ["trip", "work"]
+    assert list(tags.all_of(["trip", "work"])) == [0]
+    assert list(tags.any_of(tags.matching("WORK"))) == [0, 1]
+
+    row = columns.append(make_transaction("2024-01-04", "D", "4.00", tag="Family;trip"))
+    assert list(tags.rows_with("trip")) == [0, row]
+    columns.update(0, make_transaction("2024-01-01", "A", "1.00", tag="work"))
+    assert list(tags.rows_with("trip")) == [row]
+    columns.update(row, make_transaction("2024-01-04", "D", "4.00"))
+    assert tags.tags() == ["work"]
+    assert columns.rows_with_tag("work", [1, 2]) == [1]
+
+    rebuilt = TagBitmaps.build(columns.tag.values, columns.tag.codes)
+    assert {tag: list(bitmap) for tag, bitmap in rebuilt.bitmaps.items()} == {"work": [0, 1]}
+
+
+def test_tag_values_are_normalized():
+    assert parse_tags(" trip, work ;trip,, ") == "trip;work"
+    assert join_tags(["a", " ", "b", "a"]) == "a;b"
+    assert make_transaction("2024-01-01", "A", "1.00", tag="x;y").tags == ("x", "y")
@@ -0,0 +1,53 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file tests the transaction models: slots, interning, duplicate keys and the stored row format
+# License: MIT
+
+from datetime import date, datetime
+
+import pytest
+
+from cmdbudget.transaction import RawTransaction, Transaction, dedupe_key
+from cmdbudget.transaction_operations import TransactionOperations
+
+from helpers import make_transaction
+
+
+def test_transactions_are_slotted_with_interned_fields():
+    first = make_transaction("2024-01-02", "LOBLAWS", "1.00", "Grocer" + "ies", tag="fo" + "od")
+    second = make_transaction("2024-01-03", "LOBLAWS", "2.00", "".join(["Groc", "eries"]), tag="".join(["f", "ood"]))
+    assert not hasattr(first, "__dict__")
+    with pytest.raises(AttributeError):
+        first.note = "no room for this"
+    assert first.category is second.category
+    assert first.tag is second.tag
+
+
+def test_duplicates_match_across_sign_case_and_models():
+    stored = make_transaction("2024-01-02", "Loblaws #12 ", "12.30", "Groceries")
+    refund = make_transaction("2024-01-02", "LOBLAWS #12", "-12.30", "Dining")
+    raw = RawTransaction.from_values({"Date": "2024-01-02"}, datetime(2024, 1, 2, 15, 30), "loblaws #12", 1230, "CAD")
+    assert stored == refund == raw
+    assert len({stored, refund, raw}) == 1
+    assert stored != make_transaction("2024-01-03", "LOBLAWS #12", "12.30")
+    assert raw.raw_data == {"Date": "2024-01-02"}
+
+
+def test_plain_dates_become_datetimes():
+    created = TransactionOperations.create_transaction(date(2024, 1, 2), " Shop ", "-0.05", "CAD", "Groceries")
+    assert created.date == datetime(2024, 1, 2)
+    assert created == make_transaction("2024-01-02", "shop", "0.05")
+    assert dedupe_key(created.date, " Shop ", -5) == dedupe_key(datetime(2024, 1, 2, 9), "shop", 5)
+
+
+def test_stored_rows_round_trip_exactly(tmp_path):
+    path = str(tmp_path / "transactions.csv")
+    transactions = [
+        make_transaction("2024-01-02", "SHOP, \"QUOTED\"", "0.10", "Groceries", "Market", tag="a;b", merchant="Shop"),
+        make_transaction("2024-01-03", "REFUND", "-1234.56", "Dining", currency="USD"),
+    ]
+    assert TransactionOperations.write_transactions(transactions, path)
+    loaded = TransactionOperations.read_transactions(path)
+    assert [(t.date, t.description, t.amount_minor, t.currency, t.category, t.subcategory, t.tag, t.merchant) for t in loaded] == [
+        (t.date, t.description, t.amount_minor, t.currency, t.category, t.subcategory, t.tag, t.merchant) for t in transactions
+    ]
+    assert isinstance(loaded[0], Transaction) and loaded[1].amount_minor == -123456
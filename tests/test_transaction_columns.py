@@ -0,0 +1,54 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file tests the dictionary-encoded columnar view of transactions
+# License: MIT
+
+from collections import defaultdict
+
+from cmdbudget.transaction_columns import CategoricalColumn, TransactionColumns
+
+from helpers import make_transaction
+
+HISTORY = [
+    make_transaction("2024-01-02", "LOBLAWS", "10.00", "Groceries", "Supermarket"),
+    make_transaction("2024-01-03", "TIM HORTONS", "2.50", "Dining", "Coffee", tag="work"),
+    make_transaction("2024-01-04", "MARKET", "7.25", "Groceries", "Market", currency="USD"),
+    make_transaction("2024-01-05", "PAYBACK", "99.00", "IGNORED"),
+    make_transaction("2024-01-06", "LOBLAWS", "-4.00", "Groceries", "Supermarket"),
+]
+
+
+def test_categorical_column_keeps_codes_and_counts_in_step():
+    column = CategoricalColumn()
+    assert [column.append(value) for value in ["a", "b", "a", None]] == [0, 1, 0, 2]
+    assert column.decode(2) == "" and column.count("a") == 2
+    column.set(1, "a")
+    assert (column.count("a"), column.count("b"), column.present_values()) == (3, 0, ["a", ""])
+    assert column.code_of("missing") is None
+
+
+def test_group_sum_matches_a_plain_grouping():
+    columns = TransactionColumns(HISTORY)
+    rows = columns.reportable_rows()
+    assert rows == [0, 1, 2, 4]
+
+    expected = defaultdict(int)
+    for row in rows:
+        transaction = HISTORY[row]
+        expected[(transaction.category, transaction.currency)] += transaction.amount_minor
+    totals = columns.group_sum(("category", "currency"), rows)
+    assert {(columns.category.decode(c), columns.currency.decode(k)): total for (c, k), total in totals.items()} == expected
+    assert columns.currency_amount_bounds(rows) == {"CAD": 1650, "USD": 725}
+
+
+def test_rows_follow_updates_and_appends():
+    columns = TransactionColumns(HISTORY)
+    assert columns.rows_with("subcategory", "Supermarket") == [0, 4]
+    assert columns.rows_with_tag("work") == [1]
+
+    columns.update(0, make_transaction("2024-01-02", "LOBLAWS", "10.00", "Dining", tag="work;home"))
+    row = columns.append(make_transaction("2024-01-07", "NEW", "1.00", "Groceries", tag="home"))
+    assert row == 5
+    assert columns.rows_with("category", "Dining") == [0, 1]
+    assert columns.rows_with_tag("home") == [0, 5]
+    assert columns.rows_with_tag("work", rows=[1, 2, 3]) == [1]
+    assert columns.category.count("Groceries") == 3
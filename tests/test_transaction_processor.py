@@ -0,0 +1,120 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file tests the pipelined import: the classifier worker, batched commits and the prompt loop
+# License: MIT
+
+import time
+
+from cmdbudget import transaction_processor
+from cmdbudget.display import Display
+from cmdbudget.transaction_processor import NewTransactionProcessor
+
+from helpers import answers
+
+
+def processor(workspace) -> NewTransactionProcessor:
+    return NewTransactionProcessor(workspace.new_transactions_file, workspace.transactions_file, workspace.config_file,
+                                   workspace.categories_file, workspace.mappings_file)
+
+
+def record_prompted_rows(monkeypatch, run: NewTransactionProcessor) -> list:
+    prompted = []
+    resolve = run._resolve_unmapped
+
+    def recording(line_num, raw_transaction, config):
+        prompted.append((line_num, raw_transaction.description))
+        resolve(line_num, raw_transaction, config)
+    monkeypatch.setattr(run, "_resolve_unmapped", recording)
+    return prompted
+
+
+def test_only_unmapped_rows_reach_the_prompts_in_file_order(workspace, monkeypatch):
+    monkeypatch.setattr(transaction_processor, "IMPORT_BATCH_SIZE", 7)
+    monkeypatch.setattr(transaction_processor, "PIPELINE_DEPTH", 2)
+    rows, unmapped = [], []
+    for number in range(120):
+        day = f"2024-{number % 12 + 1:02d}-{number % 28 + 1:02d}"
+        if number % 10 == 3:
+            rows.append([day, f"SHOP {number}", f"{number}.00", ""])
+            unmapped.append((number + 2, f"SHOP {number}"))  # Row 1 is the header
+        else:
+            rows.append([day, f"LOBLAWS {number}", f"{number}.00", ""])
+    rows.append(list(rows[0]))  # Repeated within the file
+    workspace.write_new(rows)
+
+    run = processor(workspace)
+    prompted = record_prompted_rows(monkeypatch, run)
+    answers(monkeypatch, *["4"] * len(unmapped))
+    assert run.process()
+
+    assert prompted == unmapped
+    assert run.counts == {"mapped": 108, "categorized": 0, "split": 0, "ignored": 12, "duplicates": 1, "errors": 0}
+    stored = workspace.stored_rows()
+    assert len(stored) == 120 == len(run.saved_transactions)
+    assert sorted(row["Description"] for row in stored) == sorted(row[1] for row in rows[:-1])
+
+
+def test_mapped_rows_are_committed_before_the_worker_waits(workspace, monkeypatch):
+    monkeypatch.setattr(transaction_processor, "PIPELINE_DEPTH", 1)
+    workspace.write_new([
+        ["2024-03-01", "LOBLAWS #1", "1.00", ""],
+        ["2024-03-02", "LOBLAWS #2", "2.00", ""],
+        ["2024-03-03", "UNKNOWN A", "3.00", ""],
+        ["2024-03-04", "UNKNOWN B", "4.00", ""],
+        ["2024-03-05", "UNKNOWN C", "5.00", ""],
+        ["2024-03-06", "LOBLAWS #6", "6.00", ""],
+    ])
+    stored_at_first_prompt = []
+
+    def prompt(text):
+        if not stored_at_first_prompt:
+            # The worker ends up blocked on the full queue with UNKNOWN C, having committed the rows before it
+            deadline = time.monotonic() + 5
+            while len(workspace.stored_rows()) < 2 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            stored_at_first_prompt.extend(row["Description"] for row in workspace.stored_rows())
+        return "4"
+    monkeypatch.setattr(Display, "prompt", staticmethod(prompt))
+
+    run = processor(workspace)
+    assert run.process()
+    assert stored_at_first_prompt == ["LOBLAWS #1", "LOBLAWS #2"]
+    assert run.counts["mapped"] == 3 and run.counts["ignored"] == 3
+
+
+def test_mapping_saved_at_a_prompt_covers_rows_already_queued(workspace, monkeypatch):
+    workspace.write_new([
+        ["2024-04-01", "NEW SHOP", "5.00", ""],
+        ["2024-04-02", "NEW SHOP", "6.00", ""],
+        ["2024-04-03", "OTHER SHOP", "7.00", ""],
+    ])
+    run = processor(workspace)
+    prompted = record_prompted_rows(monkeypatch, run)
+    # Categorize as Transport with no subcategory and save the mapping, then ignore OTHER SHOP
+    replies = ["2", "3", "0", "y", "4"]
+
+    def prompt(text):
+        if len(replies) == 5:
+            # Hold the first answer until the worker has queued every row
+            deadline = time.monotonic() + 5
+            while len(run.checkpoint.pending) < 3 and time.monotonic() < deadline:
+                time.sleep(0.01)
+        return replies.pop(0)
+    monkeypatch.setattr(Display, "prompt", staticmethod(prompt))
+    assert run.process()
+
+    assert not replies
+    assert [line_num for line_num, _ in prompted] == [2, 3, 4]
+    assert run.counts["categorized"] == 1 and run.counts["mapped"] == 1 and run.counts["ignored"] == 1
+    assert [(row["Description"], row["Category"]) for row in workspace.stored_rows()] == [
+        ("NEW SHOP", "Transport"), ("NEW SHOP", "Transport"), ("OTHER SHOP", "IGNORED")]
+
+
+def test_worker_failure_ends_the_import(workspace, monkeypatch):
+    workspace.write_new([["2024-05-01", "LOBLAWS", "1.00", ""], ["2024-05-02", "UNKNOWN", "2.00", ""]])
+    run = processor(workspace)
+
+    def fail(description):
+        raise RuntimeError("classifier failed")
+    monkeypatch.setattr(run.classifier, "find_category", fail)
+    assert not run.process()
+    assert workspace.stored_rows() == []
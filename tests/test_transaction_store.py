@@ -0,0 +1,86 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file tests the partitioned store: its manifest, partition pruning, sealing and migration
+# License: MIT
+
+import json
+import os
+import stat
+from datetime import date
+
+from cmdbudget.transaction_operations import TransactionOperations
+from cmdbudget.transaction_store import MANIFEST_FILE, PartitionedTransactionStore, open_transaction_store
+
+from helpers import Workspace, make_transaction
+
+HISTORY = [
+    make_transaction("2022-12-31", "OLD", "1.00"),
+    make_transaction("2023-03-01", "PAYBACK", "5.00", "IGNORED"),
+    make_transaction("2023-03-15", "MARKET", "3.00"),
+    make_transaction("2024-01-02", "LOBLAWS", "10.00"),
+]
+
+
+def store_with_history(tmp_path, granularity="year") -> PartitionedTransactionStore:
+    store = PartitionedTransactionStore(str(tmp_path / "partitions"), granularity, "none")
+    assert store.save_many(HISTORY)
+    return store
+
+
+def test_manifest_records_each_partition(tmp_path):
+    store = store_with_history(tmp_path)
+    with open(os.path.join(store.directory, MANIFEST_FILE), encoding="utf-8") as file:
+        manifest = json.load(file)
+    assert manifest["granularity"] == "year"
+    assert sorted(manifest["partitions"]) == ["2022", "2023", "2024"]
+    entry = manifest["partitions"]["2023"]
+    assert (entry["file"], entry["rows"], entry["min_date"], entry["max_date"]) == ("2023.csv", 2, "2023-03-01", "2023-03-15")
+    assert entry["months"] == {"2023-03": 1}
+    assert store.available_months() == [(2022, 12), (2023, 3), (2024, 1)]
+
+
+def test_reads_open_only_overlapping_partitions(tmp_path, monkeypatch):
+    store = store_with_history(tmp_path, "month")
+    opened = []
+    read_transactions = TransactionOperations.read_transactions
+    monkeypatch.setattr(TransactionOperations, "read_transactions",
+                        staticmethod(lambda path, *args: opened.append(os.path.basename(path)) or read_transactions(path, *args)))
+
+    assert [t.description for t in store.read_range(date(2023, 1, 1), date(2023, 12, 31))] == ["PAYBACK", "MARKET"]
+    assert opened == ["2023-03.csv"]
+    assert [t.description for t in store.read_months([(2024, 1)])] == ["LOBLAWS"]
+
+
+def test_sealed_partitions_refuse_writes_until_unsealed(tmp_path):
+    store = store_with_history(tmp_path)
+    generation = store.generation()
+    assert store.seal("2022")
+    assert store.generation() != generation
+    assert not os.stat(store.partition_path("2022")).st_mode & stat.S_IWUSR
+    assert not store.save(make_transaction("2022-06-01", "LATE", "1.00"))
+    assert store.rewrite_partitions(["2022"], lambda t: None) is None
+
+    assert store.unseal("2022")
+    assert store.save(make_transaction("2022-06-01", "LATE", "1.00"))
+    assert [t.description for t in store.read_partition("2022")] == ["OLD", "LATE"]
+
+
+def test_rewrite_updates_partition_statistics(tmp_path):
+    store = store_with_history(tmp_path)
+    changed = store.rewrite_partitions(
+        ["2023"], lambda t: [] if t.description == "MARKET" else None
+    )
+    assert changed == 1
+    assert store.partitions["2023"]["rows"] == 1
+    assert store.partitions["2023"]["months"] == {"2023-03": 0}
+    assert (2023, 3) not in store.available_months()
+
+
+def test_switching_to_partitions_migrates_the_single_file(tmp_path):
+    workspace = Workspace(str(tmp_path), storage={"layout": "partitioned", "partition_dir": str(tmp_path / "parts")})
+    workspace.store(HISTORY)
+    store = open_transaction_store(workspace.config, workspace.transactions_file)
+    assert isinstance(store, PartitionedTransactionStore)
+    assert [t.description for t in store.read_range()] == [t.description for t in HISTORY]
+    # Opening again does not migrate twice
+    again = open_transaction_store(workspace.config, workspace.transactions_file)
+    assert again.partitions["2023"]["rows"] == 2
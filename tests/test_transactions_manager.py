@@ -0,0 +1,50 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file tests TransactionsManager flows that cut across the storage, index and report layers
+# License: MIT
+
+from helpers import answers, make_transaction
+
+
+def test_plan_recategorization_loads_history_first(workspace):
+    workspace.store([
+        make_transaction("2024-01-05", "COSTCO WHOLESALE #12", "80.00", "Dining"),
+        make_transaction("2024-01-09", "COSTCO GAS", "40.00", "Transport"),
+        make_transaction("2024-01-10", "LOBLAWS #3", "12.00", "Groceries", "Supermarket"),
+    ])
+    manager = workspace.manager()
+    assert not manager.is_loaded
+    manager.classifier.save_mapping("COSTCO", "Groceries", "Market")
+
+    plan = manager.plan_recategorization("COSTCO")
+
+    assert manager.is_loaded
+    assert sorted(old.description for _, old, _ in plan.changes) == ["COSTCO GAS", "COSTCO WHOLESALE #12"]
+    assert {(new.category, new.subcategory) for _, _, new in plan.changes} == {("Groceries", "Market")}
+
+
+def test_review_rule_change_before_history_is_loaded(workspace, monkeypatch):
+    workspace.store([make_transaction("2024-02-01", "COSTCO WHOLESALE", "80.00", "Dining")])
+    manager = workspace.manager()
+    manager.classifier.save_mapping("COSTCO", "Groceries")
+    answers(monkeypatch, "y")
+
+    manager.review_rule_change("COSTCO")
+
+    assert [row["Category"] for row in workspace.stored_rows()] == ["Groceries"]
+    assert manager.transactions[0].category == "Groceries"
+
+
+def test_custom_transaction_is_checked_for_duplicates(workspace, monkeypatch):
+    workspace.store([make_transaction("2024-03-01", "LOBLAWS #3", "12.00", "Groceries", "Supermarket")])
+    manager = workspace.manager()
+    manager.ensure_loaded()
+    entered = ["02/03/2024", "Loblaws 3", "12.00", ""]
+    monkeypatch.setattr("builtins.input", lambda text="": entered.pop(0))
+    answers(monkeypatch, "y")
+
+    assert manager.add_custom_transaction()
+
+    [group] = manager.find_duplicates()
+    assert [t.description for t in group.transactions] == ["LOBLAWS #3", "Loblaws 3"]
+    assert manager.merge_duplicates([group]) == 1
+    assert [row["Description"] for row in workspace.stored_rows()] == ["LOBLAWS #3"]
@@ -0,0 +1,68 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file tests the month x category trend matrix against figures computed by hand
+# License: MIT
+
+import pytest
+
+from cmdbudget.transaction_columns import TransactionColumns
+from cmdbudget.trend_analysis import TrendEngine
+
+from helpers import make_transaction
+
+# Monthly grocery spend for 14 months starting January 2023, in dollars
+MONTHLY = [100, 120, 90, 110, 130, 80, 100, 140, 150, 95, 105, 115, 160, 170]
+
+
+def history():
+    transactions = []
+    for offset, amount in enumerate(MONTHLY):
+        year, month = 2023 + offset // 12, offset % 12 + 1
+        transactions.append(make_transaction(f"{year}-{month:02d}-05", "LOBLAWS", f"{amount - 10}.00", "Groceries", "Supermarket"))
+        transactions.append(make_transaction(f"{year}-{month:02d}-20", "MARKET", "10.00", "Groceries", "Market"))
+    return transactions
+
+
+def least_squares_slope(values):
+    n = len(values)
+    mean_t, mean_y = (n - 1) / 2, sum(values) / n
+    return sum((t - mean_t) * (y - mean_y) for t, y in enumerate(values)) / sum((t - mean_t) ** 2 for t in range(n))
+
+
+def keys(columns):
+    groceries, cad = columns.category.code_of("Groceries"), columns.currency.code_of("CAD")
+    return (groceries, -1, cad), (groceries, columns.subcategory.code_of("Market"), cad)
+
+
+def test_stats_match_figures_computed_by_hand():
+    columns = TransactionColumns(history())
+    engine = TrendEngine(columns, range(len(columns)))
+    whole, market = keys(columns)
+    assert engine.months()[0] == (2023, 1) and engine.months()[-1] == (2024, 2)
+
+    stats = engine.stats(whole, 2024, 2)
+    cents = [amount * 100 for amount in MONTHLY]
+    assert stats.current == 17000
+    assert stats.rolling_means[3] == pytest.approx(sum(cents[-3:]) / 3)
+    assert stats.rolling_means[12] == pytest.approx(sum(cents[-12:]) / 12)
+    assert stats.yoy_delta == 17000 - 12000
+    assert stats.slope == pytest.approx(least_squares_slope(cents))
+    assert engine.stats(whole, 2023, 6).yoy_delta is None
+    assert engine.stats(market, 2024, 1).current == 1000
+    assert engine.stats(whole, 2025, 1) is None
+
+
+def test_added_and_removed_rows_update_the_series():
+    columns = TransactionColumns(history())
+    engine = TrendEngine(columns, range(len(columns)))
+    whole, _ = keys(columns)
+    engine.stats(whole, 2024, 2)
+
+    row = columns.append(make_transaction("2024-04-01", "LOBLAWS", "50.00", "Groceries", "Supermarket"))
+    engine.add(row)
+    assert engine.months()[-1] == (2024, 4)
+    assert engine.stats(whole, 2024, 3).current == 0
+    assert engine.stats(whole, 2024, 4).current == 5000
+    assert engine.stats(whole, 2024, 2).slope == pytest.approx(least_squares_slope([a * 100 for a in MONTHLY] + [0, 5000]))
+
+    engine.remove(0)
+    assert engine.stats(whole, 2023, 1).current == 1000
@@ -0,0 +1,114 @@
+# AI generated and maintained by claude-3.7-sonnet
+# This file tests the undo log: its JSON lines format, undo/redo of row and mapping deltas, and compaction
+# License: MIT
+
+import json
+
+import pytest
+
+from cmdbudget.transaction_processor import TransactionClassifier
+from cmdbudget.transaction_store import CsvTransactionStore
+from cmdbudget.undo_log import STATE_VERSION, UndoLog
+
+from helpers import make_transaction
+
+COFFEE = make_transaction("2024-01-05", "TIM HORTONS", "2.50", "Dining", "Coffee")
+GROCERIES = make_transaction("2024-01-06", "LOBLAWS", "40.00", "Groceries", "Supermarket")
+
+
+@pytest.fixture
+def log(workspace):
+    workspace.store([COFFEE, GROCERIES])
+    classifier = TransactionClassifier(workspace.config_file, workspace.categories_file, workspace.mappings_file)
+    return UndoLog(str(workspace.root) + "/undo.jsonl", CsvTransactionStore(workspace.transactions_file), classifier)
+
+
+def events(log: UndoLog):
+    with open(log.path, encoding="utf-8") as file:
+        return [json.loads(line) for line in file]
+
+
+def edit_stored(log: UndoLog, original, replacement):
+    """Change a stored row the way the editor does, recording it."""
+    assert log.store.replace_transaction(log.store.partition_key(original.date), original, [replacement])
+    log.record(f"Edit '{original.description}'", transactions=[([original], [replacement])])
+
+
+def stored(workspace):
+    return [(row["Description"], row["Category"]) for row in workspace.stored_rows()]
+
+
+def test_log_is_appended_event_by_event(workspace, log):
+    dining = make_transaction("2024-01-06", "LOBLAWS", "40.00", "Dining")
+    edit_stored(log, GROCERIES, dining)
+    log.record("Mapping 'COSTCO'", mappings=[("COSTCO", None, {"category": "Groceries"})])
+    assert log.undo()["label"] == "Mapping 'COSTCO'"
+
+    lines = events(log)
+    assert lines[0] == {"version": STATE_VERSION}
+    assert [line["do"]["id"] for line in lines[1:3]] == [1, 2]
+    assert lines[1]["do"]["transactions"] == [[[["06/01/24", "LOBLAWS", "40.00", "CAD", "Groceries", "Supermarket", "", ""]],
+                                               [["06/01/24", "LOBLAWS", "40.00", "CAD", "Dining", "", "", ""]]]]
+    assert lines[3:] == [{"undo": 2}]
+    entries, position = log.entries()
+    assert [entry["id"] for entry in entries] == [1, 2] and position == 1
+
+    # A new change drops what could have been redone, compacting the file
+    log.record("Change categories", categories=({"A": []}, {"A": ["B"]}))
+    assert [line.get("do", {}).get("id") for line in events(log)] == [None, 1, 3]
+
+
+def test_undo_and_redo_row_changes(workspace, log):
+    edit_stored(log, GROCERIES, make_transaction("2024-01-06", "LOBLAWS", "40.00", "Dining"))
+    assert stored(workspace) == [("TIM HORTONS", "Dining"), ("LOBLAWS", "Dining")]
+
+    assert log.undo() is not None
+    assert stored(workspace) == [("TIM HORTONS", "Dining"), ("LOBLAWS", "Groceries")]
+    assert log.undo() is None
+    assert log.redo() is not None
+    assert stored(workspace) == [("TIM HORTONS", "Dining"), ("LOBLAWS", "Dining")]
+    assert log.redo() is None
+
+
+def test_undo_refuses_rows_changed_since(workspace, log):
+    dining = make_transaction("2024-01-06", "LOBLAWS", "40.00", "Dining")
+    edit_stored(log, GROCERIES, dining)
+    # Edited again outside the log
+    assert log.store.replace_transaction("2024", dining, [make_transaction("2024-01-06", "LOBLAWS", "41.00", "Dining")])
+
+    assert log.undo() is None
+    assert workspace.stored_rows()[-1]["Amount"] == "41.00"
+    assert log.entries()[1] == 1
+
+
+def test_undo_restores_mappings(workspace, log):
+    log.classifier.save_mapping("COSTCO", "Groceries", "Market")
+    log.record("Mapping 'COSTCO'", mappings=[("COSTCO", None, {"category": "Groceries", "subcategory": "Market"})])
+    log.undo()
+    assert log.classifier.find_category("COSTCO GAS") == (None, None)
+    log.redo()
+    assert log.classifier.find_category("COSTCO GAS") == ("Groceries", "Market")
+
+
+def test_torn_lines_are_skipped_and_old_versions_ignored(log):
+    log.record("Mapping 'A'", mappings=[("A", None, {"category": "Dining"})])
+    with open(log.path, "a", encoding="utf-8") as file:
+        file.write('{"do": {"id": 2, "lab')
+    entries, position = log.entries()
+    assert [entry["id"] for entry in entries] == [1] and position == 1
+
+    with open(log.path, "w", encoding="utf-8") as file:
+        file.write(json.dumps({"version": STATE_VERSION + 1}) + "\n")
+    assert log.entries() == ([], 0)
+
+
+def test_entry_limit_is_kept_when_compacting(log):
+    log.max_entries = 3
+    for number in range(8):
+        log.record(f"Mapping {number}", mappings=[(f"RULE {number}", None, {"category": "Dining"})])
+    entries, position = log.entries()
+    assert len(entries) <= 2 * log.max_entries
+    assert entries[-1]["label"] == "Mapping 7" and position == len(entries)
+    log.undo()
+    log.record("Mapping 8", mappings=[("RULE 8", None, {"category": "Dining"})])
+    assert [entry["label"] for entry in log.entries()[0]] == ["Mapping 5", "Mapping 6", "Mapping 8"]